@@ -0,0 +1,283 @@
+"""
+Adaptive Timeout Module - 依延遲分佈調整逾時
+
+Reference:
+- src/backend/latency.py (rolling windows)
+- src/backend/deadline.py (request budget caps every timeout)
+
+The fixed 10s / 15s / 30s timeouts were far too loose for live subtitles
+(a stalled gpt-4.1-nano stream held the subtitle for 15s) and occasionally
+too tight for gpt-5-mini reasoning in call_responses_api. Timeouts are now
+computed per (endpoint, model, kind) from what that pair actually does:
+
+    timeout = clamp(p99 of recent successes × ADAPTIVE_TIMEOUT_FACTOR,
+                    policy.min_s, policy.max_s)
+
+Kinds:
+- total: whole non-streaming call (/api/translate, controller, summary)
+- first_token: streaming call until the first SSE line
+- idle: longest gap between lines once streaming (per-stream maximum)
+
+Until ADAPTIVE_TIMEOUT_MIN_SAMPLES samples are in, the policy default
+(the old constant) applies. Current values are in /api/metrics ("timeouts").
+
+A timeout computed from successes alone can lock a model out: once it
+slows down past the timeout, every call times out and none is sampled.
+So:
+- a timed-out call is recorded as a censored sample at the timeout it hit
+  (the real latency was at least that), which pushes p99 up
+- after ADAPTIVE_TIMEOUT_WIDEN_AFTER consecutive timeouts the policy
+  maximum applies until the next success
+- samples older than ADAPTIVE_TIMEOUT_MAX_AGE_S are dropped, so a burst of
+  fast (or slow) calls does not set the timeout for the rest of the day
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+import math
+from collections import deque
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+import httpx
+
+try:
+    from .latency import LATENCY_WINDOW_SIZE
+except ImportError:
+    from latency import LATENCY_WINDOW_SIZE
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# Constants (可用環境變數覆寫)
+# =============================================================================
+
+ADAPTIVE_TIMEOUTS = os.getenv("ADAPTIVE_TIMEOUTS", "true").lower() == "true"
+ADAPTIVE_TIMEOUT_FACTOR = float(os.getenv("ADAPTIVE_TIMEOUT_FACTOR", "2.0"))
+ADAPTIVE_TIMEOUT_PERCENTILE = float(os.getenv("ADAPTIVE_TIMEOUT_PERCENTILE", "99"))
+ADAPTIVE_TIMEOUT_MIN_SAMPLES = int(os.getenv("ADAPTIVE_TIMEOUT_MIN_SAMPLES", "20"))
+ADAPTIVE_TIMEOUT_MAX_AGE_S = float(os.getenv("ADAPTIVE_TIMEOUT_MAX_AGE_S", "600"))
+ADAPTIVE_TIMEOUT_WIDEN_AFTER = int(os.getenv("ADAPTIVE_TIMEOUT_WIDEN_AFTER", "3"))
+
+TOTAL = "total"
+FIRST_TOKEN = "first_token"
+IDLE = "idle"
+
+
+@dataclass(frozen=True)
+class TimeoutPolicy:
+    """Default until warmed up (the old constant) and the clamp range, seconds."""
+    default_s: float
+    min_s: float
+    max_s: float
+
+
+TIMEOUT_POLICIES: Dict[Tuple[str, str], TimeoutPolicy] = {
+    ("translate", TOTAL): TimeoutPolicy(10.0, 2.0, 10.0),
+    ("translate_stream", FIRST_TOKEN): TimeoutPolicy(15.0, 1.5, 15.0),
+    ("translate_stream", IDLE): TimeoutPolicy(15.0, 1.0, 15.0),
+    ("suggest", FIRST_TOKEN): TimeoutPolicy(15.0, 2.0, 15.0),
+    ("suggest", IDLE): TimeoutPolicy(15.0, 1.0, 15.0),
+    # gpt-5-mini reasoning: may grow past the old 30s
+    ("controller", TOTAL): TimeoutPolicy(30.0, 5.0, 60.0),
+    # Streaming controller: the reasoning happens before the first delta
+    ("controller_stream", FIRST_TOKEN): TimeoutPolicy(30.0, 5.0, 60.0),
+    ("controller_stream", IDLE): TimeoutPolicy(15.0, 2.0, 30.0),
+    ("summary", TOTAL): TimeoutPolicy(30.0, 10.0, 90.0),
+}
+
+
+class StreamTimeout(httpx.ReadTimeout):
+    """No first token / no next line within the adaptive timeout.
+
+    An httpx.ReadTimeout, so callers, the model router and the circuit
+    breaker treat it like any upstream read timeout.
+    """
+
+    def __init__(self, kind: str, timeout_s: float):
+        self.kind = kind
+        self.timeout_s = timeout_s
+        super().__init__(f"No {kind.replace('_', ' ')} within {timeout_s:.1f}s")
+
+
+# =============================================================================
+# Windows
+# =============================================================================
+
+class TimingWindow:
+    """Recent samples (ms) of one (endpoint, model, kind), aged out by time. Thread-safe."""
+
+    def __init__(self, max_samples: int = LATENCY_WINDOW_SIZE):
+        self._samples = deque(maxlen=max_samples)  # (monotonic time, ms, censored)
+        self._lock = threading.Lock()
+        self.consecutive_timeouts = 0
+
+    def record(self, ms: float, censored: bool = False) -> None:
+        with self._lock:
+            self._samples.append((time.monotonic(), ms, censored))
+            self.consecutive_timeouts = self.consecutive_timeouts + 1 if censored else 0
+
+    def _fresh(self) -> list:
+        cutoff = time.monotonic() - ADAPTIVE_TIMEOUT_MAX_AGE_S
+        with self._lock:
+            while self._samples and self._samples[0][0] < cutoff:
+                self._samples.popleft()
+            return list(self._samples)
+
+    def __len__(self) -> int:
+        return len(self._fresh())
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Nearest-rank percentile (p in 0-100) of fresh samples, None without any."""
+        ordered = sorted(ms for _, ms, _ in self._fresh())
+        if not ordered:
+            return None
+        return ordered[max(math.ceil(p / 100 * len(ordered)), 1) - 1]
+
+    def snapshot(self) -> dict:
+        samples = self._fresh()
+        return {
+            "count": len(samples),
+            "timeouts": sum(1 for *_, censored in samples if censored),
+            "p99": None if not samples else round(self.percentile(99), 1),
+        }
+
+
+_WINDOWS: Dict[Tuple[str, str, str], TimingWindow] = {}
+_WINDOWS_LOCK = threading.Lock()
+_STATS = {"stream_timeouts": {}}
+
+
+def _window(endpoint: str, model: str, kind: str) -> TimingWindow:
+    key = (endpoint, model, kind)
+    with _WINDOWS_LOCK:
+        window = _WINDOWS.get(key)
+        if window is None:
+            window = _WINDOWS[key] = TimingWindow()
+        return window
+
+
+def record_timing(endpoint: str, model: str, kind: str, ms: float) -> None:
+    """One successful observation (ms) for the (endpoint, model, kind) window."""
+    _window(endpoint, model, kind).record(ms)
+
+
+def record_timeout(endpoint: str, model: str, kind: str, timeout_s: float) -> None:
+    """A call that hit `timeout_s`: a censored sample (latency ≥ the timeout)."""
+    _window(endpoint, model, kind).record(timeout_s * 1000, censored=True)
+
+
+def adaptive_timeout(endpoint: str, model: str, kind: str) -> float:
+    """Current timeout in seconds: clamped p99 × factor, or the policy default.
+
+    After ADAPTIVE_TIMEOUT_WIDEN_AFTER consecutive timeouts: the policy maximum.
+    """
+    policy = TIMEOUT_POLICIES[(endpoint, kind)]
+    if not ADAPTIVE_TIMEOUTS:
+        return policy.default_s
+    window = _window(endpoint, model, kind)
+    if window.consecutive_timeouts >= ADAPTIVE_TIMEOUT_WIDEN_AFTER:
+        return policy.max_s
+    if len(window) < ADAPTIVE_TIMEOUT_MIN_SAMPLES:
+        return policy.default_s
+    value_s = window.percentile(ADAPTIVE_TIMEOUT_PERCENTILE) * ADAPTIVE_TIMEOUT_FACTOR / 1000
+    return min(max(value_s, policy.min_s), policy.max_s)
+
+
+def timeout_ceiling(endpoint: str) -> float:
+    """Longest timeout any kind of `endpoint` can reach (default request budget)."""
+    return max(policy.max_s for (name, _), policy in TIMEOUT_POLICIES.items() if name == endpoint)
+
+
+def _record_stream_timeout(endpoint: str, model: str, kind: str, timeout_s: float) -> None:
+    record_timeout(endpoint, model, kind, timeout_s)
+    key = f"{endpoint}:{kind}"
+    counts = _STATS["stream_timeouts"]
+    counts[key] = counts.get(key, 0) + 1
+
+
+# =============================================================================
+# Streams
+# =============================================================================
+
+async def timed_lines(
+    lines: AsyncIterator[str],
+    endpoint: str,
+    model: str,
+    sent: Optional[float] = None,
+) -> AsyncIterator[str]:
+    """Yield SSE lines, bounding the first by first_token and the rest by idle.
+
+    `sent` (perf_counter when the request went out) makes the first-token
+    timeout and sample cover the wait for response headers too.
+
+    Raises:
+        StreamTimeout: a line did not arrive in time (the source is closed)
+    """
+    first_s = adaptive_timeout(endpoint, model, FIRST_TOKEN)
+    idle_s = adaptive_timeout(endpoint, model, IDLE)
+    started = time.perf_counter() if sent is None else sent
+    last = None
+    max_gap_ms = 0.0
+    timed_out = False
+    try:
+        while True:
+            if last is None:
+                kind, limit = FIRST_TOKEN, first_s
+                wait_s = max(started + first_s - time.perf_counter(), 0.0)
+            else:
+                kind, limit = IDLE, idle_s
+                wait_s = idle_s
+            try:
+                line = await asyncio.wait_for(lines.__anext__(), timeout=wait_s)
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError as e:
+                timed_out = True
+                _record_stream_timeout(endpoint, model, kind, limit)
+                raise StreamTimeout(kind, limit) from e
+            now = time.perf_counter()
+            if last is None:
+                record_timing(endpoint, model, FIRST_TOKEN, (now - started) * 1000)
+            else:
+                max_gap_ms = max(max_gap_ms, (now - last) * 1000)
+            last = now
+            yield line
+    finally:
+        if max_gap_ms and not timed_out:
+            record_timing(endpoint, model, IDLE, max_gap_ms)
+        await lines.aclose()
+
+
+# =============================================================================
+# Metrics
+# =============================================================================
+
+def get_timeout_stats() -> dict:
+    """Current timeout per observed (endpoint, model, kind) for /api/metrics."""
+    with _WINDOWS_LOCK:
+        windows = dict(_WINDOWS)
+    current = {}
+    for (endpoint, model, kind), window in windows.items():
+        snapshot = window.snapshot()
+        warmed = ADAPTIVE_TIMEOUTS and snapshot["count"] >= ADAPTIVE_TIMEOUT_MIN_SAMPLES
+        widened = ADAPTIVE_TIMEOUTS and window.consecutive_timeouts >= ADAPTIVE_TIMEOUT_WIDEN_AFTER
+        current[f"{endpoint}:{model}:{kind}"] = {
+            "timeout_s": round(adaptive_timeout(endpoint, model, kind), 2),
+            "source": "widened" if widened else "adaptive" if warmed else "default",
+            "samples": snapshot["count"],
+            "timeouts": snapshot["timeouts"],
+            "p99_ms": snapshot["p99"],
+        }
+    return {
+        "enabled": ADAPTIVE_TIMEOUTS,
+        "factor": ADAPTIVE_TIMEOUT_FACTOR,
+        "percentile": ADAPTIVE_TIMEOUT_PERCENTILE,
+        "max_age_s": ADAPTIVE_TIMEOUT_MAX_AGE_S,
+        "current": current,
+        "defaults_s": {f"{endpoint}:{kind}": policy.default_s for (endpoint, kind), policy in TIMEOUT_POLICIES.items()},
+        "stream_timeouts": dict(_STATS["stream_timeouts"]),
+    }
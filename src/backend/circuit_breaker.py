@@ -0,0 +1,354 @@
+"""
+Circuit Breaker Module - 上游熔斷與模型備援
+
+Reference:
+- src/backend/model_router.py (translation failover order)
+- "Release It!" (Nygard) - circuit breaker pattern
+
+When the chat completions endpoint degrades, every /api/translate/stream
+call used to wait out its full 15s timeout before the error event, and the
+controller waited 30s before its canned reply. Each (upstream endpoint,
+model) pair now has a breaker:
+
+- closed: calls pass; the last BREAKER_WINDOW outcomes are kept. It trips
+  (→ open) on BREAKER_CONSECUTIVE_FAILURES failures in a row, or once
+  BREAKER_MIN_CALLS outcomes are in and the failure rate reaches
+  BREAKER_FAILURE_RATE or the slow-call rate reaches BREAKER_SLOW_RATE.
+- open: calls fail immediately with CircuitOpenError, so callers move to
+  the fallback model (BREAKER_FALLBACK_MODELS) or their canned fallback.
+- half_open: after the open period one probe call is let through; success
+  closes the breaker, failure re-opens it for twice as long (capped).
+
+Failures are timeouts, connection errors, 5xx and 408 — not 401/403/429,
+which say something about the caller's key (429 is rate_limiter.py's job).
+Breaker state is in /api/metrics.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+import httpx
+import openai
+
+try:
+    from .deadline import DeadlineExceeded
+except ImportError:
+    from deadline import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# Constants (可用環境變數覆寫)
+# =============================================================================
+
+BREAKER_ENABLED = os.getenv("BREAKER_ENABLED", "true").lower() == "true"
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", "20"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "5"))
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_SLOW_RATE = float(os.getenv("BREAKER_SLOW_RATE", "0.8"))
+BREAKER_CONSECUTIVE_FAILURES = int(os.getenv("BREAKER_CONSECUTIVE_FAILURES", "3"))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "10"))
+BREAKER_MAX_OPEN_SECONDS = float(os.getenv("BREAKER_MAX_OPEN_SECONDS", "60"))
+
+
+def _parse_fallbacks(value: str) -> Dict[str, str]:
+    """"gpt-4.1-nano=gpt-4o-mini,..." → {"gpt-4.1-nano": "gpt-4o-mini", ...}"""
+    mapping = {}
+    for item in value.split(","):
+        if "=" in item:
+            model, fallback = item.split("=", 1)
+            mapping[model.strip()] = fallback.strip()
+    return mapping
+
+
+# Controller / script models (gpt-5-mini, CLAUDE.md 硬性規則) have no fallback
+# model on purpose: their fallback is the canned response.
+BREAKER_FALLBACK_MODELS = _parse_fallbacks(os.getenv(
+    "BREAKER_FALLBACK_MODELS",
+    "gpt-4.1-nano=gpt-4o-mini,gpt-4o-mini=gpt-4.1-nano,gpt-4.1-mini=gpt-4o-mini",
+))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Window outcomes
+_OK = "ok"
+_SLOW = "slow"
+_FAILED = "failed"
+
+
+class CircuitOpenError(Exception):
+    """The breaker for this endpoint / model is open: failing fast."""
+
+    def __init__(self, name: str, retry_in_s: float):
+        self.name = name
+        self.retry_in_s = retry_in_s
+        super().__init__(f"Upstream {name} unavailable (circuit open, retry in {retry_in_s:.1f}s)")
+
+
+def is_failure_status(status_code: int) -> bool:
+    """Statuses that say the upstream (not the caller's key) is unhealthy."""
+    return status_code >= 500 or status_code == 408
+
+
+def counts_as_failure(error: BaseException) -> bool:
+    """Exceptions that count against the breaker (timeouts, transport, 5xx)."""
+    if isinstance(error, (CircuitOpenError, DeadlineExceeded)):
+        return False  # our own fail-fast / the request's budget, not the upstream
+    if isinstance(error, httpx.HTTPStatusError):
+        return is_failure_status(error.response.status_code)
+    status_code = getattr(error, "status_code", None)
+    if isinstance(status_code, int):
+        return is_failure_status(status_code)
+    return isinstance(error, (
+        httpx.TransportError,
+        openai.APIConnectionError,  # includes APITimeoutError
+        asyncio.TimeoutError,
+        ConnectionError,
+    ))
+
+
+# =============================================================================
+# Breaker
+# =============================================================================
+
+class CircuitBreaker:
+    """Breaker for one (endpoint, model) pair. Thread-safe."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=BREAKER_WINDOW)
+        self._consecutive_failures = 0
+        self._open_seconds = BREAKER_OPEN_SECONDS
+        self._open_until = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "failures": 0, "slow": 0, "rejected": 0, "trips": 0}
+
+    def _retry_in(self, now: float) -> float:
+        return max(self._open_until - now, 0.0)
+
+    def available(self) -> bool:
+        """Would a call be let through now (without claiming the probe)?"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            return time.monotonic() >= self._open_until and not self._probe_in_flight
+
+    def before_call(self) -> None:
+        """Admit a call, or raise CircuitOpenError.
+
+        Once the open period is over the first caller becomes the half-open
+        probe; others keep failing fast until it reports back.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self.state == CLOSED:
+                self._stats["calls"] += 1
+                return
+            if now >= self._open_until and not self._probe_in_flight:
+                self.state = HALF_OPEN
+                self._probe_in_flight = True
+                self._stats["calls"] += 1
+                logger.info(f"[Breaker] {self.name} half-open, sending probe")
+                return
+            self._stats["rejected"] += 1
+            retry_in = self._retry_in(now)
+        raise CircuitOpenError(self.name, retry_in)
+
+    def record_success(self, slow: bool = False) -> None:
+        with self._lock:
+            if slow:
+                self._stats["slow"] += 1
+            if self.state == HALF_OPEN:
+                if slow:
+                    self._trip(time.monotonic(), "slow probe")
+                else:
+                    self._close()
+                return
+            self._consecutive_failures = 0
+            self._outcomes.append(_SLOW if slow else _OK)
+            self._check_window()
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._stats["failures"] += 1
+            if self.state == HALF_OPEN:
+                self._trip(time.monotonic(), "probe failed")
+                return
+            if self.state == OPEN:
+                return
+            self._consecutive_failures += 1
+            self._outcomes.append(_FAILED)
+            if self._consecutive_failures >= BREAKER_CONSECUTIVE_FAILURES:
+                self._trip(time.monotonic(), f"{self._consecutive_failures} consecutive failures")
+            else:
+                self._check_window()
+
+    def release(self) -> None:
+        """Call ended without an outcome (cancelled, caller error): free the probe."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probe_in_flight = False
+
+    def _check_window(self) -> None:
+        if self.state != CLOSED or len(self._outcomes) < BREAKER_MIN_CALLS:
+            return
+        total = len(self._outcomes)
+        failure_rate = sum(1 for o in self._outcomes if o == _FAILED) / total
+        slow_rate = sum(1 for o in self._outcomes if o == _SLOW) / total
+        if failure_rate >= BREAKER_FAILURE_RATE:
+            self._trip(time.monotonic(), f"failure rate {failure_rate:.2f}")
+        elif slow_rate >= BREAKER_SLOW_RATE:
+            self._trip(time.monotonic(), f"slow-call rate {slow_rate:.2f}")
+
+    def _trip(self, now: float, reason: str) -> None:
+        if self.state == HALF_OPEN:
+            # Still unhealthy: back off longer before the next probe
+            self._open_seconds = min(self._open_seconds * 2, BREAKER_MAX_OPEN_SECONDS)
+        self.state = OPEN
+        self._open_until = now + self._open_seconds
+        self._probe_in_flight = False
+        self._stats["trips"] += 1
+        logger.warning(f"[Breaker] {self.name} open for {self._open_seconds:.0f}s ({reason})")
+
+    def _close(self) -> None:
+        self.state = CLOSED
+        self._outcomes.clear()
+        self._consecutive_failures = 0
+        self._open_seconds = BREAKER_OPEN_SECONDS
+        self._probe_in_flight = False
+        logger.info(f"[Breaker] {self.name} closed (probe succeeded)")
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["state"] = self.state
+            stats["retry_in_s"] = round(self._retry_in(time.monotonic()), 1) if self.state != CLOSED else 0.0
+            if self._outcomes:
+                stats["window_failure_rate"] = round(
+                    sum(1 for o in self._outcomes if o == _FAILED) / len(self._outcomes), 3
+                )
+        return stats
+
+
+# =============================================================================
+# Registry / Call Guard
+# =============================================================================
+
+_BREAKERS: Dict[Tuple[str, str], CircuitBreaker] = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+def get_breaker(endpoint: str, model: str) -> CircuitBreaker:
+    """Breaker for an (endpoint, model) pair (created on first use)."""
+    key = (endpoint, model)
+    with _BREAKERS_LOCK:
+        breaker = _BREAKERS.get(key)
+        if breaker is None:
+            breaker = _BREAKERS[key] = CircuitBreaker(f"{endpoint}:{model}")
+        return breaker
+
+
+def circuit_available(endpoint: str, model: str) -> bool:
+    return not BREAKER_ENABLED or get_breaker(endpoint, model).available()
+
+
+def fallback_model(model: str) -> Optional[str]:
+    return BREAKER_FALLBACK_MODELS.get(model)
+
+
+def select_model(endpoint: str, model: str) -> str:
+    """`model`, or its fallback while the model's breaker is open."""
+    fallback = fallback_model(model)
+    if fallback and not circuit_available(endpoint, model) and circuit_available(endpoint, fallback):
+        logger.warning(f"[Breaker] {endpoint}:{model} open, using fallback {fallback}")
+        return fallback
+    return model
+
+
+class BreakerCall:
+    """Outcome of one guarded call; the first outcome reported wins."""
+
+    def __init__(self, breaker: Optional[CircuitBreaker], slow_call_ms: Optional[float]):
+        self.breaker = breaker
+        self.slow_call_ms = slow_call_ms
+        self.started = time.perf_counter()
+        self.done = False
+
+    def succeeded(self, latency_ms: Optional[float] = None) -> None:
+        """Upstream is healthy; latency_ms (default: elapsed) is judged for slowness.
+
+        Streams report at the first token, so latency is time-to-first-token.
+        """
+        if self.done:
+            return
+        self.done = True
+        if latency_ms is None:
+            latency_ms = (time.perf_counter() - self.started) * 1000
+        if self.breaker is not None:
+            slow = self.slow_call_ms is not None and latency_ms > self.slow_call_ms
+            self.breaker.record_success(slow)
+
+    def failed(self) -> None:
+        if self.done:
+            return
+        self.done = True
+        if self.breaker is not None:
+            self.breaker.record_failure()
+
+    def observe_status(self, status_code: int) -> None:
+        """Non-streaming response arrived: 5xx / 408 fail, anything else succeeds."""
+        if is_failure_status(status_code):
+            self.failed()
+        else:
+            self.succeeded()
+
+
+@contextmanager
+def circuit(endpoint: str, model: str, slow_call_ms: Optional[float] = None) -> Iterator[BreakerCall]:
+    """Guard one upstream call with the (endpoint, model) breaker.
+
+    Raises CircuitOpenError up front when open. Exceptions from the block are
+    judged by counts_as_failure(); leaving the block cleanly without a
+    reported outcome counts as a success with the elapsed time.
+
+    Usage:
+        with circuit("chat/completions", model, slow_call_ms=4000) as call:
+            ...
+            call.succeeded(ttft_ms)
+    """
+    breaker = get_breaker(endpoint, model) if BREAKER_ENABLED else None
+    if breaker is not None:
+        breaker.before_call()
+    call = BreakerCall(breaker, slow_call_ms)
+    try:
+        yield call
+    except BaseException as e:
+        if not call.done and breaker is not None:
+            if counts_as_failure(e):
+                call.failed()
+            else:
+                call.done = True
+                breaker.release()
+        raise
+    else:
+        call.succeeded()
+
+
+def get_circuit_breaker_stats() -> dict:
+    """Per (endpoint, model) breaker state for /api/metrics."""
+    with _BREAKERS_LOCK:
+        breakers = list(_BREAKERS.values())
+    return {
+        "enabled": BREAKER_ENABLED,
+        "breakers": {breaker.name: breaker.stats() for breaker in breakers},
+    }
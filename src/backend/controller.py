@@ -13,7 +13,8 @@ import json
 import logging
 import os
 import re
-from typing import Optional, Tuple
+import time
+from typing import AsyncIterator, Optional, Tuple
 
 import httpx
 
@@ -32,6 +33,15 @@ try:
         build_controller_prompt,
         build_ssot_summarize_prompt,
     )
+    from .upstream import IncompleteStreamError, get_async_client
+    from .scheduler import Priority, UpstreamBusyError, upstream_slot
+    from .circuit_breaker import CircuitOpenError, circuit
+    from .deadline import DeadlineExceeded, bound_stream, current_deadline, enforce_deadline, upstream_timeout
+    from .adaptive_timeout import FIRST_TOKEN, TOTAL, adaptive_timeout, record_timeout, record_timing, timed_lines
+    from .incremental_json import FieldStreamParser
+    from .latency import LatencyWindow
+    from .tokenizer import count_tokens, count_tokens_batch, record_prompt_tokens, truncate_to_tokens
+    from .prompt_budget import current_prompt_tokens
 except ImportError:
     from models import (
         ControllerOutput,
@@ -46,6 +56,15 @@ except ImportError:
         build_controller_prompt,
         build_ssot_summarize_prompt,
     )
+    from upstream import IncompleteStreamError, get_async_client
+    from scheduler import Priority, UpstreamBusyError, upstream_slot
+    from circuit_breaker import CircuitOpenError, circuit
+    from deadline import DeadlineExceeded, bound_stream, current_deadline, enforce_deadline, upstream_timeout
+    from adaptive_timeout import FIRST_TOKEN, TOTAL, adaptive_timeout, record_timeout, record_timing, timed_lines
+    from incremental_json import FieldStreamParser
+    from latency import LatencyWindow
+    from tokenizer import count_tokens, count_tokens_batch, record_prompt_tokens, truncate_to_tokens
+    from prompt_budget import current_prompt_tokens
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -61,43 +80,35 @@ OPENAI_RESPONSES_URL = "https://api.openai.com/v1/responses"
 # API configuration
 MAX_OUTPUT_TOKENS = 1000  # Per SKILL.md recommendation
 REQUEST_TIMEOUT = 30.0  # Per design.md § 9.3
+SLOW_CALL_MS = 20000  # circuit breaker slow-call threshold (circuit_breaker.py)
+SSOT_TOKEN_LIMIT = 1500  # design.md § 4.2: SSOT above this is summarized
+CONTROLLER_DECISIONS = ("continue", "request_clarification", "stop")
 
 
 # =============================================================================
-# Token Estimation (simple formula for v1)
+# Token Estimation (tokenizer.py)
 # =============================================================================
 
 def estimate_tokens(text: str) -> int:
     """
-    Estimate token count using simple formula (v1).
+    Count tokens (tokenizer.py).
 
-    Reference: design.md § 7 (T2.1 defines the formula)
+    Reference: design.md § 7 (T2.1 defined the v1 formula)
 
-    Formula:
+    o200k_base BPE counts, as the API bills them (roughly 1 token per
+    English word or common Chinese character). If the vocabulary cannot
+    be loaded, the v1 formula applies:
     - Chinese characters: ~2 tokens each
     - English words: ~1.3 tokens each
     - Punctuation: ignored
 
     Args:
-        text: Input text to estimate
+        text: Input text to count
 
     Returns:
-        Estimated token count
+        Token count (0 for empty text)
     """
-    if not text:
-        return 0
-
-    # Count Chinese characters (CJK Unified Ideographs range)
-    chinese_chars = len(re.findall(r'[\u4e00-\u9fff]', text))
-
-    # Remove Chinese characters and count English words
-    text_without_chinese = re.sub(r'[\u4e00-\u9fff]', '', text)
-    english_words = len(text_without_chinese.split())
-
-    # Apply formula
-    estimated = int(chinese_chars * 2 + english_words * 1.3)
-
-    return max(estimated, 1)  # At least 1 token for non-empty text
+    return count_tokens(text)
 
 
 # =============================================================================
@@ -272,12 +283,40 @@ def _best_effort_extract(text: str) -> ControllerOutput:
 # OpenAI Responses API Caller
 # =============================================================================
 
+def _responses_request_body(
+    instruction: str,
+    prompt: str,
+    previous_response_id: Optional[str],
+    max_tokens: int,
+) -> dict:
+    """Responses API request body (stateful continuation when previous_response_id is set)."""
+    request_body = {
+        "model": CONTROLLER_MODEL,
+        "instructions": instruction,
+        "input": [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "input_text", "text": prompt}
+                ]
+            }
+        ],
+        "max_output_tokens": max_tokens
+    }
+
+    # Add previous_response_id if provided (for stateful continuation)
+    if previous_response_id:
+        request_body["previous_response_id"] = previous_response_id
+    return request_body
+
+
 async def call_responses_api(
     instruction: str,
     prompt: str,
     previous_response_id: Optional[str] = None,
     max_tokens: int = MAX_OUTPUT_TOKENS,
-    api_key: Optional[str] = None
+    api_key: Optional[str] = None,
+    priority: Priority = Priority.CONTROLLER,
 ) -> Tuple[str, str]:
     """
     Call OpenAI Responses API with gpt-5-mini.
@@ -290,6 +329,7 @@ async def call_responses_api(
         previous_response_id: Optional ID for stateful continuation
         max_tokens: Maximum output tokens
         api_key: OpenAI API key (required, passed from endpoint)
+        priority: Scheduler class (controller, or summary for SSOT updates)
 
     Returns:
         Tuple of (response_text, response_id)
@@ -297,60 +337,64 @@ async def call_responses_api(
     Raises:
         httpx.HTTPStatusError: On API errors
         httpx.TimeoutException: On timeout
+        UpstreamBusyError: No upstream slot (scheduler.py)
+        CircuitOpenError: Responses API breaker open (circuit_breaker.py)
+        DeadlineExceeded: The request's deadline ran out (deadline.py)
     """
     if not api_key:
         raise ValueError("API Key required. Please set your OpenAI API Key in Settings.")
 
-    # Build request body
-    request_body = {
-        "model": CONTROLLER_MODEL,
-        "instructions": instruction,
-        "input": [
-            {
-                "role": "user",
-                "content": [
-                    {"type": "input_text", "text": prompt}
-                ]
-            }
-        ],
-        "max_output_tokens": max_tokens
-    }
-
-    # Add previous_response_id if provided (for stateful continuation)
-    if previous_response_id:
-        request_body["previous_response_id"] = previous_response_id
+    request_body = _responses_request_body(instruction, prompt, previous_response_id, max_tokens)
 
     logger.debug(f"Calling Responses API with model={CONTROLLER_MODEL}")
 
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            OPENAI_RESPONSES_URL,
-            headers={
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json"
-            },
-            json=request_body,
-            timeout=REQUEST_TIMEOUT
-        )
-
-        response.raise_for_status()
-        data = response.json()
-
-        # Extract response text and ID
-        # Responses API returns: { "id": "resp_...", "output": [...], ... }
-        response_id = data.get("id", "")
-        output_text = ""
-
-        # Extract text from output array
-        output_items = data.get("output", [])
-        for item in output_items:
-            if item.get("type") == "message":
-                content = item.get("content", [])
-                for content_item in content:
-                    if content_item.get("type") == "output_text":
-                        output_text += content_item.get("text", "")
-
-        return output_text, response_id
+    client = get_async_client()
+    # gpt-5-mini only (no fallback model): an open breaker fails fast and the
+    # caller uses its canned response. The timeout follows observed latency
+    # (adaptive_timeout.py; REQUEST_TIMEOUT until warmed up), capped by the
+    # request's remaining deadline.
+    timeout_key = "summary" if priority == Priority.SUMMARY else "controller"
+    async with enforce_deadline():
+        with circuit("responses", CONTROLLER_MODEL, slow_call_ms=SLOW_CALL_MS) as call:
+            async with upstream_slot(api_key, priority):
+                sent = time.perf_counter()
+                try:
+                    response = await client.post(
+                        OPENAI_RESPONSES_URL,
+                        headers={
+                            "Authorization": f"Bearer {api_key}",
+                            "Content-Type": "application/json"
+                        },
+                        json=request_body,
+                        timeout=upstream_timeout(adaptive_timeout(timeout_key, CONTROLLER_MODEL, TOTAL))
+                    )
+                except httpx.TimeoutException:
+                    # Censored sample: the call took at least this long
+                    record_timeout(timeout_key, CONTROLLER_MODEL, TOTAL, time.perf_counter() - sent)
+                    raise
+            call.observe_status(response.status_code)
+
+    if response.status_code == 200:
+        record_timing(timeout_key, CONTROLLER_MODEL, TOTAL, (time.perf_counter() - sent) * 1000)
+
+    response.raise_for_status()
+    data = response.json()
+
+    # Extract response text and ID
+    # Responses API returns: { "id": "resp_...", "output": [...], ... }
+    response_id = data.get("id", "")
+    output_text = ""
+
+    # Extract text from output array
+    output_items = data.get("output", [])
+    for item in output_items:
+        if item.get("type") == "message":
+            content = item.get("content", [])
+            for content_item in content:
+                if content_item.get("type") == "output_text":
+                    output_text += content_item.get("text", "")
+
+    return output_text, response_id
 
 
 # =============================================================================
@@ -373,13 +417,9 @@ async def generate_controller_response(
     Returns:
         ControllerResponse with decision, utterance, memory update, notes
     """
-    # Build prompt
-    prompt = build_controller_prompt(
-        directive=request.directive,
-        pinned_context=request.pinned_context,
-        memory=request.memory,
-        latest_turns=request.latest_turns
-    )
+    # Build prompt (token-budgeted, prompt_budget.py)
+    prompt = _build_prompt(request)
+    prompt_tokens = current_prompt_tokens()
 
     try:
         # Call Responses API
@@ -392,57 +432,282 @@ async def generate_controller_response(
 
         # Parse output with fail-soft strategy
         parsed = parse_controller_output(response_text)
+        return _controller_response(parsed, response_id, prompt_tokens)
 
-        # T1.5: Detect honesty indicators in the utterance
-        utterance = parsed.next_english_utterance or "Let me consider that."
-        honesty_note = detect_honesty_response(utterance)
-
-        # Combine notes: existing notes + honesty note
-        final_notes = parsed.notes_for_user
-        if honesty_note:
-            if final_notes:
-                final_notes = f"{final_notes}\n{honesty_note}"
-            else:
-                final_notes = honesty_note
-
-        return ControllerResponse(
-            decision=parsed.decision if parsed.decision in ("continue", "request_clarification", "stop") else "continue",
-            next_english_utterance=utterance,
-            memory_update=parsed.memory_update,
-            notes_for_user=final_notes,
-            response_id=response_id
-        )
+    except Exception as e:
+        return _fallback_response(request, e, prompt_tokens)
+
+
+def _build_prompt(request: ControllerRequest) -> str:
+    return build_controller_prompt(
+        directive=request.directive,
+        pinned_context=request.pinned_context,
+        memory=request.memory,
+        latest_turns=request.latest_turns
+    )
+
+
+def _controller_response(
+    parsed: ControllerOutput,
+    response_id: str,
+    prompt_tokens: Optional[int],
+) -> ControllerResponse:
+    """Parsed model output → ControllerResponse (defaults + honesty note)."""
+    # T1.5: Detect honesty indicators in the utterance
+    utterance = parsed.next_english_utterance or "Let me consider that."
+    honesty_note = detect_honesty_response(utterance)
+
+    # Combine notes: existing notes + honesty note
+    final_notes = parsed.notes_for_user
+    if honesty_note:
+        if final_notes:
+            final_notes = f"{final_notes}\n{honesty_note}"
+        else:
+            final_notes = honesty_note
+
+    return ControllerResponse(
+        decision=parsed.decision if parsed.decision in CONTROLLER_DECISIONS else "continue",
+        next_english_utterance=utterance,
+        memory_update=parsed.memory_update,
+        notes_for_user=final_notes,
+        response_id=response_id,
+        prompt_tokens=prompt_tokens,
+    )
 
-    except httpx.TimeoutException:
+
+def _fallback_response(
+    request: ControllerRequest,
+    error: Exception,
+    prompt_tokens: Optional[int] = None,
+) -> ControllerResponse:
+    """Canned response when the controller call fails (existing memory preserved)."""
+    utterance = "I need a moment to think about that."
+    if isinstance(error, httpx.TimeoutException):
         logger.error("Controller API timeout")
-        return ControllerResponse(
-            decision="continue",
-            next_english_utterance="I need a moment to think about that.",
-            memory_update=request.memory,  # Preserve existing memory
-            notes_for_user="警告：API 超時，使用預設回應",
-            response_id=""
-        )
+        notes = "警告：API 超時，使用預設回應"
+    elif isinstance(error, UpstreamBusyError):
+        logger.error(f"Controller upstream busy: {error}")
+        notes = "警告：上游請求繁忙，使用預設回應"
+    elif isinstance(error, DeadlineExceeded):
+        logger.error(f"Controller deadline exceeded: {error}")
+        notes = f"警告：超過請求期限（{error.stage}），使用預設回應"
+    elif isinstance(error, CircuitOpenError):
+        logger.error(f"Controller circuit open: {error}")
+        notes = "警告：上游暫時無法使用（熔斷中），使用預設回應"
+    elif isinstance(error, httpx.HTTPStatusError):
+        logger.error(f"Controller API error: {error.response.status_code}")
+        utterance = "Let me get back to you on that."
+        notes = f"警告：API 錯誤 ({error.response.status_code})"
+    elif isinstance(error, IncompleteStreamError):
+        logger.error(f"Controller stream cut off: {error}")
+        notes = "警告：回應中斷，使用預設回應"
+    else:
+        logger.error(f"Unexpected error in controller: {error}")
+        utterance = "I appreciate your patience."
+        notes = f"警告：未預期錯誤 - {str(error)}"
+
+    return ControllerResponse(
+        decision="continue",
+        next_english_utterance=utterance,
+        memory_update=request.memory,  # Preserve existing memory
+        notes_for_user=notes,
+        response_id="",
+        prompt_tokens=prompt_tokens,
+    )
+
+
+# =============================================================================
+# Streaming Controller (/api/controller/stream)
+# =============================================================================
+
+# Fields reported once complete / also sent as deltas while they stream
+STREAMED_FIELDS = ("decision", "next_english_utterance", "memory_update", "notes_for_user")
+DELTA_FIELDS = ("next_english_utterance", "notes_for_user")
+
+# ms from request to the first utterance word / to the complete response
+_STREAM_FIRST_WORD = LatencyWindow()
+_STREAM_COMPLETE = LatencyWindow()
+_STREAM_STATS = {"streams": 0, "incremental": 0, "fallback_parse": 0, "errors": 0}
 
-    except httpx.HTTPStatusError as e:
-        logger.error(f"Controller API error: {e.response.status_code}")
-        return ControllerResponse(
-            decision="continue",
-            next_english_utterance="Let me get back to you on that.",
-            memory_update=request.memory,
-            notes_for_user=f"警告：API 錯誤 ({e.response.status_code})",
-            response_id=""
-        )
 
+async def stream_responses_api(
+    instruction: str,
+    prompt: str,
+    previous_response_id: Optional[str] = None,
+    max_tokens: int = MAX_OUTPUT_TOKENS,
+    api_key: Optional[str] = None,
+    priority: Priority = Priority.CONTROLLER,
+) -> AsyncIterator[Tuple[str, str]]:
+    """
+    Call the Responses API with stream=true.
+
+    Yields:
+        ("id", response_id) once the response is created, then
+        ("delta", text) for each output_text delta
+
+    Raises:
+        Same as call_responses_api(); StreamTimeout when the first delta
+        or the next event is late (adaptive_timeout.py), RuntimeError when
+        the response fails mid-stream, IncompleteStreamError when it ends
+        without response.completed (dropped, or response.incomplete)
+    """
+    if not api_key:
+        raise ValueError("API Key required. Please set your OpenAI API Key in Settings.")
+
+    request_body = _responses_request_body(instruction, prompt, previous_response_id, max_tokens)
+    request_body["stream"] = True
+
+    client = get_async_client()
+    ttft_ms = None
+    with circuit("responses", CONTROLLER_MODEL, slow_call_ms=SLOW_CALL_MS) as call:
+        async with upstream_slot(api_key, priority):
+            sent = time.perf_counter()
+            async with client.stream(
+                "POST",
+                OPENAI_RESPONSES_URL,
+                headers={
+                    "Authorization": f"Bearer {api_key}",
+                    "Content-Type": "application/json"
+                },
+                json=request_body,
+                # reasoning happens before the first delta: first_token covers it
+                timeout=upstream_timeout(adaptive_timeout("controller_stream", CONTROLLER_MODEL, FIRST_TOKEN)),
+            ) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    call.observe_status(response.status_code)
+                    response.raise_for_status()
+
+                # The outcome is recorded when the stream ends, judged by
+                # time-to-first-delta: a response that fails after its first
+                # delta still counts against the breaker
+                lines = timed_lines(response.aiter_lines(), "controller_stream", CONTROLLER_MODEL, sent=sent)
+                try:
+                    async for line in lines:
+                        if not line.startswith("data: "):
+                            continue
+                        try:
+                            event = json.loads(line[6:])
+                        except json.JSONDecodeError:
+                            continue
+                        kind = event.get("type")
+                        if kind == "response.created":
+                            yield "id", event.get("response", {}).get("id", "")
+                        elif kind == "response.output_text.delta" and event.get("delta"):
+                            if ttft_ms is None:
+                                ttft_ms = (time.perf_counter() - sent) * 1000
+                            yield "delta", event["delta"]
+                        elif kind == "response.completed":
+                            call.succeeded(ttft_ms)
+                            await lines.aclose()
+                            return
+                        elif kind == "response.incomplete":
+                            # Cut short by the model (max_output_tokens): upstream is healthy
+                            call.succeeded(ttft_ms)
+                            await lines.aclose()
+                            details = event.get("response", {}).get("incomplete_details") or {}
+                            reason = details.get("reason") or "unknown"
+                            raise IncompleteStreamError(f"Responses stream incomplete: {reason}")
+                        elif kind in ("response.failed", "error"):
+                            call.failed()
+                            error = event.get("response", {}).get("error") or event.get("message") or kind
+                            raise RuntimeError(f"Responses stream failed: {error}")
+                except GeneratorExit:
+                    # Caller stopped reading (deadline, disconnect): healthy so far
+                    if ttft_ms is not None:
+                        call.succeeded(ttft_ms)
+                    raise
+
+                # Lines ran out before response.completed: the connection dropped
+                call.failed()
+                raise IncompleteStreamError("Responses stream ended before response.completed")
+
+
+async def stream_controller_response(
+    request: ControllerRequest,
+    api_key: Optional[str] = None
+) -> AsyncIterator[dict]:
+    """
+    Controller response as stream events (the fields as gpt-5-mini writes them).
+
+    Events:
+        {"type": "delta", "field": "next_english_utterance" | "notes_for_user", "text": ...}
+        {"type": "field", "field": <name>, "value": ...}   (a field is complete)
+        {"type": "done", "response": <ControllerResponse>}   (always last)
+
+    The "done" response is what /api/controller would return for the same
+    output: the fail-soft parse of the full text when the stream was not
+    clean JSON, or the canned fallback when the call failed or the output
+    was cut off before the JSON closed (deltas already sent are then
+    superseded; the request's memory is kept).
+    """
+    prompt = _build_prompt(request)
+    prompt_tokens = current_prompt_tokens()
+    parser = FieldStreamParser()
+    parts = []
+    response_id = ""
+    started = time.perf_counter()
+    first_word = True
+    _STREAM_STATS["streams"] += 1
+
+    upstream = stream_responses_api(
+        instruction=CONTROLLER_INSTRUCTION,
+        prompt=prompt,
+        previous_response_id=request.previous_response_id,
+        api_key=api_key,
+    )
+    try:
+        # The request's deadline bounds the whole stream (→ canned fallback)
+        async for kind, value in bound_stream(upstream, current_deadline()):
+            if kind == "id":
+                response_id = value
+                continue
+            parts.append(value)
+            for event_kind, field, data in parser.feed(value):
+                if event_kind == "delta" and field in DELTA_FIELDS:
+                    if first_word and field == "next_english_utterance":
+                        first_word = False
+                        _STREAM_FIRST_WORD.record((time.perf_counter() - started) * 1000)
+                    yield {"type": "delta", "field": field, "text": data}
+                elif event_kind == "value" and field in STREAMED_FIELDS:
+                    if field == "decision" and data not in CONTROLLER_DECISIONS:
+                        continue
+                    yield {"type": "field", "field": field, "value": data}
+    except IncompleteStreamError as e:
+        # Truncated output: only a JSON object that already closed is kept,
+        # never a fail-soft parse that would blank memory_update
+        if not parser.complete:
+            _STREAM_STATS["errors"] += 1
+            yield {"type": "done", "response": _fallback_response(request, e, prompt_tokens).model_dump()}
+            return
     except Exception as e:
-        logger.error(f"Unexpected error in controller: {e}")
-        return ControllerResponse(
-            decision="continue",
-            next_english_utterance="I appreciate your patience.",
-            memory_update=request.memory,
-            notes_for_user=f"警告：未預期錯誤 - {str(e)}",
-            response_id=""
-        )
+        _STREAM_STATS["errors"] += 1
+        yield {"type": "done", "response": _fallback_response(request, e, prompt_tokens).model_dump()}
+        return
 
+    if parser.complete:
+        _STREAM_STATS["incremental"] += 1
+        parsed = _extract_from_dict(parser.values)
+    else:
+        _STREAM_STATS["fallback_parse"] += 1
+        parsed = parse_controller_output("".join(parts))
+    _STREAM_COMPLETE.record((time.perf_counter() - started) * 1000)
+    response = _controller_response(parsed, response_id, prompt_tokens)
+    yield {"type": "done", "response": response.model_dump()}
+
+
+def get_controller_stream_stats() -> dict:
+    """Streaming controller counters and first-word / complete latency for /api/metrics."""
+    return {
+        **_STREAM_STATS,
+        "first_word_ms": _STREAM_FIRST_WORD.snapshot(),
+        "complete_ms": _STREAM_COMPLETE.snapshot(),
+    }
+
+
+# =============================================================================
+# SSOT Summarization
+# =============================================================================
 
 async def summarize_ssot(request: SummarizeSsotRequest, api_key: Optional[str] = None) -> SummarizeSsotResponse:
     """
@@ -460,7 +725,7 @@ async def summarize_ssot(request: SummarizeSsotRequest, api_key: Optional[str] =
     original_tokens = estimate_tokens(request.ssot_text)
 
     # If already under limit, return as-is
-    if original_tokens <= 1500:
+    if original_tokens <= SSOT_TOKEN_LIMIT:
         return SummarizeSsotResponse(
             summary=request.ssot_text,
             original_tokens=original_tokens,
@@ -469,6 +734,7 @@ async def summarize_ssot(request: SummarizeSsotRequest, api_key: Optional[str] =
 
     # Build summarization prompt
     prompt = build_ssot_summarize_prompt(request.ssot_text)
+    record_prompt_tokens("ssot_summarize", sum(count_tokens_batch([SSOT_SUMMARIZE_INSTRUCTION, prompt])))
 
     try:
         # Call Responses API for summarization
@@ -476,7 +742,8 @@ async def summarize_ssot(request: SummarizeSsotRequest, api_key: Optional[str] =
             instruction=SSOT_SUMMARIZE_INSTRUCTION,
             prompt=prompt,
             max_tokens=2000,  # Allow more tokens for summary
-            api_key=api_key
+            api_key=api_key,
+            priority=Priority.SUMMARY,
         )
 
         summary_tokens = estimate_tokens(summary_text)
@@ -490,7 +757,7 @@ async def summarize_ssot(request: SummarizeSsotRequest, api_key: Optional[str] =
     except Exception as e:
         logger.error(f"SSOT summarization error: {e}")
         # Fall back to truncation
-        truncated = request.ssot_text[:3000]  # Rough truncation
+        truncated = truncate_to_tokens(request.ssot_text, SSOT_TOKEN_LIMIT)
         return SummarizeSsotResponse(
             summary=truncated + "\n\n[注意：摘要失敗，已截斷原文]",
             original_tokens=original_tokens,
@@ -0,0 +1,206 @@
+"""
+Custom Glossary Module - 使用者自訂詞庫
+
+Reference:
+- src/backend/glossary.py (build_index, merged_hint)
+
+Company-specific terms (product names, internal reference codes) are not
+in domain_glossaries.json. A user uploads a glossary of up to
+CUSTOM_GLOSSARY_MAX_TERMS terms once; it is compiled into the same
+GlossaryIndex / Aho-Corasick matcher as the scenario glossaries and
+matched together with the scenario's index in get_glossary_hint (custom
+terms win ties and are listed first).
+
+Compiled glossaries live in an LRU keyed by (API key digest, glossary_id),
+so one user's glossary is never visible to another. The LRU is bounded by
+the compiled size (CUSTOM_GLOSSARY_MAX_BYTES); least recently used
+glossaries are evicted and must be uploaded again. Compile time and sizes
+are in /api/metrics ("custom_glossaries").
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+# Handle both module and direct execution imports
+try:
+    from .glossary import GlossaryIndex, build_index
+except ImportError:
+    from glossary import GlossaryIndex, build_index
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# Constants (可用環境變數覆寫)
+# =============================================================================
+
+CUSTOM_GLOSSARY_MAX_TERMS = int(os.getenv("CUSTOM_GLOSSARY_MAX_TERMS", "20000"))
+CUSTOM_GLOSSARY_MAX_BYTES = int(os.getenv("CUSTOM_GLOSSARY_MAX_BYTES", str(64 * 1024 * 1024)))  # 64 MB
+CUSTOM_TERM_MAX_CHARS = 100
+
+
+class CustomGlossaryError(ValueError):
+    """Upload rejected (too many terms, empty, too large for the cache)."""
+
+
+@dataclass(frozen=True)
+class CustomGlossary:
+    """One compiled user glossary."""
+    glossary_id: str
+    version: str  # content hash: part of the translation cache key
+    index: GlossaryIndex
+    compile_ms: float
+    created_at: float
+
+    @property
+    def memory_bytes(self) -> int:
+        return self.index.memory_bytes
+
+
+def owner_key(api_key: str) -> str:
+    """Glossaries are per API key; only a digest of the key is kept."""
+    return hashlib.sha1(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+def compile_custom_glossary(glossary_id: str, terms: Dict[str, str]) -> CustomGlossary:
+    """Compile term → zh pairs (CPU-bound: run off the event loop).
+
+    Terms are trimmed; empty pairs are dropped and a repeated spelling
+    (case-insensitive) keeps its first translation.
+
+    Raises:
+        CustomGlossaryError: no usable terms, too many, or a term too long
+    """
+    if len(terms) > CUSTOM_GLOSSARY_MAX_TERMS:
+        raise CustomGlossaryError(f"Too many terms: {len(terms)} > {CUSTOM_GLOSSARY_MAX_TERMS}")
+
+    started = time.perf_counter()
+    cleaned = {}
+    seen = set()
+    for term, zh in terms.items():
+        term, zh = term.strip(), (zh or "").strip()
+        if not term or not zh or term.lower() in seen:
+            continue
+        if len(term) > CUSTOM_TERM_MAX_CHARS:
+            raise CustomGlossaryError(f"Term longer than {CUSTOM_TERM_MAX_CHARS} characters: {term[:30]}...")
+        seen.add(term.lower())
+        cleaned[term] = zh
+    if not cleaned:
+        raise CustomGlossaryError("Glossary has no terms")
+
+    canonical = json.dumps(cleaned, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    # Negative ranks: custom hints are listed before the scenario's
+    index = build_index(f"custom:{glossary_id}", "", cleaned, rank_base=-len(cleaned))
+    return CustomGlossary(
+        glossary_id=glossary_id,
+        version=hashlib.sha1(canonical).hexdigest()[:12],
+        index=index,
+        compile_ms=(time.perf_counter() - started) * 1000,
+        created_at=time.time(),
+    )
+
+
+# =============================================================================
+# LRU Cache
+# =============================================================================
+
+class CustomGlossaryCache:
+    """LRU of compiled glossaries bounded by total compiled size. Thread-safe."""
+
+    def __init__(self, max_bytes: int = CUSTOM_GLOSSARY_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, str], CustomGlossary]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "compiles": 0,
+            "compile_ms_total": 0.0,
+            "compile_ms_max": 0.0,
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "rejected": 0,
+        }
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        entry = self._entries.pop(key)
+        self._total_bytes -= entry.memory_bytes
+
+    def put(self, owner: str, glossary: CustomGlossary) -> None:
+        """Store (or replace) a glossary, evicting least recently used ones to fit.
+
+        Raises:
+            CustomGlossaryError: the glossary alone exceeds the memory cap
+        """
+        with self._lock:
+            self._stats["compiles"] += 1
+            self._stats["compile_ms_total"] += glossary.compile_ms
+            self._stats["compile_ms_max"] = max(self._stats["compile_ms_max"], glossary.compile_ms)
+            if glossary.memory_bytes > self.max_bytes:
+                self._stats["rejected"] += 1
+                raise CustomGlossaryError(
+                    f"Compiled glossary is {glossary.memory_bytes} bytes, over the {self.max_bytes} byte cap"
+                )
+            key = (owner, glossary.glossary_id)
+            if key in self._entries:
+                self._remove(key)
+            while self._entries and self._total_bytes + glossary.memory_bytes > self.max_bytes:
+                evicted_key = next(iter(self._entries))
+                self._remove(evicted_key)
+                self._stats["evictions"] += 1
+                logger.info(f"[CustomGlossary] Evicted {evicted_key[1]} (LRU, memory cap)")
+            self._entries[key] = glossary
+            self._total_bytes += glossary.memory_bytes
+
+    def get(self, owner: str, glossary_id: str) -> Optional[CustomGlossary]:
+        with self._lock:
+            key = (owner, glossary_id)
+            glossary = self._entries.get(key)
+            if glossary is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return glossary
+
+    def remove(self, owner: str, glossary_id: str) -> bool:
+        with self._lock:
+            key = (owner, glossary_id)
+            if key not in self._entries:
+                return False
+            self._remove(key)
+            return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            compiles = stats.pop("compile_ms_total")
+            return {
+                "entries": len(self._entries),
+                "total_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "terms": sum(len(g.index.terms) for g in self._entries.values()),
+                **stats,
+                "compile_ms_avg": round(compiles / stats["compiles"], 1) if stats["compiles"] else None,
+                "compile_ms_max": round(stats["compile_ms_max"], 1),
+            }
+
+
+# Module-level singleton
+custom_glossaries = CustomGlossaryCache()
+
+
+def get_custom_glossary_stats() -> dict:
+    """Get custom glossary LRU statistics (for /api/metrics)."""
+    return custom_glossaries.stats()
@@ -0,0 +1,290 @@
+"""
+Deadline Module - 請求期限端到端傳遞
+
+Reference:
+- src/backend/scheduler.py (queue / pacing waits bounded by the deadline)
+- src/backend/main.py, controller.py (upstream timeouts)
+
+Timeouts used to be scattered constants (10s /api/translate, 15s streams,
+30s controller and /api/simulate/llm) that knew nothing about the user's
+real budget. A client may now send
+
+    X-Request-Deadline-Ms: 2500      (remaining budget in ms, relative)
+
+and every upstream call made for that request derives its timeouts from
+what is left of it. Without the header the endpoint's old constant is the
+budget (now a total for the request, not a per-read timeout).
+
+- connect timeout: min(UPSTREAM_CONNECT_TIMEOUT, remaining)
+- first-byte / read timeout: min(the call's own timeout, remaining)
+  (the call's own timeout is adaptive, see adaptive_timeout.py)
+- total: enforce_deadline() cancels the call when the budget runs out;
+  bound_stream() does the same for each item of a stream.
+
+The request's Deadline lives in a ContextVar, so code deep in the call
+chain (scheduler, controller) reads it without extra parameters; tasks and
+worker threads started for the request inherit it. Each Deadline tracks
+the stage it is in (queue → rate_limit → first_byte → stream); when the
+budget is blown the stage is reported in the error and counted in
+/api/metrics.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# Constants (可用環境變數覆寫)
+# =============================================================================
+
+DEADLINE_HEADER = "X-Request-Deadline-Ms"
+DEADLINE_MAX_S = float(os.getenv("DEADLINE_MAX_S", "120"))
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "5.0"))
+
+# Stages a request passes through (reported when the budget runs out)
+STAGE_HANDLER = "handler"
+STAGE_QUEUE = "queue"
+STAGE_RATE_LIMIT = "rate_limit"
+STAGE_CONNECT = "connect"
+STAGE_FIRST_BYTE = "first_byte"
+STAGE_STREAM = "stream"
+
+
+class DeadlineExceeded(Exception):
+    """The request's budget ran out; `stage` says where."""
+
+    def __init__(self, endpoint: str, stage: str, budget_ms: float, elapsed_ms: float):
+        self.endpoint = endpoint
+        self.stage = stage
+        self.budget_ms = budget_ms
+        self.elapsed_ms = elapsed_ms
+        super().__init__(
+            f"Deadline exceeded at {stage} ({elapsed_ms:.0f}ms of {budget_ms:.0f}ms budget)"
+        )
+
+
+# =============================================================================
+# Metrics
+# =============================================================================
+
+_STATS: Dict[str, dict] = {}
+
+
+def _endpoint_stats(endpoint: str) -> dict:
+    stats = _STATS.get(endpoint)
+    if stats is None:
+        stats = _STATS[endpoint] = {"requests": 0, "client_deadlines": 0, "exceeded": {}}
+    return stats
+
+
+# =============================================================================
+# Deadline
+# =============================================================================
+
+class Deadline:
+    """Remaining budget of one request, plus the stage it is in."""
+
+    def __init__(self, endpoint: str, budget_s: float, from_client: bool = False):
+        self.endpoint = endpoint
+        self.budget_s = budget_s
+        self.from_client = from_client
+        self.started = time.monotonic()
+        self.expires_at = self.started + budget_s
+        self.stage = STAGE_HANDLER
+        self._reported = False
+
+    def remaining(self) -> float:
+        """Seconds left (0 when expired)."""
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def mark(self, stage: str) -> None:
+        self.stage = stage
+
+    def exceeded(self, stage: Optional[str] = None) -> DeadlineExceeded:
+        """Build the error for a blown budget (counted once per request)."""
+        stage = stage or self.stage
+        elapsed_ms = (time.monotonic() - self.started) * 1000
+        if not self._reported:
+            self._reported = True
+            exceeded = _endpoint_stats(self.endpoint)["exceeded"]
+            exceeded[stage] = exceeded.get(stage, 0) + 1
+            logger.warning(
+                f"[Deadline] {self.endpoint} exceeded at {stage} "
+                f"({elapsed_ms:.0f}ms of {self.budget_s * 1000:.0f}ms)"
+            )
+        return DeadlineExceeded(self.endpoint, stage, self.budget_s * 1000, elapsed_ms)
+
+    def check(self) -> None:
+        if self.expired():
+            raise self.exceeded()
+
+    def timeout(self) -> httpx.Timeout:
+        """httpx timeouts from the remaining budget (connect capped separately).
+
+        Raises:
+            DeadlineExceeded: nothing left to spend
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise self.exceeded()
+        return httpx.Timeout(remaining, connect=min(UPSTREAM_CONNECT_TIMEOUT, remaining))
+
+
+_current: ContextVar[Optional[Deadline]] = ContextVar("request_deadline", default=None)
+
+
+def parse_deadline_ms(value: Optional[str]) -> Optional[float]:
+    """Header value (ms) → seconds, None when missing or invalid."""
+    if not value:
+        return None
+    try:
+        budget_ms = float(value)
+    except ValueError:
+        return None
+    if budget_ms <= 0:
+        return None
+    return min(budget_ms / 1000, DEADLINE_MAX_S)
+
+
+def start_deadline(endpoint: str, header_value: Optional[str], default_s: float) -> Deadline:
+    """Create the request's Deadline (header budget, else `default_s`) and make it current."""
+    client_budget = parse_deadline_ms(header_value)
+    deadline = Deadline(
+        endpoint,
+        default_s if client_budget is None else client_budget,
+        from_client=client_budget is not None,
+    )
+    stats = _endpoint_stats(endpoint)
+    stats["requests"] += 1
+    if deadline.from_client:
+        stats["client_deadlines"] += 1
+    _current.set(deadline)
+    return deadline
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current.get()
+
+
+def mark_stage(stage: str) -> None:
+    """Record the stage on the current request's deadline (no-op without one)."""
+    deadline = _current.get()
+    if deadline is not None:
+        deadline.mark(stage)
+
+
+def upstream_timeout(limit: float) -> httpx.Timeout:
+    """Timeouts for one upstream call: `limit`, capped by the current deadline.
+
+    Raises:
+        DeadlineExceeded: nothing left to spend
+    """
+    deadline = _current.get()
+    if deadline is None:
+        return httpx.Timeout(limit, connect=min(UPSTREAM_CONNECT_TIMEOUT, limit))
+    remaining = deadline.remaining()
+    if remaining <= 0:
+        raise deadline.exceeded()
+    limit = min(limit, remaining)
+    return httpx.Timeout(limit, connect=min(UPSTREAM_CONNECT_TIMEOUT, limit))
+
+
+def _timeout_stage(error: httpx.TimeoutException, deadline: Deadline) -> str:
+    if isinstance(error, httpx.ConnectTimeout):
+        return STAGE_CONNECT
+    if isinstance(error, httpx.PoolTimeout):
+        return STAGE_QUEUE
+    return deadline.stage
+
+
+# An httpx timeout this close to the deadline was the deadline's doing
+_DEADLINE_SLACK_S = 0.05
+
+
+def _budget_error(error: httpx.TimeoutException, deadline: Deadline) -> Optional[DeadlineExceeded]:
+    if deadline.remaining() > _DEADLINE_SLACK_S:
+        return None  # the call's own (shorter) timeout fired
+    return deadline.exceeded(_timeout_stage(error, deadline))
+
+
+def deadline_error(error: httpx.TimeoutException) -> Optional[DeadlineExceeded]:
+    """An httpx timeout caused by the current deadline, as DeadlineExceeded with its stage.
+
+    None without a deadline or when the call's own timeout fired first.
+    """
+    deadline = _current.get()
+    if deadline is None:
+        return None
+    return _budget_error(error, deadline)
+
+
+@asynccontextmanager
+async def enforce_deadline():
+    """Cancel the block when the current request's budget runs out.
+
+    httpx timeouts cut short by the budget surface as DeadlineExceeded too,
+    with the stage they hit (connect / first_byte / stream); a call's own
+    shorter timeout propagates unchanged. Must be entered
+    and left in the same task; streams use bound_stream() instead.
+    """
+    deadline = _current.get()
+    if deadline is None:
+        yield None
+        return
+    try:
+        async with asyncio.timeout(deadline.remaining()):
+            yield deadline
+    except TimeoutError as e:
+        raise deadline.exceeded() from e
+    except httpx.TimeoutException as e:
+        error = _budget_error(e, deadline)
+        if error is None:
+            raise
+        raise error from e
+
+
+async def bound_stream(source: AsyncIterator, deadline: Optional[Deadline]) -> AsyncIterator:
+    """Pass items through until the deadline; then close the source and raise.
+
+    Raises:
+        DeadlineExceeded: the next item did not arrive within the budget
+    """
+    if deadline is None:
+        async for item in source:
+            yield item
+        return
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(source.__anext__(), timeout=deadline.remaining())
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError as e:
+                raise deadline.exceeded() from e
+            except httpx.TimeoutException as e:
+                error = _budget_error(e, deadline)
+                if error is None:
+                    raise
+                raise error from e
+            yield item
+    finally:
+        await source.aclose()
+
+
+def get_deadline_stats() -> dict:
+    """Per-endpoint requests, client-supplied deadlines and where budgets ran out."""
+    return {
+        endpoint: {**stats, "exceeded": dict(stats["exceeded"])}
+        for endpoint, stats in _STATS.items()
+    }
@@ -8,47 +8,469 @@ Reference:
 Provides domain-specific terminology hints for translation API.
 6 domains: bank, nhs, utilities, insurance, government, housing (281 entries).
 'general' scenario searches all domains for maximum coverage.
+
+Loading compiles one immutable GlossaryIndex per scenario: the terms, a
+compiled Aho-Corasick matcher (glossary_matcher.py), pre-formatted hint
+strings and the context line. 'general' is a precomputed merge of every
+domain; when several domains define the same term (case-insensitive), the
+domain listed first in the file wins and the conflict is logged. Lookups
+only read these indexes. Each index also carries precomputed inflections
+and phonetic keys (glossary_variants.py), so "direct debits", "policies"
+and misheard "sought code" still hit. Per-index size is in /api/metrics
+("glossary").
+
+Hot reload: glossary_store holds the live GlossaryVersion (plus the
+previous one for rollback). A changed file (watch_glossary_file) or an
+admin upload is compiled off the event loop and swapped in with a single
+reference assignment; requests already running keep the version they
+started with. The version used is reported to clients
+(X-Glossary-Version).
 """
 
+import asyncio
+import hashlib
 import os
 import json
 import logging
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional
+from types import MappingProxyType
+from typing import Any, Callable, List, Mapping, Optional, Sequence, Tuple
+
+# Handle both module and direct execution imports
+try:
+    from .glossary_matcher import GlossaryMatcher, select_leftmost_longest
+    from .glossary_variants import PhoneticMatcher, build_phonetic, with_inflections
+except ImportError:
+    from glossary_matcher import GlossaryMatcher, select_leftmost_longest
+    from glossary_variants import PhoneticMatcher, build_phonetic, with_inflections
 
 logger = logging.getLogger(__name__)
 
-# Load glossaries at module import
-_GLOSSARIES: dict = {}
-_GLOSSARY_LOADED = False
+GLOSSARY_PATH = Path(os.getenv("GLOSSARY_PATH", str(Path(__file__).parent / "domain_glossaries.json")))
+# Seconds between checks of the glossary file's mtime (0 → no watching)
+GLOSSARY_WATCH_INTERVAL = float(os.getenv("GLOSSARY_WATCH_INTERVAL", "5"))
+
+GENERAL_SCENARIO = "general"
+GENERAL_CONTEXT = (
+    "Context: UK phone call, may involve banking, healthcare, utilities, "
+    "insurance, government services, or housing"
+)
+_METADATA_KEYS = {"version", "description", "locale", "last_updated"}
+# Variant characters folded (1:1) before Chinese lookups: users type 帳戶, the file says 賬戶
+_ZH_FOLD = str.maketrans("賬臺裏綫衞峯着", "帳台裡線衛峰著")
+
+
+# =============================================================================
+# Compiled Indexes
+# =============================================================================
+
+@dataclass(frozen=True)
+class GlossaryIndex:
+    """Compiled, read-only glossary of one scenario."""
+    scenario: str
+    context: str
+    # term → zh, in hint order (longest term first)
+    terms: Mapping[str, str]
+    # matcher payload: (rank, '"term" = "zh"'); rank = position in `terms`.
+    # Also holds the terms' inflections (glossary_variants.py), same payload
+    matcher: GlossaryMatcher
+    # term → domain it came from (differs per term only in 'general')
+    sources: Mapping[str, str]
+    conflicts: Tuple[str, ...] = ()
+    memory_bytes: int = field(default=0, compare=False)
+    # Same payloads, matched by sound ("sought code"); None when disabled
+    phonetic: Optional[PhoneticMatcher] = field(default=None, compare=False)
+    # zh / alt → (rank, term): Chinese → English lookup for script prompts
+    reverse: Optional[GlossaryMatcher] = field(default=None, compare=False)
+
+    def hint(self, text: str, max_hints: int = 5) -> str:
+        """'Key terms: ...' for the terms found in `text`, or ""."""
+        return merged_hint((self,), text, max_hints)
+
+    def english_terms(self, chinese_text: str, max_terms: int = 8) -> List[Tuple[str, str]]:
+        """(Chinese as written in the text, English term) found in `chinese_text`, in text order.
+
+        One pass over the text; a term found through several of its
+        Chinese names is listed once.
+        """
+        if not chinese_text or self.reverse is None:
+            return []
+        found = []
+        seen = set()
+        for match in self.reverse.find(chinese_text.translate(_ZH_FOLD)):
+            _, term = match.payload
+            if term not in seen:
+                seen.add(term)
+                found.append((chinese_text[match.start:match.end], term))
+                if len(found) >= max_terms:
+                    break
+        return found
+
+    def stats(self) -> dict:
+        return {
+            "terms": len(self.terms),
+            "variants": len(self.matcher) - len(self.terms),
+            "phonetic_terms": len(self.phonetic) if self.phonetic is not None else 0,
+            "chinese_names": len(self.reverse) if self.reverse is not None else 0,
+            "nodes": self.matcher.node_count,
+            "memory_bytes": self.memory_bytes,
+            "conflicts": len(self.conflicts),
+        }
+
+
+def merged_hint(indexes: Sequence[GlossaryIndex], text: str, max_hints: int = 5) -> str:
+    """Hint from several indexes matched over the same text in one result.
+
+    Overlaps are resolved across all indexes (leftmost-longest); on an
+    identical span the earlier index wins, and spelling (terms and their
+    inflections) wins over sound. Hints are listed by rank, so an index
+    built with a lower rank_base (custom glossaries) comes first.
+    """
+    if not text:
+        return ""
+    text_lower = text.lower()
+    matches = [match for index in indexes for match in index.matcher.find_all(text_lower)]
+    matches += [
+        match for index in indexes if index.phonetic is not None
+        for match in index.phonetic.find_all(text_lower)
+    ]
+    found = sorted({match.payload for match in select_leftmost_longest(matches)})
+    if not found:
+        return ""
+    return "Key terms: " + ", ".join(formatted for _, formatted in found[:max_hints])
+
+
+def build_index(
+    scenario: str,
+    context: str,
+    terms: Mapping[str, str],
+    sources: Optional[Mapping[str, str]] = None,
+    conflicts: Tuple[str, ...] = (),
+    rank_base: int = 0,
+    alternatives: Optional[Mapping[str, Sequence[str]]] = None,
+) -> GlossaryIndex:
+    """Compile term → zh pairs (one term per lowercase spelling) into an index.
+
+    Ranks start at `rank_base` in longest-first order; a negative base puts
+    the index's hints ahead of a scenario's in merged_hint(). Inflections
+    and phonetic keys are precomputed here (glossary_variants.py), and so
+    is the reverse index over each term's zh plus its `alternatives`
+    (other Chinese names, the file's "alt" field).
+    """
+    ordered = sorted(terms, key=len, reverse=True)  # stable: ties keep input order
+    terms = {term: terms[term] for term in ordered}
+    sources = dict(sources or {})
+    patterns = [(term, (rank_base + rank, f'"{term}" = "{terms[term]}"')) for rank, term in enumerate(ordered)]
+    matcher = GlossaryMatcher(with_inflections(patterns))
+    phonetic = build_phonetic(patterns)
+    reverse = _build_reverse(terms, alternatives or {})
+    memory_bytes = (
+        matcher.memory_bytes()
+        + (phonetic.memory_bytes() if phonetic is not None else 0)
+        + reverse.memory_bytes()
+        + sys.getsizeof(terms) + sum(sys.getsizeof(t) + sys.getsizeof(z) for t, z in terms.items())
+        + sys.getsizeof(sources)
+    )
+    return GlossaryIndex(
+        scenario=scenario,
+        context=context,
+        terms=MappingProxyType(terms),
+        matcher=matcher,
+        sources=MappingProxyType(sources),
+        conflicts=tuple(conflicts),
+        memory_bytes=memory_bytes,
+        phonetic=phonetic,
+        reverse=reverse,
+    )
+
+
+def _build_reverse(terms: Mapping[str, str], alternatives: Mapping[str, Sequence[str]]) -> GlossaryMatcher:
+    """Chinese names → (rank, term), character-level (no word boundaries).
+
+    Main zh names come before alternatives, so a Chinese name shared by
+    two terms maps to the term that uses it as its main name. Single
+    characters are skipped: too ambiguous in running Chinese text.
+    """
+    names = [(zh, (rank, term)) for rank, (term, zh) in enumerate(terms.items())]
+    names += [
+        (alt, (rank, term))
+        for rank, term in enumerate(terms)
+        for alt in alternatives.get(term, ())
+    ]
+    return GlossaryMatcher(
+        ((name.strip().translate(_ZH_FOLD), payload) for name, payload in names if len(name.strip()) > 1),
+        word_boundaries=False,
+    )
+
+
+def _compile_index(glossaries: dict, scenario: str, context: str, domains: list) -> GlossaryIndex:
+    """Compile the terms of `domains`; the first domain defining a term wins."""
+    merged = {}
+    sources = {}
+    alternatives = {}
+    seen = {}
+    conflicts = []
+    for domain in domains:
+        for term, info in glossaries.get(domain, {}).get("terms", {}).items():
+            zh = info.get("zh", "")
+            if not zh:
+                continue
+            key = term.lower()
+            if key in seen:
+                kept = seen[key]
+                if merged[kept] != zh:
+                    conflicts.append(f"{term} ({sources[kept]} kept over {domain})")
+                continue
+            seen[key] = term
+            merged[term] = zh
+            sources[term] = domain
+            alt = info.get("alt", [])
+            if alt:
+                alternatives[term] = [alt] if isinstance(alt, str) else list(alt)
+    if conflicts:
+        logger.warning(f"[Glossary] {scenario}: {len(conflicts)} conflicting terms: {conflicts}")
+    return build_index(scenario, context, merged, sources, tuple(conflicts), alternatives=alternatives)
+
+
+def _compile_indexes(glossaries: dict) -> Mapping[str, GlossaryIndex]:
+    """One index per domain plus the merged 'general' index."""
+    domains = [k for k in glossaries.keys() if k not in _METADATA_KEYS]
+    indexes = {}
+    for domain in domains:
+        description = glossaries[domain].get("description", "")
+        context = f"Context: {description}" if description else ""
+        indexes[domain] = _compile_index(glossaries, domain, context, [domain])
+    indexes[GENERAL_SCENARIO] = _compile_index(glossaries, GENERAL_SCENARIO, GENERAL_CONTEXT, domains)
+    return MappingProxyType(indexes)
+
+
+# =============================================================================
+# Versioned Store (hot reload)
+# =============================================================================
+
+@dataclass(frozen=True)
+class GlossaryVersion:
+    """One loaded glossary file and its compiled indexes. Never mutated."""
+    version: str
+    source: str  # "file" / "upload" / "rollback"
+    loaded_at: float
+    glossaries: Mapping[str, Any]
+    indexes: Mapping[str, GlossaryIndex]
+
+
+def _check_term(domain: str, term: str, info: Any) -> None:
+    """One term entry: {"zh": non-empty str, "alt": str or list of str (optional)}."""
+    if not isinstance(info, dict):
+        raise ValueError(f"Term '{term}' in '{domain}' must be an object with a 'zh' string")
+    zh = info.get("zh")
+    if not isinstance(zh, str) or not zh.strip():
+        raise ValueError(f"Term '{term}' in '{domain}' needs a non-empty 'zh' string")
+    alt = info.get("alt")
+    if alt is not None and not isinstance(alt, str) and not (
+        isinstance(alt, list) and all(isinstance(a, str) for a in alt)
+    ):
+        raise ValueError(f"Term '{term}' in '{domain}': 'alt' must be a string or a list of strings")
+
+
+def compile_glossary(data: Any, source: str) -> GlossaryVersion:
+    """Validate and compile glossary file contents (CPU-bound: run off the event loop).
+
+    Version: the file's "version" field plus a content hash, so an edit that
+    forgets to bump "version" still shows up as a new version.
+
+    Raises:
+        ValueError: not a glossary (no domain with a "terms" object), or a
+            term whose entry is not {"zh": str, "alt": str | [str]}
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Glossary must be a JSON object")
+    domains = [k for k in data if k not in _METADATA_KEYS]
+    for domain in domains:
+        if not isinstance(data[domain], dict) or not isinstance(data[domain].get("terms", {}), dict):
+            raise ValueError(f"Domain '{domain}' must be an object with a 'terms' object")
+        for term, info in data[domain].get("terms", {}).items():
+            _check_term(domain, term, info)
+    if not any(data[domain].get("terms") for domain in domains):
+        raise ValueError("Glossary has no terms")
+
+    canonical = json.dumps(data, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    digest = hashlib.sha1(canonical).hexdigest()[:8]
+    return GlossaryVersion(
+        version=f"{data.get('version', '0')}+{digest}",
+        source=source,
+        loaded_at=time.time(),
+        glossaries=MappingProxyType(data),
+        indexes=_compile_indexes(data),
+    )
+
+
+_EMPTY_VERSION = GlossaryVersion("none", "none", 0.0, MappingProxyType({}), MappingProxyType({}))
+
+
+class GlossaryStore:
+    """Current + previous glossary version, swapped atomically.
+
+    Readers take `store.current` once and use that version for the whole
+    request; a swap replaces one reference, so in-flight translations keep
+    the version they started with and nothing waits on a lock. Compiling
+    happens before the swap (off the event loop); listeners run after it.
+    """
 
+    def __init__(self, path: Path):
+        self.path = path
+        self._current: Optional[GlossaryVersion] = None
+        self._previous: Optional[GlossaryVersion] = None
+        self._file_mtime: Optional[float] = None
+        self._listeners: List[Callable[[GlossaryVersion], None]] = []
+        self._lock = threading.Lock()  # writers only
+        self._stats = {"swaps": 0, "reload_errors": 0, "last_error": None}
+
+    @property
+    def current(self) -> GlossaryVersion:
+        """The live version (the glossary file is loaded on first access)."""
+        current = self._current
+        if current is None:
+            with self._lock:
+                if self._current is None:
+                    self._current = self._load_file_version() or _EMPTY_VERSION
+                current = self._current
+        return current
+
+    @property
+    def previous(self) -> Optional[GlossaryVersion]:
+        return self._previous
+
+    def add_listener(self, listener: Callable[[GlossaryVersion], None]) -> None:
+        """Call `listener(new_version)` after every swap (e.g. recompile prompts)."""
+        self._listeners.append(listener)
+
+    def _load_file_version(self) -> Optional[GlossaryVersion]:
+        if not self.path.exists():
+            logger.warning(f"Glossary file not found: {self.path}")
+            return None
+        try:
+            mtime = self.path.stat().st_mtime
+            with open(self.path, "r", encoding="utf-8") as f:
+                version = compile_glossary(json.load(f), "file")
+            self._file_mtime = mtime
+            logger.info(f"Loaded glossaries {version.version}: {list(version.glossaries.keys())}")
+            return version
+        except Exception as e:
+            logger.error(f"Failed to load glossaries: {e}")
+            self._file_mtime = self.path.stat().st_mtime if self.path.exists() else None
+            self._stats["reload_errors"] += 1
+            self._stats["last_error"] = str(e)
+            return None
+
+    def file_changed(self) -> bool:
+        try:
+            return self.path.stat().st_mtime != self._file_mtime
+        except OSError:
+            return False
+
+    def compile_file(self) -> Optional[GlossaryVersion]:
+        """Compile the file if it changed since the last load (None otherwise / on error)."""
+        if not self.file_changed():
+            return None
+        return self._load_file_version()
+
+    def swap(self, version: GlossaryVersion) -> GlossaryVersion:
+        """Make `version` current; the old one is kept for rollback."""
+        with self._lock:
+            old = self._current
+            if old is not None and old.version == version.version:
+                return old
+            self._previous = old
+            self._current = version
+            self._stats["swaps"] += 1
+        logger.info(f"[Glossary] Now serving {version.version} ({version.source})")
+        for listener in self._listeners:
+            try:
+                listener(version)
+            except Exception as e:
+                logger.error(f"[Glossary] Swap listener failed: {e}")
+        return version
+
+    def rollback(self) -> GlossaryVersion:
+        """Swap the previous version back in.
+
+        Raises:
+            ValueError: no previous version
+        """
+        previous = self._previous
+        if previous is None:
+            raise ValueError("No previous glossary version to roll back to")
+        return self.swap(GlossaryVersion(
+            previous.version, "rollback", time.time(), previous.glossaries, previous.indexes,
+        ))
+
+    def stats(self) -> dict:
+        current = self.current
+        previous = self._previous
+        return {
+            "version": current.version,
+            "source": current.source,
+            "loaded_at": current.loaded_at,
+            "previous_version": previous.version if previous else None,
+            "watching": str(self.path),
+            **self._stats,
+        }
+
+
+glossary_store = GlossaryStore(GLOSSARY_PATH)
+
+
+async def watch_glossary_file(interval_s: float = GLOSSARY_WATCH_INTERVAL) -> None:
+    """Poll the glossary file; compile a changed file off the loop, then swap it in.
+
+    A file that fails to parse or validate is logged and the live version
+    stays. Runs until cancelled.
+    """
+    while True:
+        await asyncio.sleep(interval_s)
+        if not glossary_store.file_changed():
+            continue
+        version = await asyncio.to_thread(glossary_store.compile_file)
+        if version is not None:
+            glossary_store.swap(version)
 
-def _load_glossaries():
-    """Load domain glossaries from JSON file."""
-    global _GLOSSARIES, _GLOSSARY_LOADED
 
-    if _GLOSSARY_LOADED:
-        return
+def get_glossary_version() -> str:
+    return glossary_store.current.version
 
-    # Find glossary file (relative to this module)
-    glossary_path = Path(__file__).parent / "domain_glossaries.json"
 
-    if not glossary_path.exists():
-        logger.warning(f"Glossary file not found: {glossary_path}")
-        _GLOSSARY_LOADED = True
-        return
+def get_glossary_index(
+    scenario: Optional[str],
+    version: Optional[GlossaryVersion] = None,
+) -> Optional[GlossaryIndex]:
+    """Compiled index for a scenario ('general' or unknown → the merged index)."""
+    if not scenario:
+        return None
+    indexes = (version or glossary_store.current).indexes
+    return indexes.get(scenario) or indexes.get(GENERAL_SCENARIO)
 
-    try:
-        with open(glossary_path, "r", encoding="utf-8") as f:
-            _GLOSSARIES = json.load(f)
-        logger.info(f"Loaded glossaries: {list(_GLOSSARIES.keys())}")
-        _GLOSSARY_LOADED = True
-    except Exception as e:
-        logger.error(f"Failed to load glossaries: {e}")
-        _GLOSSARY_LOADED = True
 
+def get_domains() -> list:
+    """
+    Get the domain scenario names defined in the glossary file.
 
-def get_glossary_hint(text: str, scenario: Optional[str] = None, max_hints: int = 5) -> str:
+    Returns:
+        List of domain keys (bank, nhs, utilities, ...), metadata keys excluded
+    """
+    return [k for k in glossary_store.current.glossaries.keys() if k not in _METADATA_KEYS]
+
+
+def get_glossary_hint(
+    text: str,
+    scenario: Optional[str] = None,
+    max_hints: int = 5,
+    version: Optional[GlossaryVersion] = None,
+    custom: Optional[GlossaryIndex] = None,
+) -> str:
     """
     Find matching glossary terms in source text and return hints.
 
@@ -59,63 +481,42 @@ def get_glossary_hint(text: str, scenario: Optional[str] = None, max_hints: int
         text: English source text to analyze
         scenario: Domain scenario (bank, nhs, utilities, insurance, government, housing, general)
         max_hints: Maximum number of hints to return
+        version: Glossary version to use (default: the current one)
+        custom: A user's compiled glossary (custom_glossary.py), matched in the
+            same pass; its terms win ties and are listed first
 
     Returns:
         Formatted hint string for translation prompt, or empty string
     """
-    _load_glossaries()
-
-    if not scenario:
+    index = get_glossary_index(scenario, version)
+    indexes = [i for i in (custom, index) if i is not None]
+    if not indexes:
         return ""
+    return merged_hint(indexes, text, max_hints)
 
-    # Determine which domains to search
-    # Specific scenario → search that domain only
-    # 'general' or unknown → search ALL domains for maximum coverage
-    metadata_keys = {"version", "description", "locale", "last_updated"}
-    if scenario in _GLOSSARIES and scenario not in metadata_keys:
-        domains_to_search = [scenario]
-    else:
-        # 'general' or unknown scenario: search all domains
-        domains_to_search = [k for k in _GLOSSARIES.keys() if k not in metadata_keys]
-
-    # Merge all terms from selected domains
-    all_terms = {}
-    for domain in domains_to_search:
-        domain_data = _GLOSSARIES.get(domain, {})
-        terms = domain_data.get("terms", {})
-        all_terms.update(terms)
-
-    if not all_terms:
-        return ""
 
-    text_lower = text.lower()
-    matches = []
-
-    # Find matching terms (longer terms first to avoid partial matches)
-    sorted_terms = sorted(all_terms.keys(), key=len, reverse=True)
-    matched_positions = set()  # Track matched positions to avoid overlaps
-
-    for term in sorted_terms:
-        term_lower = term.lower()
-        pos = text_lower.find(term_lower)
-
-        if pos != -1:
-            # Check if this position overlaps with already matched terms
-            term_range = set(range(pos, pos + len(term)))
-            if not term_range & matched_positions:
-                info = all_terms[term]
-                zh = info.get("zh", "")
-                if zh:
-                    matches.append(f'"{term}" = "{zh}"')
-                    matched_positions.update(term_range)
-
-                    if len(matches) >= max_hints:
-                        break
-
-    if not matches:
-        return ""
+def get_english_term_hint(
+    chinese_text: str,
+    scenario: Optional[str] = None,
+    max_terms: int = 8,
+    version: Optional[GlossaryVersion] = None,
+) -> str:
+    """
+    English terms for the Chinese concepts in `chinese_text` (script generation).
+
+    Reverse lookup over each term's zh and alt names; no scenario searches
+    every domain ('general').
 
-    return "Key terms: " + ", ".join(matches)
+    Returns:
+        'Key English terms: 銀行分類代碼 = "sort code", ...' or empty string
+    """
+    index = get_glossary_index(scenario or GENERAL_SCENARIO, version)
+    if index is None:
+        return ""
+    found = index.english_terms(chinese_text, max_terms)
+    if not found:
+        return ""
+    return "Key English terms: " + ", ".join(f'{zh} = "{term}"' for zh, term in found)
 
 
 def get_scenario_context(scenario: Optional[str] = None) -> str:
@@ -130,17 +531,39 @@ def get_scenario_context(scenario: Optional[str] = None) -> str:
     Returns:
         Context description string
     """
-    _load_glossaries()
-
     if not scenario:
         return ""
+    index = get_glossary_index(scenario)
+    return index.context if index is not None else GENERAL_CONTEXT
 
-    if scenario in _GLOSSARIES:
-        description = _GLOSSARIES.get(scenario, {}).get("description", "")
-        return f"Context: {description}" if description else ""
-    else:
-        # 'general' scenario: provide broad context
-        return "Context: UK phone call, may involve banking, healthcare, utilities, insurance, government services, or housing"
+
+def get_glossary_stats() -> dict:
+    """Live version plus terms, automaton nodes and approximate memory per index."""
+    current = glossary_store.current
+    return {
+        **glossary_store.stats(),
+        "indexes": {scenario: index.stats() for scenario, index in current.indexes.items()},
+    }
+
+
+def get_phrasebook() -> list:
+    """
+    Get all example phrases from every domain.
+
+    Used to seed the translation memory (translation_memory.py).
+
+    Returns:
+        List of (english, chinese, domain) tuples
+    """
+    phrases = []
+    for domain, domain_data in glossary_store.current.glossaries.items():
+        if not isinstance(domain_data, dict):
+            continue
+        for english, info in domain_data.get("phrases", {}).items():
+            zh = info.get("zh", "")
+            if zh:
+                phrases.append((english, zh, domain))
+    return phrases
 
 
 def post_process_translation(text: str, scenario: Optional[str] = None) -> str:
@@ -168,6 +591,3 @@ def post_process_translation(text: str, scenario: Optional[str] = None) -> str:
 
     return text
 
-
-# Pre-load glossaries on import
-_load_glossaries()
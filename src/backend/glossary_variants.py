@@ -0,0 +1,373 @@
+"""
+Glossary Variants Module - 詞形變化與語音容錯
+
+Reference:
+- src/backend/glossary_matcher.py (GlossaryMatcher)
+- src/backend/glossary.py (build_index, merged_hint)
+
+Exact matching misses what the browser's speech recognition actually
+produces. Two precomputed tables, both built once per GlossaryIndex:
+
+- Inflections (GLOSSARY_INFLECTIONS): extra spellings of each term that
+  the matcher's plural / possessive boundary does not cover — "policies",
+  "diagnoses", "booked an appointment", "topping up". They are added to
+  the term's own GlossaryMatcher with the term's payload, so they cost
+  nothing per lookup.
+- Phonetic keys (GLOSSARY_PHONETIC): every eligible term is also compiled
+  as a sequence of metaphone-style word keys ("sort code" → "st kt"). A
+  segment is tokenized once, its words are keyed (memoized) and one
+  Aho-Corasick pass over the key string finds mishearings such as
+  "sought code" or "council tacks". Keys are non-rhotic (a post-vocalic
+  R is silent) to match UK speech.
+
+Phonetic matches rank behind exact ones and only cover terms that are
+plain words (no acronyms, no digits) with a long enough key, which keeps
+"GP", "ISA" or "rent" from matching arbitrary words.
+
+Benchmark (10k+ terms):
+    python -m src.backend.glossary_variants
+"""
+
+import os
+import re
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Any, Iterable, List, Optional, Tuple
+
+# Handle both module and direct execution imports
+try:
+    from .glossary_matcher import GlossaryMatch, GlossaryMatcher
+except ImportError:
+    from glossary_matcher import GlossaryMatch, GlossaryMatcher
+
+# =============================================================================
+# Constants (可用環境變數覆寫)
+# =============================================================================
+
+GLOSSARY_INFLECTIONS = os.getenv("GLOSSARY_INFLECTIONS", "true").lower() == "true"
+GLOSSARY_PHONETIC = os.getenv("GLOSSARY_PHONETIC", "true").lower() == "true"
+# Shortest phonetic key (consonants, spaces excluded) a term needs to be matched by sound;
+# single words need a longer one ("council" would otherwise match "cancel")
+PHONETIC_MIN_KEY = 4
+PHONETIC_MIN_WORD_KEY = 6
+
+_WORD_RE = re.compile(r"[a-z0-9]+(?:['’][a-z]+)?")
+_VOWELS = frozenset("aeiou")
+_FRONT_VOWELS = frozenset("eiy")
+
+# Second words that mark a verb phrase ("book an appointment", "top up")
+_VERB_PHRASE_MARKERS = frozenset({
+    "a", "an", "the", "my", "your", "up", "off", "out", "in", "on", "down", "back", "for", "to",
+})
+
+# Verb forms the suffix rules get wrong (first word of "make a claim", "pay off"...)
+_IRREGULAR_VERBS = {
+    "make": ("made", "makes", "making"),
+    "pay": ("paid", "pays", "paying"),
+    "give": ("gave", "given", "gives", "giving"),
+    "take": ("took", "taken", "takes", "taking"),
+    "get": ("got", "gets", "getting"),
+    "set": ("sets", "setting"),
+    "put": ("puts", "putting"),
+    "send": ("sent", "sends", "sending"),
+    "leave": ("left", "leaves", "leaving"),
+}
+
+
+# =============================================================================
+# Inflections
+# =============================================================================
+
+def _is_plain_word(word: str) -> bool:
+    """Letters only, at most a leading capital: no acronym (GP, kWh), no digits (NHS 111)."""
+    return word.isalpha() and (word[1:].islower() or len(word) == 1)
+
+
+def _plurals(word: str) -> List[str]:
+    """Plurals the 's' / 'es' boundary in glossary_matcher does not cover."""
+    if len(word) > 2 and word.endswith("y") and word[-2] not in _VOWELS:
+        return [word[:-1] + "ies"]
+    if word.endswith("sis"):
+        return [word[:-3] + "ses"]
+    if word.endswith("fe"):
+        return [word[:-2] + "ves"]
+    if word.endswith("f") and not word.endswith("ff"):
+        return [word[:-1] + "ves"]
+    return []
+
+
+def _verb_forms(word: str) -> List[str]:
+    """-s / -ed / -ing forms of a (possible) verb."""
+    if word in _IRREGULAR_VERBS:
+        return list(_IRREGULAR_VERBS[word])
+    if word.endswith("e"):
+        return [word + "s", word + "d", word[:-1] + "ing"]
+    if len(word) > 2 and word.endswith("y") and word[-2] not in _VOWELS:
+        return [word[:-1] + "ies", word[:-1] + "ied", word + "ing"]
+    third = word + "es" if word.endswith(("s", "sh", "ch", "x", "z")) else word + "s"
+    # Short consonant-vowel-consonant: top → topped / topping
+    if (
+        3 <= len(word) <= 4
+        and word[-1] not in _VOWELS and word[-1] not in "wxy"
+        and word[-2] in _VOWELS and word[-3] not in _VOWELS
+    ):
+        return [third, word + word[-1] + "ed", word + word[-1] + "ing"]
+    return [third, word + "ed", word + "ing"]
+
+
+def inflections(term: str) -> List[str]:
+    """Other spellings of `term` (lowercased), without the term itself.
+
+    The last word gets irregular plurals; the first word of a verb phrase
+    ("book an appointment", "top up": lowercase, then an article or
+    particle) gets verb forms. Acronyms and numbers are left alone.
+    """
+    words = term.lower().split()
+    original = term.split()
+    if not words:
+        return []
+    variants = []
+    last = len(words) - 1
+    if _is_plain_word(original[last]):
+        variants += [" ".join(words[:last] + [plural]) for plural in _plurals(words[last])]
+    if last > 0 and original[0].isalpha() and original[0].islower() and words[1] in _VERB_PHRASE_MARKERS:
+        variants += [" ".join([form] + words[1:]) for form in _verb_forms(words[0])]
+    return [v for v in dict.fromkeys(variants) if v != term.lower()]
+
+
+# =============================================================================
+# Phonetic Keys
+# =============================================================================
+
+@lru_cache(maxsize=65536)
+def phonetic_key(word: str) -> str:
+    """Metaphone-style key of one lowercase word, non-rhotic (UK).
+
+    Vowels are dropped except a leading one (kept as "a"); similar
+    consonants collapse ("c"/"k"/"q" → "k", "ph"/"v" → "f", "th" → "0");
+    silent letters ("gh", "kn", "wr", post-vocalic "r") are removed.
+    Words with digits are their own key.
+    """
+    word = "".join(ch for ch in word if ch.isalpha())
+    if not word or not word.isascii():
+        return word
+    if word[:2] in ("kn", "gn", "pn", "wr", "ps"):
+        word = word[1:]
+    elif word[0] == "x":
+        word = "s" + word[1:]
+    elif word[:2] == "wh":
+        word = "w" + word[2:]
+
+    n = len(word)
+    key = []
+    i = 0
+    while i < n:
+        ch = word[i]
+        nxt = word[i + 1] if i + 1 < n else ""
+        prev = word[i - 1] if i else ""
+        code = ""
+        if ch == prev and ch != "c":
+            pass
+        elif ch in _VOWELS:
+            code = "a" if i == 0 else ""
+        elif ch == "b":
+            code = "" if prev == "m" and i == n - 1 else "p"
+        elif ch == "c":
+            if nxt == "h" or word.startswith("cia", i):
+                code = "x"
+            elif nxt in _FRONT_VOWELS:
+                code = "s"
+            else:
+                code = "k"
+        elif ch == "d":
+            code = "j" if nxt == "g" and i + 2 < n and word[i + 2] in _FRONT_VOWELS else "t"
+        elif ch == "g":
+            if nxt == "h" and (i + 2 >= n or word[i + 2] not in _VOWELS):
+                code = ""  # sought, night, though
+            elif nxt == "n" and i + 2 >= n:
+                code = ""  # sign
+            elif nxt in _FRONT_VOWELS and prev != "g":
+                code = "j"
+            else:
+                code = "k"
+        elif ch == "h":
+            if (prev and prev in "cgpst") or (prev in _VOWELS and nxt not in _VOWELS):
+                code = ""
+            else:
+                code = "h"
+        elif ch == "k":
+            code = "" if prev == "c" else "k"
+        elif ch == "p":
+            code = "f" if nxt == "h" else "p"
+        elif ch == "q":
+            code = "k"
+        elif ch == "r":
+            # Non-rhotic: "sort" and "sought", "odor" and "order" sound alike
+            code = "r" if nxt in _VOWELS or nxt == "y" else ""
+        elif ch == "s":
+            code = "x" if nxt == "h" or word.startswith("sio", i) or word.startswith("sia", i) else "s"
+        elif ch == "t":
+            if word.startswith("tia", i) or word.startswith("tio", i):
+                code = "x"
+            elif nxt == "h":
+                code = "0"
+            elif word.startswith("tch", i):
+                code = ""
+            else:
+                code = "t"
+        elif ch == "v":
+            code = "f"
+        elif ch in "wy":
+            code = ch if nxt in _VOWELS else ""
+        elif ch == "x":
+            code = "ks"
+        elif ch == "z":
+            code = "s"
+        else:
+            code = ch
+        if code and not (key and key[-1] == code):
+            key.append(code)
+        i += 1
+    return "".join(key) or word[0]
+
+
+def _tokens(text_lower: str) -> List[Tuple[int, int, str]]:
+    return [(m.start(), m.end(), m.group()) for m in _WORD_RE.finditer(text_lower)]
+
+
+class PhoneticMatcher:
+    """Terms matched by the phonetic keys of their words. Immutable once built."""
+
+    def __init__(self, patterns: Iterable[Tuple[str, Any]]):
+        """
+        Args:
+            patterns: (term, payload) pairs in priority order; terms that are
+                not plain words or whose key is too short are skipped
+        """
+        keyed = []
+        for term, payload in patterns:
+            words = term.split()
+            if not words or not all(_is_plain_word(w.replace("-", "")) for w in words):
+                continue
+            keys = [phonetic_key(token) for _, _, token in _tokens(term.lower())]
+            min_key = PHONETIC_MIN_KEY if len(keys) > 1 else PHONETIC_MIN_WORD_KEY
+            if sum(len(k) for k in keys) < min_key:
+                continue
+            keyed.append((" ".join(keys), payload))
+        self._matcher = GlossaryMatcher(keyed)
+
+    def __len__(self) -> int:
+        return len(self._matcher)
+
+    @property
+    def node_count(self) -> int:
+        return self._matcher.node_count
+
+    def memory_bytes(self) -> int:
+        return self._matcher.memory_bytes()
+
+    def find_all(self, text_lower: str) -> List[GlossaryMatch]:
+        """Matches by sound, as positions in `text_lower` (one tokenize + one pass)."""
+        if not len(self._matcher):
+            return []
+        tokens = _tokens(text_lower)
+        if not tokens:
+            return []
+        key_starts = []
+        parts = []
+        offset = 0
+        for _, _, token in tokens:
+            key = phonetic_key(token)
+            key_starts.append(offset)
+            parts.append(key)
+            offset += len(key) + 1
+        matches = []
+        for match in self._matcher.find_all(" ".join(parts)):
+            first = bisect_right(key_starts, match.start) - 1
+            last = bisect_right(key_starts, match.end - 1) - 1
+            matches.append(GlossaryMatch(tokens[first][0], tokens[last][1], match.payload))
+        return matches
+
+
+# =============================================================================
+# Index Building
+# =============================================================================
+
+def with_inflections(patterns: List[Tuple[str, Any]]) -> List[Tuple[str, Any]]:
+    """`patterns` followed by every inflection (same payload) when enabled.
+
+    The terms come first so a real term always wins over another term's
+    variant with the same spelling.
+    """
+    if not GLOSSARY_INFLECTIONS:
+        return list(patterns)
+    return list(patterns) + [(variant, payload) for term, payload in patterns for variant in inflections(term)]
+
+
+def build_phonetic(patterns: List[Tuple[str, Any]]) -> Optional[PhoneticMatcher]:
+    """PhoneticMatcher over `patterns`, or None when disabled / nothing eligible."""
+    if not GLOSSARY_PHONETIC:
+        return None
+    matcher = PhoneticMatcher(patterns)
+    return matcher if len(matcher) else None
+
+
+# =============================================================================
+# Benchmark
+# =============================================================================
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    try:
+        from . import glossary_variants as variants
+        from .glossary import build_index, get_domains, glossary_store, merged_hint
+    except ImportError:
+        import glossary_variants as variants
+        from glossary import build_index, get_domains, glossary_store, merged_hint
+
+    glossaries = glossary_store.current.glossaries
+    domain_terms = {}
+    segments = []
+    for domain in get_domains():
+        for term, entry in glossaries[domain].get("terms", {}).items():
+            domain_terms.setdefault(term, entry.get("zh", ""))
+        segments.extend(glossaries[domain].get("phrases", {}).keys())
+    misheard = [
+        "What's your sought code please", "Can I cancel the direct debits", "my council tacks band",
+        "we can check the standing odor", "Two insurance policies", "I've booked an appointment",
+        "Your national insurance numba",
+    ]
+
+    def _bench(label: str, terms: dict) -> None:
+        texts = segments + misheard
+        rounds = 20
+        for mode, enabled in (("exact", False), ("variants", True)):
+            variants.GLOSSARY_INFLECTIONS = variants.GLOSSARY_PHONETIC = enabled
+            started = time.perf_counter()
+            index = build_index(label, "", terms)
+            build_ms = (time.perf_counter() - started) * 1000
+            started = time.perf_counter()
+            for _ in range(rounds):
+                for segment in texts:
+                    merged_hint((index,), segment)
+            per_us = (time.perf_counter() - started) / (rounds * len(texts)) * 1e6
+            found = sum(1 for segment in misheard if merged_hint((index,), segment))
+            print(
+                f"{label:>7} {mode:>8}: {len(terms):>6} terms, build {build_ms:7.1f}ms, "
+                f"{index.memory_bytes / 1024:8.0f} KiB, {per_us:6.1f}µs/segment, "
+                f"misheard segments with hints {found}/{len(misheard)}"
+            )
+
+    _bench("general", domain_terms)
+
+    rng = random.Random(42)
+    words = sorted({w for term in domain_terms for w in term.lower().split() if w.isalpha()}) + [
+        "account", "reference", "premium", "portal", "service", "plan", "tier", "renewal",
+    ]
+    for size in (10_000, 20_000):
+        synthetic = dict(domain_terms)
+        while len(synthetic) < size:
+            synthetic[" ".join(rng.choice(words) for _ in range(rng.randint(2, 4)))] = "詞"
+        _bench(f"{size // 1000}k", synthetic)
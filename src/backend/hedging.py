@@ -0,0 +1,216 @@
+"""
+Hedging Module - 對沖請求（慢首字時再發一個）
+
+Reference:
+- src/backend/latency.py (rolling TTFT percentiles)
+- "The Tail at Scale" (Dean & Barroso) - hedged requests
+
+gpt-4.1-nano's time-to-first-token has a long tail: most segments start in
+~0.7s, but the occasional one takes several seconds and stalls the whole
+subtitle view. With hedging on, a translation that has not produced its
+first delta within the rolling p90 TTFT fires a second identical upstream
+request; whichever produces a first delta first is streamed, the other is
+cancelled (its httpx stream closed).
+
+Cost is bounded per API key by a token-bucket budget: every request earns
+HEDGE_BUDGET_RATIO of a hedge (default 0.1 → at most ~10% extra upstream
+calls), capped at HEDGE_BUDGET_BURST.
+
+Hedge rate and win rate (how often the hedge beat the original) are in
+/api/metrics.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from typing import AsyncIterator, Callable, Dict, Optional, Tuple
+
+try:
+    from .latency import latency_window
+except ImportError:
+    from latency import latency_window
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# Constants (可用環境變數覆寫)
+# =============================================================================
+
+HEDGING_ENABLED = os.getenv("TRANSLATION_HEDGING", "false").lower() == "true"
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "90"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_DEFAULT_DELAY_MS = float(os.getenv("HEDGE_DEFAULT_DELAY_MS", "1500"))
+HEDGE_MIN_DELAY_MS = float(os.getenv("HEDGE_MIN_DELAY_MS", "300"))
+HEDGE_MAX_DELAY_MS = float(os.getenv("HEDGE_MAX_DELAY_MS", "3000"))
+HEDGE_BUDGET_RATIO = float(os.getenv("HEDGE_BUDGET_RATIO", "0.1"))
+HEDGE_BUDGET_BURST = float(os.getenv("HEDGE_BUDGET_BURST", "3"))
+MAX_TRACKED_KEYS = 1000
+
+TTFT_METRIC = "translate_ttft"
+
+
+# =============================================================================
+# Per-key Budget
+# =============================================================================
+
+class HedgeBudget:
+    """Token bucket per API key: requests earn hedges, hedges spend them.
+
+    A new key starts with one hedge so it can still cut its first long tail.
+    """
+
+    def __init__(self, ratio: float = HEDGE_BUDGET_RATIO, burst: float = HEDGE_BUDGET_BURST):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens: "OrderedDict[str, float]" = OrderedDict()
+
+    @staticmethod
+    def _key(api_key: str) -> str:
+        return hashlib.sha1(api_key.encode("utf-8")).hexdigest()
+
+    def earn(self, api_key: str) -> None:
+        key = self._key(api_key)
+        tokens = self._tokens.pop(key, 1.0)
+        self._tokens[key] = min(tokens + self.ratio, self.burst)
+        while len(self._tokens) > MAX_TRACKED_KEYS:
+            self._tokens.popitem(last=False)
+
+    def try_spend(self, api_key: str) -> bool:
+        key = self._key(api_key)
+        tokens = self._tokens.get(key, 1.0)
+        if tokens < 1.0:
+            return False
+        self._tokens[key] = tokens - 1.0
+        return True
+
+    def available(self, api_key: str) -> float:
+        return self._tokens.get(self._key(api_key), 1.0)
+
+
+# =============================================================================
+# Hedged Stream
+# =============================================================================
+
+_END = object()
+
+
+def _first_item(stream: AsyncIterator) -> asyncio.Task:
+    async def _next():
+        try:
+            return await stream.__anext__()
+        except StopAsyncIteration:
+            return _END
+    return asyncio.ensure_future(_next())
+
+
+async def _discard(task: asyncio.Task, stream: AsyncIterator) -> None:
+    """Cancel a losing attempt and close its upstream stream."""
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    await stream.aclose()
+
+
+class Hedger:
+    """Races a second upstream request against a slow first token."""
+
+    def __init__(self, budget: Optional[HedgeBudget] = None):
+        self.budget = budget or HedgeBudget()
+        self._stats = {
+            "requests": 0,
+            "hedged": 0,
+            "hedge_wins": 0,
+            "budget_denied": 0,
+        }
+
+    def threshold_ms(self) -> float:
+        """Hedge delay: rolling p90 TTFT, clamped; a default until warmed up."""
+        window = latency_window(TTFT_METRIC)
+        if len(window) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY_MS
+        value = window.percentile(HEDGE_PERCENTILE)
+        return min(max(value, HEDGE_MIN_DELAY_MS), HEDGE_MAX_DELAY_MS)
+
+    async def stream(
+        self,
+        api_key: str,
+        start: Callable[[], AsyncIterator[str]],
+    ) -> AsyncIterator[str]:
+        """Stream deltas from start(), hedging once if the first delta is late.
+
+        Args:
+            api_key: Owner of the hedge budget
+            start: Starts one upstream attempt (called once or twice)
+        """
+        self._stats["requests"] += 1
+        self.budget.earn(api_key)
+
+        attempts: Dict[asyncio.Task, AsyncIterator[str]] = {}
+        primary = start()
+        primary_task = _first_item(primary)
+        attempts[primary_task] = primary
+        winner: Optional[Tuple[asyncio.Task, AsyncIterator[str]]] = None
+
+        try:
+            done, _ = await asyncio.wait({primary_task}, timeout=self.threshold_ms() / 1000)
+            if not done:
+                if self.budget.try_spend(api_key):
+                    self._stats["hedged"] += 1
+                    logger.info("[Hedge] First token late, sending hedged request")
+                    secondary = start()
+                    attempts[_first_item(secondary)] = secondary
+                else:
+                    self._stats["budget_denied"] += 1
+
+            winner = await self._first_to_respond(attempts, primary_task)
+            for task, stream in list(attempts.items()):
+                if task is not winner[0]:
+                    await _discard(task, stream)
+                    del attempts[task]
+            if winner[0] is not primary_task:
+                self._stats["hedge_wins"] += 1
+
+            first = winner[0].result()
+            if first is _END:
+                return
+            yield first
+            async for delta in winner[1]:
+                yield delta
+        finally:
+            for task, stream in attempts.items():
+                if winner is not None and task is winner[0]:
+                    await stream.aclose()
+                else:
+                    await _discard(task, stream)
+
+    @staticmethod
+    async def _first_to_respond(attempts: dict, primary_task: asyncio.Task):
+        """First attempt to produce a delta; errors only count once all failed."""
+        pending = set(attempts)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            # Prefer the original when both arrive in the same tick
+            for task in sorted(done, key=lambda t: t is not primary_task):
+                if task.exception() is None:
+                    return task, attempts[task]
+                error = error or task.exception()
+        raise error
+
+    def stats(self) -> dict:
+        stats = dict(self._stats)
+        stats["enabled"] = HEDGING_ENABLED
+        stats["threshold_ms"] = round(self.threshold_ms(), 1)
+        stats["hedge_rate"] = round(stats["hedged"] / stats["requests"], 3) if stats["requests"] else 0.0
+        stats["win_rate"] = round(stats["hedge_wins"] / stats["hedged"], 3) if stats["hedged"] else 0.0
+        return stats
+
+
+# App-wide hedger
+hedger = Hedger()
+
+
+def get_hedging_stats() -> dict:
+    """Hedge / win rates for /api/metrics."""
+    return hedger.stats()
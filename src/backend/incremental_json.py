@@ -0,0 +1,208 @@
+"""
+Incremental JSON Module - 串流 JSON 欄位即時解析
+
+Reference:
+- src/backend/controller.py (stream_controller_response, parse_controller_output)
+
+gpt-5-mini answers the controller with one JSON object
+({"decision", "next_english_utterance", "memory_update", "notes_for_user"}).
+Parsing it after the last byte holds the utterance back while the model is
+still writing memory_update. FieldStreamParser follows the object as it
+streams:
+
+- string values come out as decoded deltas as soon as their characters
+  arrive (escapes, \\uXXXX and surrogate pairs are decoded across chunk
+  borders)
+- each top-level value is reported once complete (non-strings via
+  json.loads, nested objects / arrays included)
+- text before the object (```json fences, chatter) is skipped
+
+It is fail-soft: input it cannot follow sets `failed` and stops the events;
+the caller still has the whole text for parse_controller_output().
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+_WHITESPACE = " \t\r\n"
+
+# (kind, field, data): ("delta", field, text) or ("value", field, value)
+FieldEvent = Tuple[str, str, Any]
+
+
+class FieldStreamParser:
+    """Streams the top-level fields of one JSON object. Not thread-safe."""
+
+    def __init__(self):
+        self.values: Dict[str, Any] = {}
+        self.complete = False  # closing brace seen
+        self.failed = False
+        self._state = "start"  # start / key / colon / value / string / raw / after
+        self._key: Optional[str] = None
+        self._in_key = False
+        self._chars: List[str] = []
+        self._escape: Optional[str] = None  # "" after a backslash, "uXXXX" while reading
+        self._high_surrogate: Optional[int] = None
+        self._raw: List[str] = []
+        self._depth = 0
+        self._raw_string = False
+        self._raw_escape = False
+        self._delta: List[str] = []
+        self._events: List[FieldEvent] = []
+
+    def feed(self, chunk: str) -> List[FieldEvent]:
+        """Consume the next piece of text; return the events it completes."""
+        self._events = []
+        for ch in chunk:
+            if self.complete or self.failed:
+                break
+            self._step(ch)
+        self._flush_delta()
+        return self._events
+
+    # ---- states -------------------------------------------------------------
+
+    def _step(self, ch: str) -> None:
+        state = self._state
+        if state == "string":
+            self._string_char(ch)
+        elif state == "raw":
+            self._raw_char(ch)
+        elif state == "start":
+            if ch == "{":
+                self._state = "key"
+        elif ch in _WHITESPACE:
+            return
+        elif state == "key":
+            if ch == '"':
+                self._begin_string(in_key=True)
+            elif ch == "}":
+                self.complete = True
+            elif ch != ",":
+                self.failed = True
+        elif state == "colon":
+            if ch == ":":
+                self._state = "value"
+            else:
+                self.failed = True
+        elif state == "value":
+            if ch == '"':
+                self._begin_string(in_key=False)
+            elif ch in ",}]:":
+                self.failed = True
+            else:
+                self._state = "raw"
+                self._raw = []
+                self._depth = 0
+                self._raw_char(ch)
+        elif state == "after":
+            if ch == ",":
+                self._state = "key"
+            elif ch == "}":
+                self.complete = True
+            else:
+                self.failed = True
+
+    def _begin_string(self, in_key: bool) -> None:
+        self._state = "string"
+        self._in_key = in_key
+        self._chars = []
+        self._escape = None
+        self._high_surrogate = None
+
+    def _string_char(self, ch: str) -> None:
+        if self._escape is not None:
+            self._escape_char(ch)
+        elif ch == "\\":
+            self._escape = ""
+        elif ch == '"':
+            text = "".join(self._chars)
+            if self._in_key:
+                self._key = text
+                self._state = "colon"
+            else:
+                self._flush_delta()
+                self._set_value(text)
+        else:
+            self._emit(ch)
+
+    def _escape_char(self, ch: str) -> None:
+        if self._escape == "":
+            if ch == "u":
+                self._escape = "u"
+                return
+            self._escape = None
+            self._emit(_ESCAPES.get(ch, ch))
+            return
+        self._escape += ch
+        if len(self._escape) < 5:
+            return
+        try:
+            code = int(self._escape[1:], 16)
+        except ValueError:
+            self.failed = True
+            return
+        self._escape = None
+        if 0xD800 <= code < 0xDC00:
+            self._high_surrogate = code
+        elif 0xDC00 <= code < 0xE000 and self._high_surrogate is not None:
+            self._emit(chr(0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)))
+            self._high_surrogate = None
+        else:
+            self._emit(chr(code))
+
+    def _raw_char(self, ch: str) -> None:
+        """Non-string value: collect until the comma / brace that ends it."""
+        if self._raw_string:
+            self._raw.append(ch)
+            if self._raw_escape:
+                self._raw_escape = False
+            elif ch == "\\":
+                self._raw_escape = True
+            elif ch == '"':
+                self._raw_string = False
+            return
+        if self._depth == 0 and (ch in ",}" or ch in _WHITESPACE):
+            if not self._finish_raw():
+                return
+            if ch == ",":
+                self._state = "key"
+            elif ch == "}":
+                self.complete = True
+            return
+        self._raw.append(ch)
+        if ch == '"':
+            self._raw_string = True
+        elif ch in "{[":
+            self._depth += 1
+        elif ch in "}]":
+            self._depth -= 1
+            if self._depth == 0:
+                self._finish_raw()
+
+    def _finish_raw(self) -> bool:
+        try:
+            value = json.loads("".join(self._raw))
+        except ValueError:
+            self.failed = True
+            return False
+        self._set_value(value)
+        return True
+
+    # ---- output -------------------------------------------------------------
+
+    def _emit(self, text: str) -> None:
+        self._chars.append(text)
+        if not self._in_key:
+            self._delta.append(text)
+
+    def _flush_delta(self) -> None:
+        if self._delta and self._key is not None:
+            self._events.append(("delta", self._key, "".join(self._delta)))
+        self._delta = []
+
+    def _set_value(self, value: Any) -> None:
+        self.values[self._key] = value
+        self._events.append(("value", self._key, value))
+        self._state = "after"
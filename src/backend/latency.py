@@ -0,0 +1,83 @@
+"""
+Latency Module - 滾動延遲統計
+
+Reference:
+- src/backend/hedging.py (hedge threshold from p90 TTFT)
+
+Keeps the most recent N samples per named metric (e.g. "translate_ttft")
+and answers percentile queries on them. A fixed-size window follows the
+current upstream behaviour (time of day, model load) instead of averaging
+over the whole process lifetime.
+"""
+
+import math
+import os
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+# Samples kept per metric (可用環境變數覆寫)
+LATENCY_WINDOW_SIZE = int(os.getenv("LATENCY_WINDOW_SIZE", "200"))
+
+
+class LatencyWindow:
+    """Rolling window of latency samples (ms). Thread-safe."""
+
+    def __init__(self, max_samples: int = LATENCY_WINDOW_SIZE):
+        self._samples = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+
+    def record(self, ms: float) -> None:
+        with self._lock:
+            self._samples.append(ms)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Nearest-rank percentile (p in 0-100), None without samples."""
+        with self._lock:
+            ordered = sorted(self._samples)
+        if not ordered:
+            return None
+        rank = max(math.ceil(p / 100 * len(ordered)), 1)
+        return ordered[rank - 1]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            ordered = sorted(self._samples)
+        if not ordered:
+            return {"count": 0}
+
+        def _at(p: float) -> float:
+            return round(ordered[max(math.ceil(p / 100 * len(ordered)), 1) - 1], 1)
+
+        return {"count": len(ordered), "p50": _at(50), "p90": _at(90), "p99": _at(99)}
+
+
+# =============================================================================
+# Named Windows
+# =============================================================================
+
+_WINDOWS: Dict[str, LatencyWindow] = {}
+_WINDOWS_LOCK = threading.Lock()
+
+
+def latency_window(name: str) -> LatencyWindow:
+    """Window for a metric name (created on first use)."""
+    with _WINDOWS_LOCK:
+        window = _WINDOWS.get(name)
+        if window is None:
+            window = _WINDOWS[name] = LatencyWindow()
+        return window
+
+
+def record_latency(name: str, ms: float) -> None:
+    latency_window(name).record(ms)
+
+
+def get_latency_stats() -> dict:
+    """p50 / p90 / p99 per metric for /api/metrics."""
+    with _WINDOWS_LOCK:
+        windows = dict(_WINDOWS)
+    return {name: window.snapshot() for name, window in windows.items()}
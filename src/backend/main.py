@@ -3,7 +3,7 @@ FastAPI main entry point for Voice Proxy Negotiator Backend.
 
 Integrates:
 - /api/token (from spike - ephemeral token generation)
-- /api/controller (gpt-5-mini controller)
+- /api/controller (gpt-5-mini controller; /api/controller/stream streams its fields)
 - /api/summarize_ssot (SSOT summarization)
 
 Reference:
@@ -13,12 +13,18 @@ Reference:
 """
 
 import os
+import time
+import asyncio
 import logging
+from contextlib import aclosing, asynccontextmanager
+from typing import AsyncIterator, Optional, Tuple
 
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from dotenv import load_dotenv
+from pydantic import ValidationError
 import httpx
 
 # Handle both module and direct execution imports
@@ -34,13 +40,19 @@ try:
         SimulateLLMRequest,
         SimulateLLMResponse,
         TranslateRequest,
+        SpeculativeTranslateRequest,
         TranslateResponse,
         ScriptRequest,
         ScriptResponse,
         SuggestRequest,
+        GlossaryVersionResponse,
+        CustomGlossaryRequest,
+        CustomGlossaryResponse,
     )
     from .controller import (
         generate_controller_response,
+        get_controller_stream_stats,
+        stream_controller_response,
         summarize_ssot,
         CONTROLLER_MODEL,
     )
@@ -49,10 +61,113 @@ try:
         generate_script_stream,
         get_scenario_options,
         DEFAULT_PROMPTS,
+        SCRIPT_TIMEOUT,
+        get_script_stats,
     )
     from .glossary import (
+        GLOSSARY_WATCH_INTERVAL,
+        GlossaryVersion,
+        compile_glossary,
         get_glossary_hint,
-        get_scenario_context,
+        get_glossary_stats,
+        glossary_store,
+        watch_glossary_file,
+    )
+    from .custom_glossary import (
+        CustomGlossary,
+        CustomGlossaryError,
+        compile_custom_glossary,
+        custom_glossaries,
+        owner_key,
+        get_custom_glossary_stats,
+    )
+    from .scenario_detector import (
+        ScenarioEstimate,
+        detect_scenario,
+        get_scenario_detection_stats,
+        scenario_sessions,
+    )
+    from .tokenizer import get_tokenizer_stats
+    from .prompt_budget import (
+        SUGGEST_PROMPT_BUDGET,
+        TRANSLATE_PROMPT_BUDGET,
+        AssembledPrompt,
+        Section,
+        assemble,
+        current_prompt_tokens,
+    )
+    from .upstream import (
+        IncompleteStreamError,
+        get_async_client,
+        get_upstream_stats,
+        start_upstream,
+        close_upstream,
+    )
+    from .translation_cache import (
+        translation_cache,
+        make_cache_key,
+        get_translation_cache_stats,
+    )
+    from .translation_memory import (
+        translation_memory,
+        format_tm_hint,
+        get_translation_memory_stats,
+    )
+    from .speculative import SpeculativeTranslator, SPECULATIVE_ENABLED
+    from .single_flight import (
+        single_flight,
+        make_flight_key,
+        get_single_flight_stats,
+    )
+    from .ws_session import SessionChannel, get_session_channel_stats
+    from .prompt_registry import prompt_registry, get_prompt_cache_stats
+    from .stream_guard import guard_stream, iterate_sync_stream, get_stream_abort_stats
+    from .latency import record_latency, get_latency_stats
+    from .hedging import hedger, get_hedging_stats, HEDGING_ENABLED, TTFT_METRIC
+    from .model_router import (
+        model_router,
+        get_model_router_stats,
+        RouteDecision,
+        ROUTER_MAX_FAILOVERS,
+        ROUTER_MAX_TTFT_MS,
+    )
+    from .scheduler import (
+        Priority,
+        UpstreamBusyError,
+        upstream_slot,
+        get_scheduler_stats,
+    )
+    from .rate_limiter import rate_limiter, get_rate_limit_stats
+    from .deadline import (
+        DEADLINE_HEADER,
+        STAGE_STREAM,
+        DeadlineExceeded,
+        bound_stream,
+        current_deadline,
+        deadline_error,
+        enforce_deadline,
+        mark_stage,
+        start_deadline,
+        upstream_timeout,
+        get_deadline_stats,
+    )
+    from .circuit_breaker import (
+        CircuitOpenError,
+        circuit,
+        circuit_available,
+        fallback_model,
+        select_model,
+        get_circuit_breaker_stats,
+    )
+    from .adaptive_timeout import (
+        FIRST_TOKEN,
+        TOTAL,
+        adaptive_timeout,
+        record_timeout,
+        record_timing,
+        timed_lines,
+        timeout_ceiling,
+        get_timeout_stats,
     )
 except ImportError:
     from models import (
@@ -66,13 +181,19 @@ except ImportError:
         SimulateLLMRequest,
         SimulateLLMResponse,
         TranslateRequest,
+        SpeculativeTranslateRequest,
         TranslateResponse,
         ScriptRequest,
         ScriptResponse,
         SuggestRequest,
+        GlossaryVersionResponse,
+        CustomGlossaryRequest,
+        CustomGlossaryResponse,
     )
     from controller import (
         generate_controller_response,
+        get_controller_stream_stats,
+        stream_controller_response,
         summarize_ssot,
         CONTROLLER_MODEL,
     )
@@ -81,10 +202,113 @@ except ImportError:
         generate_script_stream,
         get_scenario_options,
         DEFAULT_PROMPTS,
+        SCRIPT_TIMEOUT,
+        get_script_stats,
     )
     from glossary import (
+        GLOSSARY_WATCH_INTERVAL,
+        GlossaryVersion,
+        compile_glossary,
         get_glossary_hint,
-        get_scenario_context,
+        get_glossary_stats,
+        glossary_store,
+        watch_glossary_file,
+    )
+    from custom_glossary import (
+        CustomGlossary,
+        CustomGlossaryError,
+        compile_custom_glossary,
+        custom_glossaries,
+        owner_key,
+        get_custom_glossary_stats,
+    )
+    from scenario_detector import (
+        ScenarioEstimate,
+        detect_scenario,
+        get_scenario_detection_stats,
+        scenario_sessions,
+    )
+    from tokenizer import get_tokenizer_stats
+    from prompt_budget import (
+        SUGGEST_PROMPT_BUDGET,
+        TRANSLATE_PROMPT_BUDGET,
+        AssembledPrompt,
+        Section,
+        assemble,
+        current_prompt_tokens,
+    )
+    from upstream import (
+        IncompleteStreamError,
+        get_async_client,
+        get_upstream_stats,
+        start_upstream,
+        close_upstream,
+    )
+    from translation_cache import (
+        translation_cache,
+        make_cache_key,
+        get_translation_cache_stats,
+    )
+    from translation_memory import (
+        translation_memory,
+        format_tm_hint,
+        get_translation_memory_stats,
+    )
+    from speculative import SpeculativeTranslator, SPECULATIVE_ENABLED
+    from single_flight import (
+        single_flight,
+        make_flight_key,
+        get_single_flight_stats,
+    )
+    from ws_session import SessionChannel, get_session_channel_stats
+    from prompt_registry import prompt_registry, get_prompt_cache_stats
+    from stream_guard import guard_stream, iterate_sync_stream, get_stream_abort_stats
+    from latency import record_latency, get_latency_stats
+    from hedging import hedger, get_hedging_stats, HEDGING_ENABLED, TTFT_METRIC
+    from model_router import (
+        model_router,
+        get_model_router_stats,
+        RouteDecision,
+        ROUTER_MAX_FAILOVERS,
+        ROUTER_MAX_TTFT_MS,
+    )
+    from scheduler import (
+        Priority,
+        UpstreamBusyError,
+        upstream_slot,
+        get_scheduler_stats,
+    )
+    from rate_limiter import rate_limiter, get_rate_limit_stats
+    from deadline import (
+        DEADLINE_HEADER,
+        STAGE_STREAM,
+        DeadlineExceeded,
+        bound_stream,
+        current_deadline,
+        deadline_error,
+        enforce_deadline,
+        mark_stage,
+        start_deadline,
+        upstream_timeout,
+        get_deadline_stats,
+    )
+    from circuit_breaker import (
+        CircuitOpenError,
+        circuit,
+        circuit_available,
+        fallback_model,
+        select_model,
+        get_circuit_breaker_stats,
+    )
+    from adaptive_timeout import (
+        FIRST_TOKEN,
+        TOTAL,
+        adaptive_timeout,
+        record_timeout,
+        record_timing,
+        timed_lines,
+        timeout_ceiling,
+        get_timeout_stats,
     )
 
 # Load environment variables
@@ -101,10 +325,28 @@ logger = logging.getLogger(__name__)
 # FastAPI App Setup
 # =============================================================================
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the pooled upstream clients (and pre-connect) for the app's lifetime."""
+    await start_upstream()
+    # Build the translation memory index off the event loop
+    tm_load = asyncio.create_task(asyncio.to_thread(translation_memory.load))
+    # Hot-reload domain_glossaries.json (glossary.py)
+    glossary_watch = (
+        asyncio.create_task(watch_glossary_file()) if GLOSSARY_WATCH_INTERVAL > 0 else None
+    )
+    yield
+    if glossary_watch is not None:
+        glossary_watch.cancel()
+    await tm_load
+    await close_upstream()
+
+
 app = FastAPI(
     title="English Conversation Assistant",
     description="Backend API for real-time English translation and script generation",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan,
 )
 
 # CORS configuration (design.md § 1.1)
@@ -120,9 +362,14 @@ app.add_middleware(
         "http://127.0.0.1:5173",
     ],
     allow_credentials=False,  # v1 不使用 cookies
-    allow_methods=["GET", "POST", "OPTIONS"],
-    allow_headers=["Content-Type", "Authorization", "X-API-Key"],  # X-API-Key for user-provided OpenAI key
-    expose_headers=["Content-Length"],
+    allow_methods=["GET", "POST", "DELETE", "OPTIONS"],
+    # X-API-Key for user-provided OpenAI key; X-Request-Deadline-Ms for request budgets
+    allow_headers=["Content-Type", "Authorization", "X-API-Key", DEADLINE_HEADER],
+    expose_headers=[
+        "Content-Length", "X-Translation-Cache", "X-Speculative", "X-Coalesced",
+        "X-Translation-Model", "X-Route-Reason", "X-Glossary-Version", "X-Custom-Glossary",
+        "X-Detected-Scenario", "X-Scenario-Confidence", "X-Prompt-Tokens", "X-Deadline-Stage",
+    ],
     max_age=86400,  # 24 小時預檢緩存
 )
 
@@ -149,10 +396,34 @@ def _require_api_key(req: Request) -> str:
     return api_key
 
 
+def _start_deadline(req: Request, endpoint: str, default_s: float):
+    """Request budget from X-Request-Deadline-Ms, else the endpoint's old timeout."""
+    return start_deadline(endpoint, req.headers.get(DEADLINE_HEADER), default_s)
+
+
 # =============================================================================
 # Token Endpoint (integrated from spike)
 # =============================================================================
 
+async def _retry_once_after_429(api_key: str, priority: Priority, send) -> httpx.Response:
+    """Send in an upstream slot; after a 429 with a short pause (rate_limiter),
+    wait it out and retry once.
+
+    The slot is released during the pause (up to RATE_LIMIT_RETRY_MAX_S) so
+    other requests are not held behind it, and re-acquired for the retry.
+    """
+    async with upstream_slot(api_key, priority):
+        response = await send()
+    if response.status_code == 429:
+        delay = rate_limiter.retry_delay(api_key)
+        if delay is not None:
+            logger.info(f"[RateLimit] 429, retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            async with upstream_slot(api_key, priority):
+                response = await send()
+    return response
+
+
 @app.post("/api/token", response_model=TokenResponse)
 async def get_ephemeral_token(request: TokenRequest, req: Request):
     """
@@ -164,6 +435,7 @@ async def get_ephemeral_token(request: TokenRequest, req: Request):
     用戶必須透過 X-API-Key header 提供自己的 API Key。
     """
     api_key = _require_api_key(req)
+    _start_deadline(req, "token", 10.0)
 
     # Validate voice selection
     valid_voices = ["marin", "cedar"]
@@ -173,68 +445,80 @@ async def get_ephemeral_token(request: TokenRequest, req: Request):
             detail=f"Invalid voice. Must be one of: {valid_voices}"
         )
 
-    # Call OpenAI client_secrets endpoint
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                OPENAI_CLIENT_SECRETS_URL,
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "expires_after": {
-                        "anchor": "created_at",
-                        "seconds": 600,  # 10 minutes TTL
+    # Call OpenAI client_secrets endpoint (pooled upstream client)
+    client = get_async_client()
+    try:
+        # Budget: X-Request-Deadline-Ms, else 10s (deadline.py)
+        async with enforce_deadline():
+            with circuit("realtime/client_secrets", REALTIME_MODEL, slow_call_ms=5000) as call:
+                response = await _retry_once_after_429(api_key, Priority.TRANSLATION, lambda: client.post(
+                    OPENAI_CLIENT_SECRETS_URL,
+                    headers={
+                        "Authorization": f"Bearer {api_key}",
+                        "Content-Type": "application/json",
                     },
-                    "session": {
-                        "type": "realtime",
-                        "model": REALTIME_MODEL,
-                        "audio": {
-                            "output": {
-                                "voice": request.voice,
+                    json={
+                        "expires_after": {
+                            "anchor": "created_at",
+                            "seconds": 600,  # 10 minutes TTL
+                        },
+                        "session": {
+                            "type": "realtime",
+                            "model": REALTIME_MODEL,
+                            "audio": {
+                                "output": {
+                                    "voice": request.voice,
+                                },
                             },
                         },
                     },
-                },
-                timeout=10.0,
-            )
+                    timeout=upstream_timeout(10.0),
+                ))
+                call.observe_status(response.status_code)
 
-            if response.status_code == 401:
-                raise HTTPException(
-                    status_code=500,
-                    detail="Invalid OpenAI API key"
-                )
-            elif response.status_code == 429:
-                raise HTTPException(
-                    status_code=429,
-                    detail="Rate limited by OpenAI. Please retry later."
-                )
-            elif response.status_code != 200:
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=f"OpenAI API error: {response.text}"
-                )
-
-            data = response.json()
-
-            return TokenResponse(
-                client_secret=data["value"],
-                expires_at=data["expires_at"],
-                model=REALTIME_MODEL,
+        if response.status_code == 401:
+            raise HTTPException(
+                status_code=500,
+                detail="Invalid OpenAI API key"
             )
-
-        except httpx.TimeoutException:
+        elif response.status_code == 429:
             raise HTTPException(
-                status_code=504,
-                detail="OpenAI API timeout"
+                status_code=429,
+                detail="Rate limited by OpenAI. Please retry later."
             )
-        except httpx.RequestError as e:
+        elif response.status_code != 200:
             raise HTTPException(
-                status_code=502,
-                detail=f"Failed to connect to OpenAI: {str(e)}"
+                status_code=response.status_code,
+                detail=f"OpenAI API error: {response.text}"
             )
 
+        data = response.json()
+
+        return TokenResponse(
+            client_secret=data["value"],
+            expires_at=data["expires_at"],
+            model=REALTIME_MODEL,
+        )
+
+    except DeadlineExceeded as e:
+        raise HTTPException(
+            status_code=504,
+            detail=str(e),
+            headers={"X-Deadline-Stage": e.stage},
+        )
+    except httpx.TimeoutException:
+        raise HTTPException(
+            status_code=504,
+            detail="OpenAI API timeout"
+        )
+    except httpx.RequestError as e:
+        raise HTTPException(
+            status_code=502,
+            detail=f"Failed to connect to OpenAI: {str(e)}"
+        )
+    except (UpstreamBusyError, CircuitOpenError) as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
 
 # =============================================================================
 # Controller Endpoint
@@ -253,6 +537,8 @@ async def controller_endpoint(request: ControllerRequest, req: Request):
     3. Returns decision, next utterance, memory update, notes
     """
     api_key = _require_api_key(req)
+    # Adaptive timeouts may grow past the old 30s (adaptive_timeout.py)
+    _start_deadline(req, "controller", timeout_ceiling("controller"))
 
     logger.info(f"Controller request: directive={request.directive}")
 
@@ -274,6 +560,40 @@ async def controller_endpoint(request: ControllerRequest, req: Request):
         )
 
 
+@app.post("/api/controller/stream")
+async def controller_stream_endpoint(request: ControllerRequest, req: Request):
+    """
+    Streaming controller (SSE), same body as /api/controller.
+
+    gpt-5-mini's JSON is parsed as it streams (incremental_json.py):
+    decision and next_english_utterance deltas arrive as soon as the model
+    writes them, so the user can start speaking before memory_update is
+    generated. Events (data: JSON):
+
+    - {"type": "field", "field": "decision", "value": "continue"}
+    - {"type": "delta", "field": "next_english_utterance", "text": "..."}
+    - {"type": "field", "field": "memory_update" | "notes_for_user", ...}
+    - {"type": "done", "response": {...}}  same fields as /api/controller
+      (fail-soft parse or canned fallback included), always last
+    """
+    api_key = _require_api_key(req)
+    _start_deadline(req, "controller_stream", timeout_ceiling("controller_stream"))
+
+    logger.info(f"Controller stream request: directive={request.directive}")
+
+    input_text = "\n".join([request.pinned_context, request.memory, *request.latest_turns])
+    return StreamingResponse(
+        guard_stream(
+            _sse(stream_controller_response(request, api_key=api_key)),
+            "controller",
+            req.is_disconnected,
+            input_text,
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # =============================================================================
 # SSOT Summarization Endpoint
 # =============================================================================
@@ -291,6 +611,7 @@ async def summarize_ssot_endpoint(request: SummarizeSsotRequest, req: Request):
     3. Returns summary with token counts
     """
     api_key = _require_api_key(req)
+    _start_deadline(req, "summarize_ssot", timeout_ceiling("summary"))
 
     logger.info(f"SSOT summarize request: {len(request.ssot_text)} characters")
 
@@ -324,6 +645,167 @@ async def health_check():
     )
 
 
+# =============================================================================
+# Metrics Endpoint
+# =============================================================================
+
+@app.get("/api/metrics")
+async def metrics():
+    """Runtime metrics for tuning (no API key needed, contains no secrets)."""
+    return {
+        "upstream": get_upstream_stats(),
+        "translation_cache": get_translation_cache_stats(),
+        "translation_memory": get_translation_memory_stats(),
+        "speculative": speculative_translator.stats(),
+        "single_flight": get_single_flight_stats(),
+        "ws_session": get_session_channel_stats(),
+        "prompt_cache": get_prompt_cache_stats(),
+        "stream_aborts": get_stream_abort_stats(),
+        "latency": get_latency_stats(),
+        "hedging": get_hedging_stats(),
+        "model_router": get_model_router_stats(),
+        "scheduler": get_scheduler_stats(),
+        "rate_limits": get_rate_limit_stats(),
+        "circuit_breakers": get_circuit_breaker_stats(),
+        "deadlines": get_deadline_stats(),
+        "timeouts": get_timeout_stats(),
+        "glossary": get_glossary_stats(),
+        "custom_glossaries": get_custom_glossary_stats(),
+        "script": get_script_stats(),
+        "scenario_detection": get_scenario_detection_stats(),
+        "tokenizer": get_tokenizer_stats(),
+        "controller_stream": get_controller_stream_stats(),
+    }
+
+
+# =============================================================================
+# Glossary Admin Endpoints (hot reload)
+# Reference: src/backend/glossary.py (GlossaryStore)
+# =============================================================================
+
+GLOSSARY_ADMIN_TOKEN = os.getenv("GLOSSARY_ADMIN_TOKEN", "")
+
+
+def _require_glossary_admin(req: Request) -> None:
+    """X-Admin-Token must match GLOSSARY_ADMIN_TOKEN (unset → admin disabled)."""
+    if not GLOSSARY_ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Glossary admin disabled (GLOSSARY_ADMIN_TOKEN not set)")
+    if req.headers.get("X-Admin-Token") != GLOSSARY_ADMIN_TOKEN:
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+def _glossary_version_response() -> GlossaryVersionResponse:
+    current = glossary_store.current
+    previous = glossary_store.previous
+    general = current.indexes.get("general")
+    return GlossaryVersionResponse(
+        version=current.version,
+        source=current.source,
+        loaded_at=current.loaded_at,
+        previous_version=previous.version if previous else None,
+        terms=len(general.terms) if general else 0,
+    )
+
+
+@app.get("/api/admin/glossary", response_model=GlossaryVersionResponse)
+async def glossary_version(req: Request):
+    """Glossary version now serving translations."""
+    _require_glossary_admin(req)
+    return _glossary_version_response()
+
+
+@app.post("/api/admin/glossary", response_model=GlossaryVersionResponse)
+async def upload_glossary(req: Request):
+    """
+    Upload a new glossary (same JSON format as domain_glossaries.json).
+
+    Compiled in a worker thread, then swapped in atomically; translations
+    already running finish with the version they started with. The replaced
+    version is kept for /api/admin/glossary/rollback. Not written to disk:
+    a later change to the glossary file replaces it.
+    """
+    _require_glossary_admin(req)
+    try:
+        data = await req.json()
+        version = await asyncio.to_thread(compile_glossary, data, "upload")
+    except ValueError as e:  # includes invalid JSON
+        raise HTTPException(status_code=400, detail=f"Invalid glossary: {e}")
+    glossary_store.swap(version)
+    return _glossary_version_response()
+
+
+@app.post("/api/admin/glossary/rollback", response_model=GlossaryVersionResponse)
+async def rollback_glossary(req: Request):
+    """Swap the previous glossary version back in."""
+    _require_glossary_admin(req)
+    try:
+        glossary_store.rollback()
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return _glossary_version_response()
+
+
+# =============================================================================
+# Custom Glossary Endpoints (per user)
+# Reference: src/backend/custom_glossary.py
+# =============================================================================
+
+@app.post("/api/glossary/custom", response_model=CustomGlossaryResponse)
+async def upload_custom_glossary(request: CustomGlossaryRequest, req: Request):
+    """
+    Upload the user's own terms (product names, reference codes...).
+
+    Compiled once (in a worker thread) and used by /api/translate/stream and
+    /ws/session translations that send the same `glossary_id`. Re-uploading
+    an id replaces it. Kept in a memory-capped LRU: an evicted glossary is
+    simply ignored by translations until uploaded again.
+    """
+    api_key = _require_api_key(req)
+    try:
+        glossary = await asyncio.to_thread(compile_custom_glossary, request.glossary_id, request.terms)
+        custom_glossaries.put(owner_key(api_key), glossary)
+    except CustomGlossaryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info(
+        f"[CustomGlossary] {glossary.glossary_id}: {len(glossary.index.terms)} terms, "
+        f"{glossary.memory_bytes} bytes, compiled in {glossary.compile_ms:.1f}ms"
+    )
+    return CustomGlossaryResponse(
+        glossary_id=glossary.glossary_id,
+        version=glossary.version,
+        terms=len(glossary.index.terms),
+        memory_bytes=glossary.memory_bytes,
+        compile_ms=round(glossary.compile_ms, 1),
+    )
+
+
+@app.delete("/api/glossary/custom/{glossary_id}")
+async def delete_custom_glossary(glossary_id: str, req: Request):
+    """Drop one of the user's custom glossaries."""
+    api_key = _require_api_key(req)
+    if not custom_glossaries.remove(owner_key(api_key), glossary_id):
+        raise HTTPException(status_code=404, detail="Custom glossary not found")
+    return {"deleted": glossary_id}
+
+
+def _detected_scenario(session_key, request: TranslateRequest) -> Tuple[Optional[str], Optional[ScenarioEstimate]]:
+    """Scenario to translate with: the session's detected one when the client left it 'general'."""
+    estimate = detect_scenario(session_key, request.text, request.scenario)
+    if estimate is not None and estimate.scenario is not None:
+        return estimate.scenario, estimate
+    return request.scenario, estimate
+
+
+def _custom_glossary(api_key: str, glossary_id: Optional[str]) -> Optional[CustomGlossary]:
+    """The user's compiled glossary for a request (None: not given, or evicted)."""
+    if not glossary_id:
+        return None
+    glossary = custom_glossaries.get(owner_key(api_key), glossary_id)
+    if glossary is None:
+        logger.warning(f"[CustomGlossary] '{glossary_id}' not loaded (never uploaded or evicted)")
+    return glossary
+
+
 # =============================================================================
 # Translation Endpoint (方案 A: 兩階段架構)
 # Reference: spec/lessons_learned.md (Test 21)
@@ -336,8 +818,31 @@ OPENAI_CHAT_URL = "https://api.openai.com/v1/chat/completions"
 # 測試結果：gpt-4.1-nano 703ms < gpt-3.5-turbo 1235ms < gpt-4o-mini 1377ms
 # 注意：這不是「文字控制器」，不受 CLAUDE.md gpt-5-mini 限制
 # Controller API 仍使用 gpt-5-mini
+# 串流翻譯按段落由 model_router.py 在 TRANSLATION_MODELS 中選擇；
+# 這裡是預設模型（/api/translate 及快取鍵 namespace）
 TRANSLATION_MODEL = "gpt-4.1-nano"
 
+# 熔斷器的慢呼叫門檻：串流以首字時間（TTFT）判斷（同 model_router 的
+# ROUTER_MAX_TTFT_MS），非串流 /api/translate 以整個回應時間判斷
+TRANSLATION_SLOW_MS = 8000
+
+
+# Twilio-style translation prompt (proven effective)
+PLAIN_TRANSLATION_PROMPT = prompt_registry.register("translate_plain", """You are a translation machine. Translate English to Traditional Chinese (Hong Kong style, 繁體中文).
+
+RULES:
+- Output ONLY the Chinese translation, nothing else.
+- No greetings, no explanations, no "好的", no "我明白".
+- Use Traditional Chinese (說話 not 说话).
+- Use formal written Chinese (書面語), NOT colloquial spoken Chinese (口語).
+- Proper nouns: 中文 (English), e.g., "愛潑斯坦 (Epstein)"
+
+CRITICAL - Keep ALL numbers in Arabic numerals:
+- Currency: £500, $1,000 → keep as-is
+- Dates: 15th March → 3月15日 (NOT 三月十五日)
+- Times: 2:30pm → 下午2:30
+- Percentages, phone numbers, reference numbers → keep as-is""")
+
 
 @app.post("/api/translate", response_model=TranslateResponse)
 async def translate_text(request: TranslateRequest, req: Request):
@@ -355,67 +860,84 @@ async def translate_text(request: TranslateRequest, req: Request):
     - spec/lessons_learned.md (Test 21 - 方案 A)
     """
     api_key = _require_api_key(req)
+    _start_deadline(req, "translate", 10.0)
 
     logger.info(f"Translate request: {len(request.text)} chars")
 
-    try:
-        # Twilio-style translation prompt (proven effective)
-        system_prompt = """You are a translation machine. Translate English to Traditional Chinese (Hong Kong style, 繁體中文).
-
-RULES:
-- Output ONLY the Chinese translation, nothing else.
-- No greetings, no explanations, no "好的", no "我明白".
-- Use Traditional Chinese (說話 not 说话).
-- Use formal written Chinese (書面語), NOT colloquial spoken Chinese (口語).
-- Proper nouns: 中文 (English), e.g., "愛潑斯坦 (Epstein)"
-
-CRITICAL - Keep ALL numbers in Arabic numerals:
-- Currency: £500, $1,000 → keep as-is
-- Dates: 15th March → 3月15日 (NOT 三月十五日)
-- Times: 2:30pm → 下午2:30
-- Percentages, phone numbers, reference numbers → keep as-is"""
+    cache_key = make_cache_key(
+        request.text, request.scenario, request.previous_context,
+        TRANSLATION_MODEL, namespace="plain",
+    )
+    cached = translation_cache.get(cache_key)
+    if cached is not None:
+        logger.info(f"Translation cache hit: {len(cached)} chars")
+        return TranslateResponse(translation=cached, source_text=request.text)
 
-        async with httpx.AsyncClient() as client:
-            # 使用 Chat Completions API（更快，無 reasoning 開銷）
-            response = await client.post(
+    try:
+        system_prompt = PLAIN_TRANSLATION_PROMPT
+        client = get_async_client()
+        # 預設模型熔斷中 → 改用備援模型（circuit_breaker.py）
+        model = select_model("chat/completions", TRANSLATION_MODEL)
+        sent = 0.0
+
+        # 使用 Chat Completions API（更快，無 reasoning 開銷）
+        async def send() -> httpx.Response:
+            # Timed from the send, not from the wait for a slot
+            nonlocal sent
+            sent = time.perf_counter()
+            return await client.post(
                 OPENAI_CHAT_URL,
                 headers={
                     "Authorization": f"Bearer {api_key}",
                     "Content-Type": "application/json",
                 },
                 json={
-                    "model": TRANSLATION_MODEL,  # gpt-4.1-nano
+                    "model": model,  # gpt-4.1-nano (or its fallback)
                     "messages": [
                         {"role": "system", "content": system_prompt},
                         {"role": "user", "content": request.text}
                     ],
                     "max_tokens": 500,
                     "temperature": 0.3,  # 低溫度 = 更一致的翻譯
+                    "prompt_cache_key": "translate_plain",
                 },
-                timeout=10.0,  # 10 秒足夠
+                # p99 × factor of recent calls (10s until warmed up), capped by the deadline
+                timeout=upstream_timeout(adaptive_timeout("translate", model, TOTAL)),
             )
 
-            if response.status_code != 200:
-                error_msg = f"OpenAI API error: {response.status_code} - {response.text}"
-                logger.error(error_msg)
-                return TranslateResponse(
-                    translation="",
-                    source_text=request.text,
-                    error=error_msg
-                )
+        async with enforce_deadline():
+            with circuit("chat/completions", model, slow_call_ms=TRANSLATION_SLOW_MS) as call:
+                try:
+                    response = await _retry_once_after_429(api_key, Priority.TRANSLATION, send)
+                except httpx.TimeoutException:
+                    record_timeout("translate", model, TOTAL, time.perf_counter() - sent)
+                    raise
+                call.observe_status(response.status_code)
+
+        if response.status_code != 200:
+            error_msg = f"OpenAI API error: {response.status_code} - {response.text}"
+            logger.error(error_msg)
+            return TranslateResponse(
+                translation="",
+                source_text=request.text,
+                error=error_msg
+            )
 
-            data = response.json()
+        record_timing("translate", model, TOTAL, (time.perf_counter() - sent) * 1000)
+        data = response.json()
+        prompt_registry.record_usage("translate_plain", data.get("usage"))
 
-            # Chat Completions API 格式
-            translation_text = ""
-            if "choices" in data and len(data["choices"]) > 0:
-                translation_text = data["choices"][0]["message"].get("content", "")
+        # Chat Completions API 格式
+        translation_text = ""
+        if "choices" in data and len(data["choices"]) > 0:
+            translation_text = data["choices"][0]["message"].get("content", "")
 
-            logger.info(f"Translation ({TRANSLATION_MODEL}): {len(translation_text)} chars")
-            return TranslateResponse(
-                translation=translation_text.strip(),
-                source_text=request.text
-            )
+        logger.info(f"Translation ({model}): {len(translation_text)} chars")
+        translation_cache.put(cache_key, translation_text.strip())
+        return TranslateResponse(
+            translation=translation_text.strip(),
+            source_text=request.text
+        )
 
     except httpx.TimeoutException:
         return TranslateResponse(
@@ -423,6 +945,18 @@ CRITICAL - Keep ALL numbers in Arabic numerals:
             source_text=request.text,
             error="Translation API timeout"
         )
+    except DeadlineExceeded as e:
+        return TranslateResponse(
+            translation="",
+            source_text=request.text,
+            error=str(e)
+        )
+    except CircuitOpenError as e:
+        return TranslateResponse(
+            translation="",
+            source_text=request.text,
+            error=str(e)
+        )
     except Exception as e:
         logger.error(f"Translation error: {e}")
         return TranslateResponse(
@@ -436,25 +970,8 @@ CRITICAL - Keep ALL numbers in Arabic numerals:
 # Streaming Translation Endpoint (快速回應，~0.3s 首字)
 # =============================================================================
 
-@app.post("/api/translate/stream")
-async def translate_text_stream(request: TranslateRequest, req: Request):
-    """
-    Streaming translation using SSE (Server-Sent Events).
-
-    優點：
-    - 首字回應時間約 0.3 秒
-    - 用戶可以邊看邊讀，感覺更快
-    - 支援場景詞庫提升翻譯品質
-
-    使用方式：
-    前端用 EventSource 或 fetch + ReadableStream 接收
-
-    Reference: spec/research/glossary_integration_design.md
-    """
-    api_key = _require_api_key(req)
-
-    # Build system prompt with optional glossary hints
-    base_prompt = """You are a translation machine. Translate English to Traditional Chinese (Hong Kong style, 繁體中文).
+# Streaming translation prompt (shared by /api/translate/stream and speculative translation)
+STREAM_TRANSLATION_PROMPT = """You are a translation machine. Translate English to Traditional Chinese (Hong Kong style, 繁體中文).
 Output ONLY the Chinese translation. No greetings, no explanations. Use Traditional Chinese (說話 not 说话).
 
 STYLE - Use formal written Chinese (書面語), NOT colloquial spoken Chinese (口語):
@@ -479,30 +996,127 @@ NUMBERS - Keep ALL in Arabic numerals, NEVER convert to Chinese:
 - Reference numbers: ABC123 → keep as-is
 - Ordinals: 1st, 2nd, 3rd → 第1, 第2, 第3 (NOT 第一, 第二)"""
 
-    # Add glossary hints if scenario provided
-    glossary_hint = get_glossary_hint(request.text, request.scenario) if request.scenario else ""
-    scenario_context = get_scenario_context(request.scenario) if request.scenario else ""
+# 每個場景一個固定前綴（只在啟動時編譯一次），讓 OpenAI prompt caching 生效
+prompt_registry.compile_translation_prompts(STREAM_TRANSLATION_PROMPT)
 
-    if glossary_hint or scenario_context:
-        system_prompt = f"{base_prompt}\n\n{scenario_context}\n{glossary_hint}".strip()
-        logger.info(f"Translation with glossary: scenario={request.scenario}, hints={glossary_hint[:50]}...")
-    else:
-        system_prompt = base_prompt
-
-    # Build user message with optional previous context for continuity
-    if request.previous_context:
-        user_message = f"[Context - DO NOT translate, for reference only]\nPrevious: \"{request.previous_context}\"\n\n[Translate ONLY the following]\n{request.text}"
-    else:
-        user_message = request.text
 
-    async def generate():
-        import json as json_module
-        logger.info(f"[Translate] Starting stream translation for: {request.text[:50]}...")
-        logger.info(f"[Translate] Using API key: {api_key[:15]}...")
+def _on_glossary_swap(version: GlossaryVersion) -> None:
+    """New glossary live: recompile scenario prefixes, drop translations made with the old one.
 
+    Cache keys and TM entries carry the glossary version, so translations
+    made with the old glossary (including streams still in flight) are not
+    served again; the TM is re-seeded with the new phrasebook off the loop.
+    """
+    prompt_registry.compile_translation_prompts(STREAM_TRANSLATION_PROMPT)
+    translation_cache.clear()
+    if translation_memory.loaded:
         try:
-            async with httpx.AsyncClient() as client:
-                logger.info(f"[Translate] Calling OpenAI API with model: {TRANSLATION_MODEL}")
+            asyncio.get_running_loop().create_task(asyncio.to_thread(translation_memory.load))
+        except RuntimeError:
+            translation_memory.load()  # swapped outside the event loop (scripts, tests)
+
+
+glossary_store.add_listener(_on_glossary_swap)
+
+
+class UpstreamStatusError(Exception):
+    """Non-200 response from the OpenAI API."""
+
+    def __init__(self, status_code: int, body: str):
+        self.status_code = status_code
+        self.body = body
+        super().__init__(f"OpenAI API error {status_code}: {body[:100]}")
+
+
+def _build_stream_translation_prompt(
+    text: str,
+    scenario: Optional[str],
+    previous_context: Optional[str],
+    tm_match=None,
+    glossary: Optional[GlossaryVersion] = None,
+    custom: Optional[CustomGlossary] = None,
+) -> Tuple[str, str, str]:
+    """Build (prompt_name, system_prompt, user_message) for a streaming translation.
+
+    The system prompt is the precompiled per-scenario prefix from
+    prompt_registry (byte-identical across requests, so upstream prompt
+    caching applies). Everything that varies per text — glossary hints, a
+    below-threshold translation memory match and the previous segment — goes
+    in the user message tail. `glossary` pins the glossary version (default:
+    the current one); `custom` adds the user's own terms.
+    """
+    prompt_name, system_prompt = prompt_registry.translation_prompt(scenario)
+
+    # Add glossary hints if scenario (or a custom glossary) provided
+    glossary_hint = ""
+    if scenario or custom is not None:
+        glossary_hint = get_glossary_hint(
+            text, scenario, version=glossary, custom=custom.index if custom is not None else None
+        )
+
+    # Below the serve cutoff the TM match is still a useful reference
+    tm_hint = format_tm_hint(tm_match) if tm_match is not None else ""
+
+    if glossary_hint:
+        logger.info(f"Translation with glossary: scenario={scenario}, hints={glossary_hint[:50]}...")
+
+    # Over budget: TM hint goes first, then the start of the previous segment
+    if glossary_hint or tm_hint or previous_context:
+        sections = [
+            Section("context_header", "[Context - DO NOT translate, for reference only]"),
+            Section("glossary", glossary_hint, priority=3, prefix="\n"),
+            Section("tm", tm_hint, priority=1, prefix="\n"),
+            # Previous segment for continuity
+            Section("previous", previous_context or "", priority=2, keep="tail", prefix='\nPrevious: "', suffix='"'),
+            Section("text", text, prefix="\n\n[Translate ONLY the following]\n"),
+        ]
+    else:
+        sections = [Section("text", text)]
+    user_message = assemble("translate", sections, TRANSLATE_PROMPT_BUDGET).text
+
+    return prompt_name, system_prompt, user_message
+
+
+def _counts_against_model(error: Exception) -> bool:
+    """Errors that say something about the model (not about the user's key)."""
+    if isinstance(error, UpstreamStatusError):
+        return error.status_code not in (401, 403)
+    return isinstance(error, httpx.HTTPError)
+
+
+async def _stream_translation_deltas(
+    api_key: str,
+    system_prompt: str,
+    user_message: str,
+    prompt_name: str = "translate_stream",
+    model: str = TRANSLATION_MODEL,
+) -> AsyncIterator[str]:
+    """Stream a translation from Chat Completions, yielding text deltas.
+
+    Records the final usage chunk (cached prompt tokens) and TTFT under
+    prompt_name in prompt_registry, TTFT in the rolling latency window, and
+    TTFT / throughput / errors for `model` in model_router. The model's
+    circuit breaker judges the call by its TTFT. First-token and inter-line
+    idle timeouts are adaptive per model (adaptive_timeout.py).
+
+    Raises:
+        UpstreamStatusError: OpenAI returned a non-200 status
+        CircuitOpenError: the model's breaker is open
+        StreamTimeout: no first token / next line within its timeout
+        IncompleteStreamError: the stream ended before [DONE]
+    """
+    import json as json_module
+
+    started = time.perf_counter()
+    ttft_ms = None
+    output_chars = 0
+    client = get_async_client()
+    logger.info(f"[Translate] Calling OpenAI API with model: {model}")
+    try:
+        # Breaker first: an open circuit fails in ms instead of queueing for a slot
+        with circuit("chat/completions", model, slow_call_ms=ROUTER_MAX_TTFT_MS) as call:
+            async with upstream_slot(api_key, Priority.TRANSLATION):
+                sent = time.perf_counter()  # first-token timeout excludes the queue wait
                 async with client.stream(
                     "POST",
                     OPENAI_CHAT_URL,
@@ -511,7 +1125,7 @@ NUMBERS - Keep ALL in Arabic numerals, NEVER convert to Chinese:
                         "Content-Type": "application/json",
                     },
                     json={
-                        "model": TRANSLATION_MODEL,
+                        "model": model,
                         "messages": [
                             {"role": "system", "content": system_prompt},
                             {"role": "user", "content": user_message}
@@ -519,8 +1133,11 @@ NUMBERS - Keep ALL in Arabic numerals, NEVER convert to Chinese:
                         "max_tokens": 500,
                         "temperature": 0.3,
                         "stream": True,
+                        "stream_options": {"include_usage": True},
+                        "prompt_cache_key": prompt_name,
                     },
-                    timeout=15.0,
+                    # headers within the first-token timeout; timed_lines() bounds the lines
+                    timeout=upstream_timeout(adaptive_timeout("translate_stream", model, FIRST_TOKEN)),
                 ) as response:
                     logger.info(f"[Translate] OpenAI response status: {response.status_code}")
 
@@ -529,38 +1146,405 @@ NUMBERS - Keep ALL in Arabic numerals, NEVER convert to Chinese:
                         error_body = await response.aread()
                         error_msg = error_body.decode('utf-8')
                         logger.error(f"[Translate] OpenAI API error {response.status_code}: {error_msg}")
-                        yield f"data: {{\"error\": \"OpenAI API error {response.status_code}: {error_msg[:100]}\"}}\n\n"
-                        return
+                        raise UpstreamStatusError(response.status_code, error_msg)
 
+                    # The outcome is recorded when the stream ends, judged by
+                    # time-to-first-delta: a stream that drops or stalls (idle
+                    # timeout) after its first delta still counts against the breaker
                     chunk_count = 0
-                    async for line in response.aiter_lines():
-                        logger.debug(f"[Translate] Raw line: {line[:100] if line else '(empty)'}")
-                        if line.startswith("data: "):
+                    lines = timed_lines(response.aiter_lines(), "translate_stream", model, sent=sent)
+                    try:
+                        async for line in lines:
+                            logger.debug(f"[Translate] Raw line: {line[:100] if line else '(empty)'}")
+                            if not line.startswith("data: "):
+                                continue
                             data = line[6:]
                             if data == "[DONE]":
                                 logger.info(f"[Translate] Stream done after {chunk_count} chunks")
-                                yield f"data: {{\"done\": true}}\n\n"
-                                break
+                                call.succeeded(ttft_ms)
+                                if ttft_ms is not None:
+                                    stream_ms = (time.perf_counter() - started) * 1000 - ttft_ms
+                                    model_router.record_success(model, ttft_ms, output_chars, stream_ms)
+                                await lines.aclose()  # records the stream's idle gap now
+                                return
                             try:
                                 chunk = json_module.loads(data)
-                                delta = chunk.get("choices", [{}])[0].get("delta", {})
+                                # include_usage: the last chunk has empty choices + usage
+                                if chunk.get("usage"):
+                                    prompt_registry.record_usage(prompt_name, chunk["usage"], ttft_ms)
+                                delta = (chunk.get("choices") or [{}])[0].get("delta", {})
                                 content = delta.get("content", "")
-                                if content:
-                                    chunk_count += 1
-                                    logger.debug(f"[Translate] Chunk {chunk_count}: {content}")
-                                    yield f"data: {{\"text\": {json_module.dumps(content)}}}\n\n"
                             except Exception as parse_err:
                                 logger.warning(f"[Translate] JSON parse error: {parse_err}, data: {data[:50]}")
+                                continue
+                            if content:
+                                if ttft_ms is None:
+                                    ttft_ms = (time.perf_counter() - started) * 1000
+                                    record_latency(TTFT_METRIC, ttft_ms)
+                                    mark_stage(STAGE_STREAM)
+                                chunk_count += 1
+                                output_chars += len(content)
+                                logger.debug(f"[Translate] Chunk {chunk_count}: {content}")
+                                yield content
+                    except GeneratorExit:
+                        # Caller stopped reading (deadline, disconnect): healthy so far
+                        if ttft_ms is not None:
+                            call.succeeded(ttft_ms)
+                        raise
+
+                    # Lines ran out before [DONE]: the connection dropped mid-translation
+                    logger.error(f"[Translate] Stream ended without [DONE] after {chunk_count} chunks")
+                    call.failed()
+                    raise IncompleteStreamError("Translation stream ended before [DONE]")
+    except Exception as e:
+        if _counts_against_model(e):
+            model_router.record_error(model)
+        raise
+
+
+async def _routed_translation_deltas(
+    api_key: str,
+    system_prompt: str,
+    user_message: str,
+    prompt_name: str,
+    route: RouteDecision,
+) -> AsyncIterator[str]:
+    """Stream from the routed model; fail over if it errors before the first delta.
+
+    Models whose circuit breaker is open are skipped without spending a
+    failover; the routed model's configured fallback is appended so an open
+    breaker on every routed candidate still leaves somewhere to go.
+    """
+    ordered = list(route.candidates or [route.model])
+    fallback = fallback_model(route.model)
+    if fallback and fallback not in ordered:
+        ordered.append(fallback)
+    # All open: the first candidate raises CircuitOpenError right away
+    candidates = [m for m in ordered if circuit_available("chat/completions", m)] or ordered[:1]
+    candidates = candidates[:1 + ROUTER_MAX_FAILOVERS]
+    for index, model in enumerate(candidates):
+        deltas = _stream_translation_deltas(
+            api_key, system_prompt, user_message, prompt_name=prompt_name, model=model
+        )
+        try:
+            first = await deltas.__anext__()
+        except StopAsyncIteration:
+            return
         except Exception as e:
-            logger.error(f"[Translate] Streaming error: {e}")
-            yield f"data: {{\"error\": \"{str(e)}\"}}\n\n"
+            failover = _counts_against_model(e) or isinstance(e, CircuitOpenError)
+            if index + 1 >= len(candidates) or not failover:
+                raise
+            model_router.record_failover(model, candidates[index + 1])
+            continue
+
+        try:
+            yield first
+            async for delta in deltas:
+                yield delta
+        finally:
+            await deltas.aclose()
+        return
+
+
+async def _single_delta(text: str) -> AsyncIterator[str]:
+    yield text
+
+
+async def _store_on_complete(
+    deltas: AsyncIterator[str],
+    text: str,
+    scenario: Optional[str],
+    previous_context: Optional[str],
+    cache_scenario: Optional[str] = None,
+    glossary_version: Optional[str] = None,
+) -> AsyncIterator[str]:
+    """Pass deltas through; once complete, save the translation to cache + TM.
+
+    Complete means the deltas ran out without an error: a stream cut off
+    before [DONE] raises IncompleteStreamError, so nothing is stored. With a
+    custom glossary, `cache_scenario` carries its version and the
+    translation stays out of the shared translation memory. A translation
+    made with glossary `glossary_version` (default: the current one) is not
+    stored once another version has been swapped in.
+    """
+    glossary_version = glossary_version or glossary_store.current.version
+    translated_parts = []
+    async for delta in deltas:
+        translated_parts.append(delta)
+        yield delta
+
+    if glossary_store.current.version != glossary_version:
+        logger.info(f"[Translate] Glossary changed mid-stream, not storing: {text[:50]}...")
+        return
+    translation_text = "".join(translated_parts)
+    cache_key = make_cache_key(
+        text, cache_scenario or scenario, previous_context, TRANSLATION_MODEL,
+        glossary_version=glossary_version,
+    )
+    translation_cache.put(cache_key, translation_text)
+    if cache_scenario is None:
+        translation_memory.add(text, translation_text, scenario, glossary_version)
+
+
+def _resolve_translation(
+    api_key: str,
+    text: str,
+    scenario: Optional[str],
+    previous_context: Optional[str],
+    store: bool = True,
+    hedge: bool = False,
+    glossary: Optional[GlossaryVersion] = None,
+    custom: Optional[CustomGlossary] = None,
+) -> Tuple[str, AsyncIterator[str], Optional[RouteDecision]]:
+    """Resolve a streaming translation: exact cache → translation memory → upstream.
+
+    Returns:
+        (source, deltas, route) where source is "hit" / "tm" / "miss" and route
+        is the model_router decision for a miss. With store=True a completed
+        upstream translation is saved to the cache and TM; with hedge=True a
+        slow first token is raced by a second request (hedging.py). A miss
+        takes its glossary hints from `glossary` (default: the current version).
+
+        With a `custom` glossary the cache entry is keyed by its version and
+        TM matches are only used as hints: the shared TM never served or
+        stored a translation with the user's own terms.
+    """
+    cache_scenario = None if custom is None else f"{scenario or ''}+{custom.version}"
+    glossary = glossary or glossary_store.current
+
+    # Exact-match cache: replay immediately
+    cached = translation_cache.get(make_cache_key(
+        text, cache_scenario or scenario, previous_context, TRANSLATION_MODEL,
+        glossary_version=glossary.version,
+    ))
+    if cached is not None:
+        logger.info(f"[Translate] Cache hit for: {text[:50]}...")
+        return "hit", _single_delta(cached), None
+
+    # Translation memory: near-duplicate of a known segment
+    tm_match = translation_memory.lookup(text, scenario, glossary.version)
+    if tm_match is not None and tm_match.servable and custom is None:
+        logger.info(f"[Translate] TM match ({tm_match.similarity:.2f}) for: {text[:50]}...")
+        return "tm", _single_delta(tm_match.entry.translation), None
+
+    prompt_name, system_prompt, user_message = _build_stream_translation_prompt(
+        text, scenario, previous_context, tm_match, glossary, custom
+    )
+    route = model_router.choose(text, scenario)
+    logger.info(f"[Translate] Starting stream translation ({route.model}, {route.reason}) for: {text[:50]}...")
+
+    def start() -> AsyncIterator[str]:
+        return _routed_translation_deltas(api_key, system_prompt, user_message, prompt_name, route)
+
+    deltas = hedger.stream(api_key, start) if hedge else start()
+    if store:
+        deltas = _store_on_complete(deltas, text, scenario, previous_context, cache_scenario, glossary.version)
+    return "miss", deltas, route
+
+
+async def _translation_events(deltas: AsyncIterator[str]) -> AsyncIterator[dict]:
+    """Translation deltas as stream events: {"text"}…, then {"done"} or {"error"}.
+
+    A blown request deadline adds the stage it ran out in ("deadline_stage").
+    """
+    try:
+        async for content in deltas:
+            yield {"text": content}
+        yield {"done": True}
+    except DeadlineExceeded as e:
+        logger.error(f"[Translate] {e}")
+        yield {"error": str(e), "deadline_stage": e.stage}
+    except Exception as e:
+        logger.error(f"[Translate] Streaming error: {e}")
+        yield {"error": str(e)}
+
+
+async def _sse(events: AsyncIterator[dict]) -> AsyncIterator[str]:
+    """Format stream events as SSE lines."""
+    import json as json_module
+    async for event in events:
+        yield f"data: {json_module.dumps(event)}\n\n"
+
+
+def _hedge_requested(request: TranslateRequest) -> bool:
+    """Per-request `hedge` flag, else the TRANSLATION_HEDGING default."""
+    return HEDGING_ENABLED if request.hedge is None else request.hedge
+
+
+@app.post("/api/translate/stream")
+async def translate_text_stream(request: TranslateRequest, req: Request):
+    """
+    Streaming translation using SSE (Server-Sent Events).
 
+    優點：
+    - 首字回應時間約 0.3 秒
+    - 用戶可以邊看邊讀，感覺更快
+    - 支援場景詞庫提升翻譯品質
+    - hedge=true（或 TRANSLATION_HEDGING=true）：首字慢於滾動 p90 TTFT 時
+      再發一個相同請求，取較快者（hedging.py）
+    - 按段落長度、場景及各模型 EWMA TTFT / 吞吐量選擇翻譯模型
+      （model_router.py，X-Translation-Model / X-Route-Reason header）
+    - glossary_id：合併使用者上傳的自訂詞庫（/api/glossary/custom，
+      X-Custom-Glossary header 回報版本或 "missing"）
+    - session_id + 場景 general：依通話內容自動偵測場景（scenario_detector.py），
+      有把握後改用該場景的詞庫與提示詞（X-Detected-Scenario / X-Scenario-Confidence）
+    - 提示詞依 TRANSLATE_PROMPT_BUDGET 裁切（prompt_budget.py），
+      實際送出的 token 數見 X-Prompt-Tokens header
+
+    使用方式：
+    前端用 EventSource 或 fetch + ReadableStream 接收
+
+    Reference: spec/research/glossary_integration_design.md
+    """
+    api_key = _require_api_key(req)
+    deadline = _start_deadline(req, "translate_stream", 15.0)
+
+    # Identical request already streaming (retry / second tab) → share it,
+    # before scenario detection and routing: a duplicate adds no scenario
+    # evidence and reports the leader's route / model
+    flight_key = make_flight_key("translate", api_key, request.model_dump())
+    joined = single_flight.follow(flight_key)
+    if joined is not None:
+        events, leader_headers = joined
+        return StreamingResponse(
+            guard_stream(events, "translate", req.is_disconnected, request.text),
+            media_type="text/event-stream",
+            headers={**leader_headers, "X-Coalesced": "follower"},
+        )
+
+    # One glossary version for the whole request, even if a reload lands mid-stream
+    glossary = glossary_store.current
+    custom = _custom_glossary(api_key, request.glossary_id)
+    scenario, estimate = request.scenario, None
+    if request.session_id:
+        scenario, estimate = _detected_scenario((owner_key(api_key), request.session_id), request)
+    source, deltas, route = _resolve_translation(
+        api_key, request.text, scenario, request.previous_context,
+        hedge=_hedge_requested(request), glossary=glossary, custom=custom,
+    )
+    headers = {
+        "Cache-Control": "no-cache",
+        "Connection": "keep-alive",
+        "X-Translation-Cache": source,
+    }
+    if estimate is not None:
+        headers["X-Detected-Scenario"] = estimate.scenario or "general"
+        headers["X-Scenario-Confidence"] = f"{estimate.confidence:.2f}"
+    if request.glossary_id:
+        headers["X-Custom-Glossary"] = custom.version if custom is not None else "missing"
+    if source != "miss":
+        return StreamingResponse(
+            _sse(_translation_events(deltas)),
+            media_type="text/event-stream",
+            headers=headers,
+        )
+
+    # Out of budget → stop waiting and close upstream (coalesced requests
+    # share the first request's deadline)
+    deltas = bound_stream(deltas, deadline)
+
+    # Planned model (a failover before the first delta can still change it)
+    headers["X-Translation-Model"] = route.model
+    headers["X-Route-Reason"] = route.reason
+    headers["X-Glossary-Version"] = glossary.version
+    headers["X-Prompt-Tokens"] = str(current_prompt_tokens())
+    role, events = single_flight.stream(
+        flight_key, lambda: _sse(_translation_events(deltas)), info=dict(headers)
+    )
+    headers["X-Coalesced"] = role
+
+    # Client gone → stop reading; the last subscriber leaving cancels upstream
     return StreamingResponse(
-        generate(),
+        guard_stream(events, "translate", req.is_disconnected, request.text),
+        media_type="text/event-stream",
+        headers=headers,
+    )
+
+
+# =============================================================================
+# Speculative Translation Endpoint (推測式翻譯)
+# Reference: src/backend/speculative.py
+# =============================================================================
+
+def _translate_deltas(
+    api_key: str,
+    text: str,
+    scenario: Optional[str],
+    previous_context: Optional[str],
+) -> AsyncIterator[str]:
+    """Translation deltas for one text (cache / TM aware, nothing stored)."""
+    return _resolve_translation(api_key, text, scenario, previous_context, store=False)[1]
+
+
+speculative_translator = SpeculativeTranslator(_translate_deltas)
+
+
+def _speculative_interim(api_key: str, request: SpeculativeTranslateRequest) -> dict:
+    if not SPECULATIVE_ENABLED:
+        return {"status": "disabled", "revision": request.revision}
+    return speculative_translator.update(
+        api_key,
+        request.segment_id,
+        request.revision,
+        request.text,
+        scenario=request.scenario,
+        previous_context=request.previous_context,
+        pause=request.pause,
+    )
+
+
+def _speculative_final(
+    api_key: str,
+    request: SpeculativeTranslateRequest,
+) -> Tuple[str, AsyncIterator[str]]:
+    glossary_version = glossary_store.current.version
+    mode, deltas = speculative_translator.finalize(
+        api_key,
+        request.segment_id,
+        request.text,
+        scenario=request.scenario,
+        previous_context=request.previous_context,
+    )
+    logger.info(f"[Translate] Speculative {mode} for: {request.text[:50]}...")
+
+    # Only whole-text translations are stored (extended = prefix + remainder)
+    if mode != "extended":
+        deltas = _store_on_complete(
+            deltas, request.text, request.scenario, request.previous_context,
+            glossary_version=glossary_version,
+        )
+    return mode, deltas
+
+
+@app.post("/api/translate/speculative")
+async def translate_speculative(request: SpeculativeTranslateRequest, req: Request):
+    """
+    Speculative translation of Web Speech interim results.
+
+    - is_final=False: record the revision, maybe start translating its stable
+      prefix in the background; returns JSON status immediately
+    - is_final=True: SSE stream in the same format as /api/translate/stream,
+      reusing the speculated prefix translation when it still matches
+
+    Header X-Speculative: exact | extended | full
+    """
+    api_key = _require_api_key(req)
+
+    if not request.is_final:
+        return _speculative_interim(api_key, request)
+
+    deadline = _start_deadline(req, "translate_speculative", 15.0)
+    mode, deltas = _speculative_final(api_key, request)
+    deltas = bound_stream(deltas, deadline)
+    return StreamingResponse(
+        guard_stream(
+            _sse(_translation_events(deltas)), "translate_speculative", req.is_disconnected, request.text
+        ),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
+            "X-Speculative": mode,
         }
     )
 
@@ -586,6 +1570,7 @@ async def generate_script_endpoint(request: ScriptRequest, req: Request):
         - pronunciation_tips: IPA for difficult words
     """
     api_key = _require_api_key(req)
+    _start_deadline(req, "script", SCRIPT_TIMEOUT)
 
     logger.info(f"Script generation request: {request.chinese_input[:50]}...")
 
@@ -598,7 +1583,9 @@ async def generate_script_endpoint(request: ScriptRequest, req: Request):
     ]
     tone = context.tone if context else "polite"
 
-    result = generate_script(
+    # Sync OpenAI SDK call: run in the threadpool, not on the event loop
+    result = await run_in_threadpool(
+        generate_script,
         chinese_input=request.chinese_input,
         scenario=scenario,
         conversation_history=conversation_history,
@@ -625,6 +1612,7 @@ async def generate_script_stream_endpoint(request: ScriptRequest, req: Request):
 
     """
     api_key = _require_api_key(req)
+    _start_deadline(req, "script_stream", SCRIPT_TIMEOUT)
 
     # Extract context
     context = request.context
@@ -635,18 +1623,20 @@ async def generate_script_stream_endpoint(request: ScriptRequest, req: Request):
     ]
     tone = context.tone if context else "polite"
 
-    def generate():
-        for chunk in generate_script_stream(
+    def generate(stop):
+        return generate_script_stream(
             chinese_input=request.chinese_input,
             scenario=scenario,
             conversation_history=conversation_history,
             tone=tone,
             api_key=api_key
-        ):
-            yield chunk
+        )
 
+    # Worker thread stops (and closes the upstream stream) once the client leaves
     return StreamingResponse(
-        generate(),
+        guard_stream(
+            iterate_sync_stream(generate), "script", req.is_disconnected, request.chinese_input or ""
+        ),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -702,6 +1692,7 @@ async def get_scenario_prompts(scenario: str):
 # =============================================================================
 
 SUGGEST_MODEL = "gpt-4.1-mini"
+SUGGEST_SLOW_TTFT_MS = 5000  # circuit breaker slow-call threshold (first token)
 
 
 def _parse_suggestion_block(block: str) -> dict | None:
@@ -733,82 +1724,134 @@ ZH: [translation]
 Output ONLY in this format. No numbering, no extra text.
 Use Traditional Chinese characters (說話 not 说话, 電話 not 电话)."""
 
+prompt_registry.register("suggest", SUGGEST_SYSTEM_PROMPT)
+
 
-def _suggest_stream_sync(api_key: str, conversation_text: str, num_turns: int):
-    """Sync SSE generator — uses sync httpx streaming to avoid Windows async overhead.
+def _suggest_prompt(request: SuggestRequest) -> Tuple[str, AssembledPrompt]:
+    """(conversation_text, user message) for a suggest request.
+
+    The conversation is trimmed to SUGGEST_PROMPT_BUDGET, oldest turns first.
+    """
+    conversation_text = "\n".join(
+        f"{'Caller' if turn.role == 'me' else 'Other party'}: {turn.text}"
+        for turn in request.conversation_turns
+    )
+    prompt = assemble("suggest", [
+        Section("header", "Recent conversation:\n"),
+        Section("turns", conversation_text, priority=1, keep="lines"),
+        Section("ask", "\n\nSuggest 2-3 responses for the Caller:"),
+    ], SUGGEST_PROMPT_BUDGET)
+    return conversation_text, prompt
+
+
+async def _suggest_stream(
+    api_key: str,
+    user_message: str,
+    num_turns: int,
+) -> AsyncIterator[str]:
+    """SSE generator over the shared async client.
 
     Yields SSE events as each suggestion is parsed from the --- delimiter stream.
-    First suggestion typically arrives in ~1s.
+    First suggestion typically arrives in ~1s. Closing the generator (client
+    gone) closes the upstream stream. First-token and idle timeouts are
+    adaptive and enforced per line by timed_lines() (adaptive_timeout.py).
     """
     import json as _json
 
-    user_message = f"Recent conversation:\n{conversation_text}\n\nSuggest 2-3 responses for the Caller:"
-
-    logger.info(f"[Suggest] Streaming for {num_turns} turns (sync)")
+    logger.info(f"[Suggest] Streaming for {num_turns} turns")
+    deadline = current_deadline()
+    started = time.perf_counter()
+    ttft_ms = None
     try:
-        with httpx.Client() as client:
-            with client.stream(
-                "POST",
-                OPENAI_CHAT_URL,
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "model": SUGGEST_MODEL,
-                    "messages": [
-                        {"role": "system", "content": SUGGEST_SYSTEM_PROMPT},
-                        {"role": "user", "content": user_message}
-                    ],
-                    "max_tokens": 500,
-                    "temperature": 0.7,
-                    "stream": True,
-                },
-                timeout=15.0,
-            ) as response:
-                if response.status_code != 200:
-                    yield f"data: {_json.dumps({'type': 'error', 'error': f'API {response.status_code}'})}\n\n"
-                    return
-
-                accumulated = ""
-                suggestion_index = 0
-
-                for line in response.iter_lines():
-                    if not line.startswith("data: "):
-                        continue
-                    d = line[6:]
-                    if d == "[DONE]":
-                        break
-                    try:
-                        chunk = _json.loads(d)
-                        content = chunk.get("choices", [{}])[0].get("delta", {}).get("content", "")
-                        if content:
-                            accumulated += content
-                            # Check for complete suggestion blocks
-                            while "---" in accumulated and suggestion_index < 3:
-                                parts = accumulated.split("---", 1)
-                                block = parts[0].strip()
-                                accumulated = parts[1] if len(parts) > 1 else ""
-                                if block:
-                                    s = _parse_suggestion_block(block)
-                                    if s:
-                                        yield f"data: {_json.dumps({'type': 'suggestion', 'index': suggestion_index, 'english': s['english'], 'chinese': s['chinese']})}\n\n"
-                                        suggestion_index += 1
-                    except (_json.JSONDecodeError, IndexError, KeyError):
-                        pass
-
-                # Handle last block (no trailing ---)
-                if accumulated.strip() and suggestion_index < 3:
-                    s = _parse_suggestion_block(accumulated.strip())
-                    if s:
-                        yield f"data: {_json.dumps({'type': 'suggestion', 'index': suggestion_index, 'english': s['english'], 'chinese': s['chinese']})}\n\n"
-                        suggestion_index += 1
-
-                logger.info(f"[Suggest] Streamed {suggestion_index} suggestions")
-                yield f"data: {_json.dumps({'type': 'done'})}\n\n"
+        client = get_async_client()
+        model = select_model("chat/completions", SUGGEST_MODEL)
+        with circuit("chat/completions", model, slow_call_ms=SUGGEST_SLOW_TTFT_MS) as call:
+            async with upstream_slot(api_key, Priority.SUGGESTION):
+                sent = time.perf_counter()  # first-token timeout excludes the queue wait
+                async with client.stream(
+                    "POST",
+                    OPENAI_CHAT_URL,
+                    headers={
+                        "Authorization": f"Bearer {api_key}",
+                        "Content-Type": "application/json",
+                    },
+                    json={
+                        "model": model,
+                        "messages": [
+                            {"role": "system", "content": SUGGEST_SYSTEM_PROMPT},
+                            {"role": "user", "content": user_message}
+                        ],
+                        "max_tokens": 500,
+                        "temperature": 0.7,
+                        "stream": True,
+                        "stream_options": {"include_usage": True},
+                        "prompt_cache_key": "suggest",
+                    },
+                    # headers within the first-token timeout; timed_lines() bounds the lines
+                    timeout=upstream_timeout(adaptive_timeout("suggest", model, FIRST_TOKEN)),
+                ) as response:
+                    if response.status_code != 200:
+                        call.observe_status(response.status_code)
+                        yield f"data: {_json.dumps({'type': 'error', 'error': f'API {response.status_code}'})}\n\n"
+                        return
 
-    except httpx.TimeoutException:
-        yield f"data: {_json.dumps({'type': 'error', 'error': 'API timeout'})}\n\n"
+                    accumulated = ""
+                    suggestion_index = 0
+
+                    lines = timed_lines(response.aiter_lines(), "suggest", model, sent=sent)
+                    async with aclosing(lines):
+                        async for line in lines:
+                            if deadline is not None and deadline.expired():
+                                exceeded = deadline.exceeded()
+                                yield f"data: {_json.dumps({'type': 'error', 'error': str(exceeded), 'deadline_stage': exceeded.stage})}\n\n"
+                                return
+                            if not line.startswith("data: "):
+                                continue
+                            d = line[6:]
+                            if d == "[DONE]":
+                                break
+                            try:
+                                chunk = _json.loads(d)
+                                if chunk.get("usage"):
+                                    prompt_registry.record_usage("suggest", chunk["usage"], ttft_ms)
+                                content = (chunk.get("choices") or [{}])[0].get("delta", {}).get("content", "")
+                                if content:
+                                    if ttft_ms is None:
+                                        ttft_ms = (time.perf_counter() - started) * 1000
+                                        call.succeeded(ttft_ms)
+                                        mark_stage(STAGE_STREAM)
+                                    accumulated += content
+                                    # Check for complete suggestion blocks
+                                    while "---" in accumulated and suggestion_index < 3:
+                                        parts = accumulated.split("---", 1)
+                                        block = parts[0].strip()
+                                        accumulated = parts[1] if len(parts) > 1 else ""
+                                        if block:
+                                            s = _parse_suggestion_block(block)
+                                            if s:
+                                                yield f"data: {_json.dumps({'type': 'suggestion', 'index': suggestion_index, 'english': s['english'], 'chinese': s['chinese']})}\n\n"
+                                                suggestion_index += 1
+                            except (_json.JSONDecodeError, IndexError, KeyError):
+                                pass
+
+                    # Handle last block (no trailing ---)
+                    if accumulated.strip() and suggestion_index < 3:
+                        s = _parse_suggestion_block(accumulated.strip())
+                        if s:
+                            yield f"data: {_json.dumps({'type': 'suggestion', 'index': suggestion_index, 'english': s['english'], 'chinese': s['chinese']})}\n\n"
+                            suggestion_index += 1
+
+                    logger.info(f"[Suggest] Streamed {suggestion_index} suggestions")
+                    yield f"data: {_json.dumps({'type': 'done'})}\n\n"
+
+    except DeadlineExceeded as e:
+        yield f"data: {_json.dumps({'type': 'error', 'error': str(e), 'deadline_stage': e.stage})}\n\n"
+    except httpx.TimeoutException as e:
+        exceeded = deadline_error(e)
+        if exceeded is not None:
+            yield f"data: {_json.dumps({'type': 'error', 'error': str(exceeded), 'deadline_stage': exceeded.stage})}\n\n"
+        else:
+            yield f"data: {_json.dumps({'type': 'error', 'error': 'API timeout'})}\n\n"
     except Exception as e:
         logger.error(f"[Suggest] Error: {e}")
         yield f"data: {_json.dumps({'type': 'error', 'error': str(e)[:100]})}\n\n"
@@ -819,22 +1862,199 @@ async def suggest_stream(request: SuggestRequest, req: Request):
     """
     SSE streaming endpoint for smart suggestions.
 
-    Uses sync httpx streaming in thread pool (avoids Windows async overhead).
+    Streams over the shared async client (idle gaps bounded by timed_lines()).
     Each suggestion is emitted as soon as it's parsed from the stream.
+    Identical concurrent requests share one upstream stream (single_flight.py).
     """
     api_key = _require_api_key(req)
+    _start_deadline(req, "suggest", 15.0)
 
-    conv_lines = []
-    for turn in request.conversation_turns:
-        label = "Caller" if turn.role == "me" else "Other party"
-        conv_lines.append(f"{label}: {turn.text}")
-    conversation_text = "\n".join(conv_lines)
+    conversation_text, prompt = _suggest_prompt(request)
+
+    # Identical request already streaming (retry / second tab) → share it
+    flight_key = make_flight_key("suggest", api_key, request.model_dump())
+    role, events = single_flight.stream(
+        flight_key,
+        lambda: _suggest_stream(api_key, prompt.text, len(request.conversation_turns)),
+    )
 
     return StreamingResponse(
-        _suggest_stream_sync(api_key, conversation_text, len(request.conversation_turns)),
+        guard_stream(events, "suggest", req.is_disconnected, conversation_text),
         media_type="text/event-stream",
-        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            "X-Coalesced": role,
+            "X-Prompt-Tokens": str(prompt.tokens),
+        },
+    )
+
+
+# =============================================================================
+# Session WebSocket (一個通話一條連線)
+# Reference: src/backend/ws_session.py
+# =============================================================================
+
+def _start_session_deadline(endpoint: str, message: dict, default_s: float):
+    """Budget of one /ws/session message: its "deadline_ms" field, else `default_s`.
+
+    Each message runs in its own task, so the deadline is per message.
+    """
+    deadline_ms = message.pop("deadline_ms", None)
+    return start_deadline(endpoint, None if deadline_ms is None else str(deadline_ms), default_s)
+
+
+async def _session_translate(channel: SessionChannel, api_key: str, segment_id: str, message: dict):
+    """Translation over /ws/session (speculative final when a revision is given)."""
+    deadline = _start_session_deadline("ws:translate", message, 15.0)
+    if message.get("revision") is not None:
+        request = SpeculativeTranslateRequest(**{**message, "segment_id": segment_id, "is_final": True})
+        _, deltas = _speculative_final(api_key, request)
+        events = _translation_events(bound_stream(deltas, deadline))
+    else:
+        request = TranslateRequest(**message)
+        # Same segment already translating (client retry, second tab): share
+        # it before scenario detection, as /api/translate/stream does
+        flight_key = make_flight_key("ws:translate", api_key, request.model_dump())
+        joined = single_flight.follow(flight_key)
+        if joined is not None:
+            events = joined[0]
+        else:
+            # One detector per connection (= per call); tell the client when it changes
+            scenario, estimate = _detected_scenario(channel, request)
+            if estimate is not None and estimate.changed:
+                await channel.send("scenario", segment_id, estimate.to_dict())
+            source, deltas, _ = _resolve_translation(
+                api_key, request.text, scenario, request.previous_context,
+                hedge=_hedge_requested(request), custom=_custom_glossary(api_key, request.glossary_id),
+            )
+            leader_events = _translation_events(bound_stream(deltas, deadline))
+            events = leader_events
+            if source == "miss":
+                _, events = single_flight.stream(flight_key, lambda: leader_events)
+
+    events = guard_stream(events, "ws:translate", channel.is_disconnected, request.text)
+    async with aclosing(events):
+        async for event in events:
+            if not await channel.send("translate", segment_id, event):
+                return
+    channel.forget_segment(segment_id)
+
+
+async def _session_suggest(channel: SessionChannel, api_key: str, segment_id: str, message: dict):
+    """Suggestions over /ws/session (same events as /api/suggest/stream)."""
+    import json as json_module
+
+    _start_session_deadline("ws:suggest", message, 15.0)
+    request = SuggestRequest(**message)
+    conversation_text, prompt = _suggest_prompt(request)
+    events = guard_stream(
+        _suggest_stream(api_key, prompt.text, len(request.conversation_turns)),
+        "ws:suggest",
+        channel.is_disconnected,
+        conversation_text,
     )
+    async with aclosing(events):
+        async for line in events:
+            if not await channel.send("suggest", segment_id, json_module.loads(line[6:])):
+                return
+    channel.forget_segment(segment_id)
+
+
+async def _session_controller(channel: SessionChannel, api_key: str, segment_id: str, message: dict):
+    """Controller directive over /ws/session (same body as /api/controller)."""
+    _start_session_deadline("ws:controller", message, timeout_ceiling("controller"))
+    request = ControllerRequest(**message)
+    try:
+        response = await generate_controller_response(request, api_key=api_key)
+        await channel.send("controller", segment_id, response.model_dump())
+    except Exception as e:
+        logger.error(f"[Session] Controller error: {e}")
+        await channel.send("controller", segment_id, {"error": f"Controller error: {str(e)}"})
+    channel.forget_segment(segment_id)
+
+
+_SESSION_HANDLERS = {
+    "translate": _session_translate,
+    "suggest": _session_suggest,
+    "controller": _session_controller,
+}
+
+
+async def _dispatch_session_message(channel: SessionChannel, api_key: str, message: dict):
+    msg_type = message.pop("type", None)
+    segment_id = str(message.pop("segment_id", "") or "")
+
+    if msg_type == "ping":
+        await channel.send("pong")
+        return
+
+    if not segment_id:
+        await channel.send("error", data={"error": f"segment_id required for '{msg_type}'"})
+        return
+
+    try:
+        if msg_type == "cancel":
+            channel.cancel(segment_id)
+        elif msg_type == "interim":
+            request = SpeculativeTranslateRequest(**{**message, "segment_id": segment_id, "is_final": False})
+            await channel.send("interim", segment_id, _speculative_interim(api_key, request))
+        elif msg_type in _SESSION_HANDLERS:
+            handler = _SESSION_HANDLERS[msg_type]
+            channel.spawn(segment_id, _run_session_handler(channel, handler, api_key, segment_id, message))
+        else:
+            await channel.send("error", segment_id, {"error": f"Unknown message type: {msg_type}"})
+    except ValidationError as e:
+        await channel.send("error", segment_id, {"error": f"Invalid '{msg_type}' message: {e.errors()[0]['msg']}"})
+
+
+async def _run_session_handler(channel, handler, api_key: str, segment_id: str, message: dict):
+    try:
+        await handler(channel, api_key, segment_id, message)
+    except ValidationError as e:
+        await channel.send("error", segment_id, {"error": f"Invalid message: {e.errors()[0]['msg']}"})
+        channel.forget_segment(segment_id)
+
+
+@app.websocket("/ws/session")
+async def session_websocket(websocket: WebSocket):
+    """
+    Multiplexed channel for a whole call: translations, interim updates,
+    suggestions and controller directives over one WebSocket.
+
+    The first message must be {"type": "auth", "api_key": "..."} (browsers
+    cannot set X-API-Key on a WebSocket). Wire format: ws_session.py.
+    """
+    import json as json_module
+
+    await websocket.accept()
+    channel = SessionChannel(websocket)
+    try:
+        hello = await websocket.receive_json()
+        api_key = hello.get("api_key") if hello.get("type") == "auth" else None
+        if not api_key:
+            await channel.send("error", data={
+                "error": "API Key required. Please set your OpenAI API Key in Settings (首頁設定)."
+            })
+            await websocket.close(code=4401)
+            return
+        await channel.send("ready")
+
+        while True:
+            raw = await websocket.receive_text()
+            channel.received()
+            try:
+                message = json_module.loads(raw)
+            except ValueError:
+                await channel.send("error", data={"error": "Invalid JSON"})
+                continue
+            if isinstance(message, dict):
+                await _dispatch_session_message(channel, api_key, message)
+    except WebSocketDisconnect:
+        logger.info("[Session] Client disconnected")
+    finally:
+        scenario_sessions.remove(channel)
+        await channel.close()
 
 
 # =============================================================================
@@ -857,6 +2077,7 @@ async def simulate_llm_endpoint(request: SimulateLLMRequest, req: Request):
     Used by: src/tests/simulation/simulator.js
     """
     api_key = _require_api_key(req)
+    _start_deadline(req, "simulate_llm", 30.0)
 
     logger.info(f"Simulate LLM request: {len(request.messages)} messages")
 
@@ -870,7 +2091,9 @@ async def simulate_llm_endpoint(request: SimulateLLMRequest, req: Request):
                 "content": msg.content
             })
 
-        async with httpx.AsyncClient() as client:
+        client = get_async_client()
+        # Simulation is offline test tooling: background (script) priority
+        async with enforce_deadline(), upstream_slot(api_key, Priority.SCRIPT):
             response = await client.post(
                 OPENAI_RESPONSES_URL,
                 headers={
@@ -882,27 +2105,27 @@ async def simulate_llm_endpoint(request: SimulateLLMRequest, req: Request):
                     "instructions": request.instructions,
                     "input": input_messages,
                 },
-                timeout=30.0,
+                timeout=upstream_timeout(30.0),
             )
 
-            if response.status_code != 200:
-                error_msg = f"OpenAI API error: {response.status_code} - {response.text}"
-                logger.error(error_msg)
-                return SimulateLLMResponse(response="", error=error_msg)
+        if response.status_code != 200:
+            error_msg = f"OpenAI API error: {response.status_code} - {response.text}"
+            logger.error(error_msg)
+            return SimulateLLMResponse(response="", error=error_msg)
 
-            data = response.json()
+        data = response.json()
 
-            # Extract response text
-            output_text = ""
-            if "output" in data and len(data["output"]) > 0:
-                for item in data["output"]:
-                    if item.get("type") == "message" and "content" in item:
-                        for content_item in item["content"]:
-                            if content_item.get("type") == "output_text":
-                                output_text += content_item.get("text", "")
+        # Extract response text
+        output_text = ""
+        if "output" in data and len(data["output"]) > 0:
+            for item in data["output"]:
+                if item.get("type") == "message" and "content" in item:
+                    for content_item in item["content"]:
+                        if content_item.get("type") == "output_text":
+                            output_text += content_item.get("text", "")
 
-            logger.info(f"Simulate LLM response: {len(output_text)} chars")
-            return SimulateLLMResponse(response=output_text.strip())
+        logger.info(f"Simulate LLM response: {len(output_text)} chars")
+        return SimulateLLMResponse(response=output_text.strip())
 
     except httpx.TimeoutException:
         return SimulateLLMResponse(response="", error="OpenAI API timeout")
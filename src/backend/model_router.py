@@ -0,0 +1,253 @@
+"""
+Model Router Module - 翻譯模型自適應路由
+
+Reference:
+- spec/lessons_learned.md (Test 21 - 首字延遲: gpt-4.1-nano 703ms < gpt-4o-mini 1377ms)
+- src/backend/latency.py
+
+TRANSLATION_MODEL used to be gpt-4.1-nano for every segment, from a one-word
+"Yes" to a 60-word policy explanation. The router picks among the configured
+TRANSLATION_MODELS per segment:
+
+- Short segments (≤ ROUTER_SHORT_WORDS): lowest EWMA time-to-first-token.
+- Longer segments: lowest expected completion time,
+  TTFT + expected output chars / EWMA throughput.
+- Scenario preference (ROUTER_SCENARIO_MODELS, e.g. "nhs=gpt-4.1-mini"):
+  the preferred model wins while it is healthy and within
+  ROUTER_PREFERENCE_SLACK of the best score.
+- Failover: a model whose EWMA error rate or TTFT degrades past the limits
+  is moved behind the healthy ones; it gets a probe request every
+  ROUTER_PROBE_INTERVAL seconds so recovery is noticed. Errors before the
+  first delta also fail over to the next candidate within the request.
+
+Models start from measured priors (Test 21) until real samples arrive.
+Decisions are reported in the X-Translation-Model / X-Route-Reason headers
+and per-model state in /api/metrics.
+"""
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# Constants (可用環境變數覆寫)
+# =============================================================================
+
+TRANSLATION_MODELS = [
+    m.strip()
+    for m in os.getenv("TRANSLATION_MODELS", "gpt-4.1-nano,gpt-4o-mini").split(",")
+    if m.strip()
+]
+ROUTER_SHORT_WORDS = int(os.getenv("ROUTER_SHORT_WORDS", "6"))
+ROUTER_MAX_ERROR_RATE = float(os.getenv("ROUTER_MAX_ERROR_RATE", "0.5"))
+ROUTER_MAX_TTFT_MS = float(os.getenv("ROUTER_MAX_TTFT_MS", "4000"))
+ROUTER_PROBE_INTERVAL = float(os.getenv("ROUTER_PROBE_INTERVAL", "30"))
+ROUTER_PREFERENCE_SLACK = float(os.getenv("ROUTER_PREFERENCE_SLACK", "1.3"))
+ROUTER_MAX_FAILOVERS = int(os.getenv("ROUTER_MAX_FAILOVERS", "1"))
+ROUTER_EWMA_ALPHA = 0.3
+
+# Chinese output is roughly half as many characters as the English input
+OUTPUT_CHARS_PER_INPUT_CHAR = 0.5
+
+# Priors: (TTFT ms, throughput chars/s) until the model has been measured
+MODEL_PRIORS = {
+    "gpt-4.1-nano": (700.0, 120.0),
+    "gpt-4.1-mini": (1000.0, 90.0),
+    "gpt-4o-mini": (1400.0, 80.0),
+    "gpt-3.5-turbo": (1250.0, 90.0),
+}
+DEFAULT_PRIOR = (1500.0, 60.0)
+
+
+def _parse_scenario_models(value: str) -> Dict[str, str]:
+    """"nhs=gpt-4.1-mini,bank=gpt-4.1-nano" → {"nhs": "gpt-4.1-mini", ...}"""
+    mapping = {}
+    for item in value.split(","):
+        if "=" in item:
+            scenario, model = item.split("=", 1)
+            mapping[scenario.strip()] = model.strip()
+    return mapping
+
+
+ROUTER_SCENARIO_MODELS = _parse_scenario_models(os.getenv("ROUTER_SCENARIO_MODELS", ""))
+
+
+# =============================================================================
+# Per-model State
+# =============================================================================
+
+@dataclass
+class _ModelState:
+    ttft_ms: float
+    throughput_cps: float
+    error_rate: float = 0.0
+    requests: int = 0
+    errors: int = 0
+    selected: int = 0
+    measured: bool = False
+    last_attempt: float = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        return self.error_rate <= ROUTER_MAX_ERROR_RATE and self.ttft_ms <= ROUTER_MAX_TTFT_MS
+
+
+@dataclass
+class RouteDecision:
+    """Chosen model plus the failover order."""
+    model: str
+    reason: str
+    candidates: List[str] = field(default_factory=list)
+
+
+def _ewma(current: float, sample: float) -> float:
+    return current + ROUTER_EWMA_ALPHA * (sample - current)
+
+
+# =============================================================================
+# Router
+# =============================================================================
+
+class ModelRouter:
+    """Chooses a translation model per segment from live latency / errors.
+
+    Thread-safe (records may come from the threadpool).
+    """
+
+    def __init__(self, models: Optional[List[str]] = None, scenario_models: Optional[Dict[str, str]] = None):
+        self.models = list(models or TRANSLATION_MODELS)
+        self.scenario_models = dict(ROUTER_SCENARIO_MODELS if scenario_models is None else scenario_models)
+        self._state: Dict[str, _ModelState] = {
+            model: _ModelState(*MODEL_PRIORS.get(model, DEFAULT_PRIOR)) for model in self.models
+        }
+        self._reasons: Dict[str, int] = {}
+        self._failovers = 0
+        self._lock = threading.Lock()
+
+    @property
+    def default_model(self) -> str:
+        return self.models[0]
+
+    def _score(self, state: _ModelState, text: str, short: bool) -> float:
+        """Expected ms until the user has the translation (TTFT only when short)."""
+        if short:
+            return state.ttft_ms
+        expected_chars = len(text) * OUTPUT_CHARS_PER_INPUT_CHAR
+        return state.ttft_ms + expected_chars / max(state.throughput_cps, 1.0) * 1000
+
+    def choose(self, text: str, scenario: Optional[str] = None) -> RouteDecision:
+        """Pick a model for one segment; candidates[1:] are the failover order."""
+        short = len(text.split()) <= ROUTER_SHORT_WORDS
+        now = time.monotonic()
+
+        with self._lock:
+            scores = {model: self._score(state, text, short) for model, state in self._state.items()}
+            healthy = sorted((m for m in self.models if self._state[m].healthy), key=scores.__getitem__)
+            degraded = sorted((m for m in self.models if not self._state[m].healthy), key=scores.__getitem__)
+            candidates = healthy + degraded
+            reason = "short" if short else "long"
+
+            if not healthy:
+                reason = "all_degraded"
+
+            preferred = self.scenario_models.get(scenario or "")
+            if (
+                preferred in healthy
+                and preferred != candidates[0]
+                and scores[preferred] <= scores[candidates[0]] * ROUTER_PREFERENCE_SLACK
+            ):
+                candidates.remove(preferred)
+                candidates.insert(0, preferred)
+                reason = "scenario"
+
+            # Degraded model not tried for a while: send one probe to notice recovery
+            for model in degraded:
+                if healthy and now - self._state[model].last_attempt >= ROUTER_PROBE_INTERVAL:
+                    candidates.remove(model)
+                    candidates.insert(0, model)
+                    reason = "probe"
+                    break
+
+            model = candidates[0]
+            self._state[model].selected += 1
+            self._state[model].last_attempt = now
+            self._reasons[reason] = self._reasons.get(reason, 0) + 1
+
+        return RouteDecision(model=model, reason=reason, candidates=candidates)
+
+    # -------------------------------------------------------------------------
+    # Feedback
+    # -------------------------------------------------------------------------
+
+    def _get(self, model: str) -> Optional[_ModelState]:
+        return self._state.get(model)
+
+    def record_success(self, model: str, ttft_ms: float, output_chars: int, stream_ms: float) -> None:
+        """One completed stream: TTFT, and chars/s after the first token."""
+        with self._lock:
+            state = self._get(model)
+            if state is None:
+                return
+            state.requests += 1
+            state.last_attempt = time.monotonic()
+            if not state.measured:
+                # First real sample replaces the prior outright
+                state.ttft_ms = ttft_ms
+                state.measured = True
+            else:
+                state.ttft_ms = _ewma(state.ttft_ms, ttft_ms)
+            if output_chars >= 10 and stream_ms > 0:
+                state.throughput_cps = _ewma(state.throughput_cps, output_chars / (stream_ms / 1000))
+            state.error_rate = _ewma(state.error_rate, 0.0)
+
+    def record_error(self, model: str) -> None:
+        with self._lock:
+            state = self._get(model)
+            if state is None:
+                return
+            state.requests += 1
+            state.errors += 1
+            state.last_attempt = time.monotonic()
+            state.error_rate = _ewma(state.error_rate, 1.0)
+            if not state.healthy:
+                logger.warning(f"[Router] {model} degraded (error rate {state.error_rate:.2f})")
+
+    def record_failover(self, from_model: str, to_model: str) -> None:
+        logger.warning(f"[Router] Failover {from_model} → {to_model}")
+        with self._lock:
+            self._failovers += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "models": {
+                    model: {
+                        "ttft_ms_ewma": round(state.ttft_ms, 1),
+                        "throughput_cps_ewma": round(state.throughput_cps, 1),
+                        "error_rate_ewma": round(state.error_rate, 3),
+                        "healthy": state.healthy,
+                        "measured": state.measured,
+                        "requests": state.requests,
+                        "errors": state.errors,
+                        "selected": state.selected,
+                    }
+                    for model, state in self._state.items()
+                },
+                "reasons": dict(self._reasons),
+                "failovers": self._failovers,
+                "scenario_models": dict(self.scenario_models),
+            }
+
+
+# App-wide router
+model_router = ModelRouter()
+
+
+def get_model_router_stats() -> dict:
+    """Per-model EWMA state and routing decisions for /api/metrics."""
+    return model_router.stats()
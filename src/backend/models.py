@@ -7,7 +7,7 @@ Reference:
 - src/skills/openai-gpt5-mini-controller/SKILL.md
 """
 
-from typing import List, Literal, Optional
+from typing import Dict, List, Literal, Optional
 from pydantic import BaseModel, Field
 
 
@@ -90,6 +90,7 @@ class ControllerResponse(BaseModel):
         memory_update: Updated rolling summary (replaces previous memory)
         notes_for_user: Optional Chinese hints for UI (not spoken)
         response_id: Response ID for stateful continuation
+        prompt_tokens: Token count of the assembled prompt (prompt_budget.py)
     """
     decision: Literal["continue", "request_clarification", "stop"] = Field(
         ...,
@@ -116,6 +117,11 @@ class ControllerResponse(BaseModel):
         description="Response ID for stateful continuation"
     )
 
+    prompt_tokens: Optional[int] = Field(
+        default=None,
+        description="Token count of the assembled prompt (after budget trimming)"
+    )
+
 
 # =============================================================================
 # SSOT Summarize API Models
@@ -246,6 +252,66 @@ class TranslateRequest(BaseModel):
         default=None,
         description="Previous segment English text for translation continuity"
     )
+    hedge: Optional[bool] = Field(
+        default=None,
+        description="Hedge a slow first token with a second request (None = server default, streaming only)"
+    )
+    glossary_id: Optional[str] = Field(
+        default=None,
+        description="Custom glossary uploaded via /api/glossary/custom (streaming only)",
+        max_length=64,
+    )
+    session_id: Optional[str] = Field(
+        default=None,
+        description="Call id: with scenario 'general', enables scenario auto-detection (streaming only)",
+        max_length=64,
+    )
+
+
+class SpeculativeTranslateRequest(BaseModel):
+    """
+    Request model for speculative translation (interim + final revisions).
+
+    Reference: src/backend/speculative.py
+
+    The frontend posts every Web Speech interim revision of a segment
+    (is_final=False) and then the final segment (is_final=True) with the
+    same segment_id. Interim requests return a JSON status; the final
+    request returns the same SSE stream as /api/translate/stream.
+    """
+    segment_id: str = Field(
+        ...,
+        description="Client-generated segment ID (unique per session)",
+        min_length=1,
+        max_length=64
+    )
+    revision: int = Field(
+        ...,
+        description="Monotonic revision number within the segment",
+        ge=0
+    )
+    text: str = Field(
+        ...,
+        description="English text of this revision",
+        min_length=1,
+        max_length=2000
+    )
+    is_final: bool = Field(
+        default=False,
+        description="True for the final segment emitted by SmartSegmenter"
+    )
+    pause: bool = Field(
+        default=False,
+        description="Speaker paused: treat the whole interim text as stable"
+    )
+    scenario: Optional[str] = Field(
+        default=None,
+        description="Domain scenario for glossary hints: bank, nhs, utilities, insurance"
+    )
+    previous_context: Optional[str] = Field(
+        default=None,
+        description="Previous segment English text for translation continuity"
+    )
 
 
 class TranslateResponse(BaseModel):
@@ -352,3 +418,41 @@ class SuggestRequest(BaseModel):
         default="general",
         description="Scenario type: bank, nhs, utilities, insurance, general"
     )
+
+
+# =============================================================================
+# Glossary Admin Models (hot reload)
+# =============================================================================
+
+class GlossaryVersionResponse(BaseModel):
+    """The glossary version now serving translations."""
+    version: str = Field(..., description="File 'version' field + content hash")
+    source: str = Field(..., description="file / upload / rollback")
+    loaded_at: float = Field(..., description="Unix time the version went live")
+    previous_version: Optional[str] = Field(default=None, description="Version kept for rollback")
+    terms: int = Field(..., description="Terms in the merged 'general' index")
+
+
+# =============================================================================
+# Custom Glossary Models (per user, custom_glossary.py)
+# =============================================================================
+
+class CustomGlossaryRequest(BaseModel):
+    """Upload of a user's own terms (English → Chinese)."""
+    glossary_id: str = Field(
+        ...,
+        description="Name chosen by the client, e.g. a session or company id",
+        min_length=1,
+        max_length=64,
+        pattern=r"^[A-Za-z0-9_.:-]+$",
+    )
+    terms: Dict[str, str] = Field(..., description="English term → Chinese translation")
+
+
+class CustomGlossaryResponse(BaseModel):
+    """A compiled custom glossary."""
+    glossary_id: str
+    version: str = Field(..., description="Content hash")
+    terms: int = Field(..., description="Terms after de-duplication")
+    memory_bytes: int = Field(..., description="Approximate compiled size")
+    compile_ms: float
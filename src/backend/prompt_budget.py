@@ -0,0 +1,171 @@
+"""
+Prompt Budget Module - 以 token 預算組裝提示詞
+
+Reference:
+- src/backend/tokenizer.py (count_tokens, truncate_to_tokens)
+- src/backend/prompt_templates.py (controller / realtime prompts)
+- src/backend/script_generator.py, main.py (script, suggest, translate prompts)
+
+Every prompt builder used to concatenate its inputs as they came: the SSOT
+summary, rolling memory, recent turns, glossary / TM hints. Over a long
+call the inputs grow and so does each prompt (and TTFT with it); the only
+cap was a 2000-character cut of the SSOT in the realtime instructions.
+
+A prompt is now a list of Sections assembled against a token budget:
+
+- each section may have its own cap (max_tokens), applied first
+- if the total is still over the budget, sections are trimmed in
+  priority order (lowest first; ties: the later section first) until it
+  fits; FIXED sections (instructions, the text to translate, the user's
+  directive) are never trimmed
+- trimming keeps the start ("head"), the end ("tail"), or the most recent
+  whole lines ("lines", for conversation turns), and marks the cut with …
+
+The same inputs always give the same prompt (no sampling, no model
+summary call), so prompt caching and translation caching still apply.
+
+Prompts within budget come out byte-identical to the old builders. Each
+assembly records its final token count (tokenizer metrics, by prompt
+name), and the last count of the current request is available from
+current_prompt_tokens() for response headers / fields.
+"""
+
+import logging
+import os
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+# Handle both module and direct execution imports
+try:
+    from .tokenizer import count_tokens, record_prompt_tokens, truncate_to_tokens
+except ImportError:
+    from tokenizer import count_tokens, record_prompt_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# Constants (可用環境變數覆寫)
+# =============================================================================
+
+# Total budget per prompt (tokens)
+CONTROLLER_PROMPT_BUDGET = int(os.getenv("CONTROLLER_PROMPT_BUDGET", "3000"))
+SCRIPT_PROMPT_BUDGET = int(os.getenv("SCRIPT_PROMPT_BUDGET", "1200"))
+SUGGEST_PROMPT_BUDGET = int(os.getenv("SUGGEST_PROMPT_BUDGET", "800"))
+TRANSLATE_PROMPT_BUDGET = int(os.getenv("TRANSLATE_PROMPT_BUDGET", "600"))
+REALTIME_INSTRUCTIONS_BUDGET = int(os.getenv("REALTIME_INSTRUCTIONS_BUDGET", "1500"))
+# Cap for the SSOT reference in the realtime instructions (was 2000 characters)
+REALTIME_SSOT_TOKENS = int(os.getenv("REALTIME_SSOT_TOKENS", "600"))
+
+FIXED = 1_000_000  # priority of sections that are never trimmed
+TRIM_MARKER = "…"
+
+_current_tokens: ContextVar[Optional[int]] = ContextVar("prompt_tokens", default=None)
+
+
+# =============================================================================
+# Sections
+# =============================================================================
+
+@dataclass(frozen=True)
+class Section:
+    """One part of a prompt.
+
+    `prefix` / `suffix` (headers, blank lines) are never trimmed and are
+    dropped together with the text when the text is empty.
+    """
+    name: str
+    text: str
+    priority: int = FIXED
+    max_tokens: Optional[int] = None
+    keep: str = "head"  # head / tail / lines
+    prefix: str = ""
+    suffix: str = ""
+    min_tokens: int = 0
+
+    def render(self, text: str) -> str:
+        return f"{self.prefix}{text}{self.suffix}" if text else ""
+
+
+@dataclass(frozen=True)
+class AssembledPrompt:
+    """Assembled prompt text, its token count and what was trimmed."""
+    name: str
+    text: str
+    tokens: int
+    budget: int
+    trimmed: Tuple[str, ...] = ()
+
+
+def fit(text: str, max_tokens: int, keep: str = "head") -> str:
+    """`text` cut to `max_tokens` (marker included); unchanged if it fits."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    room = max_tokens - count_tokens(TRIM_MARKER)
+    if room <= 0:
+        return ""
+    if keep == "lines":
+        kept: List[str] = []
+        used = 0
+        for line in reversed(text.split("\n")):
+            cost = count_tokens(line + "\n")
+            if used + cost > room:
+                break
+            kept.append(line)
+            used += cost
+        if kept:
+            return TRIM_MARKER + "\n" + "\n".join(reversed(kept))
+        keep = "tail"  # the newest line alone is over: keep its end
+    if keep == "tail":
+        return TRIM_MARKER + truncate_to_tokens(text, room, keep_end=True)
+    return truncate_to_tokens(text, room) + TRIM_MARKER
+
+
+def assemble(name: str, sections: List[Section], budget: int) -> AssembledPrompt:
+    """Join `sections` in order, trimmed to `budget` tokens.
+
+    The budget is a target for the trimmable sections: FIXED sections alone
+    can exceed it (they are then sent as they are).
+    """
+    texts = [
+        fit(section.text, section.max_tokens, section.keep) if section.max_tokens is not None else section.text
+        for section in sections
+    ]
+    trimmed = {section.name for section, text in zip(sections, texts) if text != section.text}
+    costs = [count_tokens(section.render(text)) for section, text in zip(sections, texts)]
+
+    over = sum(costs) - budget
+    if over > 0:
+        order = sorted(
+            (i for i, section in enumerate(sections) if section.priority < FIXED and texts[i]),
+            key=lambda i: (sections[i].priority, -i),
+        )
+        for i in order:
+            if over <= 0:
+                break
+            section = sections[i]
+            current = count_tokens(texts[i])
+            texts[i] = fit(texts[i], max(section.min_tokens, current - over), section.keep)
+            trimmed.add(section.name)
+            cost = count_tokens(section.render(texts[i]))
+            over -= costs[i] - cost
+            costs[i] = cost
+
+    text = "".join(section.render(text) for section, text in zip(sections, texts))
+    prompt = AssembledPrompt(
+        name=name,
+        text=text,
+        tokens=count_tokens(text),
+        budget=budget,
+        trimmed=tuple(section.name for section in sections if section.name in trimmed),
+    )
+    if prompt.trimmed:
+        logger.info(f"[PromptBudget] {name}: trimmed {', '.join(prompt.trimmed)} → {prompt.tokens}/{budget} tokens")
+    record_prompt_tokens(name, prompt.tokens, trimmed=bool(prompt.trimmed))
+    _current_tokens.set(prompt.tokens)
+    return prompt
+
+
+def current_prompt_tokens() -> Optional[int]:
+    """Token count of the last prompt assembled in this request (None: none built)."""
+    return _current_tokens.get()
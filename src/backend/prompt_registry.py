@@ -0,0 +1,159 @@
+"""
+Prompt Registry Module - 穩定前綴 Prompt 登記
+
+Reference:
+- https://platform.openai.com/docs/guides/prompt-caching
+- spec/research/glossary_integration_design.md
+
+OpenAI prompt caching only reuses a prompt's *prefix*, and only when it is
+byte-identical to a recent request. translate_text_stream used to splice
+per-text glossary hints into the system message, so the prefix changed on
+every request and caching never applied.
+
+This registry precompiles one byte-identical system prompt per scenario
+(base prompt + scenario context) once at startup. Everything that varies
+per request (glossary hints, translation memory hint, previous context)
+goes in the user message at the tail.
+
+It also records `usage.prompt_tokens_details.cached_tokens` and TTFT per
+prompt, so /api/metrics shows the cache-hit rate and the TTFT difference
+between cached and uncached requests.
+
+Note: OpenAI only caches prompts of 1024+ tokens. The short translation
+prefixes stay below that today, but they now qualify as soon as the prompt
+grows (e.g. larger per-scenario context). The per-scenario prompt_cache_key
+also keeps a scenario's requests routed to the same cache shard.
+"""
+
+import hashlib
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+try:
+    from .glossary import get_domains, get_scenario_context
+except ImportError:
+    from glossary import get_domains, get_scenario_context
+
+logger = logging.getLogger(__name__)
+
+
+def translation_prompt_name(scenario: Optional[str]) -> str:
+    """Registry name of the streaming translation prefix for a scenario."""
+    return f"translate_stream:{scenario or 'none'}"
+
+
+class PromptRegistry:
+    """Precompiled prompt prefixes + per-prompt upstream cache usage.
+
+    Thread-safe: the suggestion path records usage from the threadpool.
+    """
+
+    def __init__(self):
+        self._prompts: Dict[str, str] = {}
+        self._usage: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    # -------------------------------------------------------------------------
+    # Prompts
+    # -------------------------------------------------------------------------
+
+    def register(self, name: str, text: str) -> str:
+        """Register a fixed prompt. Re-registering must not change the bytes."""
+        with self._lock:
+            existing = self._prompts.get(name)
+            if existing is not None and existing != text:
+                logger.warning(f"[Prompts] '{name}' changed at runtime; upstream prefix cache resets")
+            self._prompts[name] = text
+        return text
+
+    def get(self, name: str) -> Optional[str]:
+        return self._prompts.get(name)
+
+    def compile_translation_prompts(self, base_prompt: str) -> None:
+        """Precompile the streaming translation prefix for every scenario.
+
+        Called once at startup. Unknown scenarios share the 'general' prefix.
+        """
+        for scenario in [None, "general", *get_domains()]:
+            context = get_scenario_context(scenario) if scenario else ""
+            text = f"{base_prompt}\n\n{context}" if context else base_prompt
+            self.register(translation_prompt_name(scenario), text)
+        logger.info(f"[Prompts] Compiled {len(self._prompts)} prompt prefixes")
+
+    def translation_prompt(self, scenario: Optional[str]) -> Tuple[str, str]:
+        """Return (name, system_prompt) for a streaming translation."""
+        name = translation_prompt_name(scenario)
+        if name not in self._prompts:
+            name = translation_prompt_name("general")
+        return name, self._prompts[name]
+
+    # -------------------------------------------------------------------------
+    # Usage
+    # -------------------------------------------------------------------------
+
+    def record_usage(self, name: str, usage: Optional[dict], ttft_ms: Optional[float] = None) -> None:
+        """Record one response's `usage` block (Chat Completions format)."""
+        if not usage:
+            return
+
+        prompt_tokens = usage.get("prompt_tokens") or 0
+        details = usage.get("prompt_tokens_details") or {}
+        cached_tokens = details.get("cached_tokens") or 0
+
+        with self._lock:
+            entry = self._usage.setdefault(name, {
+                "requests": 0,
+                "prompt_tokens": 0,
+                "cached_tokens": 0,
+                "cache_hit_requests": 0,
+                "ttft_ms_cached_sum": 0.0,
+                "ttft_ms_cached_count": 0,
+                "ttft_ms_uncached_sum": 0.0,
+                "ttft_ms_uncached_count": 0,
+            })
+            entry["requests"] += 1
+            entry["prompt_tokens"] += prompt_tokens
+            entry["cached_tokens"] += cached_tokens
+            bucket = "cached" if cached_tokens else "uncached"
+            if cached_tokens:
+                entry["cache_hit_requests"] += 1
+            if ttft_ms is not None:
+                entry[f"ttft_ms_{bucket}_sum"] += ttft_ms
+                entry[f"ttft_ms_{bucket}_count"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            prompts = {
+                name: {
+                    "chars": len(text),
+                    "sha1": hashlib.sha1(text.encode("utf-8")).hexdigest()[:12],
+                }
+                for name, text in self._prompts.items()
+            }
+            usage = {name: dict(entry) for name, entry in self._usage.items()}
+
+        def _avg(entry: dict, bucket: str) -> Optional[float]:
+            count = entry.pop(f"ttft_ms_{bucket}_count")
+            total = entry.pop(f"ttft_ms_{bucket}_sum")
+            return round(total / count, 1) if count else None
+
+        for entry in usage.values():
+            entry["cached_token_ratio"] = (
+                round(entry["cached_tokens"] / entry["prompt_tokens"], 3)
+                if entry["prompt_tokens"] else None
+            )
+            entry["cache_hit_rate"] = round(entry["cache_hit_requests"] / entry["requests"], 3)
+            entry["ttft_ms_cached_avg"] = _avg(entry, "cached")
+            entry["ttft_ms_uncached_avg"] = _avg(entry, "uncached")
+
+        return {"prompts": prompts, "usage": usage}
+
+
+# App-wide registry
+prompt_registry = PromptRegistry()
+
+
+def get_prompt_cache_stats() -> dict:
+    """Prefix fingerprints and cached-token usage for /api/metrics."""
+    return prompt_registry.stats()
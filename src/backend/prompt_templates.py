@@ -5,8 +5,27 @@ Reference:
 - design.md § 5 (Button-to-Policy)
 - design.md § 4.2 (SSOT 摘要策略)
 - src/skills/openai-gpt5-mini-controller/SKILL.md
+- src/backend/prompt_budget.py (token budgets for the assembled prompts)
 """
 
+# Handle both module and direct execution imports
+try:
+    from .prompt_budget import (
+        CONTROLLER_PROMPT_BUDGET,
+        REALTIME_INSTRUCTIONS_BUDGET,
+        REALTIME_SSOT_TOKENS,
+        Section,
+        assemble,
+    )
+except ImportError:
+    from prompt_budget import (
+        CONTROLLER_PROMPT_BUDGET,
+        REALTIME_INSTRUCTIONS_BUDGET,
+        REALTIME_SSOT_TOKENS,
+        Section,
+        assemble,
+    )
+
 # =============================================================================
 # Controller Instruction Template
 # =============================================================================
@@ -111,7 +130,8 @@ def build_controller_prompt(
     directive: str,
     pinned_context: str,
     memory: str,
-    latest_turns: list[str]
+    latest_turns: list[str],
+    budget: int = CONTROLLER_PROMPT_BUDGET,
 ) -> str:
     """
     Build the controller prompt for gpt-5-mini.
@@ -121,27 +141,30 @@ def build_controller_prompt(
         pinned_context: Goal + Rules + SSOT summary
         memory: Current rolling summary
         latest_turns: Recent conversation turns (max 3)
+        budget: Token budget (prompt_budget.py); over it the memory is
+            trimmed first, then the oldest turns, then the pinned context
 
     Returns:
         Formatted prompt string for the Responses API input
     """
     turns_text = "\n".join(latest_turns) if latest_turns else "(No recent turns)"
 
-    prompt = f"""=== PINNED CONTEXT ===
-{pinned_context}
-
-=== CURRENT MEMORY ===
-{memory if memory else "(Empty)"}
-
-=== RECENT CONVERSATION ===
-{turns_text}
+    prompt = assemble("controller", [
+        Section("pinned_header", "=== PINNED CONTEXT ===\n"),
+        Section("pinned_context", pinned_context, priority=3),
+        Section("memory_header", "\n\n=== CURRENT MEMORY ===\n"),
+        Section("memory", memory if memory else "(Empty)", priority=1),
+        Section("turns_header", "\n\n=== RECENT CONVERSATION ===\n"),
+        Section("turns", turns_text, priority=2, keep="lines"),
+        Section("directive", f"""
 
 === USER DIRECTIVE ===
 {directive}
 
-Based on the above context and directive, provide your response in JSON format."""
+Based on the above context and directive, provide your response in JSON format."""),
+    ], budget)
 
-    return prompt
+    return prompt.text
 
 
 def build_ssot_summarize_prompt(ssot_text: str) -> str:
@@ -190,7 +213,7 @@ def build_realtime_session_instructions(
         goal: The objective to achieve (G)
         language: Task language code - zh-TW, zh-CN, en, ja, ko (L)
         rules: Behavioral constraints (R)
-        ssot_summary: Source-of-truth reference data (S)
+        ssot_summary: Source-of-truth reference data (S), capped at REALTIME_SSOT_TOKENS
 
     Returns:
         Session instructions string for Realtime API
@@ -222,15 +245,7 @@ def build_realtime_session_instructions(
 
 """
 
-    if rules:
-        instructions += f"[CONSTRAINTS] {rules}\n\n"
-
-    if ssot_summary:
-        # Truncate SSOT to prevent token overflow
-        truncated_ssot = ssot_summary[:2000] if len(ssot_summary) > 2000 else ssot_summary
-        instructions += f"[REFERENCE] {truncated_ssot}\n\n"
-
-    instructions += f"""[SPEAKING STYLE]
+    speaking_style = f"""[SPEAKING STYLE]
 - You are on a phone call as the CALLER.
 - Introduce yourself ONLY ONCE at the start.
 - Be concise. 1-2 sentences per turn.
@@ -238,7 +253,13 @@ def build_realtime_session_instructions(
 
 [OUTPUT] Only speak as {agent_name}. No narration. Just what {agent_name} says."""
 
-    return instructions
+    # SSOT capped to prevent token overflow; over budget it goes before the rules
+    return assemble("realtime_instructions", [
+        Section("identity", instructions),
+        Section("rules", rules, priority=2, prefix="[CONSTRAINTS] ", suffix="\n\n"),
+        Section("ssot", ssot_summary, priority=1, max_tokens=REALTIME_SSOT_TOKENS, prefix="[REFERENCE] ", suffix="\n\n"),
+        Section("speaking_style", speaking_style),
+    ], REALTIME_INSTRUCTIONS_BUDGET).text
 
 
 # =============================================================================
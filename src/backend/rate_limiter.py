@@ -0,0 +1,270 @@
+"""
+Rate Limiter Module - 從 x-ratelimit header 學習每個 key 的額度
+
+Reference:
+- https://platform.openai.com/docs/guides/rate-limits (x-ratelimit-* headers)
+- src/backend/scheduler.py (pacing before each upstream call)
+- src/backend/upstream.py (response hooks feed observe())
+
+Every OpenAI response carries the key's current budget:
+
+    x-ratelimit-limit-requests / x-ratelimit-limit-tokens
+    x-ratelimit-remaining-requests / x-ratelimit-remaining-tokens
+    x-ratelimit-reset-requests / x-ratelimit-reset-tokens   ("1s", "6m0s", "20ms")
+
+These used to be ignored, so we only learned about the limit from a 429.
+Now each API key has two token buckets (requests, tokens) rebuilt from the
+latest headers, refilling continuously at the rate the reset time implies.
+Before each upstream call the scheduler asks reserve() how long to wait:
+
+- Lower priority classes must leave a reserve of the budget for live
+  translation, so they start waiting earlier (see scheduler.RATE_RESERVE).
+- After a 429, the key is paused until Retry-After / reset has passed.
+
+Bucket state per key is exposed in /api/metrics (get_rate_limit_stats).
+"""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# Constants (可用環境變數覆寫)
+# =============================================================================
+
+RATE_LIMIT_PACING = os.getenv("RATE_LIMIT_PACING", "true").lower() == "true"
+RATE_LIMIT_RETRY_MAX_S = float(os.getenv("RATE_LIMIT_RETRY_MAX_S", "2.0"))
+RATE_LIMIT_DEFAULT_BLOCK_S = 1.0
+MAX_TRACKED_KEYS = 1000
+
+# OpenAI limits are per minute: the refill rate to assume when the headers
+# show a full bucket (no reset in progress)
+LIMIT_WINDOW_S = 60.0
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_UNIT_SECONDS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    """OpenAI reset duration ("1s", "6m0s", "20ms", "1h2m3.5s") → seconds."""
+    if not value:
+        return None
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(number) * _UNIT_SECONDS[unit] for number, unit in parts)
+
+
+def key_id(api_key: Optional[str]) -> str:
+    """Short digest used to label a key (never the key itself)."""
+    if not api_key:
+        return "env"
+    return hashlib.sha1(api_key.encode("utf-8")).hexdigest()[:12]
+
+
+# =============================================================================
+# Buckets
+# =============================================================================
+
+@dataclass
+class _Bucket:
+    """One dimension (requests or tokens) of a key's budget."""
+    limit: float
+    remaining: float
+    refill_per_s: float
+    updated: float
+
+    def available(self, now: float) -> float:
+        return min(self.limit, self.remaining + self.refill_per_s * (now - self.updated))
+
+    def seconds_until(self, amount: float, now: float) -> float:
+        amount = min(amount, self.limit)
+        shortfall = amount - self.available(now)
+        if shortfall <= 0:
+            return 0.0
+        return shortfall / self.refill_per_s if self.refill_per_s > 0 else LIMIT_WINDOW_S
+
+    def consume(self, amount: float, now: float) -> None:
+        self.remaining = self.available(now) - amount
+        self.updated = now
+
+
+def _bucket_from_headers(headers, dimension: str, now: float) -> Optional[_Bucket]:
+    try:
+        limit = float(headers.get(f"x-ratelimit-limit-{dimension}"))
+        remaining = float(headers.get(f"x-ratelimit-remaining-{dimension}"))
+    except (TypeError, ValueError):
+        return None
+    reset_s = parse_reset(headers.get(f"x-ratelimit-reset-{dimension}"))
+    if reset_s and remaining < limit:
+        refill = (limit - remaining) / reset_s
+    else:
+        refill = limit / LIMIT_WINDOW_S
+    return _Bucket(limit=limit, remaining=remaining, refill_per_s=refill, updated=now)
+
+
+class _KeyBudget:
+    def __init__(self):
+        self.requests: Optional[_Bucket] = None
+        self.tokens: Optional[_Bucket] = None
+        self.blocked_until = 0.0
+        self.rate_limited = 0
+        self.observed = 0
+
+
+# =============================================================================
+# Limiter
+# =============================================================================
+
+class RateLimiter:
+    """Per-key request / token buckets learned from response headers. Thread-safe."""
+
+    def __init__(self):
+        self._keys: Dict[str, _KeyBudget] = {}
+        self._lock = threading.Lock()
+        self._stats = {"paced": 0, "paced_ms_total": 0.0, "rejected": 0, "passed_through": 0}
+
+    def _budget(self, api_key: Optional[str], create: bool = False) -> Optional[_KeyBudget]:
+        key = key_id(api_key)
+        budget = self._keys.get(key)
+        if budget is None and create:
+            if len(self._keys) >= MAX_TRACKED_KEYS:
+                self._keys.pop(next(iter(self._keys)))
+            budget = self._keys[key] = _KeyBudget()
+        return budget
+
+    def observe(self, api_key: Optional[str], headers, status_code: int) -> None:
+        """Update a key's buckets from one OpenAI response."""
+        now = time.monotonic()
+        requests = _bucket_from_headers(headers, "requests", now)
+        tokens = _bucket_from_headers(headers, "tokens", now)
+        if requests is None and tokens is None and status_code != 429:
+            return
+
+        with self._lock:
+            budget = self._budget(api_key, create=True)
+            budget.observed += 1
+            if requests is not None:
+                budget.requests = requests
+            if tokens is not None:
+                budget.tokens = tokens
+            if status_code == 429:
+                budget.rate_limited += 1
+                block_s = self._retry_after(headers, budget, now)
+                budget.blocked_until = max(budget.blocked_until, now + block_s)
+                logger.warning(f"[RateLimit] 429 for key {key_id(api_key)}, pausing {block_s:.2f}s")
+
+    @staticmethod
+    def _retry_after(headers, budget: _KeyBudget, now: float) -> float:
+        retry_ms = headers.get("retry-after-ms")
+        if retry_ms:
+            try:
+                return float(retry_ms) / 1000
+            except ValueError:
+                pass
+        retry_after = parse_reset(headers.get("retry-after"))
+        if retry_after:
+            return retry_after
+        # Whichever exhausted bucket refills first
+        waits = [
+            bucket.seconds_until(1, now)
+            for bucket in (budget.requests, budget.tokens)
+            if bucket is not None and bucket.available(now) < 1
+        ]
+        return max(waits) if waits else RATE_LIMIT_DEFAULT_BLOCK_S
+
+    def reserve(self, api_key: Optional[str], tokens: float, reserve_fraction: float = 0.0) -> float:
+        """Seconds to wait before a request fits the learned budget.
+
+        Returns 0.0 (and books the request against the buckets) when it fits
+        now, keeping `reserve_fraction` of each limit free for higher classes.
+        Keys never seen (or pacing disabled) always fit.
+        """
+        if not RATE_LIMIT_PACING:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            budget = self._budget(api_key)
+            if budget is None:
+                return 0.0
+            if budget.blocked_until > now:
+                return budget.blocked_until - now
+
+            delay = 0.0
+            if budget.requests is not None:
+                need = 1 + reserve_fraction * budget.requests.limit
+                delay = max(delay, budget.requests.seconds_until(need, now))
+            if budget.tokens is not None:
+                need = tokens + reserve_fraction * budget.tokens.limit
+                delay = max(delay, budget.tokens.seconds_until(need, now))
+            if delay > 0:
+                return delay
+
+            if budget.requests is not None:
+                budget.requests.consume(1, now)
+            if budget.tokens is not None:
+                budget.tokens.consume(tokens, now)
+            return 0.0
+
+    def retry_delay(self, api_key: Optional[str]) -> Optional[float]:
+        """After a 429: seconds until a retry makes sense, if short enough to wait."""
+        with self._lock:
+            budget = self._budget(api_key)
+            if budget is None:
+                return None
+            delay = max(budget.blocked_until - time.monotonic(), 0.0)
+        return delay if delay <= RATE_LIMIT_RETRY_MAX_S else None
+
+    def record(self, outcome: str, waited_ms: float = 0.0) -> None:
+        """Pacing outcome from the scheduler: paced / rejected / passed_through."""
+        with self._lock:
+            self._stats[outcome] += 1
+            self._stats["paced_ms_total"] += waited_ms
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+
+        def _bucket(bucket: Optional[_Bucket]) -> Optional[dict]:
+            if bucket is None:
+                return None
+            return {
+                "limit": bucket.limit,
+                "available": round(bucket.available(now), 1),
+                "refill_per_s": round(bucket.refill_per_s, 3),
+            }
+
+        with self._lock:
+            keys = {
+                key: {
+                    "requests": _bucket(budget.requests),
+                    "tokens": _bucket(budget.tokens),
+                    "blocked_for_s": round(max(budget.blocked_until - now, 0.0), 2),
+                    "rate_limited": budget.rate_limited,
+                    "observed": budget.observed,
+                }
+                for key, budget in self._keys.items()
+            }
+            stats = dict(self._stats)
+        stats["paced_ms_total"] = round(stats["paced_ms_total"], 1)
+        stats["enabled"] = RATE_LIMIT_PACING
+        stats["keys"] = keys
+        return stats
+
+
+# App-wide limiter
+rate_limiter = RateLimiter()
+
+
+def get_rate_limit_stats() -> dict:
+    """Learned per-key budgets and pacing counters for /api/metrics."""
+    return rate_limiter.stats()
@@ -0,0 +1,327 @@
+"""
+Scenario Detector Module - 通話場景自動偵測
+
+Reference:
+- src/backend/glossary.py (domain indexes, get_glossary_hint)
+- src/backend/prompt_registry.py (per-scenario prompt prefixes)
+
+Most users leave the scenario at 'general', so every segment is matched
+against all domains and the prompt carries the catch-all context line.
+A call rarely changes domain, though: after a few segments it is clearly
+a bank (or NHS, or housing...) call.
+
+Per session, each segment to translate updates a small classifier:
+
+- a multinomial naive Bayes over words, trained at load time from the
+  glossary file itself (each domain's terms, notes, phrases and
+  description; the "lightweight local model")
+- glossary term hits, found in one Aho-Corasick pass over all domains'
+  terms; a term defined by k domains adds TERM_HIT_WEIGHT / k to each
+
+Evidence decays per segment (SCENARIO_EVIDENCE_DECAY), so a call that
+moves on can switch. Once the top domain's posterior reaches
+SCENARIO_DETECT_CONFIDENCE (after SCENARIO_DETECT_MIN_SEGMENTS segments
+with evidence), translations of that session use the detected scenario's
+glossary index and prompt prefix; below SCENARIO_RELEASE_CONFIDENCE they
+fall back to 'general'. Clients see the scenario and confidence
+(X-Detected-Scenario / X-Scenario-Confidence on every streamed
+translation; on /ws/session a "scenario" message whenever the detected
+scenario changes).
+"""
+
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Hashable, Mapping, Optional, Tuple
+
+# Handle both module and direct execution imports
+try:
+    from .glossary import GENERAL_SCENARIO, GlossaryVersion, glossary_store
+    from .glossary_matcher import GlossaryMatcher
+    from .glossary_variants import with_inflections
+except ImportError:
+    from glossary import GENERAL_SCENARIO, GlossaryVersion, glossary_store
+    from glossary_matcher import GlossaryMatcher
+    from glossary_variants import with_inflections
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# Constants (可用環境變數覆寫)
+# =============================================================================
+
+SCENARIO_DETECTION = os.getenv("SCENARIO_DETECTION", "true").lower() == "true"
+SCENARIO_DETECT_CONFIDENCE = float(os.getenv("SCENARIO_DETECT_CONFIDENCE", "0.8"))
+SCENARIO_RELEASE_CONFIDENCE = float(os.getenv("SCENARIO_RELEASE_CONFIDENCE", "0.55"))
+SCENARIO_DETECT_MIN_SEGMENTS = int(os.getenv("SCENARIO_DETECT_MIN_SEGMENTS", "2"))
+SCENARIO_EVIDENCE_DECAY = float(os.getenv("SCENARIO_EVIDENCE_DECAY", "0.85"))
+SCENARIO_SESSION_TTL = float(os.getenv("SCENARIO_SESSION_TTL", "1800"))  # 30 分鐘無活動即丟棄
+SCENARIO_MAX_SESSIONS = int(os.getenv("SCENARIO_MAX_SESSIONS", "10000"))
+
+# Log-evidence of one glossary term hit (naive Bayes words add ~0.5-2 each)
+TERM_HIT_WEIGHT = 2.0
+# Naive Bayes Laplace smoothing
+_ALPHA = 0.5
+
+_WORD_RE = re.compile(r"[a-z]+")
+_STOP_WORDS = frozenset("""
+a an the and or but if of to in on at by for with from as is are was were be been being am
+i you he she it we they me him her us them my your his its our their this that these those
+do does did have has had can could will would should shall may might must not no yes
+what which who whom when where why how all any some there here so than too very just
+please thank thanks hello hi okay ok im ive id ill youre dont cant
+""".split())
+
+
+def _words(text: str):
+    return [w for w in _WORD_RE.findall(text.lower()) if len(w) > 1 and w not in _STOP_WORDS]
+
+
+# =============================================================================
+# Domain Model (compiled per glossary version)
+# =============================================================================
+
+@dataclass(frozen=True)
+class DomainModel:
+    """Naive Bayes word log-likelihoods + a term matcher over all domains."""
+    domains: Tuple[str, ...]
+    # word → per-domain log P(word | domain), aligned with `domains`
+    log_likelihood: Mapping[str, Tuple[float, ...]]
+    # payload: domains defining the term
+    terms: GlossaryMatcher
+
+    def segment_evidence(self, text: str) -> Optional[Tuple[float, ...]]:
+        """Per-domain log-evidence of one segment, None when it has none."""
+        evidence = [0.0] * len(self.domains)
+        found = False
+        for word in _words(text):
+            scores = self.log_likelihood.get(word)
+            if scores is None:
+                continue
+            found = True
+            # Centred: only the differences between domains matter
+            mean = sum(scores) / len(scores)
+            for i, score in enumerate(scores):
+                evidence[i] += score - mean
+        for match in self.terms.find(text):
+            found = True
+            share = TERM_HIT_WEIGHT / len(match.payload)
+            for i in match.payload:
+                evidence[i] += share
+        return tuple(evidence) if found else None
+
+
+def compile_domain_model(glossaries: Mapping) -> DomainModel:
+    """Train the per-domain word model and term matcher from a glossary file."""
+    domains = tuple(k for k in glossaries if isinstance(glossaries[k], dict) and "terms" in glossaries[k])
+    counts = []
+    term_domains: Dict[str, list] = {}
+    for i, domain in enumerate(domains):
+        data = glossaries[domain]
+        words = Counter(_words(data.get("description", "")))
+        for term, info in data.get("terms", {}).items():
+            words.update(_words(term))
+            words.update(_words(info.get("notes", "")))
+            domains_of_term = term_domains.setdefault(term.lower(), [])
+            if i not in domains_of_term:
+                domains_of_term.append(i)
+        for phrase in data.get("phrases", {}):
+            words.update(_words(phrase))
+        counts.append(words)
+
+    vocabulary = set().union(*counts) if counts else set()
+    totals = [sum(c.values()) for c in counts]
+    log_likelihood = {
+        word: tuple(
+            math.log((counts[i][word] + _ALPHA) / (totals[i] + _ALPHA * len(vocabulary)))
+            for i in range(len(domains))
+        )
+        for word in vocabulary
+    }
+    patterns = [(term, tuple(ids)) for term, ids in term_domains.items()]
+    return DomainModel(
+        domains=domains,
+        log_likelihood=log_likelihood,
+        terms=GlossaryMatcher(with_inflections(patterns)),
+    )
+
+
+_MODEL_LOCK = threading.Lock()
+_MODEL: Optional[Tuple[GlossaryVersion, DomainModel]] = None
+
+
+def domain_model(version: Optional[GlossaryVersion] = None) -> DomainModel:
+    """Model for a glossary version (default: current), compiled on first use."""
+    global _MODEL
+    version = version or glossary_store.current
+    with _MODEL_LOCK:
+        if _MODEL is None or _MODEL[0] is not version:
+            _MODEL = (version, compile_domain_model(version.glossaries))
+        return _MODEL[1]
+
+
+# =============================================================================
+# Per-session Detector
+# =============================================================================
+
+@dataclass(frozen=True)
+class ScenarioEstimate:
+    """Detector state after a segment."""
+    scenario: Optional[str]  # detected (confident) scenario, None → keep 'general'
+    top: Optional[str]  # most likely domain, confident or not
+    confidence: float
+    segments: int  # segments that carried evidence
+    probabilities: Mapping[str, float] = field(default_factory=dict, compare=False)
+    changed: bool = False  # `scenario` differs from the previous segment's
+
+    def to_dict(self) -> dict:
+        return {
+            "scenario": self.scenario,
+            "top": self.top,
+            "confidence": round(self.confidence, 3),
+            "segments": self.segments,
+        }
+
+
+class ScenarioDetector:
+    """Incremental domain classifier for one session. Thread-safe."""
+
+    def __init__(self):
+        self._evidence: Dict[str, float] = {}
+        self._segments = 0
+        self._detected: Optional[str] = None
+        self._lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+    def update(self, text: str, model: Optional[DomainModel] = None) -> ScenarioEstimate:
+        """Add one segment's evidence and return the new estimate."""
+        model = model or domain_model()
+        segment = model.segment_evidence(text)
+        with self._lock:
+            self.last_used = time.monotonic()
+            if segment is not None:
+                self._segments += 1
+                for domain in set(self._evidence) | set(model.domains):
+                    self._evidence[domain] = self._evidence.get(domain, 0.0) * SCENARIO_EVIDENCE_DECAY
+                for domain, value in zip(model.domains, segment):
+                    self._evidence[domain] += value
+            return self._estimate(model)
+
+    def _estimate(self, model: DomainModel) -> ScenarioEstimate:
+        evidence = {d: self._evidence.get(d, 0.0) for d in model.domains}
+        if not evidence or not self._segments:
+            return ScenarioEstimate(self._detected, None, 0.0, self._segments)
+        peak = max(evidence.values())
+        weights = {d: math.exp(v - peak) for d, v in evidence.items()}
+        total = sum(weights.values())
+        probabilities = {d: w / total for d, w in weights.items()}
+        top = max(probabilities, key=probabilities.get)
+        confidence = probabilities[top]
+
+        previous = self._detected
+        if self._segments >= SCENARIO_DETECT_MIN_SEGMENTS and confidence >= SCENARIO_DETECT_CONFIDENCE:
+            self._detected = top
+        elif self._detected is not None and probabilities.get(self._detected, 0.0) < SCENARIO_RELEASE_CONFIDENCE:
+            self._detected = None
+        changed = self._detected != previous
+        if changed:
+            _record_change(previous, self._detected, self._segments)
+        return ScenarioEstimate(self._detected, top, confidence, self._segments, probabilities, changed)
+
+
+# =============================================================================
+# Sessions
+# =============================================================================
+
+_STATS = {
+    "segments": 0,
+    "detections": {},
+    "switches": 0,
+    "releases": 0,
+    "segments_to_detect_sum": 0,
+    "narrowed_segments": 0,
+}
+
+
+def _record_change(previous: Optional[str], detected: Optional[str], segments: int) -> None:
+    if detected is None:
+        _STATS["releases"] += 1
+        logger.info(f"[Scenario] Released {previous} (confidence dropped)")
+        return
+    if previous is None:
+        _STATS["detections"][detected] = _STATS["detections"].get(detected, 0) + 1
+        _STATS["segments_to_detect_sum"] += segments
+    else:
+        _STATS["switches"] += 1
+    logger.info(f"[Scenario] Detected {detected} after {segments} segments (was {previous})")
+
+
+class ScenarioSessions:
+    """Detectors keyed by session, LRU-bounded, idle ones expire."""
+
+    def __init__(self, max_sessions: int = SCENARIO_MAX_SESSIONS, ttl_seconds: float = SCENARIO_SESSION_TTL):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._detectors: "OrderedDict[Hashable, ScenarioDetector]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> ScenarioDetector:
+        now = time.monotonic()
+        with self._lock:
+            detector = self._detectors.get(key)
+            if detector is not None and now - detector.last_used > self.ttl_seconds:
+                detector = None
+            if detector is None:
+                detector = self._detectors[key] = ScenarioDetector()
+            self._detectors.move_to_end(key)
+            while len(self._detectors) > self.max_sessions:
+                self._detectors.popitem(last=False)
+            return detector
+
+    def remove(self, key: Hashable) -> None:
+        with self._lock:
+            self._detectors.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._detectors.clear()
+
+    def __len__(self) -> int:
+        return len(self._detectors)
+
+
+# Module-level singleton
+scenario_sessions = ScenarioSessions()
+
+
+def detect_scenario(session_key: Hashable, text: str, requested: Optional[str]) -> Optional[ScenarioEstimate]:
+    """Update the session's detector with `text` when the client left the scenario open.
+
+    Returns None when detection does not apply (disabled, or the client
+    chose a specific scenario); otherwise the estimate, whose `scenario`
+    (if set) should replace 'general' for this segment.
+    """
+    if not SCENARIO_DETECTION or requested not in (None, "", GENERAL_SCENARIO):
+        return None
+    estimate = scenario_sessions.get(session_key).update(text)
+    _STATS["segments"] += 1
+    if estimate.scenario is not None:
+        _STATS["narrowed_segments"] += 1
+    return estimate
+
+
+def get_scenario_detection_stats() -> dict:
+    """Detection counters for /api/metrics."""
+    stats = dict(_STATS)
+    stats["detections"] = dict(_STATS["detections"])
+    detected = sum(stats["detections"].values())
+    total = stats.pop("segments_to_detect_sum")
+    stats["avg_segments_to_detect"] = round(total / detected, 1) if detected else None
+    stats["enabled"] = SCENARIO_DETECTION
+    stats["sessions"] = len(scenario_sessions)
+    return stats
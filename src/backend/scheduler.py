@@ -0,0 +1,448 @@
+"""
+Upstream Scheduler Module - 上游請求優先級排程
+
+Reference:
+- src/backend/upstream.py (共用上游連線池)
+
+Translations, suggestions, scripts, controller calls and SSOT summaries used
+to hit OpenAI with no coordination, so a burst of suggestions or summaries
+under one key could push live subtitles into 429s. Every upstream call now
+takes a slot from this scheduler first (held for the whole stream).
+
+- Priority classes: translation > controller > suggestion > script > summary.
+  A freed slot always goes to the highest-priority waiter.
+- Per-key lanes: at most SCHEDULER_MAX_PER_KEY concurrent upstream calls per
+  API key, and per-class caps (CLASS_LIMITS) so background work can never
+  fill a key's lane.
+- Bounded queues: a full class queue rejects immediately, and a waiter that
+  is not granted a slot before its class deadline gives up. Both raise
+  UpstreamBusyError, which callers report like any other upstream error.
+- Queue-wait percentiles and grant / reject / timeout counters per class
+  in /api/metrics.
+
+Works from both the event loop (upstream_slot) and threadpool code such as
+the sync script stream and the OpenAI SDK (upstream_slot_sync).
+
+Once a slot is granted the call is paced against the key's learned
+x-ratelimit budget (rate_limiter.py): lower classes keep a reserve free for
+live translation and wait briefly (up to PACING_MAX_WAIT) instead of running
+into a 429, without holding the slot while they wait. Live translation never fails locally: if its wait would be too
+long it goes ahead and lets the upstream decide.
+
+Both waits are also bounded by the request's deadline (deadline.py): a
+call whose budget runs out while queued or paced raises DeadlineExceeded
+with stage "queue" / "rate_limit" instead of waiting out the class limits.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from enum import IntEnum
+from typing import Dict, Optional
+
+try:
+    from .latency import LatencyWindow
+    from .rate_limiter import rate_limiter
+    from .deadline import (
+        STAGE_FIRST_BYTE,
+        STAGE_QUEUE,
+        STAGE_RATE_LIMIT,
+        Deadline,
+        current_deadline,
+    )
+except ImportError:
+    from latency import LatencyWindow
+    from rate_limiter import rate_limiter
+    from deadline import (
+        STAGE_FIRST_BYTE,
+        STAGE_QUEUE,
+        STAGE_RATE_LIMIT,
+        Deadline,
+        current_deadline,
+    )
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Upstream priority classes (lower value = served first)."""
+    TRANSLATION = 0
+    CONTROLLER = 1
+    SUGGESTION = 2
+    SCRIPT = 3
+    SUMMARY = 4
+
+
+# =============================================================================
+# Constants (可用環境變數覆寫)
+# =============================================================================
+
+SCHEDULER_MAX_PER_KEY = int(os.getenv("SCHEDULER_MAX_PER_KEY", "8"))
+SCHEDULER_MAX_QUEUE = int(os.getenv("SCHEDULER_MAX_QUEUE", "32"))
+
+# Concurrent upstream calls per key and class
+CLASS_LIMITS = {
+    Priority.TRANSLATION: SCHEDULER_MAX_PER_KEY,
+    Priority.CONTROLLER: 4,
+    Priority.SUGGESTION: 2,
+    Priority.SCRIPT: 2,
+    Priority.SUMMARY: 1,
+}
+
+# Longest a request may wait for a slot (seconds)
+CLASS_DEADLINES = {
+    Priority.TRANSLATION: 10.0,
+    Priority.CONTROLLER: 10.0,
+    Priority.SUGGESTION: 5.0,
+    Priority.SCRIPT: 15.0,
+    Priority.SUMMARY: 30.0,
+}
+
+
+# Share of a key's request / token limit each class must leave unused
+RATE_RESERVE = {
+    Priority.TRANSLATION: 0.0,
+    Priority.CONTROLLER: 0.05,
+    Priority.SUGGESTION: 0.1,
+    Priority.SCRIPT: 0.15,
+    Priority.SUMMARY: 0.2,
+}
+
+# Rough tokens per call (prompt + output) booked against the token bucket
+CLASS_TOKEN_ESTIMATES = {
+    Priority.TRANSLATION: 800,
+    Priority.CONTROLLER: 2500,
+    Priority.SUGGESTION: 900,
+    Priority.SCRIPT: 1500,
+    Priority.SUMMARY: 4000,
+}
+
+# Longest a call waits for rate-limit budget (seconds)
+PACING_MAX_WAIT = {
+    Priority.TRANSLATION: 1.0,
+    Priority.CONTROLLER: 3.0,
+    Priority.SUGGESTION: 3.0,
+    Priority.SCRIPT: 10.0,
+    Priority.SUMMARY: 20.0,
+}
+
+
+class UpstreamBusyError(Exception):
+    """No upstream slot: the class queue is full or the wait deadline passed."""
+
+
+# =============================================================================
+# Lanes / Waiters
+# =============================================================================
+
+class _Waiter:
+    """One queued request; woken from whichever thread releases a slot."""
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.enqueued = time.perf_counter()
+        self.granted = False
+        self._loop = loop
+        self._future = loop.create_future() if loop is not None else None
+        self._event = threading.Event() if loop is None else None
+
+    def wake(self) -> None:
+        self.granted = True
+        if self._event is not None:
+            self._event.set()
+        else:
+            self._loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self) -> None:
+        if not self._future.done():
+            self._future.set_result(True)
+
+
+class _Lane:
+    """Active slots + per-class FIFO queues for one API key."""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.active = 0
+        self.active_by_class: Dict[Priority, int] = {p: 0 for p in Priority}
+        self.queues: Dict[Priority, deque] = {p: deque() for p in Priority}
+
+    def can_grant(self, priority: Priority) -> bool:
+        return self.active < SCHEDULER_MAX_PER_KEY and self.active_by_class[priority] < CLASS_LIMITS[priority]
+
+    def idle(self) -> bool:
+        return self.active == 0 and not any(self.queues.values())
+
+
+def _lane_key(api_key: Optional[str]) -> str:
+    if not api_key:
+        return "env"  # OPENAI_API_KEY from the environment (scripts)
+    return hashlib.sha1(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+# =============================================================================
+# Scheduler
+# =============================================================================
+
+class UpstreamScheduler:
+    """Per-key priority lanes for upstream calls. Thread-safe."""
+
+    def __init__(self):
+        self._lanes: Dict[str, _Lane] = {}
+        self._lock = threading.Lock()
+        self._waits = {p: LatencyWindow() for p in Priority}
+        self._stats = {
+            p: {"granted": 0, "queued": 0, "rejected": 0, "timed_out": 0} for p in Priority
+        }
+
+    def _dispatch(self, lane: _Lane) -> None:
+        """Hand free slots to waiters, highest priority first (lock held)."""
+        for priority in Priority:
+            queue = lane.queues[priority]
+            while queue and lane.can_grant(priority):
+                waiter = queue.popleft()
+                self._grant(lane, priority, waiter)
+
+    def _grant(self, lane: _Lane, priority: Priority, waiter: _Waiter) -> None:
+        lane.active += 1
+        lane.active_by_class[priority] += 1
+        self._stats[priority]["granted"] += 1
+        self._waits[priority].record((time.perf_counter() - waiter.enqueued) * 1000)
+        waiter.wake()
+
+    def _enqueue(self, api_key: Optional[str], priority: Priority, waiter: _Waiter) -> _Lane:
+        with self._lock:
+            key = _lane_key(api_key)
+            lane = self._lanes.get(key)
+            if lane is None:
+                lane = self._lanes[key] = _Lane(key)
+            queue = lane.queues[priority]
+            if len(queue) >= SCHEDULER_MAX_QUEUE:
+                self._stats[priority]["rejected"] += 1
+                raise UpstreamBusyError(f"Upstream queue full ({priority.name.lower()})")
+            queue.append(waiter)
+            self._dispatch(lane)
+            if not waiter.granted:
+                self._stats[priority]["queued"] += 1
+            return lane
+
+    def _give_up(self, lane: _Lane, priority: Priority, waiter: _Waiter) -> bool:
+        """Dequeue a waiter that stopped waiting. True if it was granted meanwhile."""
+        with self._lock:
+            if waiter.granted:
+                return True
+            lane.queues[priority].remove(waiter)
+            self._drop_if_idle(lane)
+            return False
+
+    def _drop_if_idle(self, lane: _Lane) -> None:
+        if lane.idle() and self._lanes.get(lane.key) is lane:
+            del self._lanes[lane.key]
+
+    def release(self, api_key: Optional[str], priority: Priority) -> None:
+        with self._lock:
+            lane = self._lanes[_lane_key(api_key)]
+            lane.active -= 1
+            lane.active_by_class[priority] -= 1
+            self._dispatch(lane)
+            self._drop_if_idle(lane)
+
+    def _timed_out(self, priority: Priority, deadline_s: float) -> UpstreamBusyError:
+        with self._lock:
+            self._stats[priority]["timed_out"] += 1
+        logger.warning(f"[Scheduler] {priority.name.lower()} waited {deadline_s:.1f}s for an upstream slot")
+        return UpstreamBusyError(f"Upstream busy ({priority.name.lower()} waited {deadline_s:.0f}s)")
+
+    async def acquire(self, api_key: Optional[str], priority: Priority, deadline_s: Optional[float] = None) -> None:
+        deadline_s = CLASS_DEADLINES[priority] if deadline_s is None else deadline_s
+        waiter = _Waiter(asyncio.get_running_loop())
+        lane = self._enqueue(api_key, priority, waiter)
+        if waiter.granted:
+            return
+        try:
+            await asyncio.wait_for(waiter._future, timeout=deadline_s)
+        except asyncio.TimeoutError:
+            if self._give_up(lane, priority, waiter):
+                return  # Granted in the same instant the deadline passed
+            raise self._timed_out(priority, deadline_s)
+        except asyncio.CancelledError:
+            if self._give_up(lane, priority, waiter):
+                self.release(api_key, priority)
+            raise
+
+    def acquire_sync(self, api_key: Optional[str], priority: Priority, deadline_s: Optional[float] = None) -> None:
+        deadline_s = CLASS_DEADLINES[priority] if deadline_s is None else deadline_s
+        waiter = _Waiter()
+        lane = self._enqueue(api_key, priority, waiter)
+        if waiter._event.wait(deadline_s) or self._give_up(lane, priority, waiter):
+            return
+        raise self._timed_out(priority, deadline_s)
+
+    def stats(self) -> dict:
+        with self._lock:
+            classes = {p.name.lower(): dict(self._stats[p]) for p in Priority}
+            active = {p.name.lower(): 0 for p in Priority}
+            waiting = {p.name.lower(): 0 for p in Priority}
+            for lane in self._lanes.values():
+                for p in Priority:
+                    active[p.name.lower()] += lane.active_by_class[p]
+                    waiting[p.name.lower()] += len(lane.queues[p])
+            lanes = len(self._lanes)
+
+        for p in Priority:
+            name = p.name.lower()
+            classes[name]["active"] = active[name]
+            classes[name]["waiting"] = waiting[name]
+            classes[name]["queue_wait_ms"] = self._waits[p].snapshot()
+        return {
+            "lanes": lanes,
+            "max_per_key": SCHEDULER_MAX_PER_KEY,
+            "classes": classes,
+        }
+
+
+# App-wide scheduler
+scheduler = UpstreamScheduler()
+
+
+# =============================================================================
+# Rate-limit Pacing
+# =============================================================================
+
+def _pacing_delay(
+    api_key: Optional[str],
+    priority: Priority,
+    waited: float,
+    request_deadline: Optional[Deadline] = None,
+) -> float:
+    """Next sleep before the call fits the key's budget (0 = go now).
+
+    Raises:
+        UpstreamBusyError: budget still short after PACING_MAX_WAIT (not translation)
+        DeadlineExceeded: the wait would outlast the request's deadline (not translation)
+    """
+    delay = rate_limiter.reserve(api_key, CLASS_TOKEN_ESTIMATES[priority], RATE_RESERVE[priority])
+    if delay <= 0:
+        if waited:
+            rate_limiter.record("paced", waited * 1000)
+        return 0.0
+    past_deadline = request_deadline is not None and delay >= request_deadline.remaining()
+    if waited + delay > PACING_MAX_WAIT[priority] or past_deadline:
+        if priority == Priority.TRANSLATION:
+            rate_limiter.record("passed_through", waited * 1000)
+            return 0.0
+        rate_limiter.record("rejected", waited * 1000)
+        if past_deadline:
+            raise request_deadline.exceeded(STAGE_RATE_LIMIT)
+        raise UpstreamBusyError(f"Rate limit budget exhausted ({priority.name.lower()})")
+    return delay
+
+
+# The wait timer may fire a hair before the deadline itself
+_DEADLINE_SLACK_S = 0.01
+
+
+def _queue_wait(priority: Priority, deadline_s: Optional[float], request_deadline: Optional[Deadline]):
+    """(slot wait, bounded by the request deadline?) for one acquire."""
+    wait_s = CLASS_DEADLINES[priority] if deadline_s is None else deadline_s
+    if request_deadline is not None:
+        request_deadline.mark(STAGE_QUEUE)
+        if request_deadline.remaining() < wait_s:
+            return request_deadline.remaining(), True
+    return wait_s, False
+
+
+def _slot_wait_failed(
+    error: UpstreamBusyError,
+    bounded: bool,
+    request_deadline: Optional[Deadline],
+) -> Exception:
+    """A slot wait cut short by the request's deadline is reported as such."""
+    if bounded and request_deadline.remaining() <= _DEADLINE_SLACK_S:
+        return request_deadline.exceeded(STAGE_QUEUE)
+    return error
+
+
+def _budget_delay(
+    api_key: Optional[str],
+    priority: Priority,
+    waited: float,
+    request_deadline: Optional[Deadline],
+) -> float:
+    """Pacing step for a call holding a slot; the slot is released on error."""
+    try:
+        if request_deadline is not None:
+            request_deadline.mark(STAGE_RATE_LIMIT)
+        return _pacing_delay(api_key, priority, waited, request_deadline)
+    except BaseException:
+        scheduler.release(api_key, priority)
+        raise
+
+
+@asynccontextmanager
+async def upstream_slot(api_key: Optional[str], priority: Priority, deadline_s: Optional[float] = None):
+    """Hold an upstream slot for the duration of the block (event loop code).
+
+    A call that has to wait for rate-limit budget (including the pause after
+    a 429) gives its slot back while it sleeps and queues again afterwards,
+    so calls that could go now are not held behind it.
+
+    Raises:
+        UpstreamBusyError: queue full, no slot before the deadline, or no
+            rate-limit budget within PACING_MAX_WAIT
+        DeadlineExceeded: the request's deadline ran out while queued / paced
+    """
+    request_deadline = current_deadline()
+    waited = 0.0
+    while True:
+        wait_s, bounded = _queue_wait(priority, deadline_s, request_deadline)
+        try:
+            await scheduler.acquire(api_key, priority, wait_s)
+        except UpstreamBusyError as e:
+            raise _slot_wait_failed(e, bounded, request_deadline)
+        delay = _budget_delay(api_key, priority, waited, request_deadline)
+        if delay <= 0:
+            break
+        scheduler.release(api_key, priority)
+        await asyncio.sleep(delay)
+        waited += delay
+    try:
+        if request_deadline is not None:
+            request_deadline.mark(STAGE_FIRST_BYTE)
+        yield
+    finally:
+        scheduler.release(api_key, priority)
+
+
+@contextmanager
+def upstream_slot_sync(api_key: Optional[str], priority: Priority, deadline_s: Optional[float] = None):
+    """Thread counterpart of upstream_slot (threadpool / OpenAI SDK callers)."""
+    request_deadline = current_deadline()
+    waited = 0.0
+    while True:
+        wait_s, bounded = _queue_wait(priority, deadline_s, request_deadline)
+        try:
+            scheduler.acquire_sync(api_key, priority, wait_s)
+        except UpstreamBusyError as e:
+            raise _slot_wait_failed(e, bounded, request_deadline)
+        delay = _budget_delay(api_key, priority, waited, request_deadline)
+        if delay <= 0:
+            break
+        scheduler.release(api_key, priority)
+        time.sleep(delay)
+        waited += delay
+    try:
+        if request_deadline is not None:
+            request_deadline.mark(STAGE_FIRST_BYTE)
+        yield
+    finally:
+        scheduler.release(api_key, priority)
+
+
+def get_scheduler_stats() -> dict:
+    """Per-class queue waits and slot counters for /api/metrics."""
+    return scheduler.stats()
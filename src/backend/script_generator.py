@@ -6,21 +6,55 @@ Reference:
 - CLAUDE.md § 模型硬性規則 (gpt-5-mini for text controller)
 
 Uses gpt-5-mini to generate English scripts from Chinese input.
+
+Glossary terms: the Chinese input is scanned once with the glossary's
+reverse (zh / alt → English) index and only the English terms it
+mentions are put in the prompt ("銀行分類代碼 = sort code"), so the model
+does not have to reason its way to UK terminology. Latency and reasoning
+tokens are kept separately for prompts with and without terms
+(/api/metrics "script"); SCRIPT_GLOSSARY_TERMS=false turns the lookup off
+to compare.
 """
 
 import os
 import json
 import logging
+import time
 from typing import Generator, Optional
 
 from openai import OpenAI
 
+# Handle both module and direct execution imports
+try:
+    from .upstream import get_sync_client
+    from .scheduler import Priority, upstream_slot_sync
+    from .circuit_breaker import circuit
+    from .deadline import upstream_timeout
+    from .glossary import get_english_term_hint
+    from .latency import LatencyWindow
+    from .prompt_budget import SCRIPT_PROMPT_BUDGET, Section, assemble
+except ImportError:
+    from upstream import get_sync_client
+    from scheduler import Priority, upstream_slot_sync
+    from circuit_breaker import circuit
+    from deadline import upstream_timeout
+    from glossary import get_english_term_hint
+    from latency import LatencyWindow
+    from prompt_budget import SCRIPT_PROMPT_BUDGET, Section, assemble
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
 # Model configuration (CLAUDE.md § 模型硬性規則)
 SCRIPT_MODEL = "gpt-5-mini"
 
+# Request budget without an X-Request-Deadline-Ms header (deadline.py);
+# each SDK call's timeout is whatever is left of it
+SCRIPT_TIMEOUT = 60.0
+
+# Put the glossary's English terms for the Chinese input into script prompts
+SCRIPT_GLOSSARY_TERMS = os.getenv("SCRIPT_GLOSSARY_TERMS", "true").lower() == "true"
+
 # Scenario-specific guidance
 SCENARIO_GUIDANCE = {
     "bank": {
@@ -116,6 +150,13 @@ DEFAULT_PROMPTS = {
 }
 
 
+def _get_client(api_key: Optional[str] = None) -> OpenAI:
+    """OpenAI SDK client that shares the app-wide pooled HTTP connection."""
+    if api_key:
+        return OpenAI(api_key=api_key, http_client=get_sync_client())
+    return OpenAI(http_client=get_sync_client())
+
+
 def get_default_prompt(scenario: str) -> str:
     """Get the primary default prompt for a scenario."""
     return DEFAULT_PROMPTS.get(scenario, DEFAULT_PROMPTS["general"])["primary"]
@@ -133,11 +174,44 @@ TONE_INSTRUCTIONS = {
 }
 
 
+# =============================================================================
+# Glossary Terms & Metrics
+# =============================================================================
+
+# "terms": prompt had glossary terms, "plain": it did not
+_SCRIPT_LATENCY = {"terms": LatencyWindow(), "plain": LatencyWindow()}
+_SCRIPT_FIRST_TOKEN = {"terms": LatencyWindow(), "plain": LatencyWindow()}
+_SCRIPT_REASONING_TOKENS = {"terms": LatencyWindow(), "plain": LatencyWindow()}
+
+
+def script_term_hint(chinese_input: str, scenario: Optional[str] = None) -> str:
+    """Glossary terms for the Chinese input ("" when none or disabled)."""
+    if not SCRIPT_GLOSSARY_TERMS:
+        return ""
+    return get_english_term_hint(chinese_input, scenario)
+
+
+def _variant(term_hint: str) -> str:
+    return "terms" if term_hint else "plain"
+
+
+def get_script_stats() -> dict:
+    """Script latency / reasoning tokens with vs without glossary terms (for /api/metrics)."""
+    return {
+        "glossary_terms": SCRIPT_GLOSSARY_TERMS,
+        "latency_ms": {k: w.snapshot() for k, w in _SCRIPT_LATENCY.items()},
+        "stream_first_token_ms": {k: w.snapshot() for k, w in _SCRIPT_FIRST_TOKEN.items()},
+        "reasoning_tokens": {k: w.snapshot() for k, w in _SCRIPT_REASONING_TOKENS.items()},
+    }
+
+
 def build_script_prompt(
     chinese_input: str,
     scenario: Optional[str] = None,
     conversation_history: list = None,
-    tone: str = "polite"
+    tone: str = "polite",
+    term_hint: Optional[str] = None,
+    budget: int = SCRIPT_PROMPT_BUDGET,
 ) -> str:
     """
     Build the prompt for script generation.
@@ -147,6 +221,9 @@ def build_script_prompt(
         scenario: Optional scenario type (bank, nhs, utilities, insurance, general)
         conversation_history: Optional list of recent conversation turns
         tone: Desired tone (polite, formal, casual, assertive)
+        term_hint: Glossary terms line (default: looked up from chinese_input)
+        budget: Token budget (prompt_budget.py); over it the glossary terms
+            are trimmed first, then the oldest turns
 
     Returns:
         Formatted prompt string
@@ -156,21 +233,23 @@ def build_script_prompt(
     tone_instruction = TONE_INSTRUCTIONS.get(tone, TONE_INSTRUCTIONS["polite"])
 
     # Build conversation context
-    context_str = ""
-    if conversation_history:
-        context_str = "\n\nRecent conversation:\n"
-        for turn in conversation_history[-5:]:  # Max 5 turns
-            role = "Them" if turn.get("role") == "them" else "Me"
-            context_str += f"- {role}: {turn.get('text', '')}\n"
+    history_lines = []
+    for turn in (conversation_history or [])[-5:]:  # Max 5 turns
+        role = "Them" if turn.get("role") == "them" else "Me"
+        history_lines.append(f"- {role}: {turn.get('text', '')}")
+
+    if term_hint is None:
+        term_hint = script_term_hint(chinese_input, scenario)
 
-    prompt = f"""You are helping a non-native English speaker prepare what to say in a phone call.
+    header = f"""You are helping a non-native English speaker prepare what to say in a phone call.
 
 TASK: Convert the user's Chinese input into natural, speakable English.
 
 CONTEXT:
 - Scenario: {scenario_info['context']}
-- Tone: {tone_instruction}
-{context_str}
+- Tone: {tone_instruction}"""
+
+    request = f"""
 
 USER WANTS TO SAY (in Chinese):
 {chinese_input}
@@ -193,7 +272,16 @@ OUTPUT FORMAT (JSON):
 
 Generate the JSON response:"""
 
-    return prompt
+    return assemble("script", [
+        Section("header", header),
+        Section("terms", term_hint or "", priority=1, prefix="\n- ", suffix=" (use these UK terms)"),
+        Section("newline", "\n"),
+        Section(
+            "history", "\n".join(history_lines), priority=2, keep="lines",
+            prefix="\n\nRecent conversation:\n", suffix="\n",
+        ),
+        Section("request", request),
+    ], budget).text
 
 
 def generate_script(
@@ -216,42 +304,53 @@ def generate_script(
     Returns:
         Dict with english_script, alternatives, pronunciation_tips
     """
-    client = OpenAI(api_key=api_key) if api_key else OpenAI()
+    client = _get_client(api_key)
 
+    term_hint = script_term_hint(chinese_input, scenario)
     prompt = build_script_prompt(
         chinese_input=chinese_input,
         scenario=scenario,
         conversation_history=conversation_history,
-        tone=tone
+        tone=tone,
+        term_hint=term_hint,
     )
 
     try:
-        response = client.chat.completions.create(
-            model=SCRIPT_MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a helpful assistant that generates natural English scripts for phone conversations. Always respond with valid JSON."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            max_completion_tokens=500,
-            reasoning_effort="low",
-            response_format={"type": "json_object"}
-        )
-
-        result_text = response.choices[0].message.content
-        result = json.loads(result_text)
-
-        # Validate and sanitize response
-        return {
-            "english_script": result.get("english_script", ""),
-            "alternatives": result.get("alternatives", [])[:2],  # Max 2 alternatives
-            "pronunciation_tips": result.get("pronunciation_tips", [])[:5]  # Max 5 tips
-        }
+        with circuit("chat/completions", SCRIPT_MODEL), upstream_slot_sync(api_key, Priority.SCRIPT):
+            started = time.perf_counter()
+            response = client.chat.completions.create(
+                model=SCRIPT_MODEL,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "You are a helpful assistant that generates natural English scripts for phone conversations. Always respond with valid JSON."
+                    },
+                    {
+                        "role": "user",
+                        "content": prompt
+                    }
+                ],
+                max_completion_tokens=500,
+                reasoning_effort="low",
+                response_format={"type": "json_object"},
+                timeout=upstream_timeout(SCRIPT_TIMEOUT),
+            )
+
+            _SCRIPT_LATENCY[_variant(term_hint)].record((time.perf_counter() - started) * 1000)
+            details = getattr(response.usage, "completion_tokens_details", None)
+            reasoning_tokens = getattr(details, "reasoning_tokens", None)
+            if reasoning_tokens is not None:
+                _SCRIPT_REASONING_TOKENS[_variant(term_hint)].record(reasoning_tokens)
+
+            result_text = response.choices[0].message.content
+            result = json.loads(result_text)
+
+            # Validate and sanitize response
+            return {
+                "english_script": result.get("english_script", ""),
+                "alternatives": result.get("alternatives", [])[:2],  # Max 2 alternatives
+                "pronunciation_tips": result.get("pronunciation_tips", [])[:5]  # Max 5 tips
+            }
 
     except json.JSONDecodeError as e:
         logger.error(f"Failed to parse script response: {e}")
@@ -293,7 +392,7 @@ def generate_script_stream(
     Yields:
         SSE-formatted strings
     """
-    client = OpenAI(api_key=api_key) if api_key else OpenAI()
+    client = _get_client(api_key)
 
     # Use default prompt if input is empty
     actual_input = chinese_input.strip() if chinese_input else ""
@@ -302,80 +401,84 @@ def generate_script_stream(
         # Notify frontend that we're using a default prompt
         yield f"data: {json.dumps({'type': 'using_default', 'prompt': actual_input})}\n\n"
 
-    prompt = build_script_prompt(
-        chinese_input=actual_input,
-        scenario=scenario,
-        conversation_history=conversation_history,
-        tone=tone
-    )
+    term_hint = script_term_hint(actual_input, scenario)
+    terms_line = f"\n\n{term_hint}" if term_hint else ""
 
     try:
-        # First, generate the main script with streaming
-        # Note: gpt-5-mini is a reasoning model, max_completion_tokens includes
-        # both reasoning tokens + output tokens, so we need a higher budget
-        stream = client.chat.completions.create(
-            model=SCRIPT_MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a helpful assistant. Generate a natural English script for the user to say in a phone call. Just output the English script directly, no JSON, no explanations."
-                },
-                {
-                    "role": "user",
-                    "content": f"Convert this to natural spoken English ({tone} tone):\n\n{actual_input}"
-                }
-            ],
-            max_completion_tokens=1000,
-            reasoning_effort="low",
-            stream=True
-        )
-
-        full_script = ""
-        for chunk in stream:
-            if chunk.choices[0].delta.content:
-                text = chunk.choices[0].delta.content
-                full_script += text
-                yield f"data: {json.dumps({'type': 'script_delta', 'text': text})}\n\n"
-
-        # Signal main script complete
-        yield f"data: {json.dumps({'type': 'script_done', 'text': full_script})}\n\n"
-
-        # Now generate alternatives (non-streaming for simplicity)
-        # Note: gpt-5-mini reasoning model needs higher token budget
-        alt_response = client.chat.completions.create(
-            model=SCRIPT_MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Generate 2 alternative ways to say the same thing. Output as JSON array: [\"alt1\", \"alt2\"]"
-                },
-                {
-                    "role": "user",
-                    "content": f"Original: {full_script}\n\nGenerate 2 alternatives:"
-                }
-            ],
-            max_completion_tokens=500,
-            reasoning_effort="low",
-            response_format={"type": "json_object"}
-        )
-
-        try:
-            alt_text = alt_response.choices[0].message.content
-            # Handle both array and object formats
-            alt_data = json.loads(alt_text)
-            if isinstance(alt_data, list):
-                alternatives = alt_data[:2]
-            elif isinstance(alt_data, dict):
-                alternatives = alt_data.get("alternatives", [])[:2]
-            else:
+        with circuit("chat/completions", SCRIPT_MODEL), upstream_slot_sync(api_key, Priority.SCRIPT):
+            # First, generate the main script with streaming
+            # Note: gpt-5-mini is a reasoning model, max_completion_tokens includes
+            # both reasoning tokens + output tokens, so we need a higher budget
+            started = time.perf_counter()
+            stream = client.chat.completions.create(
+                model=SCRIPT_MODEL,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "You are a helpful assistant. Generate a natural English script for the user to say in a phone call. Just output the English script directly, no JSON, no explanations."
+                    },
+                    {
+                        "role": "user",
+                        "content": f"Convert this to natural spoken English ({tone} tone):\n\n{actual_input}{terms_line}"
+                    }
+                ],
+                max_completion_tokens=1000,
+                reasoning_effort="low",
+                stream=True,
+                timeout=upstream_timeout(SCRIPT_TIMEOUT),
+            )
+
+            full_script = ""
+            # `with` closes the upstream connection if the consumer stops early
+            with stream:
+                for chunk in stream:
+                    if chunk.choices[0].delta.content:
+                        text = chunk.choices[0].delta.content
+                        if not full_script:
+                            _SCRIPT_FIRST_TOKEN[_variant(term_hint)].record((time.perf_counter() - started) * 1000)
+                        full_script += text
+                        yield f"data: {json.dumps({'type': 'script_delta', 'text': text})}\n\n"
+
+            # Signal main script complete
+            yield f"data: {json.dumps({'type': 'script_done', 'text': full_script})}\n\n"
+
+            # Now generate alternatives (non-streaming for simplicity)
+            # Note: gpt-5-mini reasoning model needs higher token budget
+            alt_response = client.chat.completions.create(
+                model=SCRIPT_MODEL,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "Generate 2 alternative ways to say the same thing. Output as JSON array: [\"alt1\", \"alt2\"]"
+                    },
+                    {
+                        "role": "user",
+                        "content": f"Original: {full_script}\n\nGenerate 2 alternatives:"
+                    }
+                ],
+                max_completion_tokens=500,
+                reasoning_effort="low",
+                response_format={"type": "json_object"},
+                timeout=upstream_timeout(SCRIPT_TIMEOUT),
+            )
+
+            try:
+                alt_text = alt_response.choices[0].message.content
+                # Handle both array and object formats
+                alt_data = json.loads(alt_text)
+                if isinstance(alt_data, list):
+                    alternatives = alt_data[:2]
+                elif isinstance(alt_data, dict):
+                    alternatives = alt_data.get("alternatives", [])[:2]
+                else:
+                    alternatives = []
+            except:
                 alternatives = []
-        except:
-            alternatives = []
 
-        yield f"data: {json.dumps({'type': 'alternatives', 'alternatives': alternatives})}\n\n"
+            yield f"data: {json.dumps({'type': 'alternatives', 'alternatives': alternatives})}\n\n"
 
-        # Final done event
-        yield f"data: {json.dumps({'type': 'done'})}\n\n"
+            # Final done event
+            yield f"data: {json.dumps({'type': 'done'})}\n\n"
 
     except Exception as e:
         logger.error(f"Script stream error: {e}")
@@ -0,0 +1,180 @@
+"""
+Single-Flight Module - 相同請求合併
+
+Reference:
+- src/backend/upstream.py (共用上游連線池)
+
+A flaky mobile connection that retries, or two tabs of the same session,
+can send the same /api/translate/stream or /api/suggest/stream payload twice
+while the first is still streaming. Instead of paying for a second upstream
+call, identical in-flight requests are coalesced:
+
+- The first request (leader) runs the upstream stream in a background task
+  and records every SSE event it produces.
+- Later identical requests (followers) attach to that flight, replay every
+  event produced so far, then receive the rest live.
+- The leader can attach what it decided before streaming (route, scenario,
+  response headers) as the flight's `info`; a request that joins with
+  follow() before doing any work of its own reports the leader's info.
+- The flight is dropped from the registry as soon as it finishes, so a
+  later repeat goes through the normal cache / upstream path.
+- If every subscriber disconnects before the end, the upstream task is
+  cancelled.
+
+Keys always include an API key digest — users never share a flight.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# Key Helpers
+# =============================================================================
+
+def make_flight_key(namespace: str, api_key: str, payload: dict) -> str:
+    """Digest of endpoint + API key + request payload (order-insensitive)."""
+    body = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    digest = hashlib.sha1(f"{api_key}\x1f{body}".encode("utf-8")).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+# =============================================================================
+# Flight Registry
+# =============================================================================
+
+class _Flight:
+    """One in-flight upstream stream and the events it has produced."""
+
+    def __init__(self, info: Optional[Dict[str, Any]] = None):
+        self.events: List[Any] = []
+        self.info: Dict[str, Any] = info or {}
+        self.done = False
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def publish(self, event: Optional[str] = None) -> None:
+        if event is not None:
+            self.events.append(event)
+        # Wake everyone waiting on the current event, then start a fresh one
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def wait(self) -> None:
+        await self._changed.wait()
+
+
+class SingleFlight:
+    """Registry of in-flight streams keyed by request digest.
+
+    Lives on the event loop only (no locking).
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._stats = {
+            "leaders": 0,
+            "followers": 0,
+            "replayed_events": 0,
+            "abandoned": 0,
+        }
+
+    async def _pump(self, key: str, flight: _Flight, source: AsyncIterator[str]) -> None:
+        try:
+            async for event in source:
+                flight.publish(event)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"[SingleFlight] Upstream stream failed: {e}")
+            flight.publish(f"data: {json.dumps({'error': str(e)})}\n\n")
+        finally:
+            flight.done = True
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            flight.publish()
+
+    async def _subscribe(self, key: str, flight: _Flight) -> AsyncIterator[str]:
+        flight.subscribers += 1
+        index = 0
+        try:
+            while True:
+                if index < len(flight.events):
+                    event = flight.events[index]
+                    index += 1
+                    yield event
+                elif flight.done:
+                    return
+                else:
+                    await flight.wait()
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                # Nobody is listening any more → stop paying for the upstream call
+                self._stats["abandoned"] += 1
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+
+    def follow(self, key: str) -> Optional[Tuple[AsyncIterator[str], Dict[str, Any]]]:
+        """Join the in-progress flight for `key` as a follower.
+
+        Returns:
+            (events, leader info), or None when nothing is in flight
+        """
+        flight = self._flights.get(key)
+        if flight is None or flight.done:
+            return None
+        self._stats["followers"] += 1
+        self._stats["replayed_events"] += len(flight.events)
+        logger.info(f"[SingleFlight] Coalesced follower onto {key[:20]}... ({len(flight.events)} events so far)")
+        return self._subscribe(key, flight), flight.info
+
+    def stream(
+        self,
+        key: str,
+        source_factory: Callable[[], AsyncIterator[str]],
+        info: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[str, AsyncIterator[str]]:
+        """Join the flight for `key`, starting it if none is in progress.
+
+        Args:
+            key: make_flight_key() digest
+            source_factory: Builds the leader's SSE event iterator (only
+                called when this request becomes the leader)
+            info: Leader's decisions, returned to later follow() callers
+
+        Returns:
+            (role, events) where role is "leader" or "follower"
+        """
+        joined = self.follow(key)
+        if joined is not None:
+            return "follower", joined[0]
+
+        flight = _Flight(info)
+        self._flights[key] = flight
+        flight.task = asyncio.create_task(self._pump(key, flight, source_factory()))
+        self._stats["leaders"] += 1
+        return "leader", self._subscribe(key, flight)
+
+    def stats(self) -> dict:
+        stats = dict(self._stats)
+        stats["in_flight"] = len(self._flights)
+        requests = stats["leaders"] + stats["followers"]
+        stats["coalesce_rate"] = round(stats["followers"] / requests, 3) if requests else None
+        return stats
+
+
+# App-wide registry shared by the streaming endpoints
+single_flight = SingleFlight()
+
+
+def get_single_flight_stats() -> dict:
+    """Leader / follower counters for /api/metrics."""
+    return single_flight.stats()
@@ -0,0 +1,342 @@
+"""
+Speculative Translation Module - 推測式翻譯
+
+Reference:
+- spec/lessons_learned.md (Test 21 - 方案 A)
+- src/frontend/smart_segmenter.js (interim / final segments)
+
+Web Speech interim results arrive well before SmartSegmenter emits the final
+segment (it waits for a pause). The frontend posts each interim revision with
+a segment_id + revision number; once the interim text has a stable prefix we
+start translating that prefix in the background.
+
+When the final segment arrives:
+- exact:    final text == speculated prefix → emit the finished translation
+- extended: final text starts with the prefix → emit the prefix translation,
+            then translate only the remainder (prefix passed as context)
+- full:     no usable speculation → normal translation
+
+A newer revision that no longer starts with the in-flight prefix (Web Speech
+rewrote an earlier word) cancels the speculation.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+try:
+    from .translation_cache import normalize_source
+except ImportError:
+    from translation_cache import normalize_source
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+SPECULATIVE_ENABLED = os.getenv("SPECULATIVE_TRANSLATION", "true").lower() == "true"
+
+# 少於此字數的前綴不值得推測（翻譯品質差、重用率低）
+SPEC_MIN_WORDS = int(os.getenv("SPECULATIVE_MIN_WORDS", "5"))
+# Web Speech 通常仍會改寫最後幾個字，這些字不算穩定
+SPEC_UNSTABLE_TAIL_WORDS = int(os.getenv("SPECULATIVE_UNSTABLE_TAIL_WORDS", "2"))
+# 穩定前綴至少增長這麼多字才重新推測（避免每個 revision 都打一次 API）
+SPEC_MIN_GROWTH_WORDS = int(os.getenv("SPECULATIVE_MIN_GROWTH_WORDS", "3"))
+# Idle segments (final never arrived) are dropped after this many seconds
+SPEC_SEGMENT_TTL = float(os.getenv("SPECULATIVE_SEGMENT_TTL", "30"))
+
+_CLAUSE_END_RE = re.compile(r"[.?!,;:]$")
+_WORD_PUNCT = ".,?!;:\"'"
+
+# translate(api_key, text, scenario, previous_context) → async iterator of text deltas
+TranslateFn = Callable[[str, str, Optional[str], Optional[str]], AsyncIterator[str]]
+
+
+# =============================================================================
+# Prefix Helpers
+# =============================================================================
+
+def _match_words(text: str) -> List[str]:
+    """Normalised words for prefix comparison (case / punctuation insensitive)."""
+    return [w.strip(_WORD_PUNCT) for w in normalize_source(text).split()]
+
+
+def stable_prefix(text: str, pause: bool = False) -> str:
+    """Return the part of an interim revision that is unlikely to change.
+
+    - pause: the speaker stopped, the whole text is stable
+    - otherwise the longer of: text up to the last clause punctuation, or the
+      text minus its last SPEC_UNSTABLE_TAIL_WORDS words
+
+    Returns "" when the stable part is shorter than SPEC_MIN_WORDS.
+    """
+    words = text.split()
+    if pause:
+        candidate = len(words)
+    else:
+        candidate = max(0, len(words) - SPEC_UNSTABLE_TAIL_WORDS)
+        for i in range(len(words) - 1, candidate - 1, -1):
+            if _CLAUSE_END_RE.search(words[i]):
+                candidate = i + 1
+                break
+
+    if candidate < SPEC_MIN_WORDS:
+        return ""
+    return " ".join(words[:candidate])
+
+
+def _remainder(text: str, prefix_len: int) -> str:
+    """Original-cased words of `text` after the first prefix_len words."""
+    return " ".join(text.split()[prefix_len:])
+
+
+# =============================================================================
+# Segment State
+# =============================================================================
+
+@dataclass
+class _Speculation:
+    prefix: str
+    words: List[str]
+    task: Optional[asyncio.Task] = None
+    parts: List[str] = field(default_factory=list)
+
+
+@dataclass
+class _Segment:
+    revision: int = -1
+    updated: float = field(default_factory=time.monotonic)
+    speculation: Optional[_Speculation] = None
+
+
+def _retrieve_exception(task: asyncio.Task) -> None:
+    # Cancelled / failed speculations are expected; avoid "never retrieved" warnings
+    if not task.cancelled():
+        task.exception()
+
+
+class SpeculativeTranslator:
+    """Per-segment speculative translation state.
+
+    Lives on the event loop only (no locking). Segments are keyed by an API
+    key digest + client segment_id so two users can never share a speculation.
+    """
+
+    def __init__(self, translate: TranslateFn, segment_ttl: float = SPEC_SEGMENT_TTL):
+        self._translate = translate
+        self.segment_ttl = segment_ttl
+        self._segments: Dict[Tuple[str, str], _Segment] = {}
+        self._last_purge = time.monotonic()
+        self._stats = {
+            "interim_updates": 0,
+            "stale_revisions": 0,
+            "started": 0,
+            "cancelled": 0,
+            "failed": 0,
+            "exact": 0,
+            "extended": 0,
+            "full": 0,
+            "expired_segments": 0,
+        }
+
+    @staticmethod
+    def _key(api_key: str, segment_id: str) -> Tuple[str, str]:
+        return hashlib.sha1(api_key.encode("utf-8")).hexdigest()[:12], segment_id
+
+    def _cancel(self, segment: _Segment) -> None:
+        spec = segment.speculation
+        segment.speculation = None
+        if spec is not None and not spec.task.done():
+            spec.task.cancel()
+            self._stats["cancelled"] += 1
+
+    def _purge_idle(self) -> None:
+        now = time.monotonic()
+        if now - self._last_purge < 1.0:
+            return
+        self._last_purge = now
+        for key, segment in list(self._segments.items()):
+            if now - segment.updated > self.segment_ttl:
+                self._cancel(segment)
+                del self._segments[key]
+                self._stats["expired_segments"] += 1
+
+    async def _run(
+        self,
+        spec: _Speculation,
+        api_key: str,
+        scenario: Optional[str],
+        previous_context: Optional[str],
+    ) -> str:
+        async for delta in self._translate(api_key, spec.prefix, scenario, previous_context):
+            spec.parts.append(delta)
+        return "".join(spec.parts)
+
+    # -------------------------------------------------------------------------
+    # Interim revisions
+    # -------------------------------------------------------------------------
+
+    def update(
+        self,
+        api_key: str,
+        segment_id: str,
+        revision: int,
+        text: str,
+        scenario: Optional[str] = None,
+        previous_context: Optional[str] = None,
+        pause: bool = False,
+    ) -> dict:
+        """Record an interim revision and (re)start speculation if worthwhile.
+
+        Must be called from the event loop (schedules background tasks).
+
+        Returns:
+            Status dict for the interim endpoint response
+        """
+        self._purge_idle()
+        self._stats["interim_updates"] += 1
+
+        key = self._key(api_key, segment_id)
+        segment = self._segments.setdefault(key, _Segment())
+        if revision <= segment.revision:
+            self._stats["stale_revisions"] += 1
+            return {"status": "stale", "revision": segment.revision}
+        segment.revision = revision
+        segment.updated = time.monotonic()
+
+        words = _match_words(text)
+        spec = segment.speculation
+
+        # 之前推測的前綴被改寫 → 取消
+        if spec is not None and words[:len(spec.words)] != spec.words:
+            self._cancel(segment)
+            spec = None
+
+        prefix = stable_prefix(text, pause)
+        if not prefix:
+            return {"status": "waiting", "revision": revision}
+
+        prefix_words = _match_words(prefix)
+        if spec is not None:
+            growth = len(prefix_words) - len(spec.words)
+            if growth <= 0 or (growth < SPEC_MIN_GROWTH_WORDS and not pause):
+                return {"status": "speculating", "revision": revision, "prefix": spec.prefix}
+            self._cancel(segment)
+
+        spec = _Speculation(prefix=prefix, words=prefix_words)
+        spec.task = asyncio.create_task(self._run(spec, api_key, scenario, previous_context))
+        spec.task.add_done_callback(_retrieve_exception)
+        segment.speculation = spec
+        self._stats["started"] += 1
+        logger.debug(f"[Speculative] {segment_id} r{revision}: '{prefix[:50]}'")
+
+        return {"status": "speculating", "revision": revision, "prefix": prefix}
+
+    # -------------------------------------------------------------------------
+    # Final segment
+    # -------------------------------------------------------------------------
+
+    def finalize(
+        self,
+        api_key: str,
+        segment_id: str,
+        text: str,
+        scenario: Optional[str] = None,
+        previous_context: Optional[str] = None,
+    ) -> Tuple[str, AsyncIterator[str]]:
+        """Resolve the final segment against any speculation.
+
+        Returns:
+            (mode, deltas) where mode is "exact" / "extended" / "full" and
+            deltas yields the translation text in order
+        """
+        segment = self._segments.pop(self._key(api_key, segment_id), None)
+        spec = segment.speculation if segment is not None else None
+
+        words = _match_words(text)
+        if spec is None or words[:len(spec.words)] != spec.words or spec.task.cancelled():
+            if segment is not None:
+                self._cancel(segment)
+            self._stats["full"] += 1
+            return "full", self._translate(api_key, text, scenario, previous_context)
+
+        if len(words) == len(spec.words):
+            self._stats["exact"] += 1
+            return "exact", self._resolve(spec, api_key, text, scenario, previous_context)
+
+        # Start the remainder now, in parallel with any in-flight prefix
+        remainder = _remainder(text, len(spec.words))
+        queue: asyncio.Queue = asyncio.Queue()
+        pump = asyncio.create_task(
+            self._pump(self._translate(api_key, remainder, scenario, spec.prefix), queue)
+        )
+        self._stats["extended"] += 1
+        return "extended", self._extend(spec, pump, queue, api_key, scenario, previous_context)
+
+    async def _resolve(
+        self,
+        spec: _Speculation,
+        api_key: str,
+        text: str,
+        scenario: Optional[str],
+        previous_context: Optional[str],
+    ) -> AsyncIterator[str]:
+        """Yield the speculated translation, or translate `text` if it failed."""
+        try:
+            translation = await spec.task
+        except (asyncio.CancelledError, Exception) as e:
+            if not isinstance(e, asyncio.CancelledError):
+                logger.warning(f"[Speculative] Prefix translation failed: {e}")
+            self._stats["failed"] += 1
+            async for delta in self._translate(api_key, text, scenario, previous_context):
+                yield delta
+            return
+        if translation:
+            yield translation
+
+    @staticmethod
+    async def _pump(deltas: AsyncIterator[str], queue: asyncio.Queue) -> None:
+        try:
+            async for delta in deltas:
+                queue.put_nowait(("delta", delta))
+            queue.put_nowait(("done", None))
+        except Exception as e:
+            queue.put_nowait(("error", e))
+
+    async def _extend(
+        self,
+        spec: _Speculation,
+        pump: asyncio.Task,
+        queue: asyncio.Queue,
+        api_key: str,
+        scenario: Optional[str],
+        previous_context: Optional[str],
+    ) -> AsyncIterator[str]:
+        try:
+            async for delta in self._resolve(spec, api_key, spec.prefix, scenario, previous_context):
+                yield delta
+            while True:
+                kind, value = await queue.get()
+                if kind == "done":
+                    return
+                if kind == "error":
+                    raise value
+                yield value
+        finally:
+            if not pump.done():
+                pump.cancel()
+
+    def stats(self) -> dict:
+        stats = dict(self._stats)
+        stats["enabled"] = SPECULATIVE_ENABLED
+        stats["active_segments"] = len(self._segments)
+        finals = stats["exact"] + stats["extended"] + stats["full"]
+        reused = stats["exact"] + stats["extended"]
+        stats["reuse_rate"] = round(reused / finals, 3) if finals else None
+        return stats
@@ -0,0 +1,181 @@
+"""
+Stream Guard Module - 客戶端斷線偵測 + 上游即時中止
+
+Reference:
+- src/backend/main.py (SSE endpoints, /ws/session handlers)
+- src/backend/single_flight.py (shared upstream streams)
+
+When a user hangs up or navigates away mid-stream, nobody reads the rest of
+the answer, but the upstream request keeps generating (and billing) tokens
+until [DONE]:
+
+- Async SSE generators: Starlette cancels them on http.disconnect for ASGI
+  spec < 2.4, but newer servers only surface the disconnect when a send
+  fails — after the next upstream chunk has already been paid for.
+- Sync generators (scripts) run in the threadpool. Cancelling
+  the awaiting coroutine does NOT stop the thread, which keeps reading the
+  upstream stream to the end.
+
+guard_stream() checks `request.is_disconnected()` (or the WebSocket channel
+state) before every event and closes the source as soon as the client is
+gone. iterate_sync_stream() runs a sync generator on a worker thread that
+stops at the next chunk and closes the generator (→ `with client.stream`
+exits → upstream connection closed).
+
+Aborted streams and an estimate of the tokens spent on them are exposed via
+/api/metrics (get_stream_abort_stats).
+"""
+
+import asyncio
+import contextvars
+import json
+import logging
+import threading
+from typing import AsyncIterator, Awaitable, Callable, Iterator, List, Optional
+
+try:
+    from .controller import estimate_tokens
+except ImportError:
+    from controller import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# Metrics
+# =============================================================================
+
+_STATS = {
+    "streams_guarded": 0,
+    "streams_completed": 0,
+    "streams_aborted": 0,
+    "wasted_input_tokens_est": 0,
+    "wasted_output_tokens_est": 0,
+}
+_ABORTED_BY_ENDPOINT = {}
+
+
+def record_abort(endpoint: str, output_text: str = "", input_text: str = "") -> None:
+    """Count one stream whose client went away before the end."""
+    _STATS["streams_aborted"] += 1
+    _ABORTED_BY_ENDPOINT[endpoint] = _ABORTED_BY_ENDPOINT.get(endpoint, 0) + 1
+    _STATS["wasted_input_tokens_est"] += estimate_tokens(input_text)
+    _STATS["wasted_output_tokens_est"] += estimate_tokens(output_text)
+
+
+def get_stream_abort_stats() -> dict:
+    """Aborted-stream counters and wasted-token estimates for /api/metrics."""
+    return {**_STATS, "aborted_by_endpoint": dict(_ABORTED_BY_ENDPOINT)}
+
+
+# =============================================================================
+# Disconnect Guard
+# =============================================================================
+
+def _event_text(event) -> str:
+    """User-visible text of one event (SSE line or event dict), for token estimates."""
+    if isinstance(event, str):
+        if not event.startswith("data: "):
+            return ""
+        try:
+            event = json.loads(event[6:])
+        except ValueError:
+            return ""
+    if not isinstance(event, dict):
+        return ""
+    return " ".join(
+        value for key, value in event.items()
+        if key != "type" and isinstance(value, str)
+    )
+
+
+async def guard_stream(
+    events: AsyncIterator,
+    endpoint: str,
+    is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+    input_text: str = "",
+) -> AsyncIterator:
+    """Pass events through until the client disconnects, then close the source.
+
+    Args:
+        events: Source stream (SSE lines or event dicts)
+        endpoint: Label for the abort metrics
+        is_disconnected: Async check, e.g. `request.is_disconnected`
+        input_text: Request text, counted as wasted input tokens on abort
+    """
+    _STATS["streams_guarded"] += 1
+    delivered: List[str] = []
+    completed = False
+    try:
+        async for event in events:
+            if is_disconnected is not None and await is_disconnected():
+                logger.info(f"[StreamGuard] Client disconnected from {endpoint}, aborting upstream")
+                break
+            yield event
+            delivered.append(_event_text(event))
+        else:
+            completed = True
+    finally:
+        if completed:
+            _STATS["streams_completed"] += 1
+        else:
+            record_abort(endpoint, " ".join(delivered), input_text)
+        # Closing the source exits its `async with client.stream(...)`
+        aclose = getattr(events, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+# =============================================================================
+# Sync Generators (threadpool)
+# =============================================================================
+
+_DONE = object()
+
+
+async def iterate_sync_stream(
+    factory: Callable[[threading.Event], Iterator],
+) -> AsyncIterator:
+    """Iterate a sync generator on a worker thread, stopping it when we stop.
+
+    Unlike starlette's iterate_in_threadpool, closing or cancelling this
+    iterator sets a stop flag: the worker quits at the next item and closes
+    the generator, so its upstream stream is released right away. The
+    factory also receives the flag to check inside long inner loops.
+    The worker runs in a copy of the caller's context (request deadline).
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+
+    def _put(item, error=None) -> None:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, (item, error))
+        except RuntimeError:
+            pass  # Event loop already closed
+
+    def _worker() -> None:
+        generator = factory(stop)
+        try:
+            for item in generator:
+                if stop.is_set():
+                    break
+                _put(item)
+        except Exception as e:
+            _put(_DONE, e)
+            return
+        finally:
+            generator.close()
+        _put(_DONE)
+
+    loop.run_in_executor(None, contextvars.copy_context().run, _worker)
+    try:
+        while True:
+            item, error = await queue.get()
+            if error is not None:
+                raise error
+            if item is _DONE:
+                break
+            yield item
+    finally:
+        stop.set()
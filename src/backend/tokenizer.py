@@ -0,0 +1,348 @@
+"""
+Tokenizer Module - token 計數
+
+Reference:
+- src/backend/controller.py (estimate_tokens, summarize_ssot)
+- src/backend/prompt_budget.py (prompt budgets are in these units)
+
+One place for token counts: prompt budgets, the 1500-token SSOT
+summarisation threshold and stream_guard's wasted-token metrics all count
+through count_tokens() / truncate_to_tokens().
+
+Default: byte-level BPE over OpenAI's o200k_base vocabulary (the
+gpt-4.1 / gpt-5 models), vendored as o200k_base.tiktoken next to this
+module (sha256 446a9538…1a2d, the file tiktoken downloads). Counts are the
+ones the API bills:
+
+- the text is split into pre-tokens with one regex pass, o200k's split
+  written for the stdlib `re` (letter runs with their leading space,
+  split before an upper-case run; 1-3 digit groups; punctuation runs;
+  whitespace). It matches tiktoken exactly except for upper-case
+  non-ASCII letters, which it treats as lower-case
+- each pre-token's UTF-8 bytes are merged by rank (lowest first)
+- counting never builds token lists: identical pre-tokens are counted
+  once per call and their token counts are memoized
+
+TOKENIZER_VOCAB_PATH selects another tiktoken-format ranks file
+(`<base64 token> <rank>` per line). If the vocabulary cannot be loaded,
+counts fall back to the v1 estimate (design.md § 7, T2.1): CJK characters
+× 2 + whitespace-separated words × 1.3, at least 1 for non-empty text.
+
+Benchmark (v1 estimate vs BPE, side by side):
+    python -m src.backend.tokenizer
+"""
+
+import base64
+import logging
+import os
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# tiktoken-format vocabulary (default: the vendored o200k_base)
+O200K_VOCAB_PATH = Path(__file__).with_name("o200k_base.tiktoken")
+TOKENIZER_VOCAB_PATH = os.getenv("TOKENIZER_VOCAB_PATH", str(O200K_VOCAB_PATH))
+# Memoized pre-token counts kept before the memo is reset
+_MEMO_MAX = 200_000
+
+# v1 estimate: CJK Unified Ideographs, and words / CJK characters as cut points
+_CJK_RE = re.compile(r"[\u4e00-\u9fff]")
+_ESTIMATE_PIECE_RE = re.compile(r"[\u4e00-\u9fff]|[^\s\u4e00-\u9fff]+")
+_CJK_TOKENS = 2
+_WORD_TOKENS = 1.3
+
+# o200k_base's split: letter runs (optionally led by one space / symbol,
+# upper-case run before lower-case run, English contractions attached),
+# 1-3 digit groups, punctuation runs, newlines, other whitespace.
+# \p{Lu} / \p{Ll} become "letter but not a-z" / "letter but not A-Z".
+_PRETOKEN_RE = re.compile(
+    r"(?:[^\r\n\w]|_)?[^\W\d_a-z]*[^\W\d_A-Z]+(?i:'s|'t|'re|'ve|'m|'ll|'d)?"
+    r"|(?:[^\r\n\w]|_)?[^\W\d_a-z]+[^\W\d_A-Z]*(?i:'s|'t|'re|'ve|'m|'ll|'d)?"
+    r"|\d{1,3}"
+    r"| ?(?:[^\s\w]|_)+[\r\n/]*"
+    r"|\s*[\r\n]+"
+    r"|\s+(?!\S)"
+    r"|\s+"
+)
+
+
+def pretokenize(text: str) -> List[str]:
+    """Split text into the pieces BPE runs on (one regex pass)."""
+    return _PRETOKEN_RE.findall(text)
+
+
+# =============================================================================
+# v1 Estimate
+# =============================================================================
+
+class TokenEstimator:
+    """The v1 formula: CJK characters × 2 + other words × 1.3. Thread-safe."""
+
+    name = "estimate"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0}
+
+    def count(self, text: str) -> int:
+        """Estimated tokens in `text` (0 for empty text, else at least 1)."""
+        if not text:
+            return 0
+        with self._lock:
+            self._stats["calls"] += 1
+        without_cjk = _CJK_RE.sub("", text)
+        chinese_chars = len(text) - len(without_cjk)
+        return max(int(chinese_chars * _CJK_TOKENS + len(without_cjk.split()) * _WORD_TOKENS), 1)
+
+    def count_batch(self, texts: Iterable[str]) -> List[int]:
+        return [self.count(text) for text in texts]
+
+    def truncate(self, text: str, max_tokens: int, keep_end: bool = False) -> str:
+        """Longest prefix of `text` (cut after a word / CJK character) within `max_tokens`.
+
+        keep_end=True keeps the longest suffix instead. Each piece is costed
+        on its own, which never undercounts the joined result.
+        """
+        if max_tokens <= 0:
+            return ""
+        matches = list(_ESTIMATE_PIECE_RE.finditer(text))
+        if keep_end:
+            matches.reverse()
+        used = 0.0
+        cut = len(text) if keep_end else 0
+        for match in matches:
+            used += _CJK_TOKENS if _CJK_RE.match(match.group()) else _WORD_TOKENS
+            if int(used) > max_tokens:
+                return text[cut:] if keep_end else text[:cut]
+            cut = match.start() if keep_end else match.end()
+        return text
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"vocabulary": self.name, **self._stats}
+
+
+# =============================================================================
+# BPE
+# =============================================================================
+
+class BPETokenizer:
+    """Byte-level BPE over a ranked vocabulary. Thread-safe."""
+
+    def __init__(self, ranks: Dict[bytes, int], name: str = "custom"):
+        self.name = name
+        self._ranks = ranks
+        self._decoder: Optional[Dict[int, bytes]] = None
+        self._memo: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "pieces": 0, "memo_misses": 0}
+
+    @classmethod
+    def from_file(cls, path: Path) -> "BPETokenizer":
+        """Load a .tiktoken file (`<base64 token> <rank>` per line)."""
+        ranks = {}
+        with open(path, "rb") as f:
+            for line in f:
+                if line.strip():
+                    token, rank = line.split()
+                    ranks[base64.b64decode(token)] = int(rank)
+        return cls(ranks, name=Path(path).stem)
+
+    @property
+    def vocab_size(self) -> int:
+        return len(self._ranks)
+
+    def _merge(self, piece: bytes) -> List[bytes]:
+        """tiktoken's merge loop: repeatedly join the adjacent pair with the lowest rank."""
+        ranks = self._ranks
+        if piece in ranks:
+            return [piece]
+        parts = [piece[i:i + 1] for i in range(len(piece))]
+        while len(parts) > 1:
+            best_rank = None
+            best_i = -1
+            for i in range(len(parts) - 1):
+                rank = ranks.get(parts[i] + parts[i + 1])
+                if rank is not None and (best_rank is None or rank < best_rank):
+                    best_rank, best_i = rank, i
+            if best_rank is None:
+                break
+            parts[best_i:best_i + 2] = [parts[best_i] + parts[best_i + 1]]
+        return parts
+
+    def encode(self, text: str) -> List[int]:
+        """Token ids (bytes missing from the vocabulary cannot occur: all 256 are ranked)."""
+        ids = []
+        for piece in pretokenize(text):
+            ids.extend(self._ranks[part] for part in self._merge(piece.encode("utf-8")))
+        return ids
+
+    def decode(self, ids: Iterable[int]) -> str:
+        if self._decoder is None:
+            self._decoder = {rank: token for token, rank in self._ranks.items()}
+        return b"".join(self._decoder[i] for i in ids).decode("utf-8", errors="replace")
+
+    def _piece_count(self, piece: str) -> int:
+        count = self._memo.get(piece)
+        if count is None:
+            count = len(self._merge(piece.encode("utf-8")))
+            with self._lock:
+                self._stats["memo_misses"] += 1
+                if len(self._memo) >= _MEMO_MAX:
+                    self._memo.clear()
+                self._memo[piece] = count
+        return count
+
+    def count(self, text: str) -> int:
+        """Number of tokens in `text` (counting-only path: no token lists)."""
+        if not text:
+            return 0
+        pieces = Counter(_PRETOKEN_RE.findall(text))
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["pieces"] += len(pieces)
+        return sum(self._piece_count(piece) * n for piece, n in pieces.items())
+
+    def count_batch(self, texts: Iterable[str]) -> List[int]:
+        """count() for several texts; pieces shared between them are merged once."""
+        return [self.count(text) for text in texts]
+
+    def truncate(self, text: str, max_tokens: int, keep_end: bool = False) -> str:
+        """Longest prefix of `text` (on a pre-token boundary) within `max_tokens`.
+
+        keep_end=True keeps the longest suffix instead.
+        """
+        matches = list(_PRETOKEN_RE.finditer(text))
+        if keep_end:
+            matches.reverse()
+        used = 0
+        cut = len(text) if keep_end else 0
+        for match in matches:
+            cost = self._piece_count(match.group())
+            if used + cost > max_tokens:
+                return text[cut:] if keep_end else text[:cut]
+            used += cost
+            cut = match.start() if keep_end else match.end()
+        return text
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "vocabulary": self.name,
+                "vocab_size": self.vocab_size,
+                "memo_entries": len(self._memo),
+                **self._stats,
+            }
+
+
+# =============================================================================
+# Module-level Tokenizer
+# =============================================================================
+
+_TOKENIZER: Optional[Union[BPETokenizer, TokenEstimator]] = None
+_TOKENIZER_LOCK = threading.Lock()
+
+
+def _load_tokenizer() -> Union[BPETokenizer, TokenEstimator]:
+    if TOKENIZER_VOCAB_PATH:
+        try:
+            tokenizer = BPETokenizer.from_file(Path(TOKENIZER_VOCAB_PATH))
+            logger.info(f"[Tokenizer] Loaded {tokenizer.name} ({tokenizer.vocab_size} tokens)")
+            return tokenizer
+        except (OSError, ValueError) as e:
+            logger.error(f"[Tokenizer] Cannot load {TOKENIZER_VOCAB_PATH} ({e}); using the v1 estimate")
+    return TokenEstimator()
+
+
+def get_tokenizer() -> Union[BPETokenizer, TokenEstimator]:
+    """The configured counter (BPE over TOKENIZER_VOCAB_PATH, else the v1 estimate)."""
+    global _TOKENIZER
+    if _TOKENIZER is None:
+        with _TOKENIZER_LOCK:
+            if _TOKENIZER is None:
+                _TOKENIZER = _load_tokenizer()
+    return _TOKENIZER
+
+
+def count_tokens(text: str) -> int:
+    """Token count of `text`."""
+    return get_tokenizer().count(text)
+
+
+def count_tokens_batch(texts: Iterable[str]) -> List[int]:
+    """Token counts of several texts."""
+    return get_tokenizer().count_batch(texts)
+
+
+def truncate_to_tokens(text: str, max_tokens: int, keep_end: bool = False) -> str:
+    """Prefix (or with keep_end, suffix) of `text` that fits in `max_tokens`."""
+    return get_tokenizer().truncate(text, max_tokens, keep_end)
+
+
+# Prompt sizes by prompt name: {name: {"count", "total_tokens", "max_tokens", "trimmed"}}
+_PROMPT_TOKENS: Dict[str, Dict[str, int]] = {}
+
+
+def record_prompt_tokens(name: str, tokens: int, trimmed: bool = False) -> None:
+    """Record the size of an assembled prompt (reported in /api/metrics).
+
+    `trimmed`: the prompt was cut down to its token budget (prompt_budget.py).
+    """
+    with _TOKENIZER_LOCK:
+        entry = _PROMPT_TOKENS.setdefault(name, {"count": 0, "total_tokens": 0, "max_tokens": 0, "trimmed": 0})
+        entry["count"] += 1
+        entry["total_tokens"] += tokens
+        entry["max_tokens"] = max(entry["max_tokens"], tokens)
+        entry["trimmed"] += int(trimmed)
+
+
+def get_tokenizer_stats() -> dict:
+    """Counter, counting and prompt-size statistics for /api/metrics."""
+    with _TOKENIZER_LOCK:
+        prompts = {
+            name: {**entry, "avg_tokens": round(entry["total_tokens"] / entry["count"], 1)}
+            for name, entry in _PROMPT_TOKENS.items()
+        }
+    if _TOKENIZER is None:
+        vocabulary = Path(TOKENIZER_VOCAB_PATH).stem if TOKENIZER_VOCAB_PATH else TokenEstimator.name
+        return {"vocabulary": vocabulary, "loaded": False, "prompts": prompts}
+    return {"loaded": True, **_TOKENIZER.stats(), "prompts": prompts}
+
+
+# =============================================================================
+# Benchmark
+# =============================================================================
+
+if __name__ == "__main__":
+    import time
+
+    root = Path(__file__).resolve().parents[2]
+    ssot = "\n\n".join(p.read_text(encoding="utf-8") for p in sorted(root.glob("spec/*.md")))
+    samples = {
+        "segment": "Can I take your sort code and account number, please?",
+        "zh segment": "您好，我想查詢一筆直接扣款，請問您的分行代碼是多少？",
+        "ssot 100KB": ssot[:100_000],
+        "ssot 2MB": (ssot * (2_000_000 // max(len(ssot), 1) + 1))[:2_000_000],
+    }
+    started = time.perf_counter()
+    bpe = get_tokenizer()
+    print(f"loaded {bpe.stats()['vocabulary']} in {(time.perf_counter() - started) * 1000:.0f}ms")
+    counters = [TokenEstimator(), bpe]
+    for label, text in samples.items():
+        rounds = max(1, 200_000 // max(len(text), 1))
+        row = []
+        for counter in counters:
+            counter.count(text)  # warm the memo, as a running server would be
+            started = time.perf_counter()
+            for _ in range(rounds):
+                tokens = counter.count(text)
+            elapsed = (time.perf_counter() - started) / rounds
+            row.append(
+                f"{counter.name:>10} {tokens:>7} tokens {elapsed * 1000:7.2f}ms "
+                f"({len(text) / elapsed / 1e6:5.1f} MB/s)"
+            )
+        print(f"{label:>10}: " + " | ".join(row))
@@ -0,0 +1,195 @@
+"""
+Translation Cache Module - 翻譯結果快取
+
+Reference:
+- spec/lessons_learned.md (Test 21 - 方案 A)
+
+Call-centre agents repeat the same lines all day ("Can I take your sort code
+please?"). This bounded in-process cache sits in front of /api/translate and
+/api/translate/stream so repeated lines skip the gpt-4.1-nano round trip.
+
+Key: normalised source text + scenario + previous-context digest + model.
+Eviction: LRU, bounded by entry count AND total bytes, plus a TTL.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+CACHE_MAX_ENTRIES = int(os.getenv("TRANSLATION_CACHE_MAX_ENTRIES", "5000"))
+CACHE_MAX_BYTES = int(os.getenv("TRANSLATION_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))  # 8 MB
+CACHE_TTL_SECONDS = float(os.getenv("TRANSLATION_CACHE_TTL", "86400"))  # 24 小時
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+# =============================================================================
+# Key Helpers
+# =============================================================================
+
+def normalize_source(text: str) -> str:
+    """Normalise English source text for cache lookups.
+
+    NFKC + casefold + collapsed whitespace, so Web Speech capitalisation and
+    spacing differences still hit the same entry.
+    """
+    text = unicodedata.normalize("NFKC", text or "")
+    return _WHITESPACE_RE.sub(" ", text).strip().casefold()
+
+
+def _digest(text: Optional[str]) -> str:
+    if not text:
+        return "-"
+    return hashlib.sha1(normalize_source(text).encode("utf-8")).hexdigest()[:16]
+
+
+def make_cache_key(
+    text: str,
+    scenario: Optional[str],
+    previous_context: Optional[str],
+    model: str,
+    namespace: str = "stream",
+    glossary_version: Optional[str] = None,
+) -> str:
+    """Build the cache key for a translation request.
+
+    Args:
+        text: English source text
+        scenario: Glossary scenario (None → "")
+        previous_context: Previous segment (hashed, only its digest is kept)
+        model: Translation model ID
+        namespace: Prompt family ("stream" or "plain"), since the two
+            endpoints use different system prompts
+        glossary_version: Glossary the prompt's term hints came from, so a
+            translation made with an older glossary is never served
+
+    Returns:
+        Cache key string
+    """
+    return "\x1f".join([
+        namespace,
+        model,
+        glossary_version or "",
+        scenario or "",
+        _digest(previous_context),
+        normalize_source(text),
+    ])
+
+
+# =============================================================================
+# Cache
+# =============================================================================
+
+class TranslationCache:
+    """Size-aware LRU cache with TTL for finished translations.
+
+    Thread-safe (the sync suggestion / script paths run in the threadpool,
+    and the lock is cheap compared with an upstream call).
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict = OrderedDict()  # key -> (value, size, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+
+    @staticmethod
+    def _entry_size(key: str, value: str) -> int:
+        return len(key.encode("utf-8")) + len(value.encode("utf-8"))
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached translation, or None on miss / expiry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+
+            value, _, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def put(self, key: str, value: str) -> None:
+        """Store a finished translation, evicting LRU entries to stay in bounds."""
+        if not value:
+            return
+
+        size = self._entry_size(key, value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (value, size, time.monotonic() + self.ttl_seconds)
+            self._bytes += size
+            self._stats["stores"] += 1
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else None
+        stats["max_entries"] = self.max_entries
+        stats["max_bytes"] = self.max_bytes
+        stats["ttl_seconds"] = self.ttl_seconds
+        return stats
+
+
+# App-wide instance shared by both translation endpoints
+translation_cache = TranslationCache(
+    max_entries=CACHE_MAX_ENTRIES,
+    max_bytes=CACHE_MAX_BYTES,
+    ttl_seconds=CACHE_TTL_SECONDS,
+)
+
+
+def get_translation_cache_stats() -> dict:
+    """Hit / miss / eviction counters for /api/metrics."""
+    return translation_cache.stats()
@@ -0,0 +1,504 @@
+"""
+Translation Memory Module - 模糊翻譯記憶庫
+
+Reference:
+- spec/research/glossary_integration_design.md
+- spec/research/translation_quality_roadmap.md
+
+The exact-match cache (translation_cache.py) misses near-duplicate
+utterances such as "could I take your account number" vs "can I take your
+account number please". This module keeps a local near-duplicate index of
+English source segments:
+
+- Character 3-gram shingles + MinHash signatures, bucketed with LSH bands
+- Candidates are re-scored with exact Jaccard similarity
+- Seeded from the domain_glossaries.json phrasebooks + completed translations
+- Learned entries are appended to a JSONL file and reloaded on restart
+
+Above TM_SERVE_THRESHOLD /api/translate/stream serves the stored translation
+with no upstream call; above TM_HINT_THRESHOLD the match is injected into the
+prompt as a reference translation.
+
+A near-duplicate is only served when nothing that changes the meaning
+differs: the numbers / currency amounts and negations of the two sentences
+must be identical ("£600" is not "£500", "cannot confirm" is not "can
+confirm") and the entry must come from the same scenario and glossary
+version (a glossary swap changes how terms are translated). Otherwise the
+match is downgraded to a hint.
+
+Benchmark (100k+ entries):
+    python -m src.backend.translation_memory
+"""
+
+import hashlib
+import json
+import logging
+from bisect import bisect_right
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+# Handle both module and direct execution imports
+try:
+    from .glossary import get_glossary_version, get_phrasebook
+    from .translation_cache import normalize_source
+except ImportError:
+    from glossary import get_glossary_version, get_phrasebook
+    from translation_cache import normalize_source
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+TM_SERVE_THRESHOLD = float(os.getenv("TM_SERVE_THRESHOLD", "0.9"))
+TM_HINT_THRESHOLD = float(os.getenv("TM_HINT_THRESHOLD", "0.6"))
+TM_MIN_WORDS = 3  # 短句（"Yes."）交給精確快取，避免誤配
+TM_MAX_ENTRIES = int(os.getenv("TM_MAX_ENTRIES", "200000"))
+# The JSONL store is rewritten from the index once it holds this many times
+# more rows than distinct learned entries (re-learned sources append a row)
+TM_COMPACT_RATIO = 2
+TM_COMPACT_MIN_ROWS = 1000
+TM_PATH = Path(os.getenv(
+    "TRANSLATION_MEMORY_PATH",
+    str(Path(__file__).parent / "data" / "translation_memory.jsonl"),
+))
+
+# MinHash / LSH parameters: 16 bands x 3 rows → ~98% recall at the 0.6 hint
+# threshold (8 x 4 only found ~70% of pairs right at the threshold)
+NUM_PERM = 48
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+MAX_BUCKET_CANDIDATES = 64  # Only the newest entries of a crowded bucket are considered
+MAX_SCORED_CANDIDATES = 8   # Candidates re-scored with exact Jaccard (most band hits first)
+_MASK = (1 << 61) - 1
+_EMPTY = 1 << 62
+_DENSIFY_OFFSET = 1 << 57  # Keeps borrowed values distinct from real bin minima
+
+_PUNCT_RE = re.compile(r"[^\w\s']")
+# Meaning-bearing tokens a served match must reproduce exactly
+_AMOUNT_RE = re.compile(r"[£$€¥]?\d+(?:[.,:]\d+)*(?:k|m|p|%)?")
+_NEGATION_RE = re.compile(r"\b(?:no|not|never|none|nothing|nobody|nowhere|neither|nor|cannot|\w+n't)\b")
+_GENERAL_SCENARIOS = ("", "general")
+
+
+# =============================================================================
+# Shingling / MinHash
+# =============================================================================
+
+def _tm_normalize(text: str) -> str:
+    """Normalise for similarity: cache normalisation + punctuation removed."""
+    return " ".join(_PUNCT_RE.sub(" ", normalize_source(text)).split())
+
+
+def _guard_tokens(text: str) -> tuple:
+    """Numbers / amounts (with currency) and negations, in order of appearance."""
+    text = normalize_source(text).replace("’", "'")
+    return tuple(_AMOUNT_RE.findall(text)), tuple(_NEGATION_RE.findall(text))
+
+
+def _scenario_key(scenario: Optional[str]) -> str:
+    scenario = (scenario or "").strip().lower()
+    return "" if scenario in _GENERAL_SCENARIOS else scenario
+
+
+def _shingles(normalized: str) -> frozenset:
+    padded = f" {normalized} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _stable_hash(shingle: str) -> int:
+    """Process-independent 61-bit hash (built-in hash() is salted per process)."""
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little") & _MASK
+
+
+def _signature(shingles: frozenset) -> list:
+    """One-permutation MinHash: hash each shingle once, keep the min per bin.
+
+    Empty bins are filled from the next non-empty bin (rotation densification)
+    so short segments still produce comparable signatures.
+    """
+    signature = [_EMPTY] * NUM_PERM
+    for shingle in shingles:
+        h = _stable_hash(shingle)
+        b = h % NUM_PERM
+        v = h // NUM_PERM
+        if v < signature[b]:
+            signature[b] = v
+
+    if _EMPTY in signature:
+        original = list(signature)
+        filled = [i for i, v in enumerate(original) if v != _EMPTY]
+        if filled:
+            for i, v in enumerate(original):
+                if v == _EMPTY:
+                    distance = next(
+                        (j - i) % NUM_PERM for j in filled[bisect_right(filled, i):] + filled
+                    )
+                    signature[i] = original[(i + distance) % NUM_PERM] + distance * _DENSIFY_OFFSET
+    return signature
+
+
+def _band_keys(signature: list) -> list:
+    return [hash((b, *signature[b * ROWS:(b + 1) * ROWS])) for b in range(BANDS)]
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+# =============================================================================
+# Index
+# =============================================================================
+
+@dataclass(frozen=True)
+class TMEntry:
+    """One English source segment with its Chinese translation."""
+    source: str
+    translation: str
+    scenario: str = ""
+    origin: str = "learned"  # phrasebook | learned
+    glossary: str = ""  # glossary version it was translated with
+
+
+@dataclass(frozen=True)
+class TMMatch:
+    """Best near-duplicate match for a lookup.
+
+    `safe`: numbers, amounts, negations, scenario and glossary version are
+    the same as for the looked-up text (False: usable as a hint only).
+    """
+    entry: TMEntry
+    similarity: float
+    safe: bool = True
+
+    @property
+    def servable(self) -> bool:
+        return self.safe and self.similarity >= TM_SERVE_THRESHOLD
+
+
+class _Index:
+    """LSH buckets over MinHash signatures. Built off-loop, then swapped in."""
+
+    def __init__(self):
+        self.entries: list = []
+        self.by_source: dict = {}   # normalised source -> entry position
+        self.buckets: dict = {}     # band hash -> [entry positions]
+        self.learned = 0            # entries of origin "learned"
+
+    def add(self, entry: TMEntry) -> bool:
+        """Index `entry`; False if it is already indexed unchanged."""
+        normalized = _tm_normalize(entry.source)
+        if not normalized:
+            return False
+
+        position = self.by_source.get(normalized)
+        if position is not None:
+            # Same source seen again: newest translation wins
+            old = self.entries[position]
+            if old == entry:
+                return False
+            self.learned += (entry.origin == "learned") - (old.origin == "learned")
+            self.entries[position] = entry
+            return True
+
+        position = len(self.entries)
+        self.entries.append(entry)
+        self.learned += entry.origin == "learned"
+        self.by_source[normalized] = position
+        for key in _band_keys(_signature(_shingles(normalized))):
+            self.buckets.setdefault(key, []).append(position)
+        return True
+
+    def lookup(self, normalized: str) -> Optional[TMMatch]:
+        position = self.by_source.get(normalized)
+        if position is not None:
+            return TMMatch(self.entries[position], 1.0)
+
+        shingles = _shingles(normalized)
+        band_hits: dict = {}
+        for key in _band_keys(_signature(shingles)):
+            bucket = self.buckets.get(key)
+            if bucket:
+                for position in bucket[-MAX_BUCKET_CANDIDATES:]:
+                    band_hits[position] = band_hits.get(position, 0) + 1
+
+        # More colliding bands ≈ higher similarity; only the top few are re-scored
+        ranked = sorted(band_hits, key=band_hits.__getitem__, reverse=True)[:MAX_SCORED_CANDIDATES]
+
+        best = None
+        for position in ranked:
+            entry = self.entries[position]
+            similarity = jaccard(shingles, _shingles(_tm_normalize(entry.source)))
+            if best is None or similarity > best.similarity:
+                best = TMMatch(entry, similarity)
+        return best
+
+
+# =============================================================================
+# Translation Memory
+# =============================================================================
+
+class TranslationMemory:
+    """Near-duplicate translation memory with JSONL persistence."""
+
+    def __init__(self, path: Path = TM_PATH, max_entries: int = TM_MAX_ENTRIES):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self._index = _Index()
+        self._loaded = False
+        self._loading = False
+        self._pending: list = []  # Entries learned while a load is in progress
+        self._rows = 0  # Rows in the JSONL store
+        self._write_lock = threading.Lock()
+        self._latencies_ms: deque = deque(maxlen=2000)
+        self._stats = {"lookups": 0, "served": 0, "hinted": 0, "misses": 0, "learned": 0}
+
+    # -- Loading -------------------------------------------------------------
+
+    def load(self) -> None:
+        """Build the index from the phrasebooks + persisted entries.
+
+        Runs in a worker thread at startup; lookups see the old (empty) index
+        until the new one is swapped in.
+        """
+        started = time.perf_counter()
+        self._loading = True
+        index = _Index()
+
+        glossary = get_glossary_version()
+        for english, zh, domain in get_phrasebook():
+            index.add(TMEntry(english, zh, domain, "phrasebook", glossary))
+
+        learned = 0
+        rows = 0
+        if self.path.exists():
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            row = json.loads(line)
+                        except json.JSONDecodeError:
+                            continue
+                        rows += 1
+                        entry = TMEntry(
+                            row["source"], row["translation"], row.get("scenario", ""),
+                            glossary=row.get("glossary", ""),
+                        )
+                        if index.add(entry):
+                            learned += 1
+                        if len(index.entries) >= self.max_entries:
+                            break
+            except Exception as e:
+                logger.error(f"[TM] Failed to load {self.path}: {e}")
+
+        pending, self._pending = self._pending, []
+        for entry in pending:
+            index.add(entry)
+
+        self._index = index
+        self._rows = rows
+        self._loaded = True
+        self._loading = False
+        logger.info(
+            f"[TM] Loaded {len(index.entries)} entries ({learned} learned) "
+            f"in {(time.perf_counter() - started) * 1000:.0f}ms"
+        )
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def _ensure_loaded(self) -> None:
+        # Outside the app lifespan (tests, scripts) load on first use
+        if not self._loaded and not self._loading:
+            self.load()
+
+    # -- Lookup / Learn ------------------------------------------------------
+
+    def lookup(
+        self,
+        text: str,
+        scenario: Optional[str] = None,
+        glossary_version: Optional[str] = None,
+    ) -> Optional[TMMatch]:
+        """Return the best match at or above TM_HINT_THRESHOLD, else None.
+
+        The match is only servable if its numbers, amounts and negations
+        equal those of `text` and it was learned in the same `scenario`
+        (and, when given, with the same `glossary_version`).
+        """
+        normalized = _tm_normalize(text)
+        if len(normalized.split()) < TM_MIN_WORDS:
+            return None
+
+        self._ensure_loaded()
+        started = time.perf_counter()
+        match = self._index.lookup(normalized)
+        if match is not None:
+            safe = (
+                _scenario_key(match.entry.scenario) == _scenario_key(scenario)
+                and (glossary_version is None or match.entry.glossary == glossary_version)
+                and _guard_tokens(match.entry.source) == _guard_tokens(text)
+            )
+            if not safe:
+                match = TMMatch(match.entry, match.similarity, safe=False)
+        self._latencies_ms.append((time.perf_counter() - started) * 1000)
+
+        self._stats["lookups"] += 1
+        if match is None or match.similarity < TM_HINT_THRESHOLD:
+            self._stats["misses"] += 1
+            return None
+        self._stats["served" if match.servable else "hinted"] += 1
+        return match
+
+    def add(
+        self,
+        source: str,
+        translation: str,
+        scenario: Optional[str] = None,
+        glossary_version: str = "",
+    ) -> None:
+        """Learn a completed translation and append it to the JSONL store.
+
+        A source already learned with the same translation is not written
+        again; the store is compacted once re-learned sources pile up.
+        """
+        translation = (translation or "").strip()
+        if not translation or len(_tm_normalize(source).split()) < TM_MIN_WORDS:
+            return
+
+        self._ensure_loaded()
+        if len(self._index.entries) >= self.max_entries:
+            return
+
+        entry = TMEntry(source.strip(), translation, _scenario_key(scenario), glossary=glossary_version)
+        if self._loading:
+            self._pending.append(entry)
+        if not self._index.add(entry):
+            return
+        self._stats["learned"] += 1
+        self._append(entry)
+
+    def _append(self, entry: TMEntry) -> None:
+        try:
+            with self._write_lock:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(_row(entry))
+                self._rows += 1
+                if not self._loading and self._rows >= max(
+                    TM_COMPACT_MIN_ROWS, TM_COMPACT_RATIO * self._index.learned
+                ):
+                    self._compact()
+        except OSError as e:
+            logger.warning(f"[TM] Failed to persist entry: {e}")
+
+    def _compact(self) -> None:
+        """Rewrite the store with one row per learned source (write lock held)."""
+        entries = [entry for entry in self._index.entries if entry.origin == "learned"]
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.writelines(_row(entry) for entry in entries)
+        os.replace(tmp, self.path)
+        logger.info(f"[TM] Compacted {self._rows} rows → {len(entries)}")
+        self._rows = len(entries)
+
+    # -- Stats ---------------------------------------------------------------
+
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies_ms)
+
+        def pct(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 3)
+
+        stats = dict(self._stats)
+        stats["entries"] = len(self._index.entries)
+        stats["buckets"] = len(self._index.buckets)
+        stats["lookup_ms_p50"] = pct(0.50)
+        stats["lookup_ms_p99"] = pct(0.99)
+        stats["serve_threshold"] = TM_SERVE_THRESHOLD
+        stats["hint_threshold"] = TM_HINT_THRESHOLD
+        return stats
+
+
+def _row(entry: TMEntry) -> str:
+    row = {
+        "source": entry.source,
+        "translation": entry.translation,
+        "scenario": entry.scenario,
+        "glossary": entry.glossary,
+    }
+    return json.dumps(row, ensure_ascii=False) + "\n"
+
+
+def format_tm_hint(match: TMMatch) -> str:
+    """Format a near-duplicate match as a prompt hint."""
+    return (
+        "Reference translation of a similar sentence (adapt, do not copy blindly): "
+        f'"{match.entry.source}" = "{match.entry.translation}"'
+    )
+
+
+# App-wide instance
+translation_memory = TranslationMemory()
+
+
+def get_translation_memory_stats() -> dict:
+    """Lookup latency and hit counters for /api/metrics."""
+    return translation_memory.stats()
+
+
+# =============================================================================
+# Benchmark
+# =============================================================================
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    subjects = ["I", "we", "my husband", "my landlord", "the bank", "you", "they", "my GP"]
+    verbs = ["need to", "would like to", "want to", "have to", "tried to", "could"]
+    actions = ["cancel", "update", "check", "book", "report", "pay", "change", "confirm"]
+    objects = [
+        "my direct debit", "the appointment", "my meter reading", "the claim",
+        "my tax code", "the repair", "my sort code", "the policy", "my address",
+    ]
+    tails = ["today", "please", "by Friday", "next week", "as soon as possible", "", "again"]
+
+    rng = random.Random(42)
+    tm = TranslationMemory(path=Path(os.devnull))
+    tm._loaded = True
+    target = 100_000
+
+    started = time.perf_counter()
+    while len(tm._index.entries) < target:
+        sentence = " ".join(filter(None, [
+            rng.choice(subjects), rng.choice(verbs), rng.choice(actions),
+            rng.choice(objects), rng.choice(tails), f"ref {rng.randint(0, 99999)}",
+        ]))
+        tm._index.add(TMEntry(sentence, "（測試）"))
+    build_s = time.perf_counter() - started
+
+    probes = [
+        "could I take your account number",
+        "can I take your account number please",
+        "I need to cancel my direct debit today ref 123",
+        "we would like to book the appointment next week",
+    ] * 250
+    for probe in probes:
+        tm.lookup(probe)
+
+    stats = tm.stats()
+    print(f"entries={stats['entries']} build={build_s:.1f}s buckets={stats['buckets']}")
+    print(f"lookups={stats['lookups']} p50={stats['lookup_ms_p50']}ms p99={stats['lookup_ms_p99']}ms")
@@ -0,0 +1,537 @@
+"""
+Upstream HTTP Client Module - 共用上游連線池
+
+Reference:
+- spec/lessons_learned.md (Test 21 - 首字延遲)
+- https://www.python-httpx.org/advanced/clients/ (connection pooling)
+
+Every call to api.openai.com goes through the pooled clients in this module
+instead of building a fresh httpx.AsyncClient() / httpx.Client() per request.
+This removes the TCP + TLS handshake (100-300ms) from each translated segment.
+
+Features:
+- HTTP/2 multiplexing (when the optional `h2` package is installed)
+- Keep-alive connection pool shared by the whole app
+- DNS cache in front of the socket connect (TTL based)
+- Startup pre-connect (warmup) from the FastAPI lifespan
+- Pool size / keep-alive reuse metrics (get_upstream_stats)
+- x-ratelimit-* response headers fed to the per-key rate limiter
+"""
+
+import asyncio
+import importlib.util
+import logging
+import os
+import socket
+import threading
+import time
+import urllib.request
+import weakref
+from contextlib import contextmanager
+from typing import AsyncIterator, Iterator, Optional
+
+import anyio
+import httpcore
+import httpx
+
+try:
+    from .rate_limiter import rate_limiter
+except ImportError:
+    from rate_limiter import rate_limiter
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+OPENAI_API_BASE = "https://api.openai.com"
+WARMUP_URL = f"{OPENAI_API_BASE}/v1/models"
+
+# Pool configuration (可用環境變數覆寫)
+MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "10"))
+KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "90"))
+DNS_CACHE_TTL = float(os.getenv("UPSTREAM_DNS_TTL", "300"))
+WARMUP_ENABLED = os.getenv("UPSTREAM_WARMUP", "true").lower() == "true"
+
+# HTTP/2 needs the optional `h2` package (pip install httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+HTTP2_ENABLED = HTTP2_AVAILABLE and os.getenv("UPSTREAM_HTTP2", "true").lower() == "true"
+
+# Default timeout; call sites still pass their own per-request timeout
+DEFAULT_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+
+
+class IncompleteStreamError(httpx.RemoteProtocolError):
+    """An upstream stream ended before its end marker (the output is truncated).
+
+    [DONE] for Chat Completions, response.completed for the Responses API.
+    A transport error: counted against the model and its breaker, and the
+    partial output is never cached, learned or parsed as a complete answer.
+    """
+
+
+# =============================================================================
+# Metrics
+# =============================================================================
+
+_STATS = {
+    "requests": 0,
+    "responses": 0,
+    "connections_opened": 0,
+    "dns_hits": 0,
+    "dns_misses": 0,
+    "warmup_ok": 0,
+    "warmup_failed": 0,
+}
+_STATS_LOCK = threading.Lock()
+
+
+def _bump(name: str, amount: int = 1) -> None:
+    with _STATS_LOCK:
+        _STATS[name] += amount
+
+
+# =============================================================================
+# DNS Cache
+# =============================================================================
+
+_DNS_CACHE: dict = {}  # (host, port) -> (address, expires_at)
+
+
+def _dns_lookup_cached(host: str, port: int) -> Optional[str]:
+    entry = _DNS_CACHE.get((host, port))
+    if entry and entry[1] > time.monotonic():
+        _bump("dns_hits")
+        return entry[0]
+    return None
+
+
+def _dns_store(host: str, port: int, infos: list) -> str:
+    _bump("dns_misses")
+    address = infos[0][4][0]
+    _DNS_CACHE[(host, port)] = (address, time.monotonic() + DNS_CACHE_TTL)
+    return address
+
+
+def _dns_invalidate(host: str, port: int) -> None:
+    _DNS_CACHE.pop((host, port), None)
+
+
+class _CachingAsyncBackend(httpcore.AsyncNetworkBackend):
+    """Async network backend that resolves hosts through the DNS cache.
+
+    TLS still uses the original hostname for SNI / certificate checks,
+    because httpcore takes server_hostname from the request origin.
+    """
+
+    def __init__(self):
+        self._backend = httpcore.AnyIOBackend()
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        address = _dns_lookup_cached(host, port)
+        if address is None:
+            infos = await anyio.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+            address = _dns_store(host, port, infos)
+        try:
+            stream = await self._backend.connect_tcp(
+                address, port, timeout=timeout,
+                local_address=local_address, socket_options=socket_options,
+            )
+        except Exception:
+            _dns_invalidate(host, port)
+            raise
+        _bump("connections_opened")
+        return stream
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self._backend.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    async def sleep(self, seconds: float) -> None:
+        await self._backend.sleep(seconds)
+
+
+class _CachingSyncBackend(httpcore.NetworkBackend):
+    """Sync counterpart of _CachingAsyncBackend (for threadpool / OpenAI SDK callers)."""
+
+    def __init__(self):
+        self._backend = httpcore.SyncBackend()
+
+    def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        address = _dns_lookup_cached(host, port)
+        if address is None:
+            infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+            address = _dns_store(host, port, infos)
+        try:
+            stream = self._backend.connect_tcp(
+                address, port, timeout=timeout,
+                local_address=local_address, socket_options=socket_options,
+            )
+        except Exception:
+            _dns_invalidate(host, port)
+            raise
+        _bump("connections_opened")
+        return stream
+
+    def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return self._backend.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    def sleep(self, seconds: float) -> None:
+        self._backend.sleep(seconds)
+
+
+# =============================================================================
+# Client Construction
+# =============================================================================
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+
+
+# httpcore errors as the httpx errors callers catch, most specific first
+_HTTPCORE_ERRORS = (
+    (httpcore.ConnectTimeout, httpx.ConnectTimeout),
+    (httpcore.ReadTimeout, httpx.ReadTimeout),
+    (httpcore.WriteTimeout, httpx.WriteTimeout),
+    (httpcore.PoolTimeout, httpx.PoolTimeout),
+    (httpcore.TimeoutException, httpx.TimeoutException),
+    (httpcore.ConnectError, httpx.ConnectError),
+    (httpcore.ReadError, httpx.ReadError),
+    (httpcore.WriteError, httpx.WriteError),
+    (httpcore.NetworkError, httpx.NetworkError),
+    (httpcore.ProxyError, httpx.ProxyError),
+    (httpcore.UnsupportedProtocol, httpx.UnsupportedProtocol),
+    (httpcore.RemoteProtocolError, httpx.RemoteProtocolError),
+    (httpcore.LocalProtocolError, httpx.LocalProtocolError),
+    (httpcore.ProtocolError, httpx.ProtocolError),
+)
+
+
+@contextmanager
+def _httpx_errors(request: httpx.Request) -> Iterator[None]:
+    """Re-raise httpcore errors as their httpx counterparts."""
+    try:
+        yield
+    except tuple(core for core, _ in _HTTPCORE_ERRORS) as e:
+        mapped = next(error for core, error in _HTTPCORE_ERRORS if isinstance(e, core))
+        raise mapped(str(e), request=request) from e
+
+
+def _core_request(request: httpx.Request) -> httpcore.Request:
+    return httpcore.Request(
+        method=request.method,
+        url=httpcore.URL(
+            scheme=request.url.raw_scheme,
+            host=request.url.raw_host,
+            port=request.url.port,
+            target=request.url.raw_path,
+        ),
+        headers=request.headers.raw,
+        content=request.stream,
+        extensions=request.extensions,
+    )
+
+
+class _AsyncResponseStream(httpx.AsyncByteStream):
+    def __init__(self, stream, request: httpx.Request):
+        self._stream = stream
+        self._request = request
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        with _httpx_errors(self._request):
+            async for part in self._stream:
+                yield part
+
+    async def aclose(self) -> None:
+        await self._stream.aclose()
+
+
+class _SyncResponseStream(httpx.SyncByteStream):
+    def __init__(self, stream, request: httpx.Request):
+        self._stream = stream
+        self._request = request
+
+    def __iter__(self) -> Iterator[bytes]:
+        with _httpx_errors(self._request):
+            for part in self._stream:
+                yield part
+
+    def close(self) -> None:
+        self._stream.close()
+
+
+class _PooledAsyncTransport(httpx.AsyncBaseTransport):
+    """httpx transport over an httpcore pool built with the DNS-caching backend."""
+
+    def __init__(self):
+        self.pool = httpcore.AsyncConnectionPool(
+            ssl_context=httpx.create_ssl_context(),
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+            http2=HTTP2_ENABLED,
+            network_backend=_CachingAsyncBackend(),
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        with _httpx_errors(request):
+            response = await self.pool.handle_async_request(_core_request(request))
+        return httpx.Response(
+            status_code=response.status,
+            headers=response.headers,
+            stream=_AsyncResponseStream(response.stream, request),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        await self.pool.aclose()
+
+
+class _PooledSyncTransport(httpx.BaseTransport):
+    """Sync counterpart of _PooledAsyncTransport."""
+
+    def __init__(self):
+        self.pool = httpcore.ConnectionPool(
+            ssl_context=httpx.create_ssl_context(),
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+            http2=HTTP2_ENABLED,
+            network_backend=_CachingSyncBackend(),
+        )
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        with _httpx_errors(request):
+            response = self.pool.handle_request(_core_request(request))
+        return httpx.Response(
+            status_code=response.status,
+            headers=response.headers,
+            stream=_SyncResponseStream(response.stream, request),
+            extensions=response.extensions,
+        )
+
+    def close(self) -> None:
+        self.pool.close()
+
+
+def _observe_rate_limits(response: httpx.Response) -> None:
+    """Learn the caller's remaining request / token budget from the headers."""
+    if response.request.url.host != "api.openai.com":
+        return
+    authorization = response.request.headers.get("authorization", "")
+    api_key = authorization[7:] if authorization.startswith("Bearer ") else None
+    rate_limiter.observe(api_key, response.headers, response.status_code)
+
+
+async def _on_async_request(request: httpx.Request) -> None:
+    _bump("requests")
+
+
+async def _on_async_response(response: httpx.Response) -> None:
+    _bump("responses")
+    _observe_rate_limits(response)
+
+
+def _on_sync_request(request: httpx.Request) -> None:
+    _bump("requests")
+
+
+def _on_sync_response(response: httpx.Response) -> None:
+    _bump("responses")
+    _observe_rate_limits(response)
+
+
+# Connection pool behind each client built with a caching transport
+_POOLS: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def _env_proxy_configured() -> bool:
+    # An explicit transport disables httpx's env proxy support, so only
+    # install the caching transport when no HTTPS proxy is configured.
+    return "https" in urllib.request.getproxies()
+
+
+def _build_async_client() -> httpx.AsyncClient:
+    options = dict(timeout=DEFAULT_TIMEOUT, event_hooks={
+        "request": [_on_async_request],
+        "response": [_on_async_response],
+    })
+    if _env_proxy_configured():
+        return httpx.AsyncClient(http2=HTTP2_ENABLED, limits=_limits(), **options)
+
+    transport = _PooledAsyncTransport()
+    client = httpx.AsyncClient(transport=transport, **options)
+    _POOLS[client] = transport.pool
+    return client
+
+
+def _build_sync_client() -> httpx.Client:
+    options = dict(timeout=DEFAULT_TIMEOUT, event_hooks={
+        "request": [_on_sync_request],
+        "response": [_on_sync_response],
+    })
+    if _env_proxy_configured():
+        return httpx.Client(http2=HTTP2_ENABLED, limits=_limits(), **options)
+
+    transport = _PooledSyncTransport()
+    client = httpx.Client(transport=transport, **options)
+    _POOLS[client] = transport.pool
+    return client
+
+
+# =============================================================================
+# Shared Clients
+# =============================================================================
+
+_async_client: Optional[httpx.AsyncClient] = None
+_async_client_loop = None
+_sync_client: Optional[httpx.Client] = None
+_sync_client_lock = threading.Lock()
+_warmup_task: Optional[asyncio.Task] = None
+_closing_tasks: set = set()
+
+
+async def _aclose_quietly(client: httpx.AsyncClient) -> None:
+    try:
+        await client.aclose()
+    except Exception as e:
+        # Its loop is already closed: the sockets went with it
+        logger.debug(f"[Upstream] Stale async client closed with error: {e}")
+
+
+def _close_stale_async_client(client: httpx.AsyncClient, client_loop, loop) -> None:
+    """Close the client of a previous event loop instead of leaking its pool.
+
+    Closed on its own loop while that loop still runs (its connections are
+    bound to it), otherwise on the current one.
+    """
+    if client.is_closed:
+        return
+    if client_loop is not None and client_loop is not loop and client_loop.is_running():
+        asyncio.run_coroutine_threadsafe(_aclose_quietly(client), client_loop)
+    elif loop is not None:
+        task = loop.create_task(_aclose_quietly(client))
+        _closing_tasks.add(task)
+        task.add_done_callback(_closing_tasks.discard)
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Return the app-wide pooled AsyncClient.
+
+    Created lazily so modules work outside the FastAPI lifespan (tests, scripts).
+    Async connections are bound to the event loop that opened them, so a new
+    client is built if the running loop has changed (the old one is closed).
+    """
+    global _async_client, _async_client_loop
+
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+
+    if _async_client is None or _async_client.is_closed or _async_client_loop is not loop:
+        if _async_client is not None:
+            _close_stale_async_client(_async_client, _async_client_loop, loop)
+        _async_client = _build_async_client()
+        _async_client_loop = loop
+        logger.info(f"[Upstream] Async client ready (http2={HTTP2_ENABLED}, max_connections={MAX_CONNECTIONS})")
+    return _async_client
+
+
+def get_sync_client() -> httpx.Client:
+    """Return the app-wide pooled sync Client (thread-safe, used from the threadpool)."""
+    global _sync_client
+
+    with _sync_client_lock:
+        if _sync_client is None or _sync_client.is_closed:
+            _sync_client = _build_sync_client()
+            logger.info(f"[Upstream] Sync client ready (http2={HTTP2_ENABLED}, max_connections={MAX_CONNECTIONS})")
+        return _sync_client
+
+
+# =============================================================================
+# Lifespan Hooks
+# =============================================================================
+
+async def warmup() -> None:
+    """Pre-connect to api.openai.com so the first translation skips DNS + TLS.
+
+    An unauthenticated HEAD is enough to finish the handshake; the 401 is ignored.
+    """
+    try:
+        await get_async_client().head(WARMUP_URL, timeout=5.0)
+        await asyncio.to_thread(get_sync_client().head, WARMUP_URL, timeout=5.0)
+        _bump("warmup_ok")
+        logger.info("[Upstream] Warmup complete")
+    except Exception as e:
+        _bump("warmup_failed")
+        logger.warning(f"[Upstream] Warmup failed (will connect on first request): {e}")
+
+
+async def start_upstream() -> None:
+    """Create the pooled clients and schedule the warmup (non-blocking)."""
+    global _warmup_task
+
+    get_async_client()
+    get_sync_client()
+    if WARMUP_ENABLED:
+        _warmup_task = asyncio.create_task(warmup())
+
+
+async def close_upstream() -> None:
+    """Close the pooled clients at shutdown."""
+    global _async_client, _sync_client, _warmup_task
+
+    if _warmup_task and not _warmup_task.done():
+        _warmup_task.cancel()
+    _warmup_task = None
+
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+    with _sync_client_lock:
+        if _sync_client is not None:
+            _sync_client.close()
+            _sync_client = None
+
+
+# =============================================================================
+# Stats
+# =============================================================================
+
+def _pool_stats(client) -> dict:
+    """Connection counts of a client's pool (empty for proxied clients)."""
+    pool = _POOLS.get(client) if client is not None else None
+    connections = pool.connections if pool is not None else []
+    idle = sum(1 for c in connections if c.is_idle())
+    return {
+        "connections": len(connections),
+        "idle": idle,
+        "active": len(connections) - idle,
+    }
+
+
+def get_upstream_stats() -> dict:
+    """Pool size and keep-alive reuse metrics for /api/metrics."""
+    with _STATS_LOCK:
+        stats = dict(_STATS)
+
+    # Share of upstream responses served over an already-open connection
+    responses = stats["responses"]
+    opened = stats["connections_opened"]
+    stats["connection_reuse_ratio"] = round(max(0.0, 1 - opened / responses), 3) if responses else None
+    stats["http2"] = HTTP2_ENABLED
+    stats["limits"] = {
+        "max_connections": MAX_CONNECTIONS,
+        "max_keepalive_connections": MAX_KEEPALIVE_CONNECTIONS,
+        "keepalive_expiry": KEEPALIVE_EXPIRY,
+    }
+    stats["async_pool"] = _pool_stats(_async_client)
+    stats["sync_pool"] = _pool_stats(_sync_client)
+    stats["dns_cache_entries"] = len(_DNS_CACHE)
+    return stats
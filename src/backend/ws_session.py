@@ -0,0 +1,144 @@
+"""
+Session WebSocket Channel - 單一連線多工通道
+
+Reference:
+- src/frontend/segment_store.js (SessionMessageRouter)
+- src/frontend/session_socket.js
+
+Each translated segment used to cost its own POST + SSE response (headers,
+CORS preflight, connection setup). /ws/session carries a whole call's
+translations, speculative interim updates, suggestions and controller
+directives over one WebSocket instead.
+
+Wire format (JSON):
+
+    client → server
+        {"type": "auth", "api_key": "..."}                     (first message)
+        {"type": "translate" | "interim" | "suggest" | "controller",
+         "segment_id": "...", ...request fields...,
+         "deadline_ms": n}                                      (optional budget,
+                                                                 as X-Request-Deadline-Ms)
+        {"type": "cancel", "segment_id": "..."}
+        {"type": "ping"}
+
+    server → client
+        {"type": ..., "segment_id": "...", "seq": n, "part": k, "data": {...}}
+        {"type": "scenario", ..., "data": {"scenario", "top", "confidence", "segments"}}
+            (detected call scenario changed; scenario_detector.py)
+
+`seq` is monotonic per connection, `part` is monotonic per segment_id, and
+`data` has exactly the shape of the matching HTTP endpoint's SSE event /
+JSON body, so the frontend can reuse its existing handlers. Streams for
+different segments run concurrently and interleave; the frontend router
+uses (segment_id, part) to put each segment's messages back in order.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# Metrics
+# =============================================================================
+
+_STATS = {
+    "sessions_opened": 0,
+    "sessions_active": 0,
+    "messages_received": 0,
+    "messages_sent": 0,
+    "streams_started": 0,
+    "streams_cancelled": 0,
+}
+
+
+def get_session_channel_stats() -> dict:
+    """Connection / message counters for /api/metrics."""
+    return dict(_STATS)
+
+
+# =============================================================================
+# Channel
+# =============================================================================
+
+class SessionChannel:
+    """One /ws/session connection: numbered sends + per-segment tasks."""
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.seq = 0
+        self._parts: Dict[str, int] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._send_lock = asyncio.Lock()
+        self.closed = False
+        _STATS["sessions_opened"] += 1
+        _STATS["sessions_active"] += 1
+
+    async def send(self, msg_type: str, segment_id: Optional[str] = None, data: Any = None) -> bool:
+        """Send one tagged message. Returns False once the socket is gone."""
+        if self.closed:
+            return False
+
+        async with self._send_lock:
+            self.seq += 1
+            message = {"type": msg_type, "seq": self.seq}
+            if segment_id is not None:
+                part = self._parts.get(segment_id, 0)
+                self._parts[segment_id] = part + 1
+                message["segment_id"] = segment_id
+                message["part"] = part
+            if data is not None:
+                message["data"] = data
+            try:
+                await self.websocket.send_json(message)
+            except Exception as e:
+                # Client went away mid-stream; stop every producer
+                logger.info(f"[Session] Send failed, closing channel: {e}")
+                self.closed = True
+                return False
+
+        _STATS["messages_sent"] += 1
+        return True
+
+    async def is_disconnected(self) -> bool:
+        """Disconnect check for stream_guard.guard_stream."""
+        return self.closed
+
+    def received(self) -> None:
+        _STATS["messages_received"] += 1
+
+    def spawn(self, segment_id: str, coro: Awaitable) -> None:
+        """Run a producer for segment_id; a newer one for the same id replaces it."""
+        self.cancel(segment_id)
+        task = asyncio.create_task(coro)
+        self._tasks[segment_id] = task
+        _STATS["streams_started"] += 1
+
+        def _forget(done: asyncio.Task) -> None:
+            if self._tasks.get(segment_id) is done:
+                del self._tasks[segment_id]
+            if not done.cancelled() and done.exception() is not None:
+                logger.error(f"[Session] Segment {segment_id} failed: {done.exception()}")
+
+        task.add_done_callback(_forget)
+
+    def cancel(self, segment_id: str) -> bool:
+        task = self._tasks.pop(segment_id, None)
+        if task is None or task.done():
+            return False
+        task.cancel()
+        _STATS["streams_cancelled"] += 1
+        return True
+
+    def forget_segment(self, segment_id: str) -> None:
+        """Drop the part counter once a segment has finished."""
+        self._parts.pop(segment_id, None)
+
+    async def close(self) -> None:
+        """Cancel every running producer (connection closed)."""
+        self.closed = True
+        for segment_id in list(self._tasks):
+            self.cancel(segment_id)
+        _STATS["sessions_active"] -= 1
@@ -598,6 +598,82 @@ class EnhancedSegmentStore extends SegmentStore {
     }
 }
 
+// =============================================================================
+// SessionMessageRouter 類（/ws/session 多工訊息路由）
+// =============================================================================
+
+/**
+ * SessionMessageRouter - 將 /ws/session 的訊息路由到對應的 segment
+ *
+ * Reference: src/backend/ws_session.py
+ *
+ * 伺服器訊息格式：{type, segment_id, seq, part, data}
+ * - seq：整條連線單調遞增
+ * - part：每個 segment_id 內單調遞增（從 0 開始）
+ *
+ * 不同 segment 的串流會交錯到達；同一 segment 的訊息若亂序，
+ * 先緩存，等缺少的 part 到達後再按順序交付。
+ */
+class SessionMessageRouter {
+    constructor() {
+        this.routes = new Map();   // segment_id → { handler, nextPart, pending: Map(part → msg) }
+        this.lastSeq = 0;
+        this.onUnrouted = null;    // (msg) => void — 沒有登記的 segment（例如已取消）
+    }
+
+    /**
+     * 登記 segment 的處理函數
+     * @param {string} segmentId
+     * @param {function} handler - (data, msg) => void，按 part 順序調用
+     */
+    expect(segmentId, handler) {
+        this.routes.set(segmentId, { handler, nextPart: 0, pending: new Map() });
+    }
+
+    /**
+     * 移除 segment（完成或取消後）
+     */
+    release(segmentId) {
+        this.routes.delete(segmentId);
+    }
+
+    /**
+     * 路由一條伺服器訊息
+     * @returns {boolean} - 是否有對應的 segment
+     */
+    route(msg) {
+        if (typeof msg.seq === 'number' && msg.seq > this.lastSeq) {
+            this.lastSeq = msg.seq;
+        }
+
+        const route = msg.segment_id !== undefined ? this.routes.get(msg.segment_id) : null;
+        if (!route) {
+            if (this.onUnrouted) this.onUnrouted(msg);
+            return false;
+        }
+
+        if (msg.part < route.nextPart) {
+            console.warn(`[Router] Duplicate part ${msg.part} for ${msg.segment_id}, ignoring`);
+            return true;
+        }
+        route.pending.set(msg.part, msg);
+
+        // 按順序交付所有已到達的 part
+        while (route.pending.has(route.nextPart)) {
+            const next = route.pending.get(route.nextPart);
+            route.pending.delete(route.nextPart);
+            route.nextPart++;
+            route.handler(next.data, next);
+        }
+        return true;
+    }
+
+    reset() {
+        this.routes.clear();
+        this.lastSeq = 0;
+    }
+}
+
 // =============================================================================
 // Exports
 // =============================================================================
@@ -608,6 +684,7 @@ if (typeof window !== 'undefined') {
     window.Segment = Segment;
     window.SegmentStore = SegmentStore;
     window.EnhancedSegmentStore = EnhancedSegmentStore;
+    window.SessionMessageRouter = SessionMessageRouter;
 }
 
 // For Node.js (tests)
@@ -617,6 +694,7 @@ if (typeof module !== 'undefined' && module.exports) {
         Segment,
         SegmentStore,
         EnhancedSegmentStore,
+        SessionMessageRouter,
         VALID_TRANSITIONS,
         STATUS_TIMEOUTS
     };
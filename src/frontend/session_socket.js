@@ -0,0 +1,213 @@
+/**
+ * Session Socket - /ws/session 多工連線
+ *
+ * Reference:
+ * - src/backend/ws_session.py (wire format)
+ * - src/frontend/segment_store.js (SessionMessageRouter)
+ *
+ * 一個通話只用一條 WebSocket 傳送所有翻譯、interim 推測、建議和 controller
+ * 指令，省去每段 POST + SSE 的 header、CORS 預檢和連線建立開銷（手機上明顯）。
+ *
+ * 用法：
+ *   const socket = new SessionSocket({ getApiKey });
+ *   await socket.connect();
+ *   for await (const data of socket.stream('translate', segmentId, body)) { ... }
+ *
+ * stream() 產生的 data 與對應 HTTP 端點的 SSE 事件格式完全相同，
+ * 所以現有的處理邏輯可以直接重用。連線失敗時 connect() 回傳 false，
+ * 呼叫者應退回 HTTP 端點。
+ */
+
+// Node.js (tests)：從 segment_store.js 取得 router
+const _SessionMessageRouter = (typeof SessionMessageRouter !== 'undefined')
+    ? SessionMessageRouter
+    : require('./segment_store.js').SessionMessageRouter;
+
+class SessionSocket {
+    constructor(options = {}) {
+        const protocol = (typeof location !== 'undefined' && location.protocol === 'https:') ? 'wss' : 'ws';
+        const host = typeof location !== 'undefined' ? location.host : 'localhost:8000';
+        this.url = options.url || `${protocol}://${host}/ws/session`;
+        this.getApiKey = options.getApiKey || (() => null);
+        this.connectTimeout = options.connectTimeout || 3000;  // ms
+
+        this.ws = null;
+        this.ready = false;
+        this.router = new _SessionMessageRouter();
+        this._connecting = null;
+        this._streams = new Map();  // segment_id → push(data, msg)
+    }
+
+    /**
+     * 建立連線並完成 auth
+     * @returns {Promise<boolean>} - 是否可用
+     */
+    connect() {
+        if (this.ready) return Promise.resolve(true);
+        if (this._connecting) return this._connecting;
+
+        const apiKey = this.getApiKey();
+        if (!apiKey || typeof WebSocket === 'undefined') return Promise.resolve(false);
+
+        this._connecting = new Promise((resolve) => {
+            let settled = false;
+            const settle = (ok) => {
+                if (settled) return;
+                settled = true;
+                this._connecting = null;
+                resolve(ok);
+            };
+            const timer = setTimeout(() => {
+                console.warn('[SessionSocket] Connect timeout');
+                settle(false);
+                if (this.ws) this.ws.close();
+            }, this.connectTimeout);
+
+            const ws = new WebSocket(this.url);
+            this.ws = ws;
+
+            ws.onopen = () => {
+                ws.send(JSON.stringify({ type: 'auth', api_key: apiKey }));
+            };
+
+            ws.onmessage = (event) => {
+                let msg;
+                try {
+                    msg = JSON.parse(event.data);
+                } catch (parseErr) {
+                    return;
+                }
+                if (msg.type === 'ready') {
+                    clearTimeout(timer);
+                    this.ready = true;
+                    console.log('[SessionSocket] Ready');
+                    settle(true);
+                    return;
+                }
+                if (!this.ready && msg.type === 'error') {
+                    console.warn(`[SessionSocket] Auth failed: ${msg.data && msg.data.error}`);
+                }
+                this.router.route(msg);
+            };
+
+            ws.onclose = () => {
+                clearTimeout(timer);
+                this._handleClose();
+                settle(false);
+            };
+
+            ws.onerror = () => {
+                console.warn('[SessionSocket] Connection error');
+            };
+        });
+
+        return this._connecting;
+    }
+
+    isReady() {
+        return this.ready && this.ws && this.ws.readyState === WebSocket.OPEN;
+    }
+
+    /**
+     * 送出請求並以 async iterator 取得回應
+     * @param {string} type - 'translate' | 'suggest' | 'controller'
+     * @param {string} segmentId
+     * @param {object} payload - 與 HTTP 端點相同的 request body
+     */
+    async *stream(type, segmentId, payload) {
+        const queue = [];
+        let wake = null;
+
+        const push = (data, msg) => {
+            queue.push({ data, msg });
+            if (wake) {
+                wake();
+                wake = null;
+            }
+        };
+
+        this._streams.set(segmentId, push);
+        this.router.expect(segmentId, push);
+
+        try {
+            this._send({ ...payload, type, segment_id: segmentId });
+
+            while (true) {
+                if (queue.length === 0) {
+                    await new Promise((resolve) => { wake = resolve; });
+                    continue;
+                }
+                const { data, msg } = queue.shift();
+                yield data;
+                if (SessionSocket.isTerminal(msg.type, data)) return;
+            }
+        } finally {
+            this._streams.delete(segmentId);
+            this.router.release(segmentId);
+        }
+    }
+
+    /**
+     * interim 推測式翻譯（fire-and-forget，不等回應）
+     */
+    sendInterim(segmentId, payload) {
+        if (!this.isReady()) return false;
+        this._send({ ...payload, type: 'interim', segment_id: segmentId });
+        return true;
+    }
+
+    /**
+     * 取消 segment 的上游請求
+     */
+    cancel(segmentId) {
+        if (this.isReady()) {
+            this._send({ type: 'cancel', segment_id: segmentId });
+        }
+    }
+
+    close() {
+        if (this.ws) this.ws.close();
+    }
+
+    /**
+     * 判斷訊息是否為該 segment 的最後一條
+     */
+    static isTerminal(type, data) {
+        if (type === 'translate') return Boolean(data && (data.done || data.error));
+        if (type === 'suggest') return Boolean(data && (data.type === 'done' || data.type === 'error'));
+        return true;  // controller / interim / error：單一回應
+    }
+
+    _send(message) {
+        if (!this.isReady()) {
+            throw new Error('Session socket not connected');
+        }
+        this.ws.send(JSON.stringify(message));
+    }
+
+    _handleClose() {
+        const wasReady = this.ready;
+        this.ready = false;
+        this.ws = null;
+        // 結束所有等待中的串流（呼叫者會顯示錯誤或重試）
+        for (const push of this._streams.values()) {
+            push({ error: 'Session connection closed', type: 'error' }, { type: 'error' });
+        }
+        this.router.reset();
+        if (wasReady) console.log('[SessionSocket] Closed');
+    }
+}
+
+// =============================================================================
+// Exports
+// =============================================================================
+
+// For browser
+if (typeof window !== 'undefined') {
+    window.SessionSocket = SessionSocket;
+}
+
+// For Node.js (tests)
+if (typeof module !== 'undefined' && module.exports) {
+    module.exports = { SessionSocket };
+}
@@ -46,6 +46,12 @@ class SmartSegmenter {
 
         // 回調
         this.onSegment = null;  // (segment, reason) => void
+        this.onInterim = null;  // (text, {segmentIndex, revision, pause}) => void — 推測式翻譯用
+
+        // 推測式翻譯：每個分段內的 revision 編號（interim 與 final 共用）
+        this.revision = 0;
+        this.interimPauseThreshold = options.interimPauseThreshold || 300;  // 短停頓即通知後端
+        this._interimPauseSent = false;
 
         // 定時器（用於偵測長停頓）
         this.pauseCheckTimer = null;
@@ -160,6 +166,7 @@ class SmartSegmenter {
 
         // 🔧 動態穩定性檢測：如果文字有變化，取消待發出的 segment
         // 這避免了在單詞中間切割（如 "g" → "gpt4"）
+        let textChanged = false;
         if (currentSegmentText !== this.lastBufferSnapshot) {
             if (this.pendingEmit) {
                 clearTimeout(this.pendingEmit);
@@ -167,6 +174,7 @@ class SmartSegmenter {
                 console.log(`[SmartSegmenter] Text changed, cancelled pending emit`);
             }
             this.lastBufferSnapshot = currentSegmentText;
+            textChanged = true;
         }
 
         // 🐛 修復：buffer 只存儲當前分段的文字，不是整個累積文字
@@ -174,6 +182,11 @@ class SmartSegmenter {
         this.wordCount = this._countWords(this.buffer);
         this.lastUpdateTime = now;
 
+        if (textChanged && !isFinal) {
+            this._interimPauseSent = false;
+            this._notifyInterim(false);
+        }
+
         // 記錄當前 filteredTranscript 長度，用於分段時更新 processedLength
         this._currentTranscriptLength = filteredTranscript.length;
 
@@ -330,7 +343,8 @@ class SmartSegmenter {
                 reason,
                 wordCount: this._countWords(segment),
                 duration,
-                segmentIndex: this.segmentCount
+                segmentIndex: this.segmentCount,
+                revision: ++this.revision
             });
         }
 
@@ -352,6 +366,22 @@ class SmartSegmenter {
         this.buffer = '';
         this.wordCount = 0;
         this.segmentStartTime = Date.now();
+        this.revision = 0;
+        this._interimPauseSent = false;
+    }
+
+    /**
+     * 通知 interim 文字（推測式翻譯）
+     * 後端會翻譯穩定前綴，final segment 到達時重用
+     */
+    _notifyInterim(pause) {
+        if (!this.onInterim || !this.buffer.trim()) return;
+        this.revision++;
+        this.onInterim(this.buffer.trim(), {
+            segmentIndex: this.segmentCount + 1,  // 即將發出的分段
+            revision: this.revision,
+            pause
+        });
     }
 
     /**
@@ -410,6 +440,12 @@ class SmartSegmenter {
 
         const pauseDuration = Date.now() - this.lastUpdateTime;
 
+        // 短停頓：整段 interim 視為穩定，讓後端提早翻譯
+        if (pauseDuration >= this.interimPauseThreshold && !this._interimPauseSent) {
+            this._interimPauseSent = true;
+            this._notifyInterim(true);
+        }
+
         if (pauseDuration >= this.pauseThreshold) {
             console.log(`[SmartSegmenter] Pause detected: ${pauseDuration}ms, scheduling emit...`);
             this._scheduleEmit('pause_timeout');
@@ -0,0 +1,206 @@
+"""
+Unit tests for adaptive upstream timeouts.
+
+Reference:
+- src/backend/adaptive_timeout.py
+- src/backend/deadline.py (upstream_timeout caps the adaptive value)
+- src/backend/main.py (_suggest_stream)
+
+Run with:
+    python -m pytest src/tests/test_adaptive_timeout.py -v
+"""
+
+import sys
+import os
+import asyncio
+import json
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+# Ensure src is in path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.backend import adaptive_timeout as at
+from src.backend import deadline as deadline_module
+from src.backend.adaptive_timeout import (
+    FIRST_TOKEN,
+    IDLE,
+    TOTAL,
+    StreamTimeout,
+    adaptive_timeout,
+    get_timeout_stats,
+    record_timeout,
+    record_timing,
+    timed_lines,
+    timeout_ceiling,
+)
+from src.backend.deadline import start_deadline, upstream_timeout
+
+
+@pytest.fixture(autouse=True)
+def fresh_windows():
+    """Windows are app-wide: start each test without samples or a deadline."""
+    at._WINDOWS.clear()
+    token = deadline_module._current.set(None)
+    yield
+    deadline_module._current.reset(token)
+    at._WINDOWS.clear()
+
+
+def _warm(endpoint: str, model: str, kind: str, ms: float) -> None:
+    for _ in range(at.ADAPTIVE_TIMEOUT_MIN_SAMPLES):
+        record_timing(endpoint, model, kind, ms)
+
+
+# =============================================================================
+# Test: Computed Timeouts
+# =============================================================================
+
+class TestTimeouts:
+    """p99 × factor, clamped to the policy; default until warmed up."""
+
+    def test_default_until_warm(self):
+        record_timing("translate", "m", TOTAL, 500)
+        assert adaptive_timeout("translate", "m", TOTAL) == 10.0
+
+    def test_from_p99(self):
+        _warm("translate", "m", TOTAL, 1500)
+        assert adaptive_timeout("translate", "m", TOTAL) == pytest.approx(1.5 * at.ADAPTIVE_TIMEOUT_FACTOR)
+
+    def test_clamped(self):
+        _warm("translate_stream", "fast", FIRST_TOKEN, 10)
+        _warm("controller", "slow", TOTAL, 60_000)
+        assert adaptive_timeout("translate_stream", "fast", FIRST_TOKEN) == 1.5
+        assert adaptive_timeout("controller", "slow", TOTAL) == 60.0
+
+    def test_per_model(self):
+        _warm("translate", "fast", TOTAL, 1500)
+        assert adaptive_timeout("translate", "other", TOTAL) == 10.0
+
+    def test_ceiling(self):
+        assert timeout_ceiling("controller") == 60.0
+
+    def test_deadline_caps(self):
+        start_deadline("test", "2000", 10.0)
+        assert upstream_timeout(8.0).read <= 2.0
+        assert upstream_timeout(0.5).read == 0.5
+
+    def test_timeouts_widen(self):
+        """A model slower than its timeout is not locked out."""
+        _warm("translate", "m", TOTAL, 1000)
+        assert adaptive_timeout("translate", "m", TOTAL) == 2.0
+        for _ in range(at.ADAPTIVE_TIMEOUT_WIDEN_AFTER - 1):
+            record_timeout("translate", "m", TOTAL, 2.0)
+        assert adaptive_timeout("translate", "m", TOTAL) == 4.0  # censored samples lift p99
+        record_timeout("translate", "m", TOTAL, 4.0)
+        assert adaptive_timeout("translate", "m", TOTAL) == 10.0  # policy max until a success
+        assert get_timeout_stats()["current"]["translate:m:total"]["source"] == "widened"
+        record_timing("translate", "m", TOTAL, 3000)
+        assert adaptive_timeout("translate", "m", TOTAL) == 8.0
+
+    def test_samples_age_out(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr(at.time, "monotonic", lambda: now[0])
+        _warm("translate", "m", TOTAL, 1500)
+        assert adaptive_timeout("translate", "m", TOTAL) == 3.0
+        now[0] += at.ADAPTIVE_TIMEOUT_MAX_AGE_S + 1
+        assert len(at._WINDOWS[("translate", "m", TOTAL)]) == 0
+        assert adaptive_timeout("translate", "m", TOTAL) == 10.0
+
+    def test_stats(self):
+        _warm("translate", "m", TOTAL, 1500)
+        current = get_timeout_stats()["current"]["translate:m:total"]
+        assert current["source"] == "adaptive"
+        assert current["samples"] == at.ADAPTIVE_TIMEOUT_MIN_SAMPLES
+
+
+# =============================================================================
+# Test: Streams
+# =============================================================================
+
+class TestTimedLines:
+    """First line bounded by first_token, later lines by idle."""
+
+    @pytest.mark.asyncio
+    async def test_records_first_token_and_idle(self):
+        async def lines():
+            for line in ["a", "b", "c"]:
+                await asyncio.sleep(0.01)
+                yield line
+
+        assert [line async for line in timed_lines(lines(), "suggest", "m")] == ["a", "b", "c"]
+        assert len(at._WINDOWS[("suggest", "m", FIRST_TOKEN)]) == 1
+        assert len(at._WINDOWS[("suggest", "m", IDLE)]) == 1
+
+    @pytest.mark.asyncio
+    async def test_idle_timeout(self, monkeypatch):
+        monkeypatch.setitem(at.TIMEOUT_POLICIES, ("suggest", IDLE), at.TimeoutPolicy(0.05, 0.01, 0.05))
+        closed = []
+
+        async def stalls():
+            try:
+                yield "a"
+                await asyncio.sleep(1)
+                yield "b"
+            finally:
+                closed.append(True)
+
+        items = []
+        with pytest.raises(StreamTimeout) as info:
+            async for line in timed_lines(stalls(), "suggest", "m"):
+                items.append(line)
+        assert items == ["a"]
+        assert info.value.kind == IDLE
+        assert isinstance(info.value, httpx.ReadTimeout)
+        assert at._WINDOWS[("suggest", "m", IDLE)].consecutive_timeouts == 1
+        assert closed == [True]
+        assert get_timeout_stats()["stream_timeouts"]["suggest:idle"] >= 1
+
+    @pytest.mark.asyncio
+    async def test_first_token_timeout(self, monkeypatch):
+        monkeypatch.setitem(
+            at.TIMEOUT_POLICIES, ("translate_stream", FIRST_TOKEN), at.TimeoutPolicy(0.05, 0.01, 0.05)
+        )
+
+        async def silent():
+            await asyncio.sleep(1)
+            yield "a"
+
+        with pytest.raises(StreamTimeout) as info:
+            async for _ in timed_lines(silent(), "translate_stream", "m"):
+                pass
+        assert info.value.kind == FIRST_TOKEN
+
+    @pytest.mark.asyncio
+    async def test_suggest_stream_idle_gap(self, monkeypatch):
+        """A stalled suggestion stream stops at the idle timeout, not the first-token one."""
+        from src.backend import circuit_breaker, main
+
+        monkeypatch.setitem(at.TIMEOUT_POLICIES, ("suggest", IDLE), at.TimeoutPolicy(0.05, 0.01, 0.05))
+
+        class Stalls(httpx.AsyncByteStream):
+            async def __aiter__(self):
+                yield b'data: {"choices": [{"delta": {"content": "Sure"}}]}\n\n'
+                await asyncio.sleep(1)
+                yield b"data: [DONE]\n\n"
+
+        def handler(request):
+            return httpx.Response(200, stream=Stalls(), headers={"content-type": "text/event-stream"})
+
+        upstream = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        started = asyncio.get_running_loop().time()
+        with patch.object(main, "get_async_client", lambda: upstream), \
+                patch.dict(circuit_breaker._BREAKERS, clear=True):
+            events = [json.loads(line[6:]) async for line in main._suggest_stream("k", "hi", 1)]
+        assert asyncio.get_running_loop().time() - started < 0.5
+        assert events == [{"type": "error", "error": "API timeout"}]
+        model = main.SUGGEST_MODEL
+        assert at._WINDOWS[("suggest", model, IDLE)].consecutive_timeouts == 1
+        assert ("suggest", model, FIRST_TOKEN) in at._WINDOWS
+        assert at._WINDOWS[("suggest", model, FIRST_TOKEN)].consecutive_timeouts == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,274 @@
+"""
+Unit tests for the upstream circuit breakers.
+
+Reference:
+- src/backend/circuit_breaker.py
+- src/backend/main.py (_routed_translation_deltas, _stream_translation_deltas)
+- src/backend/controller.py (canned fallback)
+
+Run with:
+    python -m pytest src/tests/test_circuit_breaker.py -v
+"""
+
+import sys
+import os
+import json
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+# Ensure src is in path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.backend import circuit_breaker as cb
+from src.backend.circuit_breaker import (
+    CircuitBreaker,
+    CircuitOpenError,
+    circuit,
+    get_breaker,
+    select_model,
+)
+from src.backend.model_router import RouteDecision
+
+
+@pytest.fixture(autouse=True)
+def fresh_breakers():
+    """Breakers are app-wide: start each test from an empty registry."""
+    cb._BREAKERS.clear()
+    yield
+    cb._BREAKERS.clear()
+
+
+def _trip(breaker: CircuitBreaker) -> None:
+    for _ in range(cb.BREAKER_CONSECUTIVE_FAILURES):
+        breaker.before_call()
+        breaker.record_failure()
+
+
+# =============================================================================
+# Test: State Machine
+# =============================================================================
+
+class TestBreaker:
+    """closed → open → half_open → closed / open."""
+
+    def test_consecutive_failures_trip(self):
+        breaker = CircuitBreaker("chat:m")
+        _trip(breaker)
+        assert breaker.state == cb.OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+        assert breaker.stats()["rejected"] == 1
+
+    def test_failure_rate_trips(self):
+        breaker = CircuitBreaker("chat:m")
+        for outcome in [True, False, True, False, False]:
+            breaker.before_call()
+            breaker.record_success() if outcome else breaker.record_failure()
+        assert breaker.state == cb.OPEN
+
+    def test_slow_calls_trip(self):
+        breaker = CircuitBreaker("chat:m")
+        for _ in range(cb.BREAKER_MIN_CALLS):
+            breaker.before_call()
+            breaker.record_success(slow=True)
+        assert breaker.state == cb.OPEN
+
+    def test_healthy_stays_closed(self):
+        breaker = CircuitBreaker("chat:m")
+        for _ in range(20):
+            breaker.before_call()
+            breaker.record_success()
+        breaker.record_failure()
+        assert breaker.state == cb.CLOSED
+
+    def test_half_open_single_probe(self, monkeypatch):
+        monkeypatch.setattr(cb, "BREAKER_OPEN_SECONDS", 0.0)
+        breaker = CircuitBreaker("chat:m")
+        _trip(breaker)
+
+        breaker.before_call()  # the probe
+        assert breaker.state == cb.HALF_OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+        breaker.record_success()
+        assert breaker.state == cb.CLOSED
+        breaker.before_call()
+
+    def test_failed_probe_reopens_longer(self, monkeypatch):
+        monkeypatch.setattr(cb, "BREAKER_OPEN_SECONDS", 5.0)
+        breaker = CircuitBreaker("chat:m")
+        _trip(breaker)
+        breaker._open_until = 0.0  # open period over
+
+        breaker.before_call()
+        breaker.record_failure()
+        assert breaker.state == cb.OPEN
+        assert breaker.stats()["retry_in_s"] > 5.0
+
+    def test_released_probe_frees_slot(self, monkeypatch):
+        monkeypatch.setattr(cb, "BREAKER_OPEN_SECONDS", 0.0)
+        breaker = CircuitBreaker("chat:m")
+        _trip(breaker)
+        breaker.before_call()
+        breaker.release()
+        breaker.before_call()  # a new probe is allowed
+
+
+# =============================================================================
+# Test: Call Guard
+# =============================================================================
+
+class TestCircuit:
+    """circuit() classifies outcomes."""
+
+    def test_transport_errors_count(self):
+        for _ in range(cb.BREAKER_CONSECUTIVE_FAILURES):
+            with pytest.raises(httpx.ConnectError):
+                with circuit("chat", "m"):
+                    raise httpx.ConnectError("down")
+        with pytest.raises(CircuitOpenError):
+            with circuit("chat", "m"):
+                pass
+
+    def test_key_errors_do_not_count(self):
+        class AuthError(Exception):
+            status_code = 401
+
+        for _ in range(5):
+            with pytest.raises(AuthError):
+                with circuit("chat", "m"):
+                    raise AuthError()
+        assert get_breaker("chat", "m").state == cb.CLOSED
+
+    def test_status_observed(self):
+        for _ in range(cb.BREAKER_CONSECUTIVE_FAILURES):
+            with circuit("chat", "m") as call:
+                call.observe_status(503)
+        assert get_breaker("chat", "m").state == cb.OPEN
+
+    def test_fallback_model_while_open(self):
+        _trip(get_breaker("chat/completions", "gpt-4.1-nano"))
+        assert select_model("chat/completions", "gpt-4.1-nano") == "gpt-4o-mini"
+        assert select_model("chat/completions", "gpt-4o-mini") == "gpt-4o-mini"
+
+
+# =============================================================================
+# Test: Integration
+# =============================================================================
+
+class TestIntegration:
+    """Open breakers are skipped (translation) or answered canned (controller)."""
+
+    @pytest.mark.asyncio
+    async def test_open_model_skipped_without_failover(self):
+        from src.backend import main
+
+        _trip(get_breaker("chat/completions", "gpt-4.1-nano"))
+        called = []
+
+        async def fake_stream(api_key, system_prompt, user_message, prompt_name=None, model=None):
+            called.append(model)
+            yield f"from {model}"
+
+        route = RouteDecision("gpt-4.1-nano", "short", ["gpt-4.1-nano"])
+        with patch.object(main, "_stream_translation_deltas", fake_stream):
+            deltas = [d async for d in main._routed_translation_deltas("k", "sys", "hi", "p", route)]
+
+        assert called == ["gpt-4o-mini"]
+        assert deltas == ["from gpt-4o-mini"]
+
+    @pytest.mark.asyncio
+    async def test_controller_canned_when_open(self):
+        from src.backend.controller import CONTROLLER_MODEL, generate_controller_response
+        from src.backend.models import ControllerRequest
+
+        _trip(get_breaker("responses", CONTROLLER_MODEL))
+        request = ControllerRequest(directive="CONTINUE", pinned_context="Goal")
+
+        response = await generate_controller_response(request, api_key="sk-test")
+
+        assert response.next_english_utterance == "I need a moment to think about that."
+        assert "熔斷" in response.notes_for_user
+        assert response.prompt_tokens > 0
+
+
+
+# =============================================================================
+# Test: Translation Stream Outcome
+# =============================================================================
+
+class TestTranslationStream:
+    """The outcome is recorded at [DONE]: a stream failing after its first delta counts."""
+
+    MODEL = "gpt-4.1-nano"
+
+    @staticmethod
+    def _body(chunks, done=True):
+        lines = [
+            "data: " + json.dumps({"choices": [{"delta": {"content": chunk}}]}) + "\n\n"
+            for chunk in chunks
+        ]
+        return "".join(lines) + ("data: [DONE]\n\n" if done else "")
+
+    async def _consume(self, body, lines=None, take=None):
+        from src.backend import main
+
+        def handler(request):
+            return httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})
+
+        upstream = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        deltas = []
+        with patch.object(main, "get_async_client", lambda: upstream), \
+                patch.object(main, "timed_lines", lines or main.timed_lines):
+            stream = main._stream_translation_deltas("k", "sys", "hi", prompt_name="p", model=self.MODEL)
+            try:
+                async for delta in stream:
+                    deltas.append(delta)
+                    if take is not None and len(deltas) >= take:
+                        break
+            finally:
+                await stream.aclose()
+        return deltas, get_breaker("chat/completions", self.MODEL).stats()
+
+    @pytest.mark.asyncio
+    async def test_complete_stream_succeeds(self):
+        deltas, stats = await self._consume(self._body(["您的", "退款"]))
+        assert deltas == ["您的", "退款"]
+        assert stats["failures"] == 0 and stats["window_failure_rate"] == 0.0
+
+    @pytest.mark.asyncio
+    async def test_drop_after_first_delta_fails(self):
+        from src.backend.upstream import IncompleteStreamError
+
+        with pytest.raises(IncompleteStreamError):
+            await self._consume(self._body(["您的", "退款"], done=False))
+        assert get_breaker("chat/completions", self.MODEL).stats()["failures"] == 1
+
+    @pytest.mark.asyncio
+    async def test_idle_timeout_after_first_delta_fails(self):
+        from src.backend.adaptive_timeout import StreamTimeout
+
+        def stalling_lines(lines, *args, **kwargs):
+            async def gen():
+                async for line in lines:
+                    yield line
+                    break
+                raise StreamTimeout("idle", 0.5)
+            return gen()
+
+        with pytest.raises(StreamTimeout):
+            await self._consume(self._body(["您的", "退款"]), lines=stalling_lines)
+        assert get_breaker("chat/completions", self.MODEL).stats()["failures"] == 1
+
+    @pytest.mark.asyncio
+    async def test_caller_stopping_is_not_a_failure(self):
+        deltas, stats = await self._consume(self._body(["您的", "退款"]), take=1)
+        assert deltas == ["您的"]
+        assert stats["failures"] == 0 and stats["window_failure_rate"] == 0.0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
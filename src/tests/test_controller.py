@@ -44,32 +44,29 @@ from src.backend.prompt_templates import (
 # =============================================================================
 
 class TestEstimateTokens:
-    """Tests for token estimation function."""
+    """Tests for token estimation function (o200k_base counts)."""
 
     def test_empty_string(self):
         """Empty string should return 0 tokens."""
         assert estimate_tokens("") == 0
 
     def test_english_words(self):
-        """English words should be ~1.3 tokens each."""
+        """Common English words are one token each."""
         text = "hello world"  # 2 words
         tokens = estimate_tokens(text)
-        assert tokens >= 2  # At least 2 tokens
-        assert tokens <= 4  # At most 4 tokens (2 * 1.3 rounded)
+        assert tokens == 2
 
     def test_chinese_characters(self):
-        """Chinese characters should be ~2 tokens each."""
+        """Common Chinese words take a token or two (the v1 formula said 8)."""
         text = "你好世界"  # 4 characters
         tokens = estimate_tokens(text)
-        assert tokens >= 6  # At least 6 tokens (4 * 2 - some margin)
-        assert tokens <= 10  # At most 10 tokens
+        assert 1 <= tokens <= 4
 
     def test_mixed_content(self):
         """Mixed Chinese and English content."""
         text = "Hello 世界"  # 1 English word + 2 Chinese chars
         tokens = estimate_tokens(text)
-        assert tokens >= 4  # 1*1.3 + 2*2 = 5.3
-        assert tokens <= 8
+        assert 2 <= tokens <= 4
 
     def test_long_text(self):
         """Longer text should scale proportionally."""
@@ -320,13 +317,13 @@ class TestControllerService:
         }
 
         with patch.dict(os.environ, {"OPENAI_API_KEY": "test_key"}):
-            with patch("src.backend.controller.httpx.AsyncClient") as mock_client:
+            with patch("src.backend.controller.get_async_client") as mock_client:
                 mock_response_obj = MagicMock()
                 mock_response_obj.status_code = 200
                 mock_response_obj.json.return_value = mock_response
                 mock_response_obj.raise_for_status = MagicMock()
 
-                mock_client.return_value.__aenter__.return_value.post = AsyncMock(
+                mock_client.return_value.post = AsyncMock(
                     return_value=mock_response_obj
                 )
 
@@ -337,7 +334,7 @@ class TestControllerService:
                     latest_turns=[]
                 )
 
-                response = await generate_controller_response(request)
+                response = await generate_controller_response(request, api_key="test_key")
 
                 assert response.decision == "continue"
                 assert response.next_english_utterance == "I understand your point."
@@ -350,8 +347,8 @@ class TestControllerService:
         import httpx
 
         with patch.dict(os.environ, {"OPENAI_API_KEY": "test_key"}):
-            with patch("src.backend.controller.httpx.AsyncClient") as mock_client:
-                mock_client.return_value.__aenter__.return_value.post = AsyncMock(
+            with patch("src.backend.controller.get_async_client") as mock_client:
+                mock_client.return_value.post = AsyncMock(
                     side_effect=httpx.TimeoutException("Timeout")
                 )
 
@@ -362,7 +359,7 @@ class TestControllerService:
                     latest_turns=[]
                 )
 
-                response = await generate_controller_response(request)
+                response = await generate_controller_response(request, api_key="test_key")
 
                 # Should return fallback response, not crash
                 assert response.decision == "continue"
@@ -396,7 +393,7 @@ class TestPreviousResponseId:
         from src.backend.controller import call_responses_api
 
         with patch.dict(os.environ, {"OPENAI_API_KEY": "test_key"}):
-            with patch("src.backend.controller.httpx.AsyncClient") as mock_client:
+            with patch("src.backend.controller.get_async_client") as mock_client:
                 mock_response_obj = MagicMock()
                 mock_response_obj.status_code = 200
                 mock_response_obj.json.return_value = {
@@ -406,12 +403,13 @@ class TestPreviousResponseId:
                 mock_response_obj.raise_for_status = MagicMock()
 
                 mock_post = AsyncMock(return_value=mock_response_obj)
-                mock_client.return_value.__aenter__.return_value.post = mock_post
+                mock_client.return_value.post = mock_post
 
                 await call_responses_api(
                     instruction="Test instruction",
                     prompt="Test prompt",
-                    previous_response_id="resp_previous_123"
+                    previous_response_id="resp_previous_123",
+                    api_key="test_key"
                 )
 
                 # Verify previous_response_id was included
@@ -425,7 +423,7 @@ class TestPreviousResponseId:
         from src.backend.controller import call_responses_api
 
         with patch.dict(os.environ, {"OPENAI_API_KEY": "test_key"}):
-            with patch("src.backend.controller.httpx.AsyncClient") as mock_client:
+            with patch("src.backend.controller.get_async_client") as mock_client:
                 mock_response_obj = MagicMock()
                 mock_response_obj.status_code = 200
                 mock_response_obj.json.return_value = {
@@ -435,12 +433,13 @@ class TestPreviousResponseId:
                 mock_response_obj.raise_for_status = MagicMock()
 
                 mock_post = AsyncMock(return_value=mock_response_obj)
-                mock_client.return_value.__aenter__.return_value.post = mock_post
+                mock_client.return_value.post = mock_post
 
                 await call_responses_api(
                     instruction="Test instruction",
                     prompt="Test prompt",
-                    previous_response_id=None
+                    previous_response_id=None,
+                    api_key="test_key"
                 )
 
                 # Verify previous_response_id was NOT included
@@ -540,13 +539,13 @@ class TestHonestyDetection:
         }
 
         with patch.dict(os.environ, {"OPENAI_API_KEY": "test_key"}):
-            with patch("src.backend.controller.httpx.AsyncClient") as mock_client:
+            with patch("src.backend.controller.get_async_client") as mock_client:
                 mock_response_obj = MagicMock()
                 mock_response_obj.status_code = 200
                 mock_response_obj.json.return_value = mock_response
                 mock_response_obj.raise_for_status = MagicMock()
 
-                mock_client.return_value.__aenter__.return_value.post = AsyncMock(
+                mock_client.return_value.post = AsyncMock(
                     return_value=mock_response_obj
                 )
 
@@ -557,7 +556,7 @@ class TestHonestyDetection:
                     latest_turns=[]
                 )
 
-                response = await generate_controller_response(request)
+                response = await generate_controller_response(request, api_key="test_key")
 
                 # Should have honesty note added
                 assert response.notes_for_user is not None
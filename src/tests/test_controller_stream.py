@@ -0,0 +1,230 @@
+"""
+Unit tests for the streaming controller and its incremental JSON parser.
+
+Reference:
+- src/backend/incremental_json.py
+- src/backend/controller.py (stream_responses_api, stream_controller_response)
+- src/backend/main.py (/api/controller/stream)
+
+Run with:
+    python -m pytest src/tests/test_controller_stream.py -v
+"""
+
+import sys
+import os
+import json
+import random
+from typing import Optional
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+# Ensure src is in path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.backend import circuit_breaker, controller
+from src.backend.controller import get_controller_stream_stats
+from src.backend.incremental_json import FieldStreamParser
+
+OUTPUT = {
+    "decision": "continue",
+    "next_english_utterance": "Could you confirm the \"sort code\" — 20-00-00? 😀",
+    "memory_update": "Caller agreed to £20 a month.",
+    "notes_for_user": None,
+}
+REQUEST = {
+    "directive": "AGREE",
+    "pinned_context": "Goal: lower the bill",
+    "memory": "",
+    "latest_turns": ["Other party: We can offer £20 a month."],
+}
+
+
+def _feed(parser: FieldStreamParser, text: str, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    events = []
+    i = 0
+    while i < len(text):
+        n = rng.randint(1, 6)
+        events.extend(parser.feed(text[i:i + n]))
+        i += n
+    return events
+
+
+def _sse_body(chunks: list, response_id: str = "resp_1", end: Optional[dict] = None) -> str:
+    """Responses API SSE body; `end` replaces response.completed (empty dict: no end event)."""
+    events = [{"type": "response.created", "response": {"id": response_id}}]
+    events += [{"type": "response.output_text.delta", "delta": chunk} for chunk in chunks]
+    if end is None:
+        end = {"type": "response.completed", "response": {"id": response_id}}
+    if end:
+        events.append(end)
+    return "".join(f"event: {e['type']}\ndata: {json.dumps(e)}\n\n" for e in events)
+
+
+def _chunks(text: str, size: int = 5) -> list:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+# =============================================================================
+# Test: Incremental Parser
+# =============================================================================
+
+class TestFieldStreamParser:
+    """Fields and string deltas as the object streams, any chunking."""
+
+    @pytest.mark.parametrize("seed", range(5))
+    def test_any_chunking(self, seed):
+        parser = FieldStreamParser()
+        events = _feed(parser, json.dumps(OUTPUT), seed)
+        assert parser.complete and not parser.failed
+        assert parser.values == OUTPUT
+        utterance = "".join(d for kind, field, d in events if kind == "delta" and field == "next_english_utterance")
+        assert utterance == OUTPUT["next_english_utterance"]
+
+    def test_escaped_ascii(self):
+        parser = FieldStreamParser()
+        _feed(parser, json.dumps(OUTPUT, ensure_ascii=True))
+        assert parser.values == OUTPUT
+
+    def test_utterance_before_memory(self):
+        parser = FieldStreamParser()
+        events = parser.feed('{"decision": "continue", "next_english_utterance": "Yes, I')
+        assert ("value", "decision", "continue") in events
+        assert events[-1] == ("delta", "next_english_utterance", "Yes, I")
+        assert "memory_update" not in parser.values
+
+    def test_fenced_and_nested(self):
+        parser = FieldStreamParser()
+        _feed(parser, '```json\n{"decision": "stop", "extra": {"a": [1, "}"]}, "n": 2}\n```')
+        assert parser.complete
+        assert parser.values == {"decision": "stop", "extra": {"a": [1, "}"]}, "n": 2}
+
+    def test_fail_soft(self):
+        parser = FieldStreamParser()
+        assert parser.feed('{"decision" "stop"}') == []
+        assert parser.failed and not parser.complete
+        plain = FieldStreamParser()
+        assert plain.feed("I think we should continue.") == []
+        assert not plain.complete
+
+
+# =============================================================================
+# Test: Streaming Controller
+# =============================================================================
+
+class TestStreamController:
+    """Responses API streaming → field events → the /api/controller response."""
+
+    @pytest.fixture
+    def upstream(self):
+        """Patch the Responses API with a fixed SSE body (tests set state["body"] / ["status"])."""
+        state = {"body": _sse_body(_chunks(json.dumps(OUTPUT))), "status": 200, "requests": []}
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            state["requests"].append(json.loads(request.content))
+            return httpx.Response(state["status"], text=state["body"], headers={"content-type": "text/event-stream"})
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        # Failure tests count against the app-wide breaker: start each test from an empty registry
+        with patch.object(controller, "get_async_client", lambda: client), \
+                patch.dict(circuit_breaker._BREAKERS, clear=True):
+            yield state
+
+    def _events(self, **overrides):
+        from src.backend import main
+
+        response = TestClient(main.app).post(
+            "/api/controller/stream", json={**REQUEST, **overrides}, headers={"X-API-Key": "test_key"}
+        )
+        assert response.status_code == 200
+        return [json.loads(line[6:]) for line in response.text.splitlines() if line.startswith("data: ")]
+
+    def test_events_in_order(self, upstream):
+        events = self._events()
+        assert upstream["requests"][0]["stream"] is True
+        kinds = [(e["type"], e.get("field")) for e in events]
+        assert kinds[0] == ("field", "decision")
+        first_utterance = kinds.index(("delta", "next_english_utterance"))
+        assert first_utterance < kinds.index(("field", "memory_update"))
+        text = "".join(e["text"] for e in events if e.get("field") == "next_english_utterance" and e["type"] == "delta")
+        assert text == OUTPUT["next_english_utterance"]
+
+        done = events[-1]
+        assert done["type"] == "done"
+        assert done["response"]["response_id"] == "resp_1"
+        assert done["response"]["memory_update"] == OUTPUT["memory_update"]
+        assert done["response"]["prompt_tokens"] > 0
+
+    def test_not_json_falls_back(self, upstream):
+        upstream["body"] = _sse_body(_chunks("Sure. Tell them you accept the offer."))
+        events = self._events()
+        assert [e["type"] for e in events] == ["done"]
+        assert events[-1]["response"]["next_english_utterance"] == "Sure."
+        assert "JSON 解析失敗" in events[-1]["response"]["notes_for_user"]
+
+    def test_upstream_error_canned_response(self, upstream):
+        upstream["status"] = 500
+        upstream["body"] = '{"error": "boom"}'
+        events = self._events()
+        assert events[-1]["type"] == "done"
+        assert events[-1]["response"]["notes_for_user"] == "警告：API 錯誤 (500)"
+        assert events[-1]["response"]["response_id"] == ""
+        assert events[-1]["response"]["prompt_tokens"] > 0
+
+    def test_failed_response_counts_against_breaker(self, upstream):
+        failed = {"type": "response.failed", "response": {"error": {"message": "server_error"}}}
+        upstream["body"] = _sse_body(["{\"decision\": "], end=failed)
+        breaker = circuit_breaker.get_breaker("responses", controller.CONTROLLER_MODEL)
+        before = breaker.stats()["failures"]
+
+        events = self._events()
+        assert events[-1]["type"] == "done"
+        assert events[-1]["response"]["response_id"] == ""
+        assert breaker.stats()["failures"] == before + 1
+
+    def _cut_inside_memory(self, end: dict) -> str:
+        text = json.dumps(OUTPUT)
+        return _sse_body(_chunks(text[:text.index("a month") + 3]), end=end)
+
+    def test_truncated_stream_keeps_memory(self, upstream):
+        upstream["body"] = self._cut_inside_memory(end={})
+        breaker = circuit_breaker.get_breaker("responses", controller.CONTROLLER_MODEL)
+        before = breaker.stats()["failures"]
+
+        done = self._events(memory="OLD MEMORY")[-1]["response"]
+        assert done["memory_update"] == "OLD MEMORY"
+        assert done["notes_for_user"] == "警告：回應中斷，使用預設回應"
+        assert breaker.stats()["failures"] == before + 1
+
+    def test_incomplete_response_keeps_memory(self, upstream):
+        incomplete = {"type": "response.incomplete", "response": {"incomplete_details": {"reason": "max_output_tokens"}}}
+        upstream["body"] = self._cut_inside_memory(end=incomplete)
+        done = self._events(memory="OLD MEMORY")[-1]["response"]
+        assert done["memory_update"] == "OLD MEMORY"
+
+    def test_incomplete_after_complete_json_used(self, upstream):
+        incomplete = {"type": "response.incomplete", "response": {"incomplete_details": {"reason": "max_output_tokens"}}}
+        upstream["body"] = _sse_body(_chunks(json.dumps(OUTPUT)), end=incomplete)
+        done = self._events(memory="OLD MEMORY")[-1]["response"]
+        assert done["memory_update"] == OUTPUT["memory_update"]
+
+    def test_same_response_as_non_streaming(self, upstream):
+        from src.backend.controller import _controller_response, _extract_from_dict
+
+        done = self._events()[-1]["response"]
+        expected = _controller_response(_extract_from_dict(OUTPUT), "resp_1", done["prompt_tokens"])
+        assert done == expected.model_dump()
+
+    def test_metrics(self, upstream):
+        self._events()
+        stats = get_controller_stream_stats()
+        assert stats["streams"] >= 1 and stats["first_word_ms"]
+        from src.backend import main
+        assert "controller_stream" in TestClient(main.app).get("/api/metrics").json()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
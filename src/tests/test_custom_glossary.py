@@ -0,0 +1,210 @@
+"""
+Unit tests for per-user custom glossaries.
+
+Reference:
+- src/backend/custom_glossary.py
+- src/backend/glossary.py (get_glossary_hint custom=)
+- src/backend/main.py (/api/glossary/custom, glossary_id on /api/translate/stream)
+
+Run with:
+    python -m pytest src/tests/test_custom_glossary.py -v
+"""
+
+import sys
+import os
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Ensure src is in path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.backend import custom_glossary as cg
+from src.backend.custom_glossary import (
+    CustomGlossaryCache,
+    CustomGlossaryError,
+    compile_custom_glossary,
+    owner_key,
+)
+from src.backend.glossary import get_glossary_hint
+
+
+# =============================================================================
+# Test: Compile
+# =============================================================================
+
+class TestCompile:
+    """Upload → one GlossaryIndex, same matcher as the scenario glossaries."""
+
+    def test_dedupes_case_insensitive(self):
+        glossary = compile_custom_glossary("acme", {"Acme Shield": "艾克米保障", "acme shield": "x", " ": "空"})
+        assert dict(glossary.index.terms) == {"Acme Shield": "艾克米保障"}
+        assert glossary.memory_bytes > 0
+
+    def test_version_is_content_hash(self):
+        a = compile_custom_glossary("acme", {"Acme Shield": "艾克米保障"})
+        b = compile_custom_glossary("other", {"Acme Shield": "艾克米保障"})
+        c = compile_custom_glossary("acme", {"Acme Shield": "艾克米盾"})
+        assert a.version == b.version != c.version
+
+    def test_rejected(self, monkeypatch):
+        monkeypatch.setattr(cg, "CUSTOM_GLOSSARY_MAX_TERMS", 2)
+        with pytest.raises(CustomGlossaryError):
+            compile_custom_glossary("big", {"a": "甲", "b": "乙", "c": "丙"})
+        with pytest.raises(CustomGlossaryError):
+            compile_custom_glossary("empty", {"term": ""})
+
+    def test_thousands_of_terms(self):
+        terms = {f"product {i}": f"產品{i}" for i in range(5000)}
+        glossary = compile_custom_glossary("catalogue", terms)
+        hint = get_glossary_hint("is product 4321 covered", None, custom=glossary.index)
+        assert hint == 'Key terms: "product 4321" = "產品4321"'
+
+
+# =============================================================================
+# Test: Merged Hints
+# =============================================================================
+
+class TestMergedHint:
+    """Custom terms are matched with the scenario's in one result."""
+
+    def test_custom_listed_first(self):
+        custom = compile_custom_glossary("acme", {"Acme Shield": "艾克米保障"}).index
+        hint = get_glossary_hint("Your sort code for the Acme Shield plan", "bank", custom=custom)
+        assert hint == 'Key terms: "Acme Shield" = "艾克米保障", "sort code" = "銀行分類代碼"'
+
+    def test_custom_wins_same_term(self):
+        custom = compile_custom_glossary("acme", {"sort code": "分行代碼"}).index
+        assert get_glossary_hint("my sort code", "bank", custom=custom) == 'Key terms: "sort code" = "分行代碼"'
+
+    def test_longest_across_indexes(self):
+        custom = compile_custom_glossary("acme", {"sort code lookup": "分類代碼查詢"}).index
+        hint = get_glossary_hint("use sort code lookup", "bank", custom=custom)
+        assert hint == 'Key terms: "sort code lookup" = "分類代碼查詢"'
+
+    def test_without_custom_unchanged(self):
+        assert get_glossary_hint("my sort code", "bank", custom=None) == 'Key terms: "sort code" = "銀行分類代碼"'
+
+
+# =============================================================================
+# Test: LRU
+# =============================================================================
+
+class TestCache:
+    """Keyed by owner; bounded by compiled size."""
+
+    def test_owner_isolation(self):
+        cache = CustomGlossaryCache(max_bytes=10_000_000)
+        cache.put(owner_key("key-a"), compile_custom_glossary("shared", {"Acme": "艾克米"}))
+        assert cache.get(owner_key("key-a"), "shared") is not None
+        assert cache.get(owner_key("key-b"), "shared") is None
+
+    def test_lru_eviction(self):
+        a = compile_custom_glossary("a", {f"alpha {i}": "甲" for i in range(50)})
+        b = compile_custom_glossary("b", {f"beta {i}": "乙" for i in range(50)})
+        c = compile_custom_glossary("c", {f"gamma {i}": "丙" for i in range(50)})
+        cache = CustomGlossaryCache(max_bytes=a.memory_bytes + b.memory_bytes + c.memory_bytes // 2)
+        cache.put("o", a)
+        cache.put("o", b)
+        assert cache.get("o", "a") is a  # a is now most recently used
+        cache.put("o", c)
+        assert cache.get("o", "b") is None
+        assert cache.get("o", "a") is a and cache.get("o", "c") is c
+        stats = cache.stats()
+        assert stats["evictions"] == 1
+        assert stats["total_bytes"] == a.memory_bytes + c.memory_bytes <= stats["max_bytes"]
+
+    def test_replace_same_id(self):
+        cache = CustomGlossaryCache(max_bytes=10_000_000)
+        cache.put("o", compile_custom_glossary("a", {"one": "一"}))
+        cache.put("o", compile_custom_glossary("a", {"one": "一", "two": "二"}))
+        assert cache.stats()["entries"] == 1
+        assert cache.stats()["terms"] == 2
+
+    def test_over_cap_rejected(self):
+        glossary = compile_custom_glossary("a", {"one": "一"})
+        cache = CustomGlossaryCache(max_bytes=glossary.memory_bytes - 1)
+        with pytest.raises(CustomGlossaryError):
+            cache.put("o", glossary)
+        assert cache.stats()["rejected"] == 1
+
+
+# =============================================================================
+# Test: Endpoints
+# =============================================================================
+
+class TestEndpoints:
+    """/api/glossary/custom and glossary_id on /api/translate/stream."""
+
+    @pytest.fixture
+    def client(self, tmp_path):
+        from src.backend import main
+        from src.backend.translation_cache import TranslationCache
+        from src.backend.translation_memory import TranslationMemory
+
+        prompts = []
+
+        async def fake_deltas(api_key, system_prompt, user_message, prompt_name=None, model=None):
+            prompts.append(user_message)
+            yield "艾克米保障"
+
+        memory = TranslationMemory(path=tmp_path / "tm.jsonl")
+        cache = TranslationCache(max_entries=10, max_bytes=10_000, ttl_seconds=60)
+        with patch.object(main, "_stream_translation_deltas", fake_deltas), \
+                patch.object(main, "translation_memory", memory), \
+                patch.object(main, "translation_cache", cache), \
+                patch.object(main, "custom_glossaries", CustomGlossaryCache(max_bytes=10_000_000)):
+            test_client = TestClient(main.app)
+            test_client.prompts = prompts
+            test_client.memory = memory
+            yield test_client
+
+    def test_upload_and_translate(self, client):
+        headers = {"X-API-Key": "test_key"}
+        uploaded = client.post(
+            "/api/glossary/custom",
+            json={"glossary_id": "acme", "terms": {"Acme Shield": "艾克米保障"}},
+            headers=headers,
+        ).json()
+        assert uploaded["terms"] == 1 and uploaded["memory_bytes"] > 0
+
+        response = client.post(
+            "/api/translate/stream",
+            json={"text": "Is the Acme Shield plan active", "scenario": "bank", "glossary_id": "acme"},
+            headers=headers,
+        )
+        assert response.headers["X-Custom-Glossary"] == uploaded["version"]
+        assert '"Acme Shield" = "艾克米保障"' in client.prompts[-1]
+        match = client.memory.lookup("Is the Acme Shield plan active")
+        assert match is None or match.similarity < 1.0  # user terms stay out of the shared TM
+
+    def test_other_key_sees_missing(self, client):
+        client.post(
+            "/api/glossary/custom",
+            json={"glossary_id": "acme", "terms": {"Acme Shield": "艾克米保障"}},
+            headers={"X-API-Key": "test_key"},
+        )
+        response = client.post(
+            "/api/translate/stream",
+            json={"text": "Is the Acme Shield plan active", "glossary_id": "acme"},
+            headers={"X-API-Key": "other_key"},
+        )
+        assert response.headers["X-Custom-Glossary"] == "missing"
+        assert "Acme Shield\" =" not in client.prompts[-1]
+
+    def test_invalid_and_delete(self, client):
+        headers = {"X-API-Key": "test_key"}
+        assert client.post(
+            "/api/glossary/custom", json={"glossary_id": "acme", "terms": {}}, headers=headers
+        ).status_code == 400
+        assert client.delete("/api/glossary/custom/acme", headers=headers).status_code == 404
+        client.post("/api/glossary/custom", json={"glossary_id": "acme", "terms": {"a": "甲"}}, headers=headers)
+        assert client.delete("/api/glossary/custom/acme", headers=headers).status_code == 200
+
+    def test_metrics(self, client):
+        assert "custom_glossaries" in client.get("/api/metrics").json()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,231 @@
+"""
+Unit tests for request deadline propagation.
+
+Reference:
+- src/backend/deadline.py
+- src/backend/scheduler.py (queue wait bounded by the deadline)
+- src/backend/main.py (/api/translate/stream)
+
+Run with:
+    python -m pytest src/tests/test_deadline.py -v
+"""
+
+import sys
+import os
+import asyncio
+import json
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Ensure src is in path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.backend import deadline as deadline_module
+from src.backend import scheduler as scheduler_module
+from src.backend.deadline import (
+    DEADLINE_HEADER,
+    STAGE_QUEUE,
+    STAGE_STREAM,
+    DeadlineExceeded,
+    bound_stream,
+    enforce_deadline,
+    get_deadline_stats,
+    mark_stage,
+    parse_deadline_ms,
+    start_deadline,
+)
+from src.backend.scheduler import Priority, UpstreamScheduler, upstream_slot
+
+
+@pytest.fixture(autouse=True)
+def no_current_deadline():
+    """start_deadline() sets a ContextVar: keep it from leaking between tests."""
+    token = deadline_module._current.set(None)
+    yield
+    deadline_module._current.reset(token)
+
+
+# =============================================================================
+# Test: Budget
+# =============================================================================
+
+class TestBudget:
+    """Header parsing and derived timeouts."""
+
+    @pytest.mark.parametrize("value,seconds", [
+        ("2500", 2.5), ("abc", None), ("-5", None), ("", None), (None, None),
+    ])
+    def test_parse(self, value, seconds):
+        assert parse_deadline_ms(value) == seconds
+
+    def test_capped(self):
+        assert parse_deadline_ms("99999999") == deadline_module.DEADLINE_MAX_S
+
+    def test_default_without_header(self):
+        deadline = start_deadline("test", None, 10.0)
+        assert deadline.budget_s == 10.0
+        assert not deadline.from_client
+
+    def test_timeouts_from_remaining(self):
+        deadline = start_deadline("test", "2000", 10.0)
+        timeout = deadline.timeout()
+        assert timeout.read <= 2.0
+        assert timeout.connect <= min(deadline_module.UPSTREAM_CONNECT_TIMEOUT, 2.0)
+
+    def test_no_budget_left(self):
+        deadline = start_deadline("test", "1", 10.0)
+        deadline.expires_at = 0.0
+        with pytest.raises(DeadlineExceeded):
+            deadline.timeout()
+
+
+# =============================================================================
+# Test: Enforcement
+# =============================================================================
+
+class TestEnforcement:
+    """Work that cannot finish in time is cancelled and its stage reported."""
+
+    @pytest.mark.asyncio
+    async def test_enforce_cancels(self):
+        start_deadline("test_enforce", "50", 10.0)
+        with pytest.raises(DeadlineExceeded) as info:
+            async with enforce_deadline():
+                mark_stage("first_byte")
+                await asyncio.sleep(1)
+        assert info.value.stage == "first_byte"
+        assert get_deadline_stats()["test_enforce"]["exceeded"] == {"first_byte": 1}
+
+    @pytest.mark.asyncio
+    async def test_bound_stream_closes_source(self):
+        deadline = start_deadline("test_stream", "50", 10.0)
+        closed = []
+
+        async def slow():
+            try:
+                yield "a"
+                mark_stage(STAGE_STREAM)
+                await asyncio.sleep(1)
+                yield "b"
+            finally:
+                closed.append(True)
+
+        items = []
+        with pytest.raises(DeadlineExceeded) as info:
+            async for item in bound_stream(slow(), deadline):
+                items.append(item)
+        assert items == ["a"]
+        assert info.value.stage == STAGE_STREAM
+        assert closed == [True]
+
+    @pytest.mark.asyncio
+    async def test_queue_wait_bounded(self):
+        with patch.object(scheduler_module, "SCHEDULER_MAX_PER_KEY", 1), \
+                patch.object(scheduler_module, "scheduler", UpstreamScheduler()):
+            await scheduler_module.scheduler.acquire("key", Priority.TRANSLATION)
+            start_deadline("test_queue", "50", 10.0)
+            with pytest.raises(DeadlineExceeded) as info:
+                async with upstream_slot("key", Priority.TRANSLATION):
+                    pass
+        assert info.value.stage == STAGE_QUEUE
+
+
+# =============================================================================
+# Test: Endpoint
+# =============================================================================
+
+class TestEndpoint:
+    """/api/translate/stream honours X-Request-Deadline-Ms."""
+
+    def test_stream_reports_stage(self, tmp_path):
+        from src.backend import main
+        from src.backend.translation_cache import TranslationCache
+        from src.backend.translation_memory import TranslationMemory
+
+        async def slow_deltas(api_key, system_prompt, user_message, prompt_name=None, model=None):
+            yield "請"
+            mark_stage(STAGE_STREAM)
+            await asyncio.sleep(2)
+            yield "提供"
+
+        memory = TranslationMemory(path=tmp_path / "tm.jsonl")
+        cache = TranslationCache(max_entries=10, max_bytes=10_000, ttl_seconds=60)
+        with patch.object(main, "_stream_translation_deltas", slow_deltas), \
+                patch.object(main, "translation_memory", memory), \
+                patch.object(main, "translation_cache", cache):
+            response = TestClient(main.app).post(
+                "/api/translate/stream",
+                json={"text": "Please provide the sort code"},
+                headers={"X-API-Key": "test_key", DEADLINE_HEADER: "200"},
+            )
+
+        events = [json.loads(line[6:]) for line in response.text.splitlines() if line.startswith("data: ")]
+        assert events[0] == {"text": "請"}
+        assert events[-1]["deadline_stage"] == STAGE_STREAM
+        assert get_deadline_stats()["translate_stream"]["client_deadlines"] >= 1
+
+    @pytest.fixture
+    def slow_upstream(self, tmp_path):
+        from src.backend import main
+        from src.backend.translation_cache import TranslationCache
+        from src.backend.translation_memory import TranslationMemory
+
+        async def slow_deltas(api_key, system_prompt, user_message, prompt_name=None, model=None):
+            yield "請"
+            mark_stage(STAGE_STREAM)
+            await asyncio.sleep(2)
+            yield "提供"
+
+        memory = TranslationMemory(path=tmp_path / "tm.jsonl")
+        cache = TranslationCache(max_entries=10, max_bytes=10_000, ttl_seconds=60)
+        with patch.object(main, "_stream_translation_deltas", slow_deltas), \
+                patch.object(main, "translation_memory", memory), \
+                patch.object(main, "translation_cache", cache):
+            yield TestClient(main.app)
+
+    def test_speculative_final_bounded(self, slow_upstream):
+        response = slow_upstream.post(
+            "/api/translate/speculative",
+            json={"segment_id": "s1", "revision": 1, "text": "Please provide the sort code", "is_final": True},
+            headers={"X-API-Key": "test_key", DEADLINE_HEADER: "200"},
+        )
+        events = [json.loads(line[6:]) for line in response.text.splitlines() if line.startswith("data: ")]
+        assert events[-1]["deadline_stage"] == STAGE_STREAM
+        assert get_deadline_stats()["translate_speculative"]["client_deadlines"] >= 1
+
+    def test_session_message_bounded(self, slow_upstream):
+        with slow_upstream.websocket_connect("/ws/session") as ws:
+            ws.send_json({"type": "auth", "api_key": "test_key"})
+            ws.receive_json()
+            ws.send_json({
+                "type": "translate", "segment_id": "s1",
+                "text": "Please provide the sort code", "deadline_ms": 200,
+            })
+            events = [ws.receive_json()["data"] for _ in range(2)]
+        assert events[0] == {"text": "請"}
+        assert events[1]["deadline_stage"] == STAGE_STREAM
+        assert get_deadline_stats()["ws:translate"]["client_deadlines"] >= 1
+
+    def test_cors_allows_deadline_headers(self):
+        """Browser clients may send the deadline and read the stage it ran out in."""
+        from src.backend import main
+
+        response = TestClient(main.app).options(
+            "/api/translate/stream",
+            headers={
+                "Origin": "http://localhost:5173",
+                "Access-Control-Request-Method": "POST",
+                "Access-Control-Request-Headers": f"x-api-key, {DEADLINE_HEADER.lower()}",
+            },
+        )
+        assert response.status_code == 200
+        assert DEADLINE_HEADER.lower() in response.headers["access-control-allow-headers"].lower()
+
+        response = TestClient(main.app).get("/api/metrics", headers={"Origin": "http://localhost:5173"})
+        assert "x-deadline-stage" in response.headers["access-control-expose-headers"].lower()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
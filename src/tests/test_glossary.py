@@ -0,0 +1,423 @@
+"""
+Unit tests for glossary term matching and the hot-reloadable glossary store.
+
+Reference:
+- src/backend/glossary_matcher.py
+- src/backend/glossary_variants.py
+- src/backend/glossary.py (get_glossary_hint, get_english_term_hint, GlossaryStore)
+- src/backend/script_generator.py (build_script_prompt)
+- src/backend/main.py (/api/admin/glossary)
+
+Run with:
+    python -m pytest src/tests/test_glossary.py -v
+"""
+
+import sys
+import os
+import json
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Ensure src is in path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.backend.glossary import (
+    GENERAL_CONTEXT,
+    GlossaryStore,
+    _compile_indexes,
+    compile_glossary,
+    get_english_term_hint,
+    get_glossary_hint,
+    get_glossary_index,
+    get_glossary_stats,
+    get_scenario_context,
+    glossary_store,
+)
+from src.backend import glossary_variants
+from src.backend.glossary import build_index
+from src.backend.glossary_matcher import GlossaryMatch, GlossaryMatcher, select_leftmost_longest
+from src.backend.glossary_variants import PhoneticMatcher, inflections, phonetic_key
+
+
+def _terms(matcher: GlossaryMatcher, text: str) -> list:
+    return [match.payload for match in matcher.find(text)]
+
+
+# =============================================================================
+# Test: Matcher
+# =============================================================================
+
+class TestMatcher:
+    """Aho-Corasick: one pass, leftmost-longest, word boundaries."""
+
+    def test_case_insensitive(self):
+        matcher = GlossaryMatcher([("sort code", "sc")])
+        assert _terms(matcher, "Can I take your SORT CODE?") == ["sc"]
+
+    def test_longest_wins(self):
+        matcher = GlossaryMatcher([("overdraft", "o"), ("arranged overdraft", "ao")])
+        assert _terms(matcher, "an arranged overdraft") == ["ao"]
+
+    def test_leftmost_wins(self):
+        matcher = GlossaryMatcher([("tax code", "tc"), ("code of conduct", "cc")])
+        assert _terms(matcher, "tax code of conduct") == ["tc"]
+
+    def test_all_occurrences(self):
+        matcher = GlossaryMatcher([("gp", "gp"), ("a&e", "ae")])
+        matches = matcher.find("GP first, then A&E, then the GP again")
+        assert [m.payload for m in matches] == ["gp", "ae", "gp"]
+        assert [(m.start, m.end) for m in matches][:2] == [(0, 2), (15, 18)]
+
+    @pytest.mark.parametrize("text,found", [
+        ("Is it an ISA?", True),
+        ("I have an eVisa", False),
+        ("pay the rent", True),
+        ("my current account", False),
+        ("two direct debits", True),
+        ("the GP's surgery", True),
+    ])
+    def test_word_boundaries(self, text, found):
+        matcher = GlossaryMatcher([("isa", 1), ("rent", 2), ("direct debit", 3), ("gp", 4)])
+        assert bool(matcher.find(text)) is found
+
+    def test_first_pattern_wins_duplicates(self):
+        matcher = GlossaryMatcher([("excess", "first"), ("Excess", "second")])
+        assert len(matcher) == 1
+        assert _terms(matcher, "the excess") == ["first"]
+
+    def test_merge_matchers(self):
+        text = "my national insurance number"
+        a = GlossaryMatcher([("national insurance", "ni")]).find_all(text)
+        b = GlossaryMatcher([("national insurance number", "nino")]).find_all(text)
+        assert [m.payload for m in select_leftmost_longest(a + b)] == ["nino"]
+
+    def test_select_keeps_text_order(self):
+        matches = [GlossaryMatch(10, 14, "b"), GlossaryMatch(0, 4, "a")]
+        assert [m.payload for m in select_leftmost_longest(matches)] == ["a", "b"]
+
+
+# =============================================================================
+# Test: Variants
+# =============================================================================
+
+class TestVariants:
+    """Inflections and phonetic keys, precomputed per index."""
+
+    @pytest.mark.parametrize("term,variant", [
+        ("policy", "policies"),
+        ("diagnosis", "diagnoses"),
+        ("book an appointment", "booked an appointment"),
+        ("book an appointment", "books an appointment"),
+        ("top up", "topping up"),
+        ("make a claim", "made a claim"),
+    ])
+    def test_inflections(self, term, variant):
+        assert variant in inflections(term)
+
+    def test_no_inflections_for_acronyms_and_names(self):
+        assert inflections("GP") == []
+        assert inflections("Home Office") == []
+        assert inflections("sort code") == []  # not a verb phrase
+
+    @pytest.mark.parametrize("a,b", [
+        ("sort", "sought"), ("tax", "tacks"), ("order", "odor"), ("number", "numba"),
+    ])
+    def test_phonetic_key_homophones(self, a, b):
+        assert phonetic_key(a) == phonetic_key(b)
+
+    def test_phonetic_key_differs(self):
+        assert phonetic_key("code") != phonetic_key("cost")
+
+    def test_phonetic_spans_original_text(self):
+        matcher = PhoneticMatcher([("sort code", "sc")])
+        text = "what's your sought code?"
+        [match] = matcher.find_all(text)
+        assert text[match.start:match.end] == "sought code"
+
+    def test_phonetic_skips_short_and_acronyms(self):
+        matcher = PhoneticMatcher([("GP", 1), ("rent", 2), ("council", 3), ("tax code", 4)])
+        assert len(matcher) == 1
+
+    @pytest.mark.parametrize("text,scenario,term", [
+        ("What's your sought code please", "bank", "sort code"),
+        ("my council tacks band", "government", "council tax band"),
+        ("we can check the standing odor", "bank", "standing order"),
+        ("I've booked an appointment", "nhs", "book an appointment"),
+        ("Two insurance policies", "insurance", "policy"),
+    ])
+    def test_tolerant_hints(self, text, scenario, term):
+        assert get_glossary_hint(text, scenario).startswith(f'Key terms: "{term}"')
+
+    def test_no_false_positives(self):
+        assert get_glossary_hint("I want to cancel my policy", "general") == 'Key terms: "policy" = "保單"'
+
+    def test_disabled(self, monkeypatch):
+        monkeypatch.setattr(glossary_variants, "GLOSSARY_INFLECTIONS", False)
+        monkeypatch.setattr(glossary_variants, "GLOSSARY_PHONETIC", False)
+        index = build_index("bank", "", {"sort code": "銀行分類代碼", "policy": "保單"})
+        assert index.phonetic is None
+        assert index.stats()["variants"] == 0
+        assert index.hint("what's your sought code") == ""
+
+
+# =============================================================================
+# Test: Hints
+# =============================================================================
+
+class TestGlossaryHint:
+    """get_glossary_hint output format is unchanged."""
+
+    def test_bank_hint(self):
+        assert get_glossary_hint("Can I take your sort code please?", "bank") == \
+            'Key terms: "sort code" = "銀行分類代碼"'
+
+    def test_longest_first_order(self):
+        hint = get_glossary_hint("Set up a standing order and a direct debit", "bank")
+        assert hint == 'Key terms: "standing order" = "常設轉賬指示", "direct debit" = "直接付款授權"'
+
+    def test_general_searches_all_domains(self):
+        hint = get_glossary_hint("my sort code and my GP", "general")
+        assert '"sort code"' in hint and '"GP"' in hint
+
+    def test_scenario_only_its_domain(self):
+        assert get_glossary_hint("my sort code", "nhs") == ""
+
+    def test_max_hints(self):
+        text = "HMRC and DWP and DVLA and Home Office and tax code and tax return"
+        hint = get_glossary_hint(text, "government", max_hints=2)
+        assert hint.count(" = ") == 2
+
+    def test_no_scenario(self):
+        assert get_glossary_hint("my sort code", None) == ""
+
+
+# =============================================================================
+# Test: Chinese → English (script prompts)
+# =============================================================================
+
+class TestReverseIndex:
+    """zh / alt names found in Chinese input in one pass."""
+
+    def test_zh_and_alt(self):
+        index = build_index(
+            "bank", "", {"sort code": "銀行分類代碼", "direct debit": "直接付款授權"},
+            alternatives={"direct debit": ["自動轉賬", "直接扣賬"]},
+        )
+        assert index.english_terms("查詢銀行分類代碼，再取消自動轉賬") == [
+            ("銀行分類代碼", "sort code"), ("自動轉賬", "direct debit"),
+        ]
+
+    def test_each_term_once(self):
+        index = build_index("bank", "", {"direct debit": "直接付款授權"}, alternatives={"direct debit": ["自動轉賬"]})
+        assert index.english_terms("自動轉賬還是直接付款授權") == [("自動轉賬", "direct debit")]
+
+    def test_variant_characters_folded(self):
+        assert get_english_term_hint("我想取消自動轉帳", "bank") == 'Key English terms: 自動轉帳 = "direct debit"'
+
+    def test_single_characters_skipped(self):
+        index = build_index("x", "", {"tax": "稅", "council tax": "市政稅"})
+        assert index.english_terms("我要繳稅") == []
+        assert index.english_terms("我要繳市政稅") == [("市政稅", "council tax")]
+
+    def test_no_scenario_searches_all(self):
+        assert get_english_term_hint("我想提出一個理賠申請") == 'Key English terms: 理賠 = "claim"'
+        assert get_english_term_hint("您好，我想詢問一些事情", "bank") == ""
+
+    def test_script_prompt(self, monkeypatch):
+        from src.backend import script_generator
+
+        prompt = script_generator.build_script_prompt("我想查詢銀行分類代碼", "bank")
+        assert 'Key English terms: 銀行分類代碼 = "sort code"' in prompt
+
+        monkeypatch.setattr(script_generator, "SCRIPT_GLOSSARY_TERMS", False)
+        assert "Key English terms" not in script_generator.build_script_prompt("我想查詢銀行分類代碼", "bank")
+
+
+# =============================================================================
+# Test: Compiled Indexes
+# =============================================================================
+
+class TestIndexes:
+    """Per-scenario indexes are compiled once and read-only."""
+
+    GLOSSARIES = {
+        "version": "test",
+        "bank": {"description": "Banking", "terms": {"excess": {"zh": "超額"}, "sort code": {"zh": "銀行分類代碼"}}},
+        "insurance": {"description": "", "terms": {"Excess": {"zh": "自付額"}, "claim": {"zh": "索償"}}},
+    }
+
+    def test_general_merge_first_domain_wins(self):
+        general = _compile_indexes(self.GLOSSARIES)["general"]
+        assert general.terms == {"sort code": "銀行分類代碼", "excess": "超額", "claim": "索償"}
+        assert general.sources["excess"] == "bank"
+        assert len(general.conflicts) == 1
+        assert general.hint("what is the excess on the claim") == 'Key terms: "excess" = "超額", "claim" = "索償"'
+
+    def test_read_only(self):
+        index = _compile_indexes(self.GLOSSARIES)["bank"]
+        with pytest.raises(TypeError):
+            index.terms["new"] = "新"
+        with pytest.raises(AttributeError):
+            index.context = "changed"
+
+    def test_context(self):
+        indexes = _compile_indexes(self.GLOSSARIES)
+        assert indexes["bank"].context == "Context: Banking"
+        assert indexes["insurance"].context == ""
+        assert indexes["general"].context == GENERAL_CONTEXT
+
+    def test_unknown_scenario_uses_general(self):
+        assert get_glossary_index("no-such-scenario") is get_glossary_index("general")
+        assert get_scenario_context("no-such-scenario") == GENERAL_CONTEXT
+
+    def test_stats(self):
+        indexes = get_glossary_stats()["indexes"]
+        assert indexes["general"]["terms"] == sum(indexes[d]["terms"] for d in indexes if d != "general")
+        assert all(s["memory_bytes"] > 0 for s in indexes.values())
+
+
+# =============================================================================
+# Test: Versioned Store
+# =============================================================================
+
+GLOSSARY_V2 = {
+    "version": "2.0.0",
+    "bank": {"description": "Banking", "terms": {"faster payment": {"zh": "快速支付"}}},
+}
+
+
+@pytest.fixture
+def restore_store():
+    """Admin tests swap the app-wide store: put the original version back."""
+    original, previous = glossary_store.current, glossary_store.previous
+    yield glossary_store
+    if glossary_store.current is not original:
+        glossary_store.swap(original)
+    glossary_store._previous = previous
+
+
+class TestGlossaryStore:
+    """Compile off to the side, swap atomically, keep the previous version."""
+
+    def test_invalid_rejected(self):
+        for data in ([], {"version": "1"}, {"bank": {"terms": []}}):
+            with pytest.raises(ValueError):
+                compile_glossary(data, "upload")
+
+    @pytest.mark.parametrize("terms", [
+        {"sort code": "分行代碼"},
+        {"sort code": {"zh": 5}},
+        {"sort code": {"zh": " "}},
+        {"sort code": {"zh": "銀行分類代碼", "alt": ["分行號碼", 3]}},
+    ])
+    def test_malformed_term_rejected(self, terms):
+        with pytest.raises(ValueError, match="sort code"):
+            compile_glossary({"banking": {"terms": terms}}, "upload")
+
+    def test_version_includes_content_hash(self):
+        a = compile_glossary(GLOSSARY_V2, "upload")
+        changed = dict(GLOSSARY_V2, bank={"terms": {"faster payments": {"zh": "快速支付"}}})
+        b = compile_glossary(changed, "upload")
+        assert a.version.startswith("2.0.0+")
+        assert a.version != b.version
+
+    def test_swap_and_rollback(self, tmp_path):
+        path = tmp_path / "glossary.json"
+        path.write_text(json.dumps({"bank": {"terms": {"sort code": {"zh": "銀行分類代碼"}}}}), encoding="utf-8")
+        store = GlossaryStore(path)
+        v1 = store.current
+        swapped = []
+        store.add_listener(swapped.append)
+
+        v2 = store.swap(compile_glossary(GLOSSARY_V2, "upload"))
+        assert store.current is v2 and store.previous is v1
+        assert swapped == [v2]
+
+        # A request that started on v1 keeps using it
+        assert get_glossary_hint("my sort code", "bank", version=v1) == 'Key terms: "sort code" = "銀行分類代碼"'
+        assert get_glossary_hint("my sort code", "bank", version=v2) == ""
+
+        restored = store.rollback()
+        assert restored.version == v1.version and restored.source == "rollback"
+
+    def test_file_change_reloaded(self, tmp_path):
+        path = tmp_path / "glossary.json"
+        path.write_text(json.dumps({"bank": {"terms": {"sort code": {"zh": "銀行分類代碼"}}}}), encoding="utf-8")
+        store = GlossaryStore(path)
+        v1 = store.current
+        assert store.compile_file() is None  # unchanged
+
+        path.write_text(json.dumps(GLOSSARY_V2), encoding="utf-8")
+        os.utime(path, (v1.loaded_at + 10, v1.loaded_at + 10))
+        v2 = store.compile_file()
+        assert v2 is not None and v2.version.startswith("2.0.0+")
+        assert store.current is v1  # compiled, not yet swapped
+
+    def test_broken_file_keeps_current(self, tmp_path):
+        path = tmp_path / "glossary.json"
+        path.write_text(json.dumps(GLOSSARY_V2), encoding="utf-8")
+        store = GlossaryStore(path)
+        v1 = store.current
+        path.write_text("{ not json", encoding="utf-8")
+        os.utime(path, (v1.loaded_at + 10, v1.loaded_at + 10))
+        assert store.compile_file() is None
+        assert store.current is v1
+        assert store.stats()["reload_errors"] == 1
+
+
+class TestAdminEndpoints:
+    """/api/admin/glossary upload and rollback."""
+
+    def test_disabled_without_token(self):
+        from src.backend import main
+
+        with patch.object(main, "GLOSSARY_ADMIN_TOKEN", ""):
+            response = TestClient(main.app).get("/api/admin/glossary")
+        assert response.status_code == 403
+
+    def test_upload_then_rollback(self, restore_store):
+        from src.backend import main
+
+        original = restore_store.current.version
+        client = TestClient(main.app)
+        headers = {"X-Admin-Token": "secret"}
+        with patch.object(main, "GLOSSARY_ADMIN_TOKEN", "secret"):
+            assert client.post("/api/admin/glossary", json={"bank": {}}, headers=headers).status_code == 400
+            for terms in ({"sort code": "分行代碼"}, {"sort code": {"zh": 5}}):
+                response = client.post("/api/admin/glossary", json={"banking": {"terms": terms}}, headers=headers)
+                assert response.status_code == 400 and "sort code" in response.json()["detail"]
+
+            uploaded = client.post("/api/admin/glossary", json=GLOSSARY_V2, headers=headers).json()
+            assert uploaded["source"] == "upload"
+            assert uploaded["previous_version"] == original
+            assert get_glossary_hint("a faster payment", "bank") == 'Key terms: "faster payment" = "快速支付"'
+
+            rolled_back = client.post("/api/admin/glossary/rollback", headers=headers).json()
+        assert rolled_back["version"] == original
+        assert get_glossary_hint("my sort code", "bank") == 'Key terms: "sort code" = "銀行分類代碼"'
+
+    def test_stream_reports_version(self, tmp_path):
+        from src.backend import main
+        from src.backend.translation_cache import TranslationCache
+        from src.backend.translation_memory import TranslationMemory
+
+        async def fake_deltas(api_key, system_prompt, user_message, prompt_name=None, model=None):
+            yield "銀行分類代碼"
+
+        memory = TranslationMemory(path=tmp_path / "tm.jsonl")
+        cache = TranslationCache(max_entries=10, max_bytes=10_000, ttl_seconds=60)
+        with patch.object(main, "_stream_translation_deltas", fake_deltas), \
+                patch.object(main, "translation_memory", memory), \
+                patch.object(main, "translation_cache", cache):
+            response = TestClient(main.app).post(
+                "/api/translate/stream",
+                json={"text": "What is your sort code", "scenario": "bank"},
+                headers={"X-API-Key": "test_key"},
+            )
+        assert response.headers["X-Glossary-Version"] == glossary_store.current.version
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
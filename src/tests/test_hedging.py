@@ -0,0 +1,157 @@
+"""
+Unit tests for hedged translation requests and the rolling latency window.
+
+Reference:
+- src/backend/hedging.py
+- src/backend/latency.py
+
+Run with:
+    python -m pytest src/tests/test_hedging.py -v
+"""
+
+import sys
+import os
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+# Ensure src is in path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.backend import hedging
+from src.backend.hedging import Hedger, HedgeBudget
+from src.backend.latency import LatencyWindow
+
+
+class FakeUpstream:
+    """Starts attempts whose first delta arrives after the given delays."""
+
+    def __init__(self, first_delays):
+        self.first_delays = list(first_delays)
+        self.started = 0
+        self.closed = []
+
+    def start(self):
+        index = self.started
+        self.started += 1
+        return self._attempt(index, self.first_delays[index])
+
+    async def _attempt(self, index, delay):
+        try:
+            await asyncio.sleep(delay)
+            yield f"attempt{index}:"
+            yield "done"
+        finally:
+            self.closed.append(index)
+
+
+async def _collect(stream):
+    return [delta async for delta in stream]
+
+
+# =============================================================================
+# Test: Latency Window
+# =============================================================================
+
+class TestLatencyWindow:
+    """Nearest-rank percentiles over the most recent samples."""
+
+    def test_percentiles(self):
+        window = LatencyWindow(max_samples=100)
+        for ms in range(1, 101):
+            window.record(float(ms))
+        assert window.percentile(90) == 90.0
+        assert window.snapshot()["p50"] == 50.0
+
+    def test_rolling(self):
+        window = LatencyWindow(max_samples=10)
+        for ms in [5000.0] * 10 + [100.0] * 10:
+            window.record(ms)
+        assert window.percentile(99) == 100.0
+
+    def test_empty(self):
+        assert LatencyWindow().percentile(90) is None
+
+
+# =============================================================================
+# Test: Hedging
+# =============================================================================
+
+class TestHedger:
+    """A late first delta triggers one hedge; the faster attempt wins."""
+
+    @pytest.mark.asyncio
+    async def test_fast_primary_not_hedged(self):
+        hedger = Hedger(HedgeBudget())
+        upstream = FakeUpstream([0.0])
+        with patch.object(hedging, "HEDGE_DEFAULT_DELAY_MS", 50):
+            deltas = await _collect(hedger.stream("key", upstream.start))
+
+        assert deltas == ["attempt0:", "done"]
+        assert upstream.started == 1
+        assert hedger.stats()["hedged"] == 0
+
+    @pytest.mark.asyncio
+    async def test_slow_primary_loses_to_hedge(self):
+        hedger = Hedger(HedgeBudget())
+        upstream = FakeUpstream([1.0, 0.0])
+        with patch.object(hedging, "HEDGE_DEFAULT_DELAY_MS", 20):
+            deltas = await _collect(hedger.stream("key", upstream.start))
+
+        assert deltas == ["attempt1:", "done"]
+        assert 0 in upstream.closed  # loser cancelled
+        stats = hedger.stats()
+        assert stats["hedged"] == 1
+        assert stats["hedge_wins"] == 1
+        assert stats["win_rate"] == 1.0
+
+    @pytest.mark.asyncio
+    async def test_primary_still_wins_race(self):
+        hedger = Hedger(HedgeBudget())
+        upstream = FakeUpstream([0.05, 1.0])
+        with patch.object(hedging, "HEDGE_DEFAULT_DELAY_MS", 20):
+            deltas = await _collect(hedger.stream("key", upstream.start))
+
+        assert deltas == ["attempt0:", "done"]
+        assert 1 in upstream.closed
+        assert hedger.stats()["hedge_wins"] == 0
+
+    @pytest.mark.asyncio
+    async def test_budget_limits_hedges(self):
+        hedger = Hedger(HedgeBudget(ratio=0.1, burst=3))
+        with patch.object(hedging, "HEDGE_DEFAULT_DELAY_MS", 5):
+            for _ in range(3):
+                await _collect(hedger.stream("key", FakeUpstream([0.02, 0.0]).start))
+
+        stats = hedger.stats()
+        assert stats["hedged"] == 1  # the starting hedge; 0.2 earned since
+        assert stats["budget_denied"] == 2
+
+    @pytest.mark.asyncio
+    async def test_error_falls_back_to_other_attempt(self):
+        hedger = Hedger(HedgeBudget())
+
+        async def failing():
+            await asyncio.sleep(0.03)
+            raise RuntimeError("upstream 500")
+            yield  # pragma: no cover
+
+        upstream = FakeUpstream([0.0, 0.05])
+        starts = iter([failing, lambda: upstream._attempt(1, 0.05)])
+        with patch.object(hedging, "HEDGE_DEFAULT_DELAY_MS", 10):
+            deltas = await _collect(hedger.stream("key", lambda: next(starts)()))
+
+        assert deltas == ["attempt1:", "done"]
+
+    def test_threshold_follows_p90(self):
+        hedger = Hedger(HedgeBudget())
+        window = LatencyWindow()
+        for ms in [400.0] * 90 + [2000.0] * 10:
+            window.record(ms)
+        with patch.object(hedging, "latency_window", lambda name: window):
+            assert hedger.threshold_ms() == 400.0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,147 @@
+"""
+Unit tests for the adaptive translation model router.
+
+Reference:
+- src/backend/model_router.py
+- src/backend/main.py (_routed_translation_deltas)
+
+Run with:
+    python -m pytest src/tests/test_model_router.py -v
+"""
+
+import sys
+import os
+from unittest.mock import patch
+
+import pytest
+
+# Ensure src is in path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.backend.model_router import ModelRouter, RouteDecision
+
+LONG_TEXT = (
+    "Before we go any further I need to explain how the excess works on this policy, "
+    "because it applies separately to each claim and not to the year as a whole"
+)
+
+
+def _router(**scenario_models):
+    router = ModelRouter(["fast-start", "fast-stream"], scenario_models=scenario_models)
+    router._state["fast-start"].ttft_ms = 500.0
+    router._state["fast-start"].throughput_cps = 20.0
+    router._state["fast-stream"].ttft_ms = 900.0
+    router._state["fast-stream"].throughput_cps = 200.0
+    return router
+
+
+# =============================================================================
+# Test: Routing
+# =============================================================================
+
+class TestChoose:
+    """Short segments optimise TTFT, long ones total completion time."""
+
+    def test_short_segment_prefers_ttft(self):
+        decision = _router().choose("Yes, that's right", None)
+        assert decision.model == "fast-start"
+        assert decision.reason == "short"
+
+    def test_long_segment_prefers_throughput(self):
+        decision = _router().choose(LONG_TEXT, None)
+        assert decision.model == "fast-stream"
+        assert decision.reason == "long"
+        assert decision.candidates == ["fast-stream", "fast-start"]
+
+    def test_scenario_preference_within_slack(self):
+        router = _router(nhs="fast-stream")
+        assert router.choose("Can I book an appointment", "nhs").model == "fast-start"  # 900 > 500 x 1.3
+
+        router._state["fast-stream"].ttft_ms = 600.0
+        decision = router.choose("Can I book an appointment", "nhs")
+        assert decision.model == "fast-stream"
+        assert decision.reason == "scenario"
+
+    def test_priors_favour_nano(self):
+        router = ModelRouter(["gpt-4o-mini", "gpt-4.1-nano"], scenario_models={})
+        assert router.choose("Hello", None).model == "gpt-4.1-nano"
+
+
+class TestFailover:
+    """Degraded models move behind healthy ones and get periodic probes."""
+
+    def test_errors_degrade_model(self):
+        router = _router()
+        for _ in range(3):
+            router.record_error("fast-start")
+
+        decision = router.choose("Yes", None)
+        assert decision.model == "fast-stream"
+        assert decision.candidates[-1] == "fast-start"
+        assert router.stats()["models"]["fast-start"]["healthy"] is False
+
+    def test_probe_after_interval(self):
+        router = _router()
+        for _ in range(3):
+            router.record_error("fast-start")
+        router._state["fast-start"].last_attempt -= 3600
+
+        assert router.choose("Yes", None).reason == "probe"
+        assert router.choose("Yes", None).model == "fast-stream"
+
+    def test_success_recovers(self):
+        router = _router()
+        for _ in range(3):
+            router.record_error("fast-start")
+        for _ in range(5):
+            router.record_success("fast-start", 450.0, 40, 300.0)
+        assert router.choose("Yes", None).model == "fast-start"
+
+    def test_slow_ttft_degrades(self):
+        router = _router()
+        router.record_success("fast-start", 9000.0, 40, 300.0)
+        assert router.stats()["models"]["fast-start"]["healthy"] is False
+
+
+# =============================================================================
+# Test: In-request Failover
+# =============================================================================
+
+class TestRoutedDeltas:
+    """An error before the first delta retries on the next candidate."""
+
+    @pytest.mark.asyncio
+    async def test_fails_over_before_first_delta(self):
+        from src.backend import main
+
+        calls = []
+
+        async def fake_stream(api_key, system_prompt, user_message, prompt_name=None, model=None):
+            calls.append(model)
+            if model == "primary":
+                raise main.UpstreamStatusError(503, "overloaded")
+            yield "譯文"
+
+        route = RouteDecision(model="primary", reason="short", candidates=["primary", "backup"])
+        with patch.object(main, "_stream_translation_deltas", fake_stream):
+            deltas = [d async for d in main._routed_translation_deltas("k", "sys", "hi", "p", route)]
+
+        assert deltas == ["譯文"]
+        assert calls == ["primary", "backup"]
+
+    @pytest.mark.asyncio
+    async def test_auth_error_not_failed_over(self):
+        from src.backend import main
+
+        async def fake_stream(api_key, system_prompt, user_message, prompt_name=None, model=None):
+            raise main.UpstreamStatusError(401, "bad key")
+            yield  # pragma: no cover
+
+        route = RouteDecision(model="primary", reason="short", candidates=["primary", "backup"])
+        with patch.object(main, "_stream_translation_deltas", fake_stream):
+            with pytest.raises(main.UpstreamStatusError):
+                [d async for d in main._routed_translation_deltas("k", "sys", "hi", "p", route)]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
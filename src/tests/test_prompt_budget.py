@@ -0,0 +1,195 @@
+"""
+Unit tests for token-budgeted prompt assembly.
+
+Reference:
+- src/backend/prompt_budget.py
+- src/backend/prompt_templates.py (controller / realtime prompts)
+- src/backend/script_generator.py (build_script_prompt)
+- src/backend/main.py (translate / suggest prompts, X-Prompt-Tokens)
+
+Run with:
+    python -m pytest src/tests/test_prompt_budget.py -v
+"""
+
+import sys
+import os
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Ensure src is in path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.backend.prompt_budget import TRIM_MARKER, Section, assemble, fit
+from src.backend.prompt_templates import build_controller_prompt, build_realtime_session_instructions
+from src.backend.tokenizer import count_tokens, get_tokenizer_stats
+
+TURNS = [f"Other party: turn {i} about the direct debit on the joint account" for i in range(10)]
+
+
+# =============================================================================
+# Test: Fit
+# =============================================================================
+
+class TestFit:
+    """Cut to a token count, keeping the start, end or newest lines."""
+
+    def test_fits_unchanged(self):
+        assert fit("sort code", 50) == "sort code"
+
+    def test_head(self):
+        text = fit("one two three four five six seven eight", 5)
+        assert text.startswith("one") and text.endswith(TRIM_MARKER)
+        assert count_tokens(text) <= 5
+
+    def test_tail(self):
+        text = fit("one two three four five six seven eight", 5, keep="tail")
+        assert text.startswith(TRIM_MARKER) and text.endswith("eight")
+        assert count_tokens(text) <= 5
+
+    def test_lines_keep_newest_whole(self):
+        text = fit("\n".join(TURNS), 40, keep="lines")
+        lines = text.split("\n")
+        assert lines[0] == TRIM_MARKER
+        assert lines[-1] == TURNS[-1]
+        assert all(line in TURNS for line in lines[1:])
+        assert count_tokens(text) <= 40
+
+
+# =============================================================================
+# Test: Assemble
+# =============================================================================
+
+class TestAssemble:
+    """Priority order, fixed sections, determinism, metrics."""
+
+    SECTIONS = [
+        Section("instructions", "Translate to Traditional Chinese. "),
+        Section("hints", "hint " * 60, priority=1, prefix="Hints: ", suffix="\n"),
+        Section("history", "\n".join(TURNS), priority=2, keep="lines", suffix="\n"),
+        Section("text", "Can I take your sort code?"),
+    ]
+
+    def test_within_budget_is_plain_join(self):
+        prompt = assemble("test_join", self.SECTIONS, 10_000)
+        assert prompt.text == "".join(s.render(s.text) for s in self.SECTIONS)
+        assert prompt.trimmed == ()
+        assert prompt.tokens == count_tokens(prompt.text)
+
+    def test_lowest_priority_trimmed_first(self):
+        full = assemble("test_order", self.SECTIONS, 10_000).tokens
+        prompt = assemble("test_order", self.SECTIONS, full - 20)
+        assert prompt.trimmed == ("hints",)
+        assert "\n".join(TURNS) in prompt.text
+        assert prompt.tokens <= full - 20
+
+    def test_fixed_never_trimmed(self):
+        prompt = assemble("test_fixed", self.SECTIONS, 1)
+        assert prompt.text.startswith("Translate to Traditional Chinese. ")
+        assert prompt.text.endswith("Can I take your sort code?")
+        assert set(prompt.trimmed) == {"hints", "history"}
+
+    def test_deterministic(self):
+        assert assemble("test_det", self.SECTIONS, 80).text == assemble("test_det", self.SECTIONS, 80).text
+
+    def test_section_cap(self):
+        sections = [Section("ssot", "fact " * 500, priority=1, max_tokens=30)]
+        prompt = assemble("test_cap", sections, 10_000)
+        assert prompt.trimmed == ("ssot",) and prompt.tokens <= 30
+
+    def test_metrics(self):
+        assemble("test_metrics", self.SECTIONS, 1)
+        entry = get_tokenizer_stats()["prompts"]["test_metrics"]
+        assert entry["count"] >= 1 and entry["trimmed"] >= 1
+
+
+# =============================================================================
+# Test: Builders
+# =============================================================================
+
+class TestBuilders:
+    """Long calls stay within budget; short ones are unchanged."""
+
+    def test_controller_bounded(self):
+        prompt = build_controller_prompt("AGREE", "Goal: cancel the contract. " * 20, "memory " * 2000, TURNS, budget=400)
+        assert count_tokens(prompt) <= 400
+        assert prompt.endswith("provide your response in JSON format.")
+        assert "Goal: cancel the contract." in prompt  # pinned context outlives memory
+        assert TURNS[-1] in prompt
+
+    def test_controller_short_unchanged(self):
+        prompt = build_controller_prompt("AGREE", "Goal: x", "", [])
+        assert "=== CURRENT MEMORY ===\n(Empty)" in prompt
+        assert TRIM_MARKER not in prompt
+
+    def test_realtime_ssot_capped_by_tokens(self):
+        instructions = build_realtime_session_instructions("Alex", "the bank", "close the account", ssot_summary="fact " * 5000)
+        assert count_tokens(instructions) < 1500
+        assert "[REFERENCE] fact" in instructions and "[SPEAKING STYLE]" in instructions
+
+    def test_script_history_trimmed(self):
+        from src.backend.script_generator import build_script_prompt
+
+        history = [{"role": "them", "text": f"turn {i} " * 30} for i in range(5)]
+        prompt = build_script_prompt("我想取消合約", "general", history, term_hint="", budget=400)
+        assert count_tokens(prompt) <= 400
+        assert "turn 4" in prompt and "USER WANTS TO SAY" in prompt
+
+
+# =============================================================================
+# Test: Endpoints
+# =============================================================================
+
+class TestEndpoints:
+    """Final prompt size reported per request."""
+
+    @pytest.fixture
+    def client(self, tmp_path):
+        from src.backend import main
+        from src.backend.translation_cache import TranslationCache
+        from src.backend.translation_memory import TranslationMemory
+
+        messages = []
+
+        async def fake_deltas(api_key, system_prompt, user_message, prompt_name=None, model=None):
+            messages.append(user_message)
+            yield "好的"
+
+        async def fake_suggest(api_key, user_message, num_turns):
+            messages.append(user_message)
+            yield 'data: {"type": "done"}\n\n'
+
+        memory = TranslationMemory(path=tmp_path / "tm.jsonl")
+        cache = TranslationCache(max_entries=10, max_bytes=10_000, ttl_seconds=60)
+        with patch.object(main, "_stream_translation_deltas", fake_deltas), \
+                patch.object(main, "_suggest_stream", fake_suggest), \
+                patch.object(main, "translation_memory", memory), \
+                patch.object(main, "translation_cache", cache), \
+                patch.object(main, "TRANSLATE_PROMPT_BUDGET", 60):
+            test_client = TestClient(main.app)
+            test_client.messages = messages
+            yield test_client
+
+    def test_translate_previous_context_trimmed(self, client):
+        response = client.post(
+            "/api/translate/stream",
+            json={"text": "Can I take your sort code", "previous_context": "earlier words " * 200},
+            headers={"X-API-Key": "test_key"},
+        )
+        tokens = int(response.headers["X-Prompt-Tokens"])
+        assert tokens == count_tokens(client.messages[-1]) <= 60
+        assert client.messages[-1].endswith("[Translate ONLY the following]\nCan I take your sort code")
+
+    def test_suggest_header(self, client):
+        response = client.post(
+            "/api/suggest/stream",
+            json={"conversation_turns": [{"role": "them", "text": "What is your account number?"}]},
+            headers={"X-API-Key": "test_key"},
+        )
+        assert int(response.headers["X-Prompt-Tokens"]) == count_tokens(client.messages[-1])
+        assert "Other party: What is your account number?" in client.messages[-1]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
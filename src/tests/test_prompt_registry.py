@@ -0,0 +1,94 @@
+"""
+Unit tests for the prefix-stable prompt registry.
+
+Reference:
+- src/backend/prompt_registry.py
+- src/backend/main.py (_build_stream_translation_prompt)
+
+Run with:
+    python -m pytest src/tests/test_prompt_registry.py -v
+"""
+
+import sys
+import os
+
+import pytest
+
+# Ensure src is in path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.backend.prompt_registry import PromptRegistry, translation_prompt_name
+
+
+# =============================================================================
+# Test: Stable Prefixes
+# =============================================================================
+
+class TestStablePrefix:
+    """The system prompt must not vary with the text being translated."""
+
+    def test_system_prompt_identical_across_texts(self):
+        from src.backend.main import _build_stream_translation_prompt
+
+        name_a, system_a, user_a = _build_stream_translation_prompt(
+            "Can I take your sort code?", "bank", None
+        )
+        name_b, system_b, user_b = _build_stream_translation_prompt(
+            "Your direct debit bounced", "bank", "Hello"
+        )
+        assert name_a == name_b == translation_prompt_name("bank")
+        assert system_a.encode("utf-8") == system_b.encode("utf-8")
+        assert "Key terms" not in system_a
+
+    def test_hints_and_context_in_user_tail(self):
+        from src.backend.main import _build_stream_translation_prompt
+
+        _, _, user_message = _build_stream_translation_prompt(
+            "Can I take your sort code?", "bank", "Good morning"
+        )
+        assert "Key terms" in user_message
+        assert 'Previous: "Good morning"' in user_message
+        assert user_message.endswith("[Translate ONLY the following]\nCan I take your sort code?")
+
+    def test_plain_text_without_hints(self):
+        from src.backend.main import _build_stream_translation_prompt
+
+        name, _, user_message = _build_stream_translation_prompt("Hello there", None, None)
+        assert name == translation_prompt_name(None)
+        assert user_message == "Hello there"
+
+    def test_unknown_scenario_uses_general(self):
+        registry = PromptRegistry()
+        registry.compile_translation_prompts("BASE")
+        name, text = registry.translation_prompt("pet_shop")
+        assert name == translation_prompt_name("general")
+        assert text.startswith("BASE\n\nContext:")
+
+
+# =============================================================================
+# Test: Usage Recording
+# =============================================================================
+
+class TestUsage:
+    """cached_tokens and TTFT are aggregated per prompt."""
+
+    def test_cached_tokens_recorded(self):
+        registry = PromptRegistry()
+        registry.record_usage("p", {"prompt_tokens": 1200, "prompt_tokens_details": {"cached_tokens": 1024}}, 180.0)
+        registry.record_usage("p", {"prompt_tokens": 1200, "prompt_tokens_details": {"cached_tokens": 0}}, 420.0)
+
+        usage = registry.stats()["usage"]["p"]
+        assert usage["requests"] == 2
+        assert usage["cached_tokens"] == 1024
+        assert usage["cache_hit_rate"] == 0.5
+        assert usage["ttft_ms_cached_avg"] == 180.0
+        assert usage["ttft_ms_uncached_avg"] == 420.0
+
+    def test_missing_usage_ignored(self):
+        registry = PromptRegistry()
+        registry.record_usage("p", None)
+        assert registry.stats()["usage"] == {}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,186 @@
+"""
+Unit tests for the rate-limit-header-aware limiter.
+
+Reference:
+- src/backend/rate_limiter.py
+- src/backend/scheduler.py (pacing)
+- src/backend/upstream.py (response hook)
+
+Run with:
+    python -m pytest src/tests/test_rate_limiter.py -v
+"""
+
+import sys
+import os
+import asyncio
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+# Ensure src is in path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.backend import scheduler as scheduler_module
+from src.backend.rate_limiter import RateLimiter, parse_reset
+from src.backend.scheduler import Priority, UpstreamBusyError, upstream_slot
+
+
+def _headers(remaining_requests=499, remaining_tokens=199_000, reset_requests="120ms", reset_tokens="300ms"):
+    return {
+        "x-ratelimit-limit-requests": "500",
+        "x-ratelimit-limit-tokens": "200000",
+        "x-ratelimit-remaining-requests": str(remaining_requests),
+        "x-ratelimit-remaining-tokens": str(remaining_tokens),
+        "x-ratelimit-reset-requests": reset_requests,
+        "x-ratelimit-reset-tokens": reset_tokens,
+    }
+
+
+# =============================================================================
+# Test: Header Parsing
+# =============================================================================
+
+class TestParseReset:
+    """OpenAI reset durations."""
+
+    @pytest.mark.parametrize("value,seconds", [
+        ("1s", 1.0), ("20ms", 0.02), ("6m0s", 360.0), ("1h2m3.5s", 3723.5), ("2", 2.0),
+    ])
+    def test_durations(self, value, seconds):
+        assert parse_reset(value) == pytest.approx(seconds)
+
+    def test_missing(self):
+        assert parse_reset(None) is None
+        assert parse_reset("soon") is None
+
+
+# =============================================================================
+# Test: Buckets
+# =============================================================================
+
+class TestBuckets:
+    """Budgets learned from headers pace requests before a 429."""
+
+    def test_unknown_key_not_paced(self):
+        assert RateLimiter().reserve("new-key", 1000) == 0.0
+
+    def test_budget_available(self):
+        limiter = RateLimiter()
+        limiter.observe("key", _headers(), 200)
+        assert limiter.reserve("key", 1000) == 0.0
+
+        tokens = limiter.stats()["keys"]
+        (state,) = tokens.values()
+        assert state["tokens"]["available"] < 199_000  # booked locally
+
+    def test_exhausted_requests_wait_for_refill(self):
+        limiter = RateLimiter()
+        limiter.observe("key", _headers(remaining_requests=0, reset_requests="2s"), 200)
+        delay = limiter.reserve("key", 100)
+        assert 0 < delay <= 2.0
+
+    def test_reserve_kept_for_higher_classes(self):
+        limiter = RateLimiter()
+        # 40 of 500 requests left: 8% of the limit
+        limiter.observe("key", _headers(remaining_requests=40, reset_requests="50s"), 200)
+        assert limiter.reserve("key", 100, reserve_fraction=0.0) == 0.0
+        assert limiter.reserve("key", 100, reserve_fraction=0.2) > 0
+
+    def test_429_pauses_key(self):
+        limiter = RateLimiter()
+        limiter.observe("key", {**_headers(remaining_requests=0), "retry-after-ms": "800"}, 429)
+        assert limiter.reserve("key", 100) == pytest.approx(0.8, abs=0.05)
+        assert limiter.retry_delay("key") == pytest.approx(0.8, abs=0.05)
+        assert limiter.stats()["keys"]
+
+    def test_long_block_not_retried(self):
+        limiter = RateLimiter()
+        limiter.observe("key", {"retry-after": "30"}, 429)
+        assert limiter.retry_delay("key") is None
+
+
+# =============================================================================
+# Test: Integration
+# =============================================================================
+
+class TestIntegration:
+    """Response hook feeds the limiter; scheduler paces low priority work."""
+
+    def test_response_hook_observes_headers(self):
+        from src.backend import upstream
+
+        limiter = RateLimiter()
+        request = httpx.Request(
+            "POST", "https://api.openai.com/v1/chat/completions",
+            headers={"Authorization": "Bearer sk-test"},
+        )
+        response = httpx.Response(200, headers=_headers(), request=request)
+        with patch.object(upstream, "rate_limiter", limiter):
+            upstream._on_sync_response(response)
+
+        (state,) = limiter.stats()["keys"].values()
+        assert state["requests"]["limit"] == 500
+
+    @pytest.mark.asyncio
+    async def test_low_priority_rejected_translation_passes(self):
+        limiter = RateLimiter()
+        limiter.observe("key", {**_headers(remaining_requests=0), "retry-after": "5"}, 429)
+
+        with patch.object(scheduler_module, "rate_limiter", limiter):
+            with pytest.raises(UpstreamBusyError):
+                async with upstream_slot("key", Priority.CONTROLLER):
+                    pass
+            async with upstream_slot("key", Priority.TRANSLATION):
+                pass
+
+        stats = limiter.stats()
+        assert stats["rejected"] == 1
+        assert stats["passed_through"] == 1
+
+    @pytest.mark.asyncio
+    async def test_slot_released_while_paced(self):
+        limiter = RateLimiter()
+        limiter.observe("key", {**_headers(remaining_requests=0), "retry-after-ms": "200"}, 429)
+
+        async def paced_call():
+            async with upstream_slot("key", Priority.CONTROLLER):
+                return scheduler_module.scheduler.stats()["classes"]["controller"]["active"]
+
+        with patch.object(scheduler_module, "rate_limiter", limiter):
+            task = asyncio.create_task(paced_call())
+            await asyncio.sleep(0.05)
+            assert scheduler_module.scheduler.stats()["classes"]["controller"]["active"] == 0
+            assert await task == 1
+
+        assert limiter.stats()["paced"] == 1
+
+    @pytest.mark.asyncio
+    async def test_429_retry_waits_without_slot(self):
+        from src.backend import main
+
+        limiter = RateLimiter()
+        active = []
+
+        def translation_slots():
+            return scheduler_module.scheduler.stats()["classes"]["translation"]["active"]
+
+        async def send():
+            active.append(translation_slots())
+            if len(active) == 1:
+                limiter.observe("key", {**_headers(remaining_requests=0), "retry-after-ms": "100"}, 429)
+                return httpx.Response(429)
+            return httpx.Response(200)
+
+        with patch.object(main, "rate_limiter", limiter), patch.object(scheduler_module, "rate_limiter", limiter):
+            task = asyncio.create_task(main._retry_once_after_429("key", Priority.TRANSLATION, send))
+            await asyncio.sleep(0.05)
+            assert translation_slots() == 0
+            response = await task
+
+        assert response.status_code == 200
+        assert active == [1, 1]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,198 @@
+"""
+Unit tests for per-session scenario auto-detection.
+
+Reference:
+- src/backend/scenario_detector.py
+- src/backend/main.py (session_id on /api/translate/stream, /ws/session)
+
+Run with:
+    python -m pytest src/tests/test_scenario_detector.py -v
+"""
+
+import sys
+import os
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Ensure src is in path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.backend.scenario_detector import (
+    ScenarioDetector,
+    ScenarioSessions,
+    compile_domain_model,
+    detect_scenario,
+    domain_model,
+    get_scenario_detection_stats,
+    scenario_sessions,
+)
+
+BANK_CALL = [
+    "I'd like to check a payment on my account",
+    "Can I take your sort code and account number",
+    "I can see the direct debit went out on Monday",
+]
+NHS_CALL = [
+    "I'd like to see a doctor please",
+    "The GP has no appointments until Thursday",
+    "Is it about your repeat prescription",
+    "I'll book you in with the practice nurse",
+]
+
+
+@pytest.fixture(autouse=True)
+def fresh_sessions():
+    scenario_sessions.clear()
+    yield
+    scenario_sessions.clear()
+
+
+def _run(detector: ScenarioDetector, segments: list):
+    return [detector.update(segment) for segment in segments]
+
+
+# =============================================================================
+# Test: Model
+# =============================================================================
+
+class TestDomainModel:
+    """Trained from the glossary file at load time."""
+
+    GLOSSARIES = {
+        "version": "test",
+        "bank": {"description": "Banking", "terms": {"sort code": {"zh": "銀行分類代碼", "notes": "bank branch"}}},
+        "nhs": {"description": "Health", "terms": {"GP": {"zh": "家庭醫生", "notes": "doctor surgery"}}},
+    }
+
+    def test_term_hits(self):
+        model = compile_domain_model(self.GLOSSARIES)
+        bank, nhs = model.segment_evidence("what is your sort code")
+        assert bank > nhs
+
+    def test_no_evidence(self):
+        model = compile_domain_model(self.GLOSSARIES)
+        assert model.segment_evidence("lovely weather today") is None
+
+    def test_cached_per_version(self):
+        assert domain_model() is domain_model()
+
+
+# =============================================================================
+# Test: Detector
+# =============================================================================
+
+class TestDetector:
+    """Confident after a few segments; can switch and release."""
+
+    def test_detects_bank(self):
+        estimates = _run(ScenarioDetector(), BANK_CALL)
+        assert estimates[0].scenario is None  # one segment is never enough
+        assert estimates[-1].scenario == "bank"
+        assert estimates[-1].confidence >= 0.8
+        assert sum(e.changed for e in estimates) == 1
+
+    def test_small_talk_stays_general(self):
+        estimates = _run(ScenarioDetector(), ["Hello how are you", "Fine thanks", "Lovely weather today"])
+        assert all(e.scenario is None for e in estimates)
+
+    def test_switches_domain(self):
+        detector = ScenarioDetector()
+        _run(detector, BANK_CALL)
+        assert _run(detector, NHS_CALL)[-1].scenario == "nhs"
+
+    def test_only_when_general(self):
+        assert detect_scenario("s1", BANK_CALL[1], "bank") is None
+        assert detect_scenario("s1", BANK_CALL[1], "general") is not None
+
+    def test_sessions_bounded(self):
+        sessions = ScenarioSessions(max_sessions=2)
+        first = sessions.get("a")
+        sessions.get("b")
+        sessions.get("c")
+        assert len(sessions) == 2
+        assert sessions.get("a") is not first
+
+    def test_idle_session_restarts(self):
+        sessions = ScenarioSessions(ttl_seconds=0)
+        first = sessions.get("a")
+        first.last_used -= 1
+        assert sessions.get("a") is not first
+
+
+# =============================================================================
+# Test: Endpoints
+# =============================================================================
+
+class TestEndpoints:
+    """Detected scenario narrows the prompt; confidence reaches the client."""
+
+    @pytest.fixture
+    def client(self, tmp_path):
+        from src.backend import main
+        from src.backend.translation_cache import TranslationCache
+        from src.backend.translation_memory import TranslationMemory
+
+        prompts = []
+
+        async def fake_deltas(api_key, system_prompt, user_message, prompt_name=None, model=None):
+            prompts.append(prompt_name)
+            yield "好的"
+
+        memory = TranslationMemory(path=tmp_path / "tm.jsonl")
+        cache = TranslationCache(max_entries=10, max_bytes=10_000, ttl_seconds=60)
+        with patch.object(main, "_stream_translation_deltas", fake_deltas), \
+                patch.object(main, "translation_memory", memory), \
+                patch.object(main, "translation_cache", cache):
+            test_client = TestClient(main.app)
+            test_client.prompts = prompts
+            yield test_client
+
+    def test_stream_headers(self, client):
+        responses = [
+            client.post(
+                "/api/translate/stream",
+                json={"text": text, "scenario": "general", "session_id": "call-1"},
+                headers={"X-API-Key": "test_key"},
+            )
+            for text in BANK_CALL
+        ]
+        assert responses[0].headers["X-Detected-Scenario"] == "general"
+        assert responses[-1].headers["X-Detected-Scenario"] == "bank"
+        assert float(responses[-1].headers["X-Scenario-Confidence"]) >= 0.8
+        assert client.prompts[0] == "translate_stream:general"
+        assert client.prompts[-1] == "translate_stream:bank"
+
+    def test_no_session_no_detection(self, client):
+        response = client.post(
+            "/api/translate/stream",
+            json={"text": BANK_CALL[1], "scenario": "general"},
+            headers={"X-API-Key": "test_key"},
+        )
+        assert "X-Detected-Scenario" not in response.headers
+
+    def test_ws_scenario_message(self, client):
+        with client.websocket_connect("/ws/session") as ws:
+            ws.send_json({"type": "auth", "api_key": "test_key"})
+            ws.receive_json()
+            types = []
+            for i, text in enumerate(BANK_CALL):
+                ws.send_json({"type": "translate", "segment_id": f"s{i}", "text": text})
+                while True:
+                    message = ws.receive_json()
+                    types.append(message["type"])
+                    if message["type"] == "scenario":
+                        assert message["data"]["scenario"] == "bank"
+                    if message["data"].get("done"):
+                        break
+        assert types.count("scenario") == 1
+        assert len(scenario_sessions) == 0  # dropped with the connection
+
+    def test_metrics(self, client):
+        assert "scenario_detection" in client.get("/api/metrics").json()
+        assert get_scenario_detection_stats()["enabled"] is True
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
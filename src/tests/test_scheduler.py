@@ -0,0 +1,152 @@
+"""
+Unit tests for the priority-aware upstream scheduler.
+
+Reference:
+- src/backend/scheduler.py
+
+Run with:
+    python -m pytest src/tests/test_scheduler.py -v
+"""
+
+import sys
+import os
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+# Ensure src is in path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.backend import scheduler as scheduler_module
+from src.backend.scheduler import Priority, UpstreamScheduler, UpstreamBusyError
+
+
+@pytest.fixture
+def one_slot():
+    """A scheduler whose lanes hold one upstream call per key."""
+    with patch.object(scheduler_module, "SCHEDULER_MAX_PER_KEY", 1):
+        yield UpstreamScheduler()
+
+
+# =============================================================================
+# Test: Priority Order
+# =============================================================================
+
+class TestPriority:
+    """A freed slot goes to the highest-priority waiter."""
+
+    @pytest.mark.asyncio
+    async def test_translation_overtakes_summary(self, one_slot):
+        await one_slot.acquire("key", Priority.SCRIPT)
+        order = []
+
+        async def wait(priority):
+            await one_slot.acquire("key", priority)
+            order.append(priority)
+            one_slot.release("key", priority)
+
+        summary = asyncio.create_task(wait(Priority.SUMMARY))
+        await asyncio.sleep(0)
+        translation = asyncio.create_task(wait(Priority.TRANSLATION))
+        await asyncio.sleep(0)
+
+        one_slot.release("key", Priority.SCRIPT)
+        await asyncio.gather(summary, translation)
+        assert order == [Priority.TRANSLATION, Priority.SUMMARY]
+
+    @pytest.mark.asyncio
+    async def test_keys_do_not_share_lanes(self, one_slot):
+        await one_slot.acquire("key-a", Priority.SUMMARY)
+        await asyncio.wait_for(one_slot.acquire("key-b", Priority.SUMMARY), 0.5)
+        assert one_slot.stats()["lanes"] == 2
+
+
+class TestClassLimits:
+    """Background classes cannot fill a key's lane."""
+
+    @pytest.mark.asyncio
+    async def test_summary_capped_translation_not(self):
+        scheduler = UpstreamScheduler()
+        await scheduler.acquire("key", Priority.SUMMARY)
+
+        with pytest.raises(UpstreamBusyError):
+            await scheduler.acquire("key", Priority.SUMMARY, deadline_s=0.05)
+        await asyncio.wait_for(scheduler.acquire("key", Priority.TRANSLATION), 0.5)
+
+        stats = scheduler.stats()["classes"]
+        assert stats["summary"]["timed_out"] == 1
+        assert stats["summary"]["waiting"] == 0
+        assert stats["translation"]["active"] == 1
+
+
+# =============================================================================
+# Test: Bounded Queues / Deadlines
+# =============================================================================
+
+class TestQueues:
+    """Full queues reject; waiters give up at their deadline."""
+
+    @pytest.mark.asyncio
+    async def test_full_queue_rejects(self, one_slot):
+        await one_slot.acquire("key", Priority.SUGGESTION)
+        with patch.object(scheduler_module, "SCHEDULER_MAX_QUEUE", 1):
+            waiting = asyncio.create_task(one_slot.acquire("key", Priority.SUGGESTION))
+            await asyncio.sleep(0)
+            with pytest.raises(UpstreamBusyError):
+                await one_slot.acquire("key", Priority.SUGGESTION)
+
+        one_slot.release("key", Priority.SUGGESTION)
+        await asyncio.wait_for(waiting, 0.5)
+        assert one_slot.stats()["classes"]["suggestion"]["rejected"] == 1
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_leaves_queue(self, one_slot):
+        await one_slot.acquire("key", Priority.SCRIPT)
+        waiting = asyncio.create_task(one_slot.acquire("key", Priority.SCRIPT))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+
+        one_slot.release("key", Priority.SCRIPT)
+        assert one_slot.stats()["lanes"] == 0
+
+    @pytest.mark.asyncio
+    async def test_queue_wait_recorded(self, one_slot):
+        await one_slot.acquire("key", Priority.CONTROLLER)
+        waiting = asyncio.create_task(one_slot.acquire("key", Priority.CONTROLLER))
+        await asyncio.sleep(0.02)
+        one_slot.release("key", Priority.CONTROLLER)
+        await waiting
+
+        wait_ms = one_slot.stats()["classes"]["controller"]["queue_wait_ms"]
+        assert wait_ms["count"] == 2
+        assert wait_ms["p99"] >= 15
+
+
+# =============================================================================
+# Test: Threadpool Callers
+# =============================================================================
+
+class TestSync:
+    """Sync waiters (threadpool) are woken by async releases."""
+
+    @pytest.mark.asyncio
+    async def test_sync_waiter_woken(self, one_slot):
+        await one_slot.acquire("key", Priority.TRANSLATION)
+        waiting = asyncio.create_task(
+            asyncio.to_thread(one_slot.acquire_sync, "key", Priority.SUGGESTION, 2.0)
+        )
+        await asyncio.sleep(0.02)
+        one_slot.release("key", Priority.TRANSLATION)
+        await asyncio.wait_for(waiting, 1.0)
+        assert one_slot.stats()["classes"]["suggestion"]["active"] == 1
+
+    def test_sync_deadline(self, one_slot):
+        one_slot.acquire_sync("key", Priority.SCRIPT)
+        with pytest.raises(UpstreamBusyError):
+            one_slot.acquire_sync("key", Priority.SCRIPT, deadline_s=0.02)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,205 @@
+"""
+Unit tests for single-flight coalescing of identical streaming requests.
+
+Reference:
+- src/backend/single_flight.py
+
+Run with:
+    python -m pytest src/tests/test_single_flight.py -v
+"""
+
+import asyncio
+import sys
+import os
+from unittest.mock import patch
+
+import pytest
+
+# Ensure src is in path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.backend.single_flight import SingleFlight, make_flight_key
+
+
+class FakeUpstream:
+    """SSE event source that releases one event per gate.set()."""
+
+    def __init__(self, events):
+        self.events = events
+        self.calls = 0
+        self.cancelled = False
+        self.gate = asyncio.Event()
+
+    async def stream(self):
+        self.calls += 1
+        try:
+            for event in self.events:
+                await self.gate.wait()
+                self.gate.clear()
+                yield event
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+    async def release(self, n=1):
+        for _ in range(n):
+            self.gate.set()
+            await asyncio.sleep(0.01)
+
+
+async def _collect(events):
+    return [e async for e in events]
+
+
+# =============================================================================
+# Test: Keys
+# =============================================================================
+
+class TestFlightKey:
+    """Tests for request digests."""
+
+    def test_payload_order_insensitive(self):
+        a = make_flight_key("translate", "k", {"text": "Hi", "scenario": "bank"})
+        b = make_flight_key("translate", "k", {"scenario": "bank", "text": "Hi"})
+        assert a == b
+
+    def test_api_key_and_namespace_separate_flights(self):
+        base = make_flight_key("translate", "k1", {"text": "Hi"})
+        assert base != make_flight_key("translate", "k2", {"text": "Hi"})
+        assert base != make_flight_key("suggest", "k1", {"text": "Hi"})
+
+
+# =============================================================================
+# Test: Coalescing
+# =============================================================================
+
+class TestSingleFlight:
+    """Followers replay earlier events then follow live; upstream paid once."""
+
+    @pytest.mark.asyncio
+    async def test_follower_replays_and_follows(self):
+        flights = SingleFlight()
+        upstream = FakeUpstream(["a", "b", "c"])
+
+        role1, leader = flights.stream("key", upstream.stream)
+        assert role1 == "leader"
+        leader_task = asyncio.create_task(_collect(leader))
+        await upstream.release(1)  # "a" produced before the follower arrives
+
+        role2, follower = flights.stream("key", upstream.stream)
+        assert role2 == "follower"
+        follower_task = asyncio.create_task(_collect(follower))
+        await upstream.release(2)
+
+        assert await leader_task == ["a", "b", "c"]
+        assert await follower_task == ["a", "b", "c"]
+        assert upstream.calls == 1
+
+        stats = flights.stats()
+        assert stats["leaders"] == 1
+        assert stats["followers"] == 1
+        assert stats["replayed_events"] == 1
+        assert stats["in_flight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_finished_flight_not_reused(self):
+        flights = SingleFlight()
+        upstream = FakeUpstream(["a"])
+
+        _, first = flights.stream("key", upstream.stream)
+        task = asyncio.create_task(_collect(first))
+        await upstream.release(1)
+        await task
+
+        role, second = flights.stream("key", upstream.stream)
+        assert role == "leader"
+        task = asyncio.create_task(_collect(second))
+        await upstream.release(1)
+        assert await task == ["a"]
+        assert upstream.calls == 2
+
+    @pytest.mark.asyncio
+    async def test_abandoned_flight_cancels_upstream(self):
+        flights = SingleFlight()
+        upstream = FakeUpstream(["a", "b"])
+
+        _, events = flights.stream("key", upstream.stream)
+        await upstream.release(1)
+        assert await events.__anext__() == "a"
+        await events.aclose()
+        await asyncio.sleep(0.01)
+
+        assert upstream.cancelled
+        assert flights.stats()["abandoned"] == 1
+        assert flights.stats()["in_flight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_follow_returns_leader_info(self):
+        flights = SingleFlight()
+        upstream = FakeUpstream(["a"])
+
+        assert flights.follow("key") is None
+        _, leader = flights.stream("key", upstream.stream, info={"X-Translation-Model": "m1"})
+        events, info = flights.follow("key")
+        assert info == {"X-Translation-Model": "m1"}
+
+        tasks = [asyncio.create_task(_collect(leader)), asyncio.create_task(_collect(events))]
+        await upstream.release(1)
+        assert await asyncio.gather(*tasks) == [["a"], ["a"]]
+        assert flights.stats()["followers"] == 1
+
+
+# =============================================================================
+# Test: Endpoint
+# =============================================================================
+
+class TestTranslateEndpoint:
+    """A duplicate /api/translate/stream joins before scenario detection."""
+
+    @pytest.mark.asyncio
+    async def test_duplicate_skips_detection_and_reports_leader_route(self, tmp_path):
+        import httpx
+        from src.backend import main
+        from src.backend.translation_cache import TranslationCache
+        from src.backend.translation_memory import TranslationMemory
+
+        gate = asyncio.Event()
+        upstream_calls = []
+        detections = []
+
+        async def fake_deltas(api_key, system_prompt, user_message, prompt_name=None, model=None):
+            upstream_calls.append(model)
+            await gate.wait()
+            yield "好的"
+
+        def counting_detect(session_key, text, requested):
+            detections.append(text)
+            return None
+
+        payload = {"text": "Could you confirm the payee name", "session_id": "call-1"}
+        transport = httpx.ASGITransport(app=main.app)
+        with patch.object(main, "_stream_translation_deltas", fake_deltas), \
+                patch.object(main, "detect_scenario", counting_detect), \
+                patch.object(main, "translation_memory", TranslationMemory(path=tmp_path / "tm.jsonl")), \
+                patch.object(main, "translation_cache", TranslationCache(max_entries=10, max_bytes=10_000, ttl_seconds=60)):
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                post = lambda: client.post("/api/translate/stream", json=payload, headers={"X-API-Key": "test_key"})
+                leader = asyncio.create_task(post())
+                while not upstream_calls:
+                    await asyncio.sleep(0.01)
+                follower = asyncio.create_task(post())
+                await asyncio.sleep(0.05)
+                gate.set()
+                leader, follower = await leader, await follower
+
+        assert leader.headers["X-Coalesced"] == "leader"
+        assert follower.headers["X-Coalesced"] == "follower"
+        assert follower.headers["X-Translation-Model"] == leader.headers["X-Translation-Model"]
+        assert follower.headers["X-Route-Reason"] == leader.headers["X-Route-Reason"]
+        assert follower.text == leader.text
+        assert len(upstream_calls) == 1
+        assert len(detections) == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
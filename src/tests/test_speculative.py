@@ -0,0 +1,127 @@
+"""
+Unit tests for speculative translation of interim results.
+
+Reference:
+- src/backend/speculative.py
+
+Run with:
+    python -m pytest src/tests/test_speculative.py -v
+"""
+
+import asyncio
+import sys
+import os
+
+import pytest
+
+# Ensure src is in path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.backend.speculative import SpeculativeTranslator, stable_prefix
+
+
+class FakeTranslate:
+    """Records calls; translation is "<" + text + ">"."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = []
+
+    async def __call__(self, api_key, text, scenario, previous_context):
+        self.calls.append((text, previous_context))
+        await asyncio.sleep(self.delay)
+        yield f"<{text}>"
+
+
+async def _collect(deltas):
+    return "".join([d async for d in deltas])
+
+
+# =============================================================================
+# Test: Stable Prefix
+# =============================================================================
+
+class TestStablePrefix:
+    """Tests for choosing the part of an interim revision to speculate on."""
+
+    def test_short_text_not_stable(self):
+        assert stable_prefix("can I take your") == ""
+
+    def test_unstable_tail_dropped(self):
+        text = "could I please take your sort code and account"
+        assert stable_prefix(text) == "could I please take your sort code"
+
+    def test_pause_uses_whole_text(self):
+        text = "could I please take your sort code"
+        assert stable_prefix(text, pause=True) == text
+
+    def test_clause_punctuation_in_tail(self):
+        text = "thanks for calling the bank today."
+        assert stable_prefix(text) == text
+
+
+# =============================================================================
+# Test: Revisions and Finalisation
+# =============================================================================
+
+class TestSpeculativeTranslator:
+    """Tests for reuse, cancellation and fallbacks."""
+
+    @pytest.mark.asyncio
+    async def test_exact_reuse(self):
+        translate = FakeTranslate()
+        spec = SpeculativeTranslator(translate)
+        text = "could I please take your sort code"
+
+        status = spec.update("k", "s1", 1, text, pause=True)
+        assert status["status"] == "speculating"
+        await asyncio.sleep(0.01)
+
+        mode, deltas = spec.finalize("k", "s1", "Could I please take your sort code?")
+        assert mode == "exact"
+        assert await _collect(deltas) == f"<{text}>"
+        assert len(translate.calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_extended_translates_remainder_only(self):
+        translate = FakeTranslate()
+        spec = SpeculativeTranslator(translate)
+        spec.update("k", "s1", 1, "could I please take your sort code", pause=True)
+
+        mode, deltas = spec.finalize("k", "s1", "could I please take your sort code and account number")
+        assert mode == "extended"
+        result = await _collect(deltas)
+        assert result == "<could I please take your sort code><and account number>"
+        assert translate.calls[-1] == ("and account number", "could I please take your sort code")
+
+    @pytest.mark.asyncio
+    async def test_rewritten_prefix_cancels(self):
+        translate = FakeTranslate(delay=1.0)
+        spec = SpeculativeTranslator(translate)
+        spec.update("k", "s1", 1, "could I please take your sort code", pause=True)
+        await asyncio.sleep(0)
+
+        spec.update("k", "s1", 2, "good I please take your short code")
+        assert spec.stats()["cancelled"] == 1
+
+        mode, _ = spec.finalize("k", "s1", "good morning please hold")
+        assert mode == "full"
+
+    @pytest.mark.asyncio
+    async def test_stale_revision_ignored(self):
+        spec = SpeculativeTranslator(FakeTranslate())
+        spec.update("k", "s1", 3, "hello there")
+        assert spec.update("k", "s1", 2, "hello")["status"] == "stale"
+
+    @pytest.mark.asyncio
+    async def test_segments_isolated_per_api_key(self):
+        translate = FakeTranslate()
+        spec = SpeculativeTranslator(translate)
+        spec.update("key-a", "s1", 1, "could I please take your sort code", pause=True)
+
+        mode, _ = spec.finalize("key-b", "s1", "could I please take your sort code")
+        assert mode == "full"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
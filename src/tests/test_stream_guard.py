@@ -0,0 +1,151 @@
+"""
+Unit tests for client-disconnect detection and upstream abort.
+
+Reference:
+- src/backend/stream_guard.py
+- src/backend/main.py (SSE endpoints)
+
+Run with:
+    python -m pytest src/tests/test_stream_guard.py -v
+"""
+
+import sys
+import os
+import asyncio
+import threading
+
+import pytest
+
+# Ensure src is in path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.backend.stream_guard import (
+    guard_stream,
+    iterate_sync_stream,
+    get_stream_abort_stats,
+)
+
+
+class FakeUpstream:
+    """Async source that records whether it was closed early."""
+
+    def __init__(self, events):
+        self.events = events
+        self.closed = False
+        self.produced = 0
+
+    async def stream(self):
+        try:
+            for event in self.events:
+                self.produced += 1
+                yield event
+                await asyncio.sleep(0)
+        finally:
+            self.closed = True
+
+
+# =============================================================================
+# Test: guard_stream
+# =============================================================================
+
+class TestGuardStream:
+    """Events pass through until the client disconnects."""
+
+    @pytest.mark.asyncio
+    async def test_completed_stream_not_counted_as_abort(self):
+        before = get_stream_abort_stats()
+        upstream = FakeUpstream(['data: {"text": "你好"}\n\n', 'data: {"done": true}\n\n'])
+
+        received = [event async for event in guard_stream(upstream.stream(), "test")]
+
+        after = get_stream_abort_stats()
+        assert len(received) == 2
+        assert after["streams_completed"] == before["streams_completed"] + 1
+        assert after["streams_aborted"] == before["streams_aborted"]
+
+    @pytest.mark.asyncio
+    async def test_disconnect_closes_source(self):
+        before = get_stream_abort_stats()
+        upstream = FakeUpstream([f'data: {{"text": "word{i}"}}\n\n' for i in range(100)])
+        gone = {"value": False}
+
+        async def is_disconnected():
+            return gone["value"]
+
+        received = []
+        async for event in guard_stream(upstream.stream(), "test_disconnect", is_disconnected, "Hello there"):
+            received.append(event)
+            if len(received) == 3:
+                gone["value"] = True
+
+        after = get_stream_abort_stats()
+        assert len(received) == 3
+        assert upstream.closed
+        assert upstream.produced < 100
+        assert after["streams_aborted"] == before["streams_aborted"] + 1
+        assert after["aborted_by_endpoint"]["test_disconnect"] >= 1
+        assert after["wasted_output_tokens_est"] > before["wasted_output_tokens_est"]
+        assert after["wasted_input_tokens_est"] > before["wasted_input_tokens_est"]
+
+    @pytest.mark.asyncio
+    async def test_consumer_close_closes_source(self):
+        upstream = FakeUpstream(["a", "b", "c"])
+        events = guard_stream(upstream.stream(), "test_close")
+
+        assert await events.__anext__() == "a"
+        await events.aclose()
+
+        assert upstream.closed
+
+
+# =============================================================================
+# Test: iterate_sync_stream
+# =============================================================================
+
+class TestIterateSyncStream:
+    """Sync generators stop on their worker thread when the consumer leaves."""
+
+    @pytest.mark.asyncio
+    async def test_full_iteration(self):
+        def factory(stop):
+            yield from ["x", "y", "z"]
+
+        assert [item async for item in iterate_sync_stream(factory)] == ["x", "y", "z"]
+
+    @pytest.mark.asyncio
+    async def test_early_close_stops_worker(self):
+        closed = threading.Event()
+        stop_seen = {}
+
+        def factory(stop):
+            stop_seen["event"] = stop
+            try:
+                for i in range(1000):
+                    if stop.is_set():
+                        return
+                    yield i
+                    threading.Event().wait(0.005)
+            finally:
+                closed.set()
+
+        events = iterate_sync_stream(factory)
+        assert await events.__anext__() == 0
+        await events.aclose()
+
+        assert stop_seen["event"].is_set()
+        assert await asyncio.to_thread(closed.wait, 2.0)
+
+    @pytest.mark.asyncio
+    async def test_errors_forwarded(self):
+        def factory(stop):
+            yield "first"
+            raise ValueError("upstream broke")
+
+        events = iterate_sync_stream(factory)
+        assert await events.__anext__() == "first"
+        with pytest.raises(ValueError):
+            await events.__anext__()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,229 @@
+"""
+Unit tests for token counting.
+
+Reference:
+- src/backend/tokenizer.py
+- src/backend/controller.py (estimate_tokens, summarize_ssot)
+
+Run with:
+    python -m pytest src/tests/test_tokenizer.py -v
+"""
+
+import sys
+import os
+import asyncio
+import base64
+from unittest.mock import patch
+
+import pytest
+
+# Ensure src is in path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.backend import tokenizer
+from src.backend.tokenizer import (
+    BPETokenizer,
+    TokenEstimator,
+    count_tokens,
+    count_tokens_batch,
+    get_tokenizer,
+    get_tokenizer_stats,
+    pretokenize,
+    truncate_to_tokens,
+)
+
+SAMPLES = [
+    "Can I take your sort code and account number, please?",
+    "您好，我想查詢一筆直接扣款。",
+    "Reference 00123-ABC: £1,234.56 due on 3rd March\n\n  (see https://example.com/a_b)",
+    "I'm sure they'll call back — won't they?",
+]
+
+
+def _old_estimate(text: str) -> int:
+    """controller.estimate_tokens before tokenizer.py (design.md § 7, T2.1)."""
+    import re
+
+    if not text:
+        return 0
+    chinese_chars = len(re.findall(r'[一-鿿]', text))
+    english_words = len(re.sub(r'[一-鿿]', '', text).split())
+    return max(int(chinese_chars * 2 + english_words * 1.3), 1)
+
+
+def _write_vocabulary(path, merges):
+    """A tiny .tiktoken file: the 256 single bytes, then `merges` in rank order."""
+    tokens = [bytes([b]) for b in range(256)] + [m.encode("utf-8") for m in merges]
+    with open(path, "wb") as f:
+        for rank, token in enumerate(tokens):
+            f.write(base64.b64encode(token) + b" " + str(rank).encode() + b"\n")
+
+
+# =============================================================================
+# Test: o200k_base (default)
+# =============================================================================
+
+class TestO200k:
+    """Default counter: the vendored o200k_base vocabulary, the counts the API bills."""
+
+    def test_default_is_o200k(self):
+        assert isinstance(get_tokenizer(), BPETokenizer)
+        assert get_tokenizer().vocab_size == 199998
+        assert get_tokenizer_stats()["vocabulary"] == "o200k_base"
+
+    @pytest.mark.parametrize("text, ids", [
+        ("hello world", [24912, 2375]),
+        ("XMLHttpRequest", [13836, 4682, 2303]),
+        (SAMPLES[0], [8475, 357, 2304, 634, 4506, 3490, 326, 3527, 2086, 11, 4843, 30]),
+        (SAMPLES[1], [188633, 40824, 18165, 13451, 142092, 2432, 167932, 69529, 62639, 20337, 788]),
+        (SAMPLES[3], [15390, 3239, 57956, 2421, 1602, 2733, 14219, 1023, 30]),
+    ])
+    def test_same_as_tiktoken(self, text, ids):
+        """Ids from tiktoken's o200k_base encode_ordinary."""
+        assert get_tokenizer().encode(text) == ids
+        assert count_tokens(text) == len(ids)
+
+    def test_split_before_upper_case(self):
+        assert pretokenize("XMLHttpRequest sort code 12345") == [
+            "XMLHttp", "Request", " sort", " code", " ", "123", "45",
+        ]
+
+    def test_cjk_cheaper_than_v1(self):
+        assert count_tokens(SAMPLES[1]) < _old_estimate(SAMPLES[1]) / 2
+
+    def test_batch(self):
+        assert count_tokens_batch(SAMPLES) == [count_tokens(text) for text in SAMPLES]
+
+    @pytest.mark.parametrize("text", SAMPLES)
+    @pytest.mark.parametrize("limit", [1, 3, 7, 12])
+    def test_truncate_within_limit(self, text, limit):
+        head = truncate_to_tokens(text, limit)
+        tail = truncate_to_tokens(text, limit, keep_end=True)
+        assert text.startswith(head) and text.endswith(tail)
+        assert count_tokens(head) <= limit and count_tokens(tail) <= limit
+
+    def test_truncate_on_word_boundary(self):
+        text = "hello there world again"
+        assert truncate_to_tokens(text, 2) == "hello there"
+        assert truncate_to_tokens(text, 2, keep_end=True) == " world again"
+        assert truncate_to_tokens(text, 10_000) == text
+        assert truncate_to_tokens(text, 0) == ""
+
+
+# =============================================================================
+# Test: v1 Estimate (fallback)
+# =============================================================================
+
+class TestEstimate:
+    """Fallback when the vocabulary cannot be loaded: the v1 formula."""
+
+    @pytest.fixture
+    def estimator(self):
+        return TokenEstimator()
+
+    @pytest.mark.parametrize("text", SAMPLES + ["", "x", "ab世cd", "Hello 世界"])
+    def test_same_as_v1(self, estimator, text):
+        assert estimator.count(text) == _old_estimate(text)
+
+    @pytest.mark.parametrize("text", SAMPLES)
+    @pytest.mark.parametrize("limit", [1, 3, 7, 12])
+    def test_truncate_within_limit(self, estimator, text, limit):
+        head = estimator.truncate(text, limit)
+        tail = estimator.truncate(text, limit, keep_end=True)
+        assert text.startswith(head) and text.endswith(tail)
+        assert estimator.count(head) <= limit and estimator.count(tail) <= limit
+
+    def test_truncate_on_word_boundary(self, estimator):
+        text = "hello there world again"
+        assert estimator.truncate(text, 2) == "hello there"  # int(2 × 1.3)
+        assert estimator.truncate(text, 2, keep_end=True) == "world again"
+        assert estimator.truncate("您好世界", 4) == "您好"
+        assert estimator.truncate(text, 0) == ""
+
+    def test_unreadable_vocabulary(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(tokenizer, "TOKENIZER_VOCAB_PATH", str(tmp_path / "missing.tiktoken"))
+        assert isinstance(tokenizer._load_tokenizer(), TokenEstimator)
+
+
+# =============================================================================
+# Test: BPE Engine (TOKENIZER_VOCAB_PATH)
+# =============================================================================
+
+class TestBPE:
+    """Any tiktoken-format vocabulary file; merges by rank."""
+
+    @pytest.fixture
+    def bpe(self, tmp_path):
+        path = tmp_path / "test.tiktoken"
+        _write_vocabulary(path, ["or", " s", " sor", " sort", "co", "de", " co", " code"])
+        return BPETokenizer.from_file(path)
+
+    def test_pretokenize_lossless(self):
+        for text in SAMPLES:
+            assert "".join(pretokenize(text)) == text
+
+    @pytest.mark.parametrize("text", SAMPLES)
+    def test_round_trip_and_count(self, bpe, text):
+        assert bpe.decode(bpe.encode(text)) == text
+        assert bpe.count(text) == len(bpe.encode(text))
+
+    def test_merges(self, bpe):
+        assert bpe.encode(" sort code") == [256 + 3, 256 + 7]
+        assert bpe.vocab_size == 256 + 8
+
+    def test_lowest_rank_merged_first(self):
+        ranks = {bytes([b]): b for b in range(256)}
+        ranks[b"bc"] = 256
+        ranks[b"ab"] = 257
+        assert BPETokenizer(ranks).encode("abc") == [ord("a"), 256]
+
+    def test_truncate(self, bpe):
+        text = " sort code sort code"
+        head = bpe.truncate(text, 2)
+        assert head == " sort code" and bpe.count(head) == 2
+
+    def test_configured_path(self, tmp_path, monkeypatch):
+        path = tmp_path / "cl100k_base.tiktoken"
+        _write_vocabulary(path, ["co", "de"])
+        monkeypatch.setattr(tokenizer, "TOKENIZER_VOCAB_PATH", str(path))
+        loaded = tokenizer._load_tokenizer()
+        assert loaded.name == "cl100k_base" and loaded.vocab_size == 258
+
+
+# =============================================================================
+# Test: Controller Integration
+# =============================================================================
+
+class TestIntegration:
+    """summarize_ssot uses the same count; prompt sizes reach /api/metrics."""
+
+    def test_summary_fallback_truncates_by_tokens(self):
+        from src.backend import controller
+        from src.backend.models import SummarizeSsotRequest
+
+        async def failing_call(**kwargs):
+            raise RuntimeError("upstream down")
+
+        ssot = "Account references: " + " ".join(f"{i * 7919:07d}" for i in range(1200))
+        with patch.object(controller, "call_responses_api", failing_call):
+            result = asyncio.run(controller.summarize_ssot(SummarizeSsotRequest(ssot_text=ssot), api_key="k"))
+        assert result.original_tokens == count_tokens(ssot) > controller.SSOT_TOKEN_LIMIT
+        assert result.summary_tokens <= controller.SSOT_TOKEN_LIMIT
+
+    def test_prompt_tokens_recorded(self):
+        tokenizer.record_prompt_tokens("test_prompt", 120)
+        tokenizer.record_prompt_tokens("test_prompt", 80)
+        prompts = get_tokenizer_stats()["prompts"]
+        assert prompts["test_prompt"]["max_tokens"] == 120
+        assert prompts["test_prompt"]["avg_tokens"] == 100.0
+
+    def test_metrics(self):
+        from fastapi.testclient import TestClient
+        from src.backend import main
+
+        stats = TestClient(main.app).get("/api/metrics").json()["tokenizer"]
+        assert "vocabulary" in stats and "prompts" in stats
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,209 @@
+"""
+Unit tests for the translation result cache.
+
+Reference:
+- src/backend/translation_cache.py
+
+Run with:
+    python -m pytest src/tests/test_translation_cache.py -v
+"""
+
+import json
+import sys
+import os
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+# Ensure src is in path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.backend.translation_cache import (
+    TranslationCache,
+    make_cache_key,
+    normalize_source,
+)
+
+
+# =============================================================================
+# Test: Key Building
+# =============================================================================
+
+class TestCacheKey:
+    """Tests for source normalisation and key building."""
+
+    def test_normalize_case_and_whitespace(self):
+        """Capitalisation and spacing differences should normalise away."""
+        assert normalize_source("  Can I take  your SORT code? ") == "can i take your sort code?"
+
+    def test_same_utterance_same_key(self):
+        """Equivalent utterances should share a key."""
+        a = make_cache_key("Can I take your sort code?", "bank", None, "gpt-4.1-nano")
+        b = make_cache_key("can i take your  sort code?", "bank", None, "gpt-4.1-nano")
+        assert a == b
+
+    def test_key_varies_by_scenario_context_model(self):
+        """Scenario, previous context and model are all part of the key."""
+        base = make_cache_key("Hello", "bank", None, "gpt-4.1-nano")
+        assert base != make_cache_key("Hello", "nhs", None, "gpt-4.1-nano")
+        assert base != make_cache_key("Hello", "bank", "Previous line", "gpt-4.1-nano")
+        assert base != make_cache_key("Hello", "bank", None, "gpt-4.1-mini")
+        assert base != make_cache_key("Hello", "bank", None, "gpt-4.1-nano", namespace="plain")
+        assert base != make_cache_key("Hello", "bank", None, "gpt-4.1-nano", glossary_version="2+abcd1234")
+
+
+# =============================================================================
+# Test: Cache Behaviour
+# =============================================================================
+
+class TestTranslationCache:
+    """Tests for LRU / size / TTL eviction and counters."""
+
+    def test_hit_and_miss_counters(self):
+        cache = TranslationCache(max_entries=10, max_bytes=10_000, ttl_seconds=60)
+        assert cache.get("k") is None
+        cache.put("k", "你好")
+        assert cache.get("k") == "你好"
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["entries"] == 1
+
+    def test_lru_eviction_by_count(self):
+        cache = TranslationCache(max_entries=2, max_bytes=10_000, ttl_seconds=60)
+        cache.put("a", "1")
+        cache.put("b", "2")
+        cache.get("a")  # a is now most recently used
+        cache.put("c", "3")
+
+        assert cache.get("b") is None
+        assert cache.get("a") == "1"
+        assert cache.stats()["evictions"] == 1
+
+    def test_eviction_by_bytes(self):
+        cache = TranslationCache(max_entries=100, max_bytes=40, ttl_seconds=60)
+        cache.put("a", "x" * 15)
+        cache.put("b", "y" * 15)
+        cache.put("c", "z" * 15)
+
+        stats = cache.stats()
+        assert stats["bytes"] <= 40
+        assert cache.get("a") is None
+
+    def test_ttl_expiry(self):
+        cache = TranslationCache(max_entries=10, max_bytes=10_000, ttl_seconds=0)
+        cache.put("k", "過期")
+        assert cache.get("k") is None
+        assert cache.stats()["expirations"] == 1
+
+    def test_empty_value_not_stored(self):
+        cache = TranslationCache(max_entries=10, max_bytes=10_000, ttl_seconds=60)
+        cache.put("k", "")
+        assert cache.stats()["entries"] == 0
+
+
+# =============================================================================
+# Test: SSE Replay
+# =============================================================================
+
+class TestStreamCacheHit:
+    """Cache hits on /api/translate/stream replay without an upstream call."""
+
+    def test_stream_hit_replays_events(self):
+        from fastapi.testclient import TestClient
+        from src.backend import main
+
+        key = make_cache_key(
+            "Is there anything else?", "bank", None, main.TRANSLATION_MODEL,
+            glossary_version=main.glossary_store.current.version,
+        )
+        main.translation_cache.put(key, "還有其他需要幫忙的嗎？")
+
+        with patch.object(main, "get_async_client") as mock_client:
+            client = TestClient(main.app)
+            response = client.post(
+                "/api/translate/stream",
+                json={"text": "Is there anything else?", "scenario": "bank"},
+                headers={"X-API-Key": "test_key"},
+            )
+            mock_client.assert_not_called()
+
+        assert response.headers["X-Translation-Cache"] == "hit"
+        events = [
+            json.loads(line[6:])
+            for line in response.text.split("\n")
+            if line.startswith("data: ")
+        ]
+        assert events == [{"text": "還有其他需要幫忙的嗎？"}, {"done": True}]
+
+
+class TestStreamStore:
+    """Only a stream that reached [DONE] is cached and learned."""
+
+    @staticmethod
+    def _body(chunks, done=True):
+        lines = [
+            "data: " + json.dumps({"choices": [{"delta": {"content": chunk}}]}) + "\n\n"
+            for chunk in chunks
+        ]
+        return "".join(lines) + ("data: [DONE]\n\n" if done else "")
+
+    def _translate(self, tmp_path, body, on_request=None):
+        from fastapi.testclient import TestClient
+        from src.backend import main
+        from src.backend.translation_memory import TranslationMemory
+
+        def handler(request):
+            if on_request is not None:
+                on_request()
+            return httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})
+
+        upstream = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        memory = TranslationMemory(path=tmp_path / "tm.jsonl")
+        cache = TranslationCache(max_entries=10, max_bytes=10_000, ttl_seconds=60)
+        text = "Your refund of forty pounds has been approved"
+        with patch.object(main, "get_async_client", lambda: upstream), \
+                patch.object(main, "translation_memory", memory), \
+                patch.object(main, "translation_cache", cache):
+            response = TestClient(main.app).post(
+                "/api/translate/stream", json={"text": text}, headers={"X-API-Key": "test_key"},
+            )
+        events = [json.loads(line[6:]) for line in response.text.split("\n") if line.startswith("data: ")]
+        key = make_cache_key(
+            text, None, None, main.TRANSLATION_MODEL, glossary_version=main.glossary_store.current.version,
+        )
+        return events, cache.get(key), memory.lookup(text)
+
+    def test_complete_stream_stored(self, tmp_path):
+        events, cached, learned = self._translate(tmp_path, self._body(["您的", "退款已批准"]))
+        assert events[-1] == {"done": True}
+        assert cached == "您的退款已批准"
+        assert learned is not None and learned.entry.translation == "您的退款已批准"
+
+    def test_truncated_stream_not_stored(self, tmp_path):
+        events, cached, learned = self._translate(tmp_path, self._body(["您的", "退款"], done=False))
+        assert events[:2] == [{"text": "您的"}, {"text": "退款"}]
+        assert "error" in events[-1]
+        assert cached is None
+        assert learned is None
+
+    def test_glossary_swap_mid_stream_not_stored(self, tmp_path, monkeypatch):
+        """A translation made with the old glossary is not stored under the new one."""
+        import dataclasses
+        from src.backend import main
+
+        store = main.glossary_store
+        swapped = dataclasses.replace(store.current, version="swapped+00000000")
+        events, cached, learned = self._translate(
+            tmp_path, self._body(["您的", "退款已批准"]),
+            on_request=lambda: monkeypatch.setattr(store, "_current", swapped),
+        )
+        assert events[-1] == {"done": True}
+        assert cached is None
+        assert learned is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,156 @@
+"""
+Unit tests for the fuzzy translation memory.
+
+Reference:
+- src/backend/translation_memory.py
+
+Run with:
+    python -m pytest src/tests/test_translation_memory.py -v
+"""
+
+import sys
+import os
+
+import pytest
+
+# Ensure src is in path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.backend.translation_memory import (
+    TranslationMemory,
+    TM_SERVE_THRESHOLD,
+    TM_HINT_THRESHOLD,
+    format_tm_hint,
+)
+
+
+@pytest.fixture
+def tm(tmp_path):
+    """Translation memory backed by a temporary JSONL file."""
+    memory = TranslationMemory(path=tmp_path / "tm.jsonl")
+    memory.load()
+    return memory
+
+
+# =============================================================================
+# Test: Lookup
+# =============================================================================
+
+class TestLookup:
+    """Tests for near-duplicate lookup and thresholds."""
+
+    def test_phrasebook_seeded(self, tm):
+        """Phrasebook entries from domain_glossaries.json should be indexed."""
+        match = tm.lookup("Can I cancel my standing order?", "bank")
+        assert match is not None
+        assert match.similarity == 1.0
+        assert match.entry.origin == "phrasebook"
+        assert match.servable
+
+    def test_near_duplicate_hint(self, tm):
+        """A reworded sentence should match as a hint, not be served."""
+        tm.add("can I take your account number please", "請問可以提供您的賬戶號碼嗎？")
+        match = tm.lookup("could I take your account number")
+        assert match is not None
+        assert TM_HINT_THRESHOLD <= match.similarity < TM_SERVE_THRESHOLD
+        assert not match.servable
+        assert "賬戶號碼" in format_tm_hint(match)
+
+    def test_punctuation_and_case_served(self, tm):
+        """Punctuation / case differences should still be served directly."""
+        tm.add("Is there anything else I can help with?", "還有其他可以幫到您的嗎？")
+        match = tm.lookup("is there anything else I can help with")
+        assert match is not None
+        assert match.servable
+
+    def test_different_amount_only_hinted(self, tm):
+        """A different number / amount must never be served."""
+        balance = "The outstanding balance on your account is {} this month, due on the last working day"
+        tm.add(balance.format("£500"), "您賬戶本月的未結餘額為 500 英鎊，須於最後一個工作日前繳付")
+        match = tm.lookup(balance.format("£600"))
+        assert match is not None and match.similarity >= TM_SERVE_THRESHOLD
+        assert not match.servable
+        assert tm.lookup(balance.format("£500").upper()).servable
+        assert not tm.lookup(balance.format("$500")).servable
+
+    def test_negation_only_hinted(self, tm):
+        """Adding or dropping a negation must never be served."""
+        payment = "I {} confirm that the payment to your landlord went through yesterday afternoon as agreed"
+        tm.add(payment.format("can"), "我可以確認，給您房東的款項已按約定於昨天下午到賬")
+        match = tm.lookup(payment.format("cannot"))
+        assert match is not None and match.similarity >= TM_SERVE_THRESHOLD
+        assert not match.servable
+        assert not tm.lookup(payment.format("can't")).servable
+
+    def test_other_scenario_only_hinted(self, tm):
+        tm.add("Please hold while I check your account", "請稍等，我查一下您的賬戶", "bank")
+        assert tm.lookup("Please hold while I check your account", "bank").servable
+        assert not tm.lookup("Please hold while I check your account", "nhs").servable
+        assert not tm.lookup("Please hold while I check your account").servable
+
+    def test_other_glossary_only_hinted(self, tm):
+        tm.add("Please hold while I check your account", "請稍等，我查一下您的賬戶", "bank", "1+aaaaaaaa")
+        assert tm.lookup("Please hold while I check your account", "bank", "1+aaaaaaaa").servable
+        assert not tm.lookup("Please hold while I check your account", "bank", "2+bbbbbbbb").servable
+
+    def test_unrelated_text_misses(self, tm):
+        assert tm.lookup("the weather in Manchester is lovely today") is None
+
+    def test_short_text_ignored(self, tm):
+        """Very short utterances are left to the exact-match cache."""
+        tm.add("Yes please", "好的，麻煩你")
+        assert tm.lookup("Yes please") is None
+
+
+# =============================================================================
+# Test: Persistence
+# =============================================================================
+
+class TestPersistence:
+    """Learned entries survive a restart."""
+
+    def test_reload_from_jsonl(self, tmp_path):
+        path = tmp_path / "tm.jsonl"
+        first = TranslationMemory(path=path)
+        first.load()
+        first.add("Your parcel will arrive on Monday", "您的包裹將於星期一送達")
+
+        second = TranslationMemory(path=path)
+        second.load()
+        match = second.lookup("Your parcel will arrive on Monday")
+        assert match is not None
+        assert match.entry.translation == "您的包裹將於星期一送達"
+
+    def test_duplicates_not_appended(self, tmp_path):
+        path = tmp_path / "tm.jsonl"
+        tm = TranslationMemory(path=path)
+        for _ in range(5):
+            tm.add("Your parcel will arrive on Monday", "您的包裹將於星期一送達")
+        assert len(path.read_text(encoding="utf-8").splitlines()) == 1
+        assert tm.stats()["learned"] == 1
+
+    def test_store_compacted(self, tmp_path, monkeypatch):
+        from src.backend import translation_memory
+
+        monkeypatch.setattr(translation_memory, "TM_COMPACT_MIN_ROWS", 10)
+        path = tmp_path / "tm.jsonl"
+        tm = TranslationMemory(path=path)
+        for i in range(30):
+            tm.add("Your parcel will arrive on Monday", f"您的包裹將於星期一送達（{i}）")
+        rows = path.read_text(encoding="utf-8").splitlines()
+        assert len(rows) < 10
+
+        reloaded = TranslationMemory(path=path)
+        reloaded.load()
+        assert reloaded.lookup("Your parcel will arrive on Monday").entry.translation.endswith("（29）")
+
+    def test_stats_report_latency(self, tm):
+        tm.lookup("I'd like to book an appointment please")
+        stats = tm.stats()
+        assert stats["lookups"] == 1
+        assert stats["lookup_ms_p50"] is not None
+        assert stats["entries"] > 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
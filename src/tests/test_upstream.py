@@ -0,0 +1,262 @@
+"""
+Unit tests for the shared upstream connection pool.
+
+Reference:
+- src/backend/upstream.py
+
+Run with:
+    python -m pytest src/tests/test_upstream.py -v
+"""
+
+import sys
+import os
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+# Ensure src is in path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.backend import upstream
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Keep-alive HTTP/1.1 server answering every request with a 401.
+
+    /stall sends the headers, then waits before the body.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def _reply(self):
+        self.send_response(401)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        if self.path == "/stall":
+            self.wfile.flush()
+            time.sleep(0.5)
+        if self.command != "HEAD":
+            self.wfile.write(b"{}")
+
+    do_GET = do_HEAD = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    """Local server reached through "localhost", so connects go through the DNS cache."""
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://localhost:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def fresh_clients(monkeypatch):
+    """Each test builds its own clients and DNS cache (no env proxy)."""
+    for name in ("HTTPS_PROXY", "https_proxy", "ALL_PROXY", "all_proxy"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setattr(upstream, "_async_client", None)
+    monkeypatch.setattr(upstream, "_async_client_loop", None)
+    monkeypatch.setattr(upstream, "_sync_client", None)
+    monkeypatch.setattr(upstream, "_warmup_task", None)
+    monkeypatch.setattr(upstream, "_DNS_CACHE", {})
+    yield
+    if upstream._sync_client is not None:
+        upstream._sync_client.close()
+
+
+def _closed_port() -> int:
+    import socket
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _stats_delta(before: dict, name: str) -> int:
+    return upstream.get_upstream_stats()[name] - before[name]
+
+
+# =============================================================================
+# Test: Pooling
+# =============================================================================
+
+class TestPooling:
+    """One client per loop; requests reuse its keep-alive connections."""
+
+    def test_same_client_within_loop(self):
+        async def twice():
+            return upstream.get_async_client(), upstream.get_async_client()
+
+        first, second = asyncio.run(twice())
+        assert first is second
+        assert upstream.get_sync_client() is upstream.get_sync_client()
+
+    def test_async_connection_reused(self, server):
+        async def requests():
+            client = upstream.get_async_client()
+            for _ in range(3):
+                assert (await client.get(server)).status_code == 401
+            return upstream._pool_stats(client)
+
+        before = upstream.get_upstream_stats()
+        pool = asyncio.run(requests())
+        assert _stats_delta(before, "connections_opened") == 1
+        assert _stats_delta(before, "responses") == 3
+        assert pool == {"connections": 1, "idle": 1, "active": 0}
+
+    def test_sync_connection_reused(self, server):
+        before = upstream.get_upstream_stats()
+        client = upstream.get_sync_client()
+        for _ in range(3):
+            client.get(server)
+        assert _stats_delta(before, "connections_opened") == 1
+        assert upstream.get_upstream_stats()["connection_reuse_ratio"] is not None
+
+    def test_loop_change_closes_old_client(self):
+        async def build():
+            return upstream.get_async_client()
+
+        async def rebuild():
+            client = upstream.get_async_client()
+            await asyncio.sleep(0)  # let the close task run
+            return client
+
+        old = asyncio.run(build())
+        new = asyncio.run(rebuild())
+        assert new is not old
+        assert old.is_closed and not new.is_closed
+
+
+# =============================================================================
+# Test: Transport
+# =============================================================================
+
+class TestTransport:
+    """httpcore errors surface as the httpx errors callers catch."""
+
+    def test_sync_read_timeout(self, server):
+        with pytest.raises(httpx.ReadTimeout):
+            upstream.get_sync_client().get(f"{server}/stall", timeout=httpx.Timeout(5.0, read=0.1))
+
+    def test_async_read_timeout_in_body(self, server):
+        async def stalled():
+            client = upstream.get_async_client()
+            async with client.stream("GET", f"{server}/stall", timeout=httpx.Timeout(5.0, read=0.1)) as response:
+                assert response.status_code == 401
+                with pytest.raises(httpx.ReadTimeout):
+                    await response.aread()
+
+        asyncio.run(stalled())
+
+    def test_proxied_client_has_no_pool_stats(self, monkeypatch):
+        monkeypatch.setenv("HTTPS_PROXY", "http://127.0.0.1:9")
+        client = upstream._build_sync_client()
+        try:
+            assert upstream._pool_stats(client) == {"connections": 0, "idle": 0, "active": 0}
+        finally:
+            client.close()
+
+
+# =============================================================================
+# Test: DNS Cache
+# =============================================================================
+
+class TestDnsCache:
+    """Hosts resolved once per TTL; a failed connect drops the entry."""
+
+    def test_resolved_once(self, server):
+        before = upstream.get_upstream_stats()
+        client = upstream.get_sync_client()
+        client.get(server)
+        client.get(server, headers={"Connection": "close"})
+        client.get(server)  # new connection, cached address
+        assert _stats_delta(before, "dns_misses") == 1
+        assert _stats_delta(before, "dns_hits") == 1
+        assert upstream.get_upstream_stats()["dns_cache_entries"] == 1
+
+    def test_expired_entry_resolved_again(self, server, monkeypatch):
+        monkeypatch.setattr(upstream, "DNS_CACHE_TTL", -1)
+        before = upstream.get_upstream_stats()
+        client = upstream.get_sync_client()
+        client.get(server, headers={"Connection": "close"})
+        client.get(server)
+        assert _stats_delta(before, "dns_misses") == 2
+
+    def test_failed_connect_invalidates(self):
+        port = _closed_port()
+
+        async def connect():
+            with pytest.raises(httpx.ConnectError):
+                await upstream.get_async_client().get(f"http://localhost:{port}")
+
+        asyncio.run(connect())
+        assert ("localhost", port) not in upstream._DNS_CACHE
+
+
+# =============================================================================
+# Test: Lifespan
+# =============================================================================
+
+class TestLifespan:
+    """Warmup pre-connects both pools; shutdown closes them."""
+
+    def test_warmup_preconnects(self, server, monkeypatch):
+        monkeypatch.setattr(upstream, "WARMUP_URL", server)
+        before = upstream.get_upstream_stats()
+
+        async def lifespan():
+            await upstream.warmup()
+            return upstream._pool_stats(upstream.get_async_client())
+
+        pool = asyncio.run(lifespan())
+        assert _stats_delta(before, "warmup_ok") == 1
+        assert pool["idle"] == 1
+        assert upstream._pool_stats(upstream.get_sync_client())["idle"] == 1
+
+    def test_warmup_failure_is_soft(self, monkeypatch):
+        monkeypatch.setattr(upstream, "WARMUP_URL", f"http://localhost:{_closed_port()}")
+        before = upstream.get_upstream_stats()
+        asyncio.run(upstream.warmup())
+        assert _stats_delta(before, "warmup_failed") == 1
+
+    def test_close_on_shutdown(self, monkeypatch):
+        monkeypatch.setattr(upstream, "WARMUP_ENABLED", False)
+
+        async def lifespan():
+            await upstream.start_upstream()
+            clients = upstream._async_client, upstream._sync_client
+            await upstream.close_upstream()
+            return clients
+
+        async_client, sync_client = asyncio.run(lifespan())
+        assert async_client.is_closed and sync_client.is_closed
+        assert upstream._async_client is None and upstream._sync_client is None
+
+    def test_close_cancels_pending_warmup(self, monkeypatch):
+        async def slow_warmup():
+            await asyncio.sleep(10)
+
+        monkeypatch.setattr(upstream, "warmup", slow_warmup)
+
+        async def lifespan():
+            await upstream.start_upstream()
+            task = upstream._warmup_task
+            await upstream.close_upstream()
+            await asyncio.sleep(0)
+            return task
+
+        assert asyncio.run(lifespan()).cancelled()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
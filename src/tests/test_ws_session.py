@@ -0,0 +1,108 @@
+"""
+Unit tests for the multiplexed /ws/session WebSocket.
+
+Reference:
+- src/backend/ws_session.py
+- src/backend/main.py (session_websocket)
+
+Run with:
+    python -m pytest src/tests/test_ws_session.py -v
+"""
+
+import sys
+import os
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Ensure src is in path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.backend import main
+from src.backend.translation_cache import TranslationCache
+from src.backend.translation_memory import TranslationMemory
+
+
+async def fake_deltas(api_key, system_prompt, user_message, prompt_name=None, model=None):
+    yield "請提供"
+    yield "排序碼"
+
+
+@pytest.fixture
+def client(tmp_path):
+    """App client with a fake upstream and an empty cache / translation memory."""
+    memory = TranslationMemory(path=tmp_path / "tm.jsonl")
+    cache = TranslationCache(max_entries=100, max_bytes=100_000, ttl_seconds=60)
+    with patch.object(main, "_stream_translation_deltas", fake_deltas), \
+            patch.object(main, "translation_memory", memory), \
+            patch.object(main, "translation_cache", cache):
+        yield TestClient(main.app)
+
+
+def _auth(ws):
+    ws.send_json({"type": "auth", "api_key": "test_key"})
+    return ws.receive_json()
+
+
+# =============================================================================
+# Test: Handshake
+# =============================================================================
+
+class TestHandshake:
+    """The first message must carry the API key."""
+
+    def test_ready_after_auth(self, client):
+        with client.websocket_connect("/ws/session") as ws:
+            assert _auth(ws) == {"type": "ready", "seq": 1}
+
+    def test_missing_api_key_rejected(self, client):
+        with client.websocket_connect("/ws/session") as ws:
+            ws.send_json({"type": "translate", "segment_id": "s1", "text": "Hi"})
+            message = ws.receive_json()
+            assert message["type"] == "error"
+            assert "API Key required" in message["data"]["error"]
+
+
+# =============================================================================
+# Test: Translation Routing
+# =============================================================================
+
+class TestTranslate:
+    """Translation deltas are tagged with segment_id / seq / part."""
+
+    def test_translate_stream_tagged(self, client):
+        with client.websocket_connect("/ws/session") as ws:
+            _auth(ws)
+            ws.send_json({
+                "type": "translate",
+                "segment_id": "s1",
+                "text": "Could you give me the sort code for the ws test",
+            })
+            messages = [ws.receive_json() for _ in range(3)]
+
+        assert [m["data"] for m in messages] == [
+            {"text": "請提供"}, {"text": "排序碼"}, {"done": True},
+        ]
+        assert [m["part"] for m in messages] == [0, 1, 2]
+        assert all(m["segment_id"] == "s1" for m in messages)
+        seqs = [m["seq"] for m in messages]
+        assert seqs == sorted(seqs)
+
+    def test_invalid_payload_reports_error(self, client):
+        with client.websocket_connect("/ws/session") as ws:
+            _auth(ws)
+            ws.send_json({"type": "translate", "segment_id": "s2"})
+            message = ws.receive_json()
+        assert message["type"] == "error"
+        assert message["segment_id"] == "s2"
+
+    def test_ping(self, client):
+        with client.websocket_connect("/ws/session") as ws:
+            _auth(ws)
+            ws.send_json({"type": "ping"})
+            assert ws.receive_json()["type"] == "pong"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])